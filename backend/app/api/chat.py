@@ -1,36 +1,32 @@
 # app/api/chat_endpoints.py
 import uuid
-import time # NEU
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import List
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services.chat_service import ChatService
 from app.db.session import get_async_db
 from app.schemas.chat_schemas import ChatRequest, ChatResponse, SourceDetail 
+from app.core.sse import SSE_HEADERS, format_sse_event
+from app.core.observability import log_debug
 
 router = APIRouter(prefix="/chat", tags=["Chat (RAG)"])
 
 @router.post("/", response_model=ChatResponse)
 async def handle_chat_message(request_body: ChatRequest, db: AsyncSession = Depends(get_async_db)):
-    request_received_time = time.time() # Zeitstempel: Request erhalten
-    print(f"LOG_API_CHAT_TIMING: [{time.strftime('%H:%M:%S')}] Request empfangen.")
-
     if not request_body.message.strip(): raise HTTPException(status_code=400, detail="Nachricht leer.")
     session_id = uuid.UUID(request_body.session_id) if request_body.session_id else uuid.uuid4()
     
-    print(f"LOG_API_CHAT: Request Session {session_id}, Msg: '{request_body.message[:50]}...', RAG: {request_body.use_rag}")
+    log_debug("LOG_API_CHAT", "Request Session %s, Msg: '%s...', RAG: %s", session_id, request_body.message[:50], request_body.use_rag)
 
     chat_service = ChatService()
     try:
-        service_call_start_time = time.time()
-        print(f"LOG_API_CHAT_TIMING: [{time.strftime('%H:%M:%S')}] Rufe ChatService.process_chat_message auf...")
         service_result = await chat_service.process_chat_message(
             db, session_id, request_body.message, 
-            request_body.num_sources, request_body.use_rag
+            request_body.num_sources, request_body.use_rag,
+            retrieval_filters=request_body.filters
         )
-        service_call_end_time = time.time()
-        print(f"LOG_API_CHAT_TIMING: [{time.strftime('%H:%M:%S')}] ChatService.process_chat_message beendet. Dauer: {service_call_end_time - service_call_start_time:.2f}s")
         
         api_sources_pydantic_list: List[SourceDetail] = []
         retrieved_sources_from_service = service_result.get("retrieved_sources_for_context", [])
@@ -39,18 +35,42 @@ async def handle_chat_message(request_body: ChatRequest, db: AsyncSession = Depe
                 if source_dict.get("chunk_id") is None: continue 
                 api_sources_pydantic_list.append(SourceDetail(**source_dict))
         
-        response_object_creation_start_time = time.time()
         response = ChatResponse(
             session_id=str(session_id), 
             ai_message=service_result.get("ai_message", "Fehler: Keine Antwort erhalten."),
-            retrieved_sources=api_sources_pydantic_list
+            retrieved_sources=api_sources_pydantic_list,
+            token_usage=service_result.get("token_usage")
         )
-        response_object_creation_end_time = time.time()
-        print(f"LOG_API_CHAT_TIMING: [{time.strftime('%H:%M:%S')}] ChatResponse Objekt erstellt. Dauer: {response_object_creation_end_time - response_object_creation_start_time:.2f}s")
-        
-        print(f"LOG_API_CHAT: Verarbeitung abgeschlossen. Sende Ergebnis.")
         return response
     except Exception as e:
         print(f"ERROR_API_CHAT: Unerwarteter Fehler im Endpunkt: {e}")
         import traceback; traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Chat Fehler: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Chat Fehler: {str(e)}")
+
+
+@router.post("/stream")
+async def stream_chat_message(request_body: ChatRequest):
+    """
+    Wie POST /chat/, aber als Server-Sent-Events: `sources` (sofort nach dem Retrieval), dann `token`
+    pro Textstück und `done` mit der vollständigen Antwort, sobald sie in der Historie gespeichert ist.
+    """
+    if not request_body.message.strip(): raise HTTPException(status_code=400, detail="Nachricht leer.")
+    session_id = uuid.UUID(request_body.session_id) if request_body.session_id else uuid.uuid4()
+    log_debug("LOG_API_CHAT", "Stream-Request Session %s, Msg: '%s...', RAG: %s", session_id, request_body.message[:50], request_body.use_rag)
+
+    chat_service = ChatService()
+
+    async def event_stream():
+        try:
+            async for event, data in chat_service.stream_chat_message(
+                session_id, request_body.message,
+                request_body.num_sources, request_body.use_rag,
+                retrieval_filters=request_body.filters
+            ):
+                yield format_sse_event(event, data)
+        except Exception as e:
+            print(f"ERROR_API_CHAT: Fehler im Chat-Stream: {e}")
+            import traceback; traceback.print_exc()
+            yield format_sse_event("error", {"detail": f"Chat Fehler: {str(e)}"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -0,0 +1,73 @@
+# app/api/embedding_migration.py
+from fastapi import APIRouter, HTTPException, status
+from typing import List
+
+from app.services.embedding_migration import get_embedding_migration_manager
+from app.schemas.embedding_migration_schemas import EmbeddingMigrationRequest, EmbeddingVersionStatus
+
+router = APIRouter(
+    prefix="/embeddings",
+    tags=["Embedding Model Migration"],
+)
+
+
+@router.get("/versions", response_model=List[EmbeddingVersionStatus])
+async def list_embedding_versions():
+    """
+    Alle Embedding-Versionen (aktiv, in Migration, stillgelegt) mit Fortschritt und Durchsatz.
+    """
+    return await get_embedding_migration_manager().list_statuses()
+
+
+@router.get("/versions/{version_id}", response_model=EmbeddingVersionStatus)
+async def get_embedding_version(version_id: int):
+    version_status = await get_embedding_migration_manager().get_status(version_id)
+    if version_status is None:
+        raise HTTPException(status_code=404, detail="Embedding-Version nicht gefunden")
+    return version_status
+
+
+@router.post("/migrations", response_model=EmbeddingVersionStatus, status_code=status.HTTP_202_ACCEPTED)
+async def start_embedding_migration(request: EmbeddingMigrationRequest):
+    """
+    Startet (oder setzt fort) das Neu-Einbetten aller Chunks mit dem angegebenen Modell im Hintergrund.
+    Die Suche läuft währenddessen weiter auf dem aktiven Modell; umgeschaltet wird per /activate.
+    """
+    try:
+        return await get_embedding_migration_manager().start_migration(request.provider, request.model_name, request.dimension)
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(ve))
+
+
+@router.post("/versions/{version_id}/pause", response_model=EmbeddingVersionStatus)
+async def pause_embedding_migration(version_id: int):
+    version_status = await get_embedding_migration_manager().pause(version_id)
+    if version_status is None:
+        raise HTTPException(status_code=404, detail="Embedding-Version nicht gefunden")
+    return version_status
+
+
+@router.post("/versions/{version_id}/activate", response_model=EmbeddingVersionStatus)
+async def activate_embedding_version(version_id: int):
+    """
+    Schaltet atomar auf eine fertig migrierte Version ("ready") um. Die bisherigen Vektoren bleiben als
+    "retired" erhalten, sodass ein Rückweg per erneuter Migration nur fehlende Chunks einbetten muss.
+    """
+    try:
+        version_status = await get_embedding_migration_manager().activate(version_id)
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(ve))
+    if version_status is None:
+        raise HTTPException(status_code=404, detail="Embedding-Version nicht gefunden")
+    return version_status
+
+
+@router.delete("/versions/{version_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_embedding_version(version_id: int):
+    """Löscht eine nicht aktive Version samt ihrer gespeicherten Vektoren."""
+    try:
+        deleted = await get_embedding_migration_manager().delete(version_id)
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(ve))
+    if deleted is None:
+        raise HTTPException(status_code=404, detail="Embedding-Version nicht gefunden")
@@ -1,11 +1,14 @@
 # app/api/generation_endpoints.py
 from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services.generation_service import GenerationService
+from app.services.llm_service import get_llm_cache_stats
 from app.db.session import get_async_db
 from app.schemas.generation_schemas import GenerateTextQuery, GeneratedTextResponse, SourceDetail
+from app.core.sse import SSE_HEADERS, format_sse_event
 
 router = APIRouter(
     prefix="/generation",
@@ -34,7 +37,8 @@ async def generate_text_from_sources_endpoint(
             db=db,
             editor_context_html=request_body.editor_context_html,
             user_prompt=request_body.user_prompt, # Kann None sein
-            num_retrieved_chunks=request_body.num_sources
+            num_retrieved_chunks=request_body.num_sources,
+            retrieval_filters=request_body.filters
         )
 
         api_sources = []
@@ -49,4 +53,40 @@ async def generate_text_from_sources_endpoint(
     except Exception as e:
         print(f"ERROR_API_GENERATE: Fehler bei Textgenerierung: {e}")
         import traceback; traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Fehler bei der Textgenerierung: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Fehler bei der Textgenerierung: {str(e)}")
+
+
+@router.post("/generate-from-query/stream")
+async def stream_text_from_sources_endpoint(request_body: GenerateTextQuery):
+    """
+    Streaming-Variante von /generate-from-query (Server-Sent-Events): `sources`, dann `token`
+    pro Textstück und zum Schluss `done` mit dem vollständigen Text bzw. `error` bei einem Fehler.
+    """
+    if not (request_body.user_prompt and request_body.user_prompt.strip()) and not request_body.editor_context_html.strip():
+        raise HTTPException(status_code=400, detail="Editor-Kontext darf nicht leer sein.")
+
+    generation_service = GenerationService()
+
+    async def event_stream():
+        try:
+            async for event, data in generation_service.stream_text_with_context(
+                editor_context_html=request_body.editor_context_html,
+                user_prompt=request_body.user_prompt,
+                num_retrieved_chunks=request_body.num_sources,
+                retrieval_filters=request_body.filters
+            ):
+                yield format_sse_event(event, data)
+        except Exception as e:
+            print(f"ERROR_API_GENERATE: Fehler im Generierungs-Stream: {e}")
+            import traceback; traceback.print_exc()
+            yield format_sse_event("error", {"detail": f"Fehler bei der Textgenerierung: {str(e)}"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.get("/llm-cache/stats")
+async def llm_cache_stats():
+    """
+    Gibt Trefferquote, zusammengeführte (gleichzeitige) Anfragen und eingesparte LLM-Latenz des Antwort-Caches zurück.
+    """
+    return get_llm_cache_stats()
@@ -0,0 +1,16 @@
+# app/api/metrics.py
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.observability import get_metrics_registry
+
+router = APIRouter(tags=["Monitoring"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    """
+    Stufen-Dauern (rag_stage_duration_seconds), HTTP-Latenzen (http_request_duration_seconds) und Auslastung des
+    DB-Pools (db_pool_*) im Prometheus-Textformat.
+    """
+    return PlainTextResponse(get_metrics_registry().render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,9 +1,10 @@
 # app/api/routers/online_search_router.py
+import asyncio
 from fastapi import APIRouter, HTTPException, status, Body
 from typing import List
 
 from app.schemas.online_search_schemas import ArxivSearchRequest, ArxivSearchResponse, ArxivPaperResult
-from app.services.online_search_service import search_arxiv_service # Angepasster Service-Name
+from app.services.online_search_service import search_arxiv_service, get_arxiv_cache_stats # Angepasster Service-Name
 
 router = APIRouter(
     prefix="/online-search", # Bleibt gleich
@@ -41,4 +42,12 @@ async def perform_arxiv_search_endpoint( # Endpunkt-Funktionsname leicht geände
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ein interner Serverfehler ist aufgetreten: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/arxiv/cache-stats")
+async def arxiv_cache_stats():
+    """
+    Gibt Treffer/Fehlzähler und Größe des arXiv-Antwort-Caches und des Zusammenfassungs-Caches zurück.
+    """
+    return await asyncio.to_thread(get_arxiv_cache_stats) # zählt Einträge per SQLite
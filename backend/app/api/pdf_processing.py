@@ -1,15 +1,25 @@
 # app/api/pdf_processing.py
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status, Path
-from typing import Dict, Any, List
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status, Path, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Union
 from sqlalchemy.ext.asyncio import AsyncSession # NEU: Import für DB-Session
 import uuid
-from app.services.pdf_processing_service import PdfProcessingService
-from app.dependencies import get_marker_resources 
+import json
+import asyncio
+# PdfProcessingService (Marker, torch, fitz, PIL) erst bei der ersten PDF-Verarbeitung laden, nicht beim API-Start
+from app.dependencies import get_pdf_processing_service
 from app.schemas.processing_schemas import PdfProcessingResult
 from app.db.session import get_async_db # NEU: Importiere die DB-Session Dependency
-from app.db.crud import crud_document # Importiere die neuen CRUD-Funktionen
-from app.schemas.document_schemas import DocumentDisplay
+from app.db.crud import crud_document, crud_chunk # Importiere die neuen CRUD-Funktionen
+from app.schemas.document_schemas import DocumentDisplay, DocumentBulkDeleteRequest, DocumentBulkDeleteResponse
 from app.schemas.online_search_schemas import ImportFromUrlRequest, BatchImportFromUrlResponse, BatchImportFromUrlRequest
+from app.schemas.ingestion_job_schemas import IngestionJobCreated, IngestionJobStatus
+from app.services.ingestion_jobs import get_ingestion_job_manager
+from app.services.pdf_url_import import enqueue_pdf_from_url, iter_enqueue_pdfs_from_urls
+from app.services.pdf_artifact_cache import compute_pdf_fingerprint
+from app.services.image_store import get_image_store_stats, schedule_document_folder_removal
+from app.services.index_maintenance import get_index_maintenance_manager, MAINTENANCE_ACTIONS
+from app.services.corpus_version import bump_corpus_version
 
 
 # Router für PDF-Verarbeitungs-Endpunkte
@@ -19,15 +29,30 @@ router = APIRouter(
 )
 
 
-@router.post("/extract-and-store", response_model=PdfProcessingResult) 
+def _job_created_response(job_id: str, job_status: str, original_filename: str) -> IngestionJobCreated:
+    return IngestionJobCreated(
+        job_id=job_id,
+        status=job_status,
+        original_filename=original_filename,
+        status_url=f"{router.prefix}/jobs/{job_id}",
+        events_url=f"{router.prefix}/jobs/{job_id}/events",
+    )
+
+
+@router.post("/extract-and-store", response_model=Union[IngestionJobCreated, PdfProcessingResult])
 async def extract_and_store_content_from_pdf( # Name der Funktion ggf. auch anpassen
+    response: Response,
     uploaded_file: UploadFile = File(..., description="Die hochzuladende PDF-Datei."),
-    marker_res: Dict[str, Any] = Depends(get_marker_resources),
+    background: bool = Query(True, description="True: PDF wird als Job eingereiht (202 + Job-ID). False: synchrone Verarbeitung im Request."),
+    rechunk: bool = Query(False, description="True: Ist das PDF bereits gespeichert, wird es aus dem gecachten Markdown neu gechunkt und eingebettet."),
     db: AsyncSession = Depends(get_async_db) # NEU: DB-Session als Dependency injizieren
 ):
     """
     Nimmt eine PDF entgegen, extrahiert Inhalte, speichert Dokument-Metadaten
-    und gechunkte Texte mit Embeddings in der Datenbank und gibt das Ergebnis zurück.
+    und gechunkte Texte mit Embeddings in der Datenbank.
+    Standardmäßig wird die Verarbeitung als Hintergrund-Job eingereiht; der Fortschritt ist über
+    `GET /pdf-processor/jobs/{job_id}` bzw. `/jobs/{job_id}/events` abrufbar.
+    PDFs mit bereits gespeichertem Inhalt (SHA-256) werden ohne Marker/Embedding sofort beantwortet.
     """
     if not uploaded_file.content_type == "application/pdf":
         print(f"WARN_API: Ungültiger Dateityp: {uploaded_file.content_type} für {uploaded_file.filename}")
@@ -46,22 +71,37 @@ async def extract_and_store_content_from_pdf( # Name der Funktion ggf. auch anpa
     finally:
         await uploaded_file.close() 
 
-    # Service-Instanz mit den gecachten Marker-Ressourcen erstellen
-    # Die `config` kommt jetzt direkt von `marker_res`
-    service_config = marker_res.get("config", {}) # Standardmäßig leeres Dict, falls nicht vorhanden
-    artifact_dict = marker_res.get("artifact_dict", {})
+    if background:
+        manager = get_ingestion_job_manager()
+        if not rechunk:
+            # Duplikate nicht erst hinter laufenden Marker-Jobs einreihen, sondern direkt als erledigt melden
+            content_sha256 = await asyncio.to_thread(compute_pdf_fingerprint, pdf_content_bytes)
+            existing_document = await crud_document.get_document_by_fingerprint(db, content_sha256)
+            if existing_document:
+                job_id = await manager.record_completed(uploaded_file.filename, {
+                    "original_filename": uploaded_file.filename,
+                    "processed_document_id": existing_document.processed_document_id,
+                    "num_chunks": await crud_chunk.count_chunks_by_document_id(db, existing_document.id),
+                    "images": [],
+                    "debug_message": f"'{uploaded_file.filename}' ist bereits als '{existing_document.original_filename}' gespeichert (identischer Inhalt). Verarbeitung übersprungen.",
+                    "deduplicated": True,
+                })
+                print(f"LOG_API: '{uploaded_file.filename}' ist ein Duplikat von Dokument {existing_document.id}. Kein Job eingereiht.")
+                return _job_created_response(job_id, "succeeded", uploaded_file.filename)
+        job_id = await manager.enqueue(pdf_content_bytes, uploaded_file.filename, rechunk_existing=rechunk)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return _job_created_response(job_id, "queued", uploaded_file.filename)
 
-    service = PdfProcessingService(
-        artifact_dict=artifact_dict,
-        config=service_config 
-    )
+    # Geteilte Service-Instanz (Converter-Pool); erster Aufruf ohne Warm-up lädt die Modelle (blockierend)
+    service = await asyncio.to_thread(get_pdf_processing_service)
 
     try:
         # Rufe die neue asynchrone Service-Methode auf, die auch in die DB speichert
         processing_output = await service.process_pdf_data_and_store( # await, da die Methode jetzt async ist
             db=db,                                      # Übergebe die DB-Session
             pdf_bytes=pdf_content_bytes, 
-            original_doc_filename=uploaded_file.filename
+            original_doc_filename=uploaded_file.filename,
+            rechunk_existing=rechunk
         )
         
         print(f"LOG_API: Verarbeitung und Speicherung für '{uploaded_file.filename}' abgeschlossen. Sende Ergebnis.")
@@ -76,6 +116,53 @@ async def extract_and_store_content_from_pdf( # Name der Funktion ggf. auch anpa
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Ein interner Serverfehler ist aufgetreten: {str(e)}")
     
     
+@router.get("/jobs/{job_id}", response_model=IngestionJobStatus)
+async def read_ingestion_job(job_id: str = Path(..., description="Die ID des Ingestion-Jobs")):
+    """
+    Gibt Status und Dauer der einzelnen Verarbeitungsstufen (marker, chunking, embedding, db) eines Jobs zurück.
+    """
+    job = await get_ingestion_job_manager().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job nicht gefunden")
+    return IngestionJobStatus(**job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_ingestion_job_events(job_id: str = Path(..., description="Die ID des Ingestion-Jobs")):
+    """
+    Server-Sent-Events-Stream mit dem Fortschritt eines Jobs. Sendet bei jeder Änderung
+    (Status, aktuelle Stufe, Stufen-Dauer) ein Event und endet, sobald der Job abgeschlossen ist.
+    """
+    manager = get_ingestion_job_manager()
+    if await manager.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job nicht gefunden")
+
+    async def event_generator():
+        last_payload = None
+        while True:
+            job = await manager.get_job(job_id)
+            if job is None:
+                break
+            payload = IngestionJobStatus(**job).json()
+            if payload != last_payload:
+                yield f"event: progress\ndata: {payload}\n\n"
+                last_payload = payload
+            if job["status"] in ("succeeded", "failed"):
+                yield f"event: done\ndata: {json.dumps({'status': job['status']})}\n\n"
+                break
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+@router.get("/image-store/stats")
+async def image_store_stats():
+    """
+    Gibt Objektanzahl, Speicherbelegung, durch Deduplizierung gesparte Bytes und nicht mehr verlinkte Objekte des Bild-Stores zurück.
+    """
+    return await asyncio.to_thread(get_image_store_stats)
+
+
 @router.get("/documents", response_model=List[DocumentDisplay])
 async def read_documents(
     skip: int = 0,
@@ -102,6 +189,12 @@ async def read_document(
         raise HTTPException(status_code=404, detail="Dokument nicht gefunden")
     return db_document
 
+def _after_documents_deleted(deleted_rows, deleted_chunks: int) -> None:
+    """Nach dem Commit: Retrieval-Cache invalidieren, Bildordner im Hintergrund entfernen, Index-Wartung vormerken."""
+    bump_corpus_version(f"{len(deleted_rows)} Dokument(e) gelöscht") # erst nach dem Commit, sonst könnten alte Ergebnisse neu gecacht werden
+    schedule_document_folder_removal([row.processed_document_id for row in deleted_rows])
+    get_index_maintenance_manager().note_deleted_chunks(deleted_chunks)
+
 # NEUER Endpunkt: Ein Dokument löschen
 @router.delete("/documents/{document_id}", response_model=DocumentDisplay) # Gibt das gelöschte Dokument zurück
 async def delete_document_endpoint( # Name geändert, um Konflikt zu vermeiden, falls du delete_document importierst
@@ -109,42 +202,74 @@ async def delete_document_endpoint( # Name geändert, um Konflikt zu vermeiden,
     db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Löscht ein spezifisches Dokument anhand seiner ID.
-    Die zugehörigen Chunks werden durch die Cascade-Beziehung in der DB ebenfalls gelöscht.
+    Löscht ein spezifisches Dokument anhand seiner ID mit einem einzigen DELETE.
+    Die zugehörigen Chunks entfernt die Datenbank per ON DELETE CASCADE, die Bildordner werden im Hintergrund gelöscht.
     """
-    deleted_document = await crud_document.delete_document(db, document_id=document_id)
-    if deleted_document is None:
+    deleted_rows, deleted_chunks = await crud_document.delete_documents(db, [document_id])
+    if not deleted_rows:
         raise HTTPException(status_code=404, detail="Dokument nicht gefunden")
     
     await db.commit() # Wichtig: Commit nach der Löschoperation
-    print(f"LOG_API: Dokument mit ID {document_id} erfolgreich gelöscht.")
-    return deleted_document
+    _after_documents_deleted(deleted_rows, deleted_chunks)
+    print(f"LOG_API: Dokument mit ID {document_id} erfolgreich gelöscht ({deleted_chunks} Chunks).")
+    return dict(deleted_rows[0]._mapping)
 
 
-@router.post("/import-from-url", response_model=PdfProcessingResult, status_code=status.HTTP_201_CREATED)
-async def import_pdf_from_url_endpoint(
-    request_data: ImportFromUrlRequest,
-    marker_res: Dict[str, Any] = Depends(get_marker_resources), # Brauchen wir immer noch für den Service
+@router.post("/documents/bulk-delete", response_model=DocumentBulkDeleteResponse)
+async def bulk_delete_documents_endpoint(
+    request_body: DocumentBulkDeleteRequest,
     db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Nimmt eine PDF-URL und zugehörige Metadaten entgegen, lädt die PDF serverseitig herunter,
-    verarbeitet sie und speichert sie in der Datenbank.
+    Löscht mehrere Dokumente in einer Transaktion (ein DELETE, Chunks per ON DELETE CASCADE).
+    Nicht gefundene IDs werden in `not_found` zurückgegeben.
+    """
+    deleted_rows, deleted_chunks = await crud_document.delete_documents(db, request_body.document_ids)
+    if deleted_rows:
+        await db.commit()
+        _after_documents_deleted(deleted_rows, deleted_chunks)
+    deleted_ids = {row.id for row in deleted_rows}
+    print(f"LOG_API: {len(deleted_rows)} von {len(set(request_body.document_ids))} Dokumenten gelöscht ({deleted_chunks} Chunks).")
+    return DocumentBulkDeleteResponse(
+        deleted=[DocumentDisplay(**row._mapping) for row in deleted_rows],
+        not_found=[doc_id for doc_id in dict.fromkeys(request_body.document_ids) if doc_id not in deleted_ids],
+        deleted_chunks=deleted_chunks,
+    )
+
+
+@router.get("/index-maintenance")
+async def index_maintenance_stats():
+    """
+    Zustand der chunks-Tabelle und des Vektor-Index: tote Tupel nach Löschungen, Empfehlung (vacuum/reindex),
+    letzte Wartung. Nach Löschungen prüft der Server selbst (INDEX_MAINTENANCE_*), ob eine Wartung nötig ist.
+    """
+    return await get_index_maintenance_manager().get_stats()
+
+
+@router.post("/index-maintenance")
+async def run_index_maintenance(
+    action: str = Query("vacuum", description="vacuum: VACUUM (ANALYZE) chunks, reindex: REINDEX INDEX CONCURRENTLY des Vektor-Index und danach VACUUM.")
+):
+    """Startet die Index-Wartung sofort (Suche und Ingestion laufen währenddessen weiter)."""
+    if action not in MAINTENANCE_ACTIONS:
+        raise HTTPException(status_code=400, detail=f"Unbekannte Wartung '{action}'. Erlaubt: {', '.join(MAINTENANCE_ACTIONS)}")
+    return await get_index_maintenance_manager().run(action)
+
+
+@router.post("/import-from-url", response_model=IngestionJobCreated, status_code=status.HTTP_202_ACCEPTED)
+async def import_pdf_from_url_endpoint(request_data: ImportFromUrlRequest):
+    """
+    Nimmt eine PDF-URL und zugehörige Metadaten entgegen, lädt die PDF serverseitig herunter und reiht sie
+    als Ingestion-Job ein (Marker/Embedding laufen im Ingestion-Worker). Fortschritt über
+    `GET /pdf-processor/jobs/{job_id}` bzw. `/jobs/{job_id}/events`.
     """
     print(f"API_LOG: Empfange Import-Anfrage für URL: {request_data.pdf_url}")
-    
-    service_config = marker_res.get("config", {})
-    artifact_dict = marker_res.get("artifact_dict", {})
-    service = PdfProcessingService(artifact_dict=artifact_dict, config=service_config)
 
     try:
-        processing_output = await service.import_pdf_from_url_and_store(
-            db=db,
-            request_data=request_data
-        )
-        print(f"API_LOG: Import und Verarbeitung für URL '{request_data.pdf_url}' abgeschlossen.")
-        return processing_output
-    except ValueError as ve: # Spezifische Fehler vom Service (z.B. Download-Fehler)
+        job_id = await enqueue_pdf_from_url(get_ingestion_job_manager(), request_data)
+        print(f"API_LOG: PDF von URL '{request_data.pdf_url}' als Job {job_id} eingereiht.")
+        return _job_created_response(job_id, "queued", request_data.original_filename)
+    except ValueError as ve: # Download-Fehler
         print(f"API_ERROR: Validierungs- oder Logikfehler beim Import von URL '{request_data.pdf_url}': {ve}")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
     except Exception as e:
@@ -158,35 +283,38 @@ async def import_pdf_from_url_endpoint(
         
         
 @router.post("/batch-import-from-urls", response_model=BatchImportFromUrlResponse, status_code=status.HTTP_200_OK)
-async def batch_import_pdfs_from_urls_endpoint(
-    request_data: BatchImportFromUrlRequest,
-    marker_res: Dict[str, Any] = Depends(get_marker_resources),
-    db: AsyncSession = Depends(get_async_db)
-):
+async def batch_import_pdfs_from_urls_endpoint(request_data: BatchImportFromUrlRequest):
     """
-    Nimmt eine Liste von PDF-URLs und zugehörigen Metadaten entgegen,
-    lädt die PDFs serverseitig herunter, verarbeitet sie und speichert sie in der Datenbank.
-    Gibt den Status für jedes versuchte Paper zurück.
+    Nimmt eine Liste von PDF-URLs und zugehörigen Metadaten entgegen, lädt die PDFs serverseitig (parallel)
+    herunter und reiht jedes als Ingestion-Job ein. Gibt pro Paper den Status ("queued" mit job_id oder "error")
+    in der Reihenfolge der Anfrage zurück; die Verarbeitung selbst läuft im Ingestion-Worker.
     """
     print(f"API_LOG: Empfange Batch-Import-Anfrage für {len(request_data.papers)} Paper.")
-    
-    service_config = marker_res.get("config", {})
-    artifact_dict = marker_res.get("artifact_dict", {})
-    service = PdfProcessingService(artifact_dict=artifact_dict, config=service_config)
 
     try:
-        batch_processing_results = await service.batch_import_pdfs_from_urls(
-            db=db,
-            papers_to_import=request_data.papers
-        )
-        print(f"API_LOG: Batch-Import und Verarbeitung abgeschlossen.")
-        return BatchImportFromUrlResponse(results=batch_processing_results)
+        indexed_results = [item async for item in iter_enqueue_pdfs_from_urls(get_ingestion_job_manager(), request_data.papers)]
+        print(f"API_LOG: Batch-Import: {len(indexed_results)} Paper bearbeitet.")
+        return BatchImportFromUrlResponse(results=[result_item for _index, result_item in sorted(indexed_results, key=lambda item: item[0])])
     except Exception as e: # Fängt allgemeine Fehler im Batch-Prozess ab (sollte selten sein, da Fehler pro Item gehandhabt werden)
         print(f"API_ERROR: Unerwarteter Serverfehler beim Batch-Import: {e}")
         import traceback
         traceback.print_exc()
-        # Du könntest hier auch eine Liste von Fehlern zurückgeben, wenn der ganze Batch fehlschlägt
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ein interner Serverfehler ist beim Batch-Import aufgetreten: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/batch-import-from-urls/stream")
+async def stream_batch_import_pdfs_from_urls_endpoint(request_data: BatchImportFromUrlRequest):
+    """
+    Wie `/batch-import-from-urls`, liefert aber jedes Ergebnis sofort nach dem Einreihen als eine
+    Zeile NDJSON (`{"index": ..., "result": BatchImportResultItem}`), in Reihenfolge der Fertigstellung.
+    """
+    print(f"API_LOG: Empfange Streaming-Batch-Import-Anfrage für {len(request_data.papers)} Paper.")
+
+    async def result_lines():
+        async for index, result_item in iter_enqueue_pdfs_from_urls(get_ingestion_job_manager(), request_data.papers):
+            yield json.dumps({"index": index, "result": json.loads(result_item.json())}) + "\n"
+
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
@@ -1,11 +1,13 @@
 # app/api/retrieval_endpoints.py
+import uuid
 from fastapi import APIRouter, Depends, HTTPException, Query # Query bleibt
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.services.retrieval_service import RetrievalService
+from app.services.retrieval_service import RetrievalService, RetrievalMode, get_retrieval_cache_stats
+from app.services.embedding_service import get_embedding_cache_stats
 from app.db.session import get_async_db
-from app.schemas.processing_schemas import RetrievedChunk
+from app.schemas.processing_schemas import RetrievedChunk, RetrievalFilters
 # Kein Pydantic-Modell für den Request-Body mehr nötig, wenn alles über Query-Params geht
 
 router = APIRouter(
@@ -18,6 +20,11 @@ router = APIRouter(
 async def find_similar_content_via_get( # Name ggf. angepasst für Klarheit
     query: str = Query(..., min_length=3, description="Der Suchtext oder die Frage."),
     limit: int = Query(5, ge=1, le=20, description="Maximale Anzahl zurückgegebener Chunks."),
+    mode: Optional[RetrievalMode] = Query(None, description="vector (Kosinus-Ähnlichkeit), lexical (Volltext) oder hybrid (beide, per Reciprocal Rank Fusion kombiniert)."),
+    document_ids: Optional[List[uuid.UUID]] = Query(None, description="Nur in diesen Dokumenten suchen (Parameter mehrfach angeben)."),
+    year_from: Optional[int] = Query(None, description="Frühestes Veröffentlichungsjahr."),
+    year_to: Optional[int] = Query(None, description="Spätestes Veröffentlichungsjahr."),
+    author: Optional[str] = Query(None, description="Autor (Teilstring, Groß-/Kleinschreibung egal)."),
     db: AsyncSession = Depends(get_async_db)
 ):
     """
@@ -32,7 +39,9 @@ async def find_similar_content_via_get( # Name ggf. angepasst für Klarheit
         similar_chunks_data = await retrieval_service.find_relevant_chunks(
             db=db,
             query_text=query, # query_text aus dem URL-Parameter
-            limit=limit      # limit aus dem URL-Parameter
+            limit=limit,     # limit aus dem URL-Parameter
+            mode=mode,
+            filters=RetrievalFilters(document_ids=document_ids, year_from=year_from, year_to=year_to, author=author)
         )
 
         response_data = []
@@ -44,11 +53,28 @@ async def find_similar_content_via_get( # Name ggf. angepasst für Klarheit
                 document_author=chunk_data.get("document_author"),
                 original_filename=chunk_data.get("original_filename"),
                 publication_year=chunk_data.get("publication_year"),
-                distance=chunk_data.get("distance")
+                distance=chunk_data.get("distance"),
+                score=chunk_data.get("rrf_score", chunk_data.get("text_rank"))
             ))
         return response_data
 
     except Exception as e:
         print(f"ERROR_API_RETRIEVAL (GET): Fehler bei Ähnlichkeitssuche: {e}")
         import traceback; traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Fehler bei der Ähnlichkeitssuche: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Fehler bei der Ähnlichkeitssuche: {str(e)}")
+
+
+@router.get("/embedding-cache/stats")
+async def embedding_cache_stats():
+    """
+    Gibt Treffer-/Fehlzähler und Größe des Embedding-Caches zurück.
+    """
+    return get_embedding_cache_stats()
+
+
+@router.get("/result-cache/stats")
+async def retrieval_result_cache_stats():
+    """
+    Gibt Trefferquote, durch Korpus-Änderungen verworfene Einträge (stale_evictions) und Größe des Ergebnis-Caches zurück.
+    """
+    return get_retrieval_cache_stats()
@@ -6,6 +6,8 @@ from .generation import router as generation_router
 from .chat import router as chat_router
 from .simple_google_ai import router as simple_google_ai_router
 from .online_search_router import router as online_search_router
+from .embedding_migration import router as embedding_migration_router
+from .metrics import router as metrics_router
 
 api_router = APIRouter()
 
@@ -15,3 +17,5 @@ api_router.include_router(generation_router)
 api_router.include_router(chat_router)
 api_router.include_router(simple_google_ai_router)
 api_router.include_router(online_search_router)
+api_router.include_router(embedding_migration_router)
+api_router.include_router(metrics_router)
@@ -7,7 +7,7 @@ from dotenv import load_dotenv
 # Langchain spezifische Imports
 from langchain_core.prompts import ChatPromptTemplate # Gut für Chat Modelle
 from langchain_core.output_parsers import StrOutputParser
-from langchain_google_genai import ChatGoogleGenerativeAI # Für Gemini Chat Modelle
+# ChatGoogleGenerativeAI (Gemini) wird erst im Endpunkt importiert - hält den Start der API schnell
 # Alternativ, für ältere oder non-chat Text-Completion Modelle:
 # from langchain_google_genai import GoogleGenerativeAI
 
@@ -51,6 +51,7 @@ async def generate_text_from_langchain_google_ai(request: SimpleGenerateRequest)
         #            älteren Langchain-Versionen nötig sein, wenn man System-Prompts nutzt
         #            und das Modell diese nicht direkt unterstützt. Für einfache User-Prompts
         #            ist es oft nicht notwendig.
+        from langchain_google_genai import ChatGoogleGenerativeAI
         llm = ChatGoogleGenerativeAI(
             model=request.model_name,
             google_api_key=GOOGLE_API_KEY,
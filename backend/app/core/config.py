@@ -4,4 +4,8 @@ TEMP_DIR = "/tmp/marker_processing_app"
 os.makedirs(TEMP_DIR, exist_ok=True)
 
 EXTRACTED_IMAGES_DIR = os.path.join(os.getcwd(), "extracted_images")
-os.makedirs(EXTRACTED_IMAGES_DIR, exist_ok=True)
\ No newline at end of file
+os.makedirs(EXTRACTED_IMAGES_DIR, exist_ok=True)
+
+# Lokale, persistente Caches (Embeddings etc.)
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.getcwd(), "cache"))
+os.makedirs(CACHE_DIR, exist_ok=True)
@@ -0,0 +1,41 @@
+# app/core/http_client.py
+import asyncio
+import importlib.util
+from typing import Dict, Any
+from urllib.parse import urlsplit
+import httpx
+
+# Prozessweit geteilte HTTP-Clients (Connection-Pooling/Keep-Alive statt eines neuen Clients pro Request)
+_clients: Dict[str, httpx.AsyncClient] = {}
+_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+def _http2_available() -> bool:
+    # Optionales Paket (via `httpx[http2]`); nur prüfen, ob es installiert ist
+    return importlib.util.find_spec("h2") is not None
+
+def get_http_client(name: str, **client_kwargs: Any) -> httpx.AsyncClient:
+    """
+    Gibt den geteilten Client `name` zurück und erstellt ihn beim ersten Aufruf mit `client_kwargs`.
+    HTTP/2 wird genutzt, wenn das optionale Paket `h2` installiert ist.
+    """
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client_kwargs.setdefault("http2", _http2_available())
+        client = httpx.AsyncClient(**client_kwargs)
+        _clients[name] = client
+        print(f"LOG_HTTP_CLIENT: Geteilter HTTP-Client '{name}' erstellt (http2={client_kwargs['http2']}).")
+    return client
+
+def get_host_semaphore(url: str, limit: int) -> asyncio.Semaphore:
+    """Begrenzt gleichzeitige Requests pro Host (z.B. arxiv.org), unabhängig vom globalen Pool-Limit."""
+    host = urlsplit(url).netloc.lower()
+    semaphore = _host_semaphores.get(host)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(1, limit))
+        _host_semaphores[host] = semaphore
+    return semaphore
+
+async def close_http_clients() -> None:
+    for name, client in list(_clients.items()):
+        await client.aclose()
+        _clients.pop(name, None)
@@ -0,0 +1,260 @@
+# app/core/observability.py
+import os
+import re
+import time
+import uuid
+import asyncio
+import inspect
+import functools
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Mess-Schicht für Stufen-Dauern (Prometheus-Histogramme unter /metrics), Request-IDs und Log-Level.
+# Bewusst ohne prometheus_client: Histogramme/Zähler im Textformat 0.0.4 reichen hier. Die Werte gelten pro
+# Prozess; Stufen aus Ingestion-Worker-Prozessen übernimmt der Job-Manager nach Jobende (siehe ingestion_jobs).
+
+# DEBUG: zusätzlich Detail-Logs (Spans, SQL, Trefferlisten), INFO: Standard, WARN/ERROR: nur Probleme
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+_LOG_LEVELS = {"DEBUG": 10, "INFO": 20, "WARN": 30, "WARNING": 30, "ERROR": 40}
+_log_threshold = _LOG_LEVELS.get(LOG_LEVEL, 20)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+# --- Logging ---
+
+def log_enabled(level: str) -> bool:
+    """Vor teuren Log-Argumenten (z.B. str(stmt)) prüfen, damit sie bei abgeschaltetem Level gar nicht entstehen."""
+    return _LOG_LEVELS.get(level, 20) >= _log_threshold
+
+def log(level: str, prefix: str, message: str, *args) -> None:
+    """
+    print() mit Level-Filter und Request-ID. `message` wird erst nach der Level-Prüfung mit `args`
+    formatiert (%-Syntax) - abgeschaltete Logs kosten keine String-Formatierung.
+    """
+    if _LOG_LEVELS.get(level, 20) < _log_threshold:
+        return
+    if args:
+        message = message % args
+    request_id = request_id_var.get()
+    print(f"{prefix}: [{request_id}] {message}" if request_id else f"{prefix}: {message}")
+
+def log_debug(prefix: str, message: str, *args) -> None:
+    log("DEBUG", prefix, message, *args)
+
+def log_info(prefix: str, message: str, *args) -> None:
+    log("INFO", prefix, message, *args)
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+# --- Metriken ---
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape_label(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # Label-Werte -> (Zähler je Bucket (nicht kumuliert, letzter = +Inf), Summe, Anzahl)
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(key, list(s[0]), s[1], s[2]) for key, s in sorted(self._series.items())]
+        for key, bucket_counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le_label = 'le="+Inf"' if bound == float("inf") else f'le="{float(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        lines += [f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in snapshot]
+        return lines
+
+
+class Gauge:
+    """Momentanwert, der erst beim Abruf von /metrics über `read` ermittelt wird (z.B. Zustand des DB-Pools)."""
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float]):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+
+    def render(self) -> List[str]:
+        try:
+            value = float(self.read())
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            return self._metrics.setdefault(name, Histogram(name, help_text, label_names, buckets))
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, help_text, label_names))
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]) -> Gauge:
+        with self._lock:
+            return self._metrics.setdefault(name, Gauge(name, help_text, read))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+
+def get_metrics_registry() -> MetricsRegistry:
+    return _registry
+
+STAGE_DURATION = _registry.histogram(
+    "rag_stage_duration_seconds", "Dauer einzelner Verarbeitungsstufen (Embedding, Vektorsuche, LLM, Marker, DB, ...)", ("stage", "outcome")
+)
+HTTP_REQUEST_DURATION = _registry.histogram(
+    "http_request_duration_seconds", "Dauer der HTTP-Anfragen nach Route", ("method", "route", "status")
+)
+
+
+def observe_stage(stage: str, seconds: float, outcome: str = "ok") -> None:
+    STAGE_DURATION.observe(seconds, stage=stage, outcome=outcome)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Misst einen Abschnitt als Stufe `stage` (Histogramm + DEBUG-Log); outcome = ok, error oder cancelled."""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_DURATION.observe(duration, stage=stage, outcome=outcome)
+        if _log_threshold <= 10:
+            log("DEBUG", "LOG_SPAN", "%s %.3fs (%s)", stage, duration, outcome)
+
+
+def timed(stage: str) -> Callable:
+    """Dekorator-Variante von span() für normale und async Funktionen."""
+    def decorator(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class RequestContextMiddleware:
+    """
+    ASGI-Middleware: übernimmt X-Request-ID (oder erzeugt eine), stellt sie Logs und Hintergrund-Tasks der Anfrage
+    über request_id_var bereit, gibt sie im Antwort-Header zurück und misst die Dauer je Route-Template
+    (bei Streaming-Antworten bis zum letzten Byte).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = dict(scope.get("headers") or []).get(REQUEST_ID_HEADER.lower().encode("latin-1"), b"").decode("latin-1")
+        request_id = incoming if _REQUEST_ID_PATTERN.match(incoming) else new_request_id()
+        token = request_id_var.set(request_id)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_request_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers") or []) + [
+                    (REQUEST_ID_HEADER.lower().encode("latin-1"), request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            # Route-Template statt Pfad, damit IDs in der URL keine neuen Zeitreihen erzeugen
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method=scope.get("method", ""), route=route, status=status_code)
+            request_id_var.reset(token)
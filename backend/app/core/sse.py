@@ -0,0 +1,14 @@
+# app/core/sse.py
+import json
+from typing import Any
+
+# Header für Server-Sent-Events: kein Caching, kein Puffern durch Reverse-Proxies (nginx)
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def format_sse_event(event: str, data: Any) -> str:
+    """
+    Formatiert ein SSE-Event. `data` ist ein fertiger (einzeiliger) JSON-String oder ein Objekt, das als JSON
+    kodiert wird - so bleiben Zeilenumbrüche in Tokens erhalten, ohne das SSE-Format zu brechen.
+    """
+    payload = data if isinstance(data, str) else json.dumps(data, default=str, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
@@ -1,17 +1,25 @@
 # app/db/crud/__init__.py
 from .crud_document import get_document_by_id, get_document_by_processed_id, create_document
-from .crud_chunk import create_chunks, get_chunks_by_document_id
-from .crud_retrieval import find_similar_chunks
-from .crud_chat import get_or_create_chat_session, add_chat_message, get_chat_history
+from .crud_chunk import create_chunks, bulk_create_chunks, get_chunks_by_document_id
+from .crud_retrieval import find_similar_chunks, find_similar_chunks_in_version, find_lexical_chunks
+from .crud_chat import get_or_create_chat_session, upsert_chat_session, add_chat_turn, get_chat_session, add_chat_message, get_chat_history, update_session_summary, get_unsummarized_messages
 
 __all__ = [
     "get_document_by_id",
     "get_document_by_processed_id", 
     "create_document",
     "create_chunks",
+    "bulk_create_chunks",
     "get_chunks_by_document_id",
     "find_similar_chunks",
+    "find_similar_chunks_in_version",
+    "find_lexical_chunks",
     "get_or_create_chat_session", 
+    "upsert_chat_session",
+    "add_chat_turn",
+    "get_chat_session",
     "add_chat_message", 
-    "get_chat_history"
+    "get_chat_history",
+    "update_session_summary",
+    "get_unsummarized_messages"
 ]
\ No newline at end of file
@@ -1,8 +1,11 @@
 # app/db/crud/crud_chat.py
 import uuid
+from datetime import datetime, timezone
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import insert, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import selectinload
 
 from app.db.models import ChatSession, ChatMessage
@@ -19,19 +22,98 @@ async def get_or_create_chat_session(db: AsyncSession, session_id: uuid.UUID) ->
         print(f"LOG_CRUD_CHAT: Neue Chat-Session erstellt: {session_id}")
     return chat_session
 
-async def add_chat_message(db: AsyncSession, session_id: uuid.UUID, sender_type: str, content: str) -> ChatMessage:
-    message = ChatMessage(session_id=session_id, sender_type=sender_type, content=content)
+async def upsert_chat_session(db: AsyncSession, session_id: uuid.UUID):
+    """
+    Legt die Session an, falls sie fehlt, und liefert (summary, summarized_until) - ein Round-Trip statt SELECT + INSERT.
+    Bestehende Sessions werden nicht angefasst (DO NOTHING: kein Zeilen-Lock, kein totes Tupel pro Turn); ihre Werte
+    liefert der SELECT-Zweig, die einer neuen Session das RETURNING des INSERT.
+    """
+    inserted = (
+        pg_insert(ChatSession)
+        .values(id=session_id)
+        .on_conflict_do_nothing(index_elements=[ChatSession.id])
+        .returning(ChatSession.summary, ChatSession.summarized_until)
+        .cte("inserted_session")
+    )
+    stmt = select(inserted.c.summary, inserted.c.summarized_until).union_all(
+        select(ChatSession.summary, ChatSession.summarized_until).filter(ChatSession.id == session_id)
+    ).limit(1)
+    row = (await db.execute(stmt)).first()
+    if row is None:
+        # Gleichzeitig von einer anderen Transaktion angelegt: deren Zeile ist erst nach dem Statement sichtbar
+        row = (await db.execute(
+            select(ChatSession.summary, ChatSession.summarized_until).filter(ChatSession.id == session_id)
+        )).one()
+    return row
+
+async def add_chat_turn(
+    db: AsyncSession, session_id: uuid.UUID, user_content: str, ai_content: str, user_created_at: datetime,
+    user_token_count: Optional[int] = None, ai_token_count: Optional[int] = None, prompt_token_count: Optional[int] = None
+) -> None:
+    """Schreibt Nutzer- und AI-Nachricht eines Turns mit einem einzigen mehrzeiligen INSERT."""
+    ai_created_at = max(datetime.now(timezone.utc), user_created_at)
+    await db.execute(insert(ChatMessage).values([
+        {"id": uuid.uuid4(), "session_id": session_id, "sender_type": "user", "content": user_content,
+         "token_count": user_token_count, "prompt_token_count": None, "created_at": user_created_at},
+        {"id": uuid.uuid4(), "session_id": session_id, "sender_type": "ai", "content": ai_content,
+         "token_count": ai_token_count, "prompt_token_count": prompt_token_count, "created_at": ai_created_at},
+    ]))
+
+async def get_chat_session(db: AsyncSession, session_id: uuid.UUID) -> Optional[ChatSession]:
+    result = await db.execute(select(ChatSession).filter(ChatSession.id == session_id))
+    return result.scalars().first()
+
+async def add_chat_message(
+    db: AsyncSession, session_id: uuid.UUID, sender_type: str, content: str,
+    token_count: Optional[int] = None, prompt_token_count: Optional[int] = None
+) -> ChatMessage:
+    # Zeitstempel clientseitig setzen: now() in Postgres ist der Transaktionsbeginn, Nutzer- und AI-Nachricht
+    # derselben Transaktion wären sonst gleich alt (Reihenfolge und summarized_until brauchen eindeutige Zeiten)
+    message = ChatMessage(
+        session_id=session_id, sender_type=sender_type, content=content,
+        token_count=token_count, prompt_token_count=prompt_token_count,
+        created_at=datetime.now(timezone.utc)
+    )
     db.add(message)
     await db.flush() 
     return message
 
-async def get_chat_history(db: AsyncSession, session_id: uuid.UUID, limit: int = 10) -> List[ChatMessage]:
+async def update_session_summary(
+    db: AsyncSession, session_id: uuid.UUID, summary: str, summarized_until: datetime, previous_summarized_until: Optional[datetime]
+) -> bool:
+    """
+    Schreibt die neue Zusammenfassung nur, wenn `summarized_until` noch dem gelesenen Stand entspricht
+    (optimistische Prüfung, die Zusammenfassung entsteht außerhalb der Transaktion). False bei Konflikt.
+    """
+    result = await db.execute(
+        update(ChatSession)
+        .where(ChatSession.id == session_id, ChatSession.summarized_until.is_not_distinct_from(previous_summarized_until))
+        .values(summary=summary, summarized_until=summarized_until)
+    )
+    return result.rowcount == 1
+
+async def get_chat_history(
+    db: AsyncSession, session_id: uuid.UUID, limit: int = 10, after: Optional[datetime] = None
+) -> List[ChatMessage]:
+    """Die jüngsten `limit` Nachrichten (chronologisch), optional nur die nach `after` (noch nicht zusammengefassten)."""
+    stmt = select(ChatMessage).filter(ChatMessage.session_id == session_id)
+    if after is not None:
+        stmt = stmt.filter(ChatMessage.created_at > after)
     stmt = (
-        select(ChatMessage)
-        .filter(ChatMessage.session_id == session_id)
+        stmt
         .order_by(ChatMessage.created_at.desc()) 
         .limit(limit)
     )
     result = await db.execute(stmt)
     messages = result.scalars().all()
-    return list(reversed(messages)) 
\ No newline at end of file
+    return list(reversed(messages))
+
+async def get_unsummarized_messages(
+    db: AsyncSession, session_id: uuid.UUID, summarized_until: Optional[datetime], until: datetime
+) -> List[ChatMessage]:
+    """Alle Nachrichten nach `summarized_until` bis einschließlich `until`, chronologisch."""
+    stmt = select(ChatMessage).filter(ChatMessage.session_id == session_id, ChatMessage.created_at <= until)
+    if summarized_until is not None:
+        stmt = stmt.filter(ChatMessage.created_at > summarized_until)
+    result = await db.execute(stmt.order_by(ChatMessage.created_at.asc()))
+    return list(result.scalars().all())
@@ -1,13 +1,24 @@
 # app/db/crud/crud_chunk.py
 import os
+import time
 import uuid
-from typing import List, Optional
+import struct
+from typing import List, Optional, Tuple, Any
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import delete, func, insert
 
 from app.db.models import Chunk # SQLAlchemy Chunk-Modell
 from app.schemas.processing_schemas import TextChunk as TextChunkSchema # Pydantic TextChunk Schema
 
+# "copy": asyncpg COPY (binär, schnellster Weg), "insert": mehrzeiliges INSERT über SQLAlchemy Core,
+# "orm": ORM-Objekte + add_all (langsam, nur als Fallback/Vergleich)
+CHUNK_BULK_INSERT_MODE = os.getenv("CHUNK_BULK_INSERT_MODE", "copy").lower()
+CHUNK_INSERT_BATCH_SIZE = int(os.getenv("CHUNK_INSERT_BATCH_SIZE", "1000"))
+PGVECTOR_SCHEMA = os.getenv("PGVECTOR_SCHEMA", "public")
+
+_CHUNK_COPY_COLUMNS = ["id", "document_id", "content", "page_number", "char_count", "char_start", "char_end", "embedding"]
+
 async def create_chunks(db: AsyncSession, *, # Stern erzwingt Keyword-Argumente
                         document_id: uuid.UUID, 
                         chunks_data: List[TextChunkSchema], # Liste von Pydantic-Objekten
@@ -15,23 +26,17 @@ async def create_chunks(db: AsyncSession, *, # Stern erzwingt Keyword-Argumente
                         ) -> List[Chunk]:
     """Erstellt mehrere Chunk-Einträge für ein gegebenes Dokument."""
     db_chunks_to_create: List[Chunk] = []
-    embedding_dim_from_env = int(os.getenv("EMBEDDING_DIMENSION", "768")) # Für Dummy-Embeddings
 
     for i, p_chunk_schema in enumerate(chunks_data):
-        embedding_vector = None
-        if embeddings and i < len(embeddings) and embeddings[i] is not None:
-            if len(embeddings[i]) == embedding_dim_from_env:
-                embedding_vector = embeddings[i]
-            else:
-                print(f"WARN_CRUD_CHUNK: Embedding-Dimension für Chunk {i} ({len(embeddings[i])}) passt nicht zu DB-Schema ({embedding_dim_from_env}). Setze auf None/Dummy.")
-                # Optional: Dummy-Embedding mit korrekter Dimension erstellen
-                # embedding_vector = [0.0] * embedding_dim_from_env 
+        embedding_vector = _validated_embedding(embeddings, i)
         
         db_chunk = Chunk(
             document_id=document_id,
             content=p_chunk_schema.content,
             page_number=p_chunk_schema.page_number,
             char_count=p_chunk_schema.char_count,
+            char_start=p_chunk_schema.char_start,
+            char_end=p_chunk_schema.char_end,
             embedding=embedding_vector # Kann None sein, wenn Embedding fehlgeschlagen oder falsche Dimension
         )
         db_chunks_to_create.append(db_chunk)
@@ -45,11 +50,116 @@ async def create_chunks(db: AsyncSession, *, # Stern erzwingt Keyword-Argumente
         # Refresh für eine Liste ist etwas umständlicher, oft nicht nötig, wenn man nur speichert.
     return db_chunks_to_create
 
+def _validated_embedding(embeddings: Optional[List[Optional[List[float]]]], i: int) -> Optional[List[float]]:
+    """Embedding für Chunk i oder None, wenn es fehlt oder die Dimension nicht zum DB-Schema passt."""
+    embedding_dim_from_env = int(os.getenv("EMBEDDING_DIMENSION", "768"))
+    if not embeddings or i >= len(embeddings) or embeddings[i] is None:
+        return None
+    if len(embeddings[i]) != embedding_dim_from_env:
+        print(f"WARN_CRUD_CHUNK: Embedding-Dimension für Chunk {i} ({len(embeddings[i])}) passt nicht zu DB-Schema ({embedding_dim_from_env}). Setze auf None.")
+        return None
+    return embeddings[i]
+
+
+def _encode_vector_binary(value: List[float]) -> bytes:
+    # pgvector-Binärformat: dim (int16), unbenutzt (int16), dim * float4 (Big-Endian)
+    return struct.pack(f">HH{len(value)}f", len(value), 0, *value)
+
+
+def _decode_vector_binary(data: bytes) -> List[float]:
+    dim, _ = struct.unpack_from(">HH", data)
+    return list(struct.unpack_from(f">{dim}f", data, 4))
+
+
+def _build_chunk_rows(
+    document_id: uuid.UUID, chunks_data: List[TextChunkSchema], embeddings: Optional[List[Optional[List[float]]]]
+) -> List[Tuple[Any, ...]]:
+    return [
+        (uuid.uuid4(), document_id, c.content, c.page_number, c.char_count, c.char_start, c.char_end, _validated_embedding(embeddings, i))
+        for i, c in enumerate(chunks_data)
+    ]
+
+
+async def _copy_chunk_rows(db: AsyncSession, rows: List[Tuple[Any, ...]]) -> None:
+    """
+    Schreibt die Zeilen per asyncpg `copy_records_to_table` über die Verbindung (und Transaktion) der Session.
+    Der binäre vector-Codec wird nur für die Dauer des COPY registriert, damit ORM-Abfragen auf
+    derselben Pool-Verbindung weiterhin das Textformat der pgvector-SQLAlchemy-Typen nutzen.
+    """
+    sa_connection = await db.connection()
+    raw_connection = await sa_connection.get_raw_connection()
+    asyncpg_connection = raw_connection.driver_connection
+    if not hasattr(asyncpg_connection, "copy_records_to_table"):
+        raise RuntimeError(f"COPY benötigt den asyncpg-Treiber, aktiv ist: {type(asyncpg_connection)}")
+    await asyncpg_connection.set_type_codec(
+        "vector", schema=PGVECTOR_SCHEMA, encoder=_encode_vector_binary, decoder=_decode_vector_binary, format="binary"
+    )
+    try:
+        await asyncpg_connection.copy_records_to_table(Chunk.__tablename__, records=rows, columns=_CHUNK_COPY_COLUMNS)
+    finally:
+        await asyncpg_connection.reset_type_codec("vector", schema=PGVECTOR_SCHEMA)
+
+
+async def _insert_chunk_rows(db: AsyncSession, rows: List[Tuple[Any, ...]]) -> None:
+    # Mehrzeilige INSERTs in Batches (asyncpg erlaubt max. 32767 Parameter pro Statement)
+    batch_size = max(1, CHUNK_INSERT_BATCH_SIZE)
+    for start in range(0, len(rows), batch_size):
+        batch = [dict(zip(_CHUNK_COPY_COLUMNS, row)) for row in rows[start:start + batch_size]]
+        await db.execute(insert(Chunk.__table__).values(batch))
+
+
+async def bulk_create_chunks(db: AsyncSession, *,
+                             document_id: uuid.UUID,
+                             chunks_data: List[TextChunkSchema],
+                             embeddings: Optional[List[Optional[List[float]]]] = None,
+                             mode: Optional[str] = None
+                             ) -> int:
+    """
+    Schreibt alle Chunks eines Dokuments ohne ORM-Objekte (Standard: COPY). Schlägt COPY fehl
+    (z.B. anderer Treiber), wird auf mehrzeiliges INSERT und zuletzt auf den ORM-Weg zurückgefallen.
+    Gibt die Anzahl geschriebener Chunks zurück; das Commit erfolgt beim Aufrufer.
+    """
+    if not chunks_data:
+        return 0
+    mode = (mode or CHUNK_BULK_INSERT_MODE).lower()
+    start_time = time.perf_counter()
+    if mode == "orm":
+        await create_chunks(db, document_id=document_id, chunks_data=chunks_data, embeddings=embeddings)
+    else:
+        rows = _build_chunk_rows(document_id, chunks_data, embeddings)
+        if mode == "copy":
+            try:
+                # Savepoint: ein fehlgeschlagenes COPY bricht sonst die gesamte Transaktion (inkl. Dokument) ab
+                async with db.begin_nested():
+                    await _copy_chunk_rows(db, rows)
+            except Exception as e:
+                print(f"WARN_CRUD_CHUNK: COPY fehlgeschlagen ({e}). Fallback auf mehrzeiliges INSERT.")
+                mode = "insert"
+        if mode == "insert":
+            try:
+                async with db.begin_nested():
+                    await _insert_chunk_rows(db, rows)
+            except Exception as e:
+                print(f"WARN_CRUD_CHUNK: Mehrzeiliges INSERT fehlgeschlagen ({e}). Fallback auf ORM.")
+                mode = "orm"
+                await create_chunks(db, document_id=document_id, chunks_data=chunks_data, embeddings=embeddings)
+    print(f"LOG_CRUD_CHUNK: {len(chunks_data)} Chunks für Dokument {document_id} geschrieben (Modus={mode}, {time.perf_counter() - start_time:.3f}s).")
+    return len(chunks_data)
+
+
 async def get_chunks_by_document_id(db: AsyncSession, document_id: uuid.UUID) -> List[Chunk]:
     """Ruft alle Chunks für ein gegebenes Dokument ab."""
     result = await db.execute(
-        select(Chunk).filter(Chunk.document_id == document_id).order_by(Chunk.page_number, Chunk.id) # Sortiere für Konsistenz
+        select(Chunk).filter(Chunk.document_id == document_id).order_by(Chunk.page_number, Chunk.char_start, Chunk.id) # Lesereihenfolge
     )
     return result.scalars().all()
 
+async def count_chunks_by_document_id(db: AsyncSession, document_id: uuid.UUID) -> int:
+    result = await db.execute(select(func.count(Chunk.id)).filter(Chunk.document_id == document_id))
+    return result.scalar_one()
+
+async def delete_chunks_by_document_id(db: AsyncSession, document_id: uuid.UUID) -> None:
+    """Löscht alle Chunks eines Dokuments (z.B. vor erneutem Chunking). Commit erfolgt beim Aufrufer."""
+    await db.execute(delete(Chunk).where(Chunk.document_id == document_id))
+
 # Die Funktion find_similar_chunks bleibt in crud_retrieval.py, da sie eine spezifische Suchlogik ist.
\ No newline at end of file
@@ -1,11 +1,14 @@
 # app/db/crud/crud_document.py
 import uuid
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+from sqlalchemy import delete, func
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload # Für Eager Loading von Relationships, falls später benötigt
+from sqlalchemy.sql import text
 
-from app.db.models import Document # Importiere dein SQLAlchemy Document-Modell
+from app.db.models import Document, Chunk # Importiere dein SQLAlchemy Document-Modell
 
 async def get_document_by_id(db: AsyncSession, document_id: uuid.UUID) -> Optional[Document]:
     """Ruft ein Dokument anhand seiner UUID ab."""
@@ -19,6 +22,22 @@ async def get_document_by_processed_id(db: AsyncSession, processed_document_id:
     )
     return result.scalars().first()
 
+async def get_document_by_fingerprint(db: AsyncSession, content_sha256: str) -> Optional[Document]:
+    """Ruft ein bereits verarbeitetes Dokument mit identischem PDF-Inhalt (SHA-256) ab."""
+    result = await db.execute(
+        select(Document).filter(Document.content_sha256 == content_sha256).limit(1)
+    )
+    return result.scalars().first()
+
+async def lock_fingerprint(db: AsyncSession, content_sha256: str) -> None:
+    """
+    Transaktions-Advisory-Lock auf den PDF-Fingerprint: gleichzeitige Uploads desselben Inhalts laufen nacheinander
+    durch Duplikatprüfung und Anlage, der zweite findet danach das Dokument des ersten. Frei bei Commit/Rollback.
+    """
+    await db.execute(
+        text("SELECT pg_advisory_xact_lock(hashtextextended(:key, 0))"), {"key": f"document_sha256:{content_sha256}"}
+    )
+
 async def get_documents(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[Document]:
     """Ruft eine Liste von Dokumenten ab, mit Paginierung."""
     result = await db.execute(
@@ -29,16 +48,30 @@ async def get_documents(db: AsyncSession, skip: int = 0, limit: int = 100) -> Li
     )
     return result.scalars().all()
 
-async def delete_document(db: AsyncSession, document_id: uuid.UUID) -> Optional[Document]:
-    """Löscht ein Dokument anhand seiner ID und gibt das gelöschte Dokument zurück (oder None)."""
-    # Hole das Dokument, um es zurückgeben zu können (optional, alternativ nur True/False)
-    db_document = await get_document_by_id(db, document_id) # get_document_by_id statt get_document
-    if db_document:
-        await db.delete(db_document)
-        # Das Commit erfolgt im API-Endpunkt-Handler, um Transaktionskontrolle zu behalten.
-        # await db.commit()
-        return db_document
-    return None
+async def delete_documents(db: AsyncSession, document_ids: List[uuid.UUID]) -> Tuple[List[Row], int]:
+    """
+    Löscht mehrere Dokumente mit einem einzigen DELETE ... RETURNING. Die Chunks (inkl. Embeddings) entfernt Postgres
+    per ON DELETE CASCADE, ohne dass sie ins ORM geladen werden. Gibt die gelöschten Dokument-Zeilen und die Anzahl
+    mitgelöschter Chunks zurück; das Commit erfolgt beim Aufrufer.
+    """
+    ids = list(dict.fromkeys(document_ids))
+    if not ids:
+        return [], 0
+    # Zählen über den Index auf document_id (für die Wartungs-Hinweise zum Vektor-Index), ohne Zeilen zu laden
+    chunk_count = (await db.execute(select(func.count(Chunk.id)).where(Chunk.document_id.in_(ids)))).scalar_one()
+    table = Document.__table__
+    result = await db.execute(
+        delete(table).where(table.c.id.in_(ids)).returning(
+            table.c.id, table.c.original_filename, table.c.processed_document_id,
+            table.c.title, table.c.author, table.c.publication_year,
+        )
+    )
+    return result.all(), chunk_count
+
+async def delete_document(db: AsyncSession, document_id: uuid.UUID) -> Optional[Row]:
+    """Löscht ein Dokument anhand seiner ID und gibt die gelöschte Zeile zurück (oder None). Commit beim Aufrufer."""
+    deleted_rows, _ = await delete_documents(db, [document_id])
+    return deleted_rows[0] if deleted_rows else None
 
 async def create_document(db: AsyncSession, *, # Stern erzwingt Keyword-Argumente
                           original_filename: str, 
@@ -46,7 +79,8 @@ async def create_document(db: AsyncSession, *, # Stern erzwingt Keyword-Argument
                           title: Optional[str] = None, 
                           author: Optional[str] = None, 
                           publication_year: Optional[int] = None,
-                          additional_metadata: Optional[Dict[str, Any]] = None
+                          additional_metadata: Optional[Dict[str, Any]] = None,
+                          content_sha256: Optional[str] = None
                           ) -> Document:
     """Erstellt einen neuen Dokument-Eintrag in der Datenbank."""
     db_document = Document(
@@ -55,7 +89,8 @@ async def create_document(db: AsyncSession, *, # Stern erzwingt Keyword-Argument
         title=title,
         author=author,
         publication_year=publication_year,
-        additional_metadata=additional_metadata
+        additional_metadata=additional_metadata,
+        content_sha256=content_sha256
     )
     db.add(db_document)
     # Das Commit sollte idealerweise vom aufrufenden Service oder der API-Route
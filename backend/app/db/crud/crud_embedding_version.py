@@ -0,0 +1,116 @@
+# app/db/crud/crud_embedding_version.py
+import uuid
+from typing import List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import func, update, delete, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.db.models import Chunk, EmbeddingVersion, ChunkEmbedding
+from app.db.models.embedding_version_model import make_embedding_version_key, embedding_swap_statements
+
+
+async def get_active_version(db: AsyncSession, lock: Optional[str] = None) -> Optional[EmbeddingVersion]:
+    """
+    Aktive Version. lock="share" (Ingestion schreibt Vektoren des aktiven Modells) bzw. "update" (Umschalten)
+    serialisiert beide Vorgänge über die Zeile, sodass nie Vektoren des alten Modells nach dem Umschalten landen.
+    """
+    stmt = select(EmbeddingVersion).filter(EmbeddingVersion.status == "active")
+    if lock == "share":
+        stmt = stmt.with_for_update(read=True)
+    elif lock == "update":
+        stmt = stmt.with_for_update()
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+async def get_version(db: AsyncSession, version_id: int, for_update: bool = False) -> Optional[EmbeddingVersion]:
+    stmt = select(EmbeddingVersion).filter(EmbeddingVersion.id == version_id)
+    if for_update:
+        stmt = stmt.with_for_update()
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+async def get_version_by_key(db: AsyncSession, provider: str, model_name: str, dimension: int) -> Optional[EmbeddingVersion]:
+    result = await db.execute(
+        select(EmbeddingVersion).filter(EmbeddingVersion.version_key == make_embedding_version_key(provider, model_name, dimension))
+    )
+    return result.scalars().first()
+
+async def list_versions(db: AsyncSession, statuses: Optional[List[str]] = None) -> List[EmbeddingVersion]:
+    stmt = select(EmbeddingVersion).order_by(EmbeddingVersion.id)
+    if statuses:
+        stmt = stmt.filter(EmbeddingVersion.status.in_(statuses))
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+async def create_version(db: AsyncSession, provider: str, model_name: str, dimension: int, status: str) -> EmbeddingVersion:
+    version = EmbeddingVersion(
+        version_key=make_embedding_version_key(provider, model_name, dimension),
+        provider=provider, model_name=model_name, dimension=dimension, status=status,
+    )
+    db.add(version)
+    await db.flush()
+    return version
+
+async def update_version(db: AsyncSession, version_id: int, **values) -> None:
+    await db.execute(update(EmbeddingVersion).where(EmbeddingVersion.id == version_id).values(updated_at=func.now(), **values))
+
+async def delete_version(db: AsyncSession, version_id: int) -> None:
+    """Löscht die Version samt ihrer Vektoren in chunk_embeddings (ON DELETE CASCADE). Commit beim Aufrufer."""
+    await db.execute(delete(EmbeddingVersion).where(EmbeddingVersion.id == version_id))
+
+async def count_chunks(db: AsyncSession, with_embedding: bool = False) -> int:
+    stmt = select(func.count(Chunk.id))
+    if with_embedding:
+        stmt = stmt.filter(Chunk.embedding.isnot(None))
+    return (await db.execute(stmt)).scalar_one()
+
+async def count_version_embeddings(db: AsyncSession, version_id: int) -> int:
+    result = await db.execute(select(func.count()).select_from(ChunkEmbedding).filter(ChunkEmbedding.version_id == version_id))
+    return result.scalar_one()
+
+async def get_chunks_missing_embedding(
+    db: AsyncSession, version_id: int, after_id: Optional[uuid.UUID] = None, limit: int = 64
+) -> List[Tuple[uuid.UUID, str]]:
+    """
+    Nächste Chunks (nach ID sortiert, ab `after_id`) ohne Vektor der Version. Der Anti-Join macht den Job
+    fortsetzbar: nach einem Neustart werden nur noch fehlende Chunks geholt, neue Chunks landen im Nachlauf.
+    """
+    missing = ~select(ChunkEmbedding.chunk_id).filter(
+        ChunkEmbedding.version_id == version_id, ChunkEmbedding.chunk_id == Chunk.id
+    ).exists()
+    stmt = select(Chunk.id, Chunk.content).filter(missing)
+    if after_id is not None:
+        stmt = stmt.filter(Chunk.id > after_id)
+    result = await db.execute(stmt.order_by(Chunk.id).limit(limit))
+    return [(row.id, row.content) for row in result.all()]
+
+async def store_chunk_embeddings(db: AsyncSession, version_id: int, rows: List[Tuple[uuid.UUID, List[float]]]) -> int:
+    """
+    Speichert Vektoren einer (nicht aktiven) Version. Chunks, die inzwischen gelöscht wurden, werden übersprungen;
+    FOR KEY SHARE verhindert, dass sie zwischen Prüfung und INSERT verschwinden. Commit beim Aufrufer.
+    """
+    if not rows:
+        return 0
+    existing = await db.execute(
+        select(Chunk.id).filter(Chunk.id.in_([chunk_id for chunk_id, _ in rows])).with_for_update(key_share=True)
+    )
+    existing_ids = set(existing.scalars().all())
+    values = [
+        {"chunk_id": chunk_id, "version_id": version_id, "embedding": embedding}
+        for chunk_id, embedding in rows if chunk_id in existing_ids
+    ]
+    if not values:
+        return 0
+    stmt = pg_insert(ChunkEmbedding.__table__).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ChunkEmbedding.chunk_id, ChunkEmbedding.version_id], set_={"embedding": stmt.excluded.embedding}
+    )
+    await db.execute(stmt)
+    return len(values)
+
+async def swap_active_embeddings(db: AsyncSession, old_version_id: Optional[int], new_version_id: int) -> None:
+    """Macht `new_version_id` zur aktiven Version (siehe embedding_swap_statements). Commit beim Aufrufer."""
+    params = {"old_version_id": old_version_id, "new_version_id": new_version_id}
+    for statement in embedding_swap_statements(has_old_version=old_version_id is not None):
+        await db.execute(text(statement), params)
@@ -1,62 +1,228 @@
 # app/db/crud/crud_retrieval.py
 import os
+import re
 import uuid
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select 
+from sqlalchemy import func, literal, text, cast, bindparam
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from pgvector.sqlalchemy import Vector, HALFVEC, BIT
 
-from app.db.models import Chunk, Document 
+from app.db.models import Chunk, Document, ChunkEmbedding
+from app.db.models.chunk_model import FULLTEXT_SEARCH_CONFIG, VECTOR_INDEX_MODE
+from app.schemas.processing_schemas import RetrievalFilters
+from app.core.observability import span, log_debug, log_enabled
 
 EMBEDDING_DIM_FROM_ENV = int(os.getenv("EMBEDDING_DIMENSION", "768"))
+# Gefilterte HNSW-Suche: größere Kandidatenliste (Standard in pgvector: 40), ab pgvector 0.8 zusätzlich iterativer Scan,
+# damit nach dem Filtern nicht weniger als `limit` Treffer übrig bleiben
+HNSW_EF_SEARCH_FILTERED = int(os.getenv("HNSW_EF_SEARCH_FILTERED", "200"))
+HNSW_ITERATIVE_SCAN = os.getenv("HNSW_ITERATIVE_SCAN", "relaxed_order") # "off", "strict_order", "relaxed_order"
+# Kompakte Index-Modi: limit * Faktor Kandidaten aus dem halfvec-/Binär-Index, dann exakte Nachsortierung
+VECTOR_RERANK_MULTIPLIER = int(os.getenv("VECTOR_RERANK_MULTIPLIER", "4"))
+HNSW_EF_SEARCH_DEFAULT = 40 # pgvector-Standard
+
+_pgvector_version: Optional[Tuple[int, ...]] = None
+
+def _chunk_result_columns():
+    # Gemeinsame Ergebnis-Spalten für Vektor- und Volltextsuche
+    return [
+        Chunk.id.label("chunk_db_id"), 
+        Chunk.content.label("chunk_content"),
+        Chunk.page_number,
+        Chunk.char_count,
+        Document.id.label("document_db_id"),
+        Document.original_filename,
+        Document.title.label("document_title"),
+        Document.author.label("document_author"),
+        Document.publication_year,
+    ]
+
+def _apply_filters(stmt, filters: Optional[RetrievalFilters], document_id_filter: Optional[uuid.UUID] = None):
+    if document_id_filter:
+        stmt = stmt.filter(Chunk.document_id == document_id_filter)
+    if filters is None:
+        return stmt
+    if filters.document_ids:
+        stmt = stmt.filter(Chunk.document_id.in_(filters.document_ids))
+    if filters.year_from is not None:
+        stmt = stmt.filter(Document.publication_year >= filters.year_from)
+    if filters.year_to is not None:
+        stmt = stmt.filter(Document.publication_year <= filters.year_to)
+    if filters.author and filters.author.strip():
+        stmt = stmt.filter(Document.author.ilike(f"%{filters.author.strip()}%"))
+    return stmt
+
+async def _get_pgvector_version(db: AsyncSession) -> Tuple[int, ...]:
+    global _pgvector_version
+    if _pgvector_version is None:
+        result = await db.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'"))
+        version_str = result.scalar() or "0"
+        _pgvector_version = tuple(int(p) for p in re.findall(r"\d+", version_str))
+        print(f"LOG_CRUD_RETRIEVAL: pgvector-Version {version_str} erkannt.")
+    return _pgvector_version
+
+async def _configure_filtered_hnsw_scan(db: AsyncSession, min_ef_search: int = 0) -> None:
+    """
+    Setzt ef_search (und ab pgvector 0.8 den iterativen Index-Scan) für die laufende Transaktion.
+    Ohne das liefert der HNSW-Index nur ef_search Kandidaten, von denen der Filter viele verwerfen kann.
+    """
+    await db.execute(text(f"SET LOCAL hnsw.ef_search = {max(1, min(max(HNSW_EF_SEARCH_FILTERED, min_ef_search), 1000))}"))
+    if HNSW_ITERATIVE_SCAN in ("strict_order", "relaxed_order") and await _get_pgvector_version(db) >= (0, 8):
+        await db.execute(text(f"SET LOCAL hnsw.iterative_scan = {HNSW_ITERATIVE_SCAN}"))
+
+async def resolve_vector_index_mode(db: AsyncSession, index_mode: Optional[str] = None) -> str:
+    """Aktiver Index-Modus; halfvec/binary fallen vor pgvector 0.7 auf "vector" zurück (wie in create_db_tables)."""
+    mode = (index_mode or VECTOR_INDEX_MODE).lower()
+    if mode != "vector" and await _get_pgvector_version(db) < (0, 7):
+        return "vector"
+    return mode
+
+def _approximate_distance(mode: str, query_embedding: List[float]):
+    """Distanz-Ausdruck, der exakt dem Ausdruck des jeweiligen Expression-Index entspricht (sonst kein Index-Scan)."""
+    query_vector = bindparam("query_embedding", query_embedding, type_=Vector(EMBEDDING_DIM_FROM_ENV))
+    if mode == "halfvec":
+        return cast(Chunk.embedding, HALFVEC(EMBEDDING_DIM_FROM_ENV)).cosine_distance(cast(query_vector, HALFVEC(EMBEDDING_DIM_FROM_ENV)))
+    # binary: Hamming-Distanz der Vorzeichen-Bits
+    return cast(func.binary_quantize(Chunk.embedding), BIT(EMBEDDING_DIM_FROM_ENV)).hamming_distance(
+        cast(func.binary_quantize(query_vector), BIT(EMBEDDING_DIM_FROM_ENV))
+    )
+
+def build_or_tsquery_text(query_text: str) -> Optional[str]:
+    """
+    Wandelt eine Freitext-Frage in eine ODER-verknüpfte tsquery ("transformer | attention | bleu").
+    Mit UND-Semantik (plainto/websearch_to_tsquery) fänden natürlichsprachige Fragen kaum Treffer;
+    ts_rank_cd gewichtet Chunks mit mehr übereinstimmenden Begriffen ohnehin höher.
+    """
+    terms = list(dict.fromkeys(t.lower() for t in re.findall(r"\w+", query_text) if len(t) > 1))
+    return " | ".join(terms) if terms else None
 
 async def find_similar_chunks(
     db: AsyncSession, 
     query_embedding: List[float], 
     limit: int = 5,
     document_id_filter: Optional[uuid.UUID] = None,
+    filters: Optional[RetrievalFilters] = None,
+    tune_filtered_scan: bool = True,
+    index_mode: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
-    print(f"LOG_CRUD_RETRIEVAL: find_similar_chunks aufgerufen. Query-Embedding-Länge: {len(query_embedding) if query_embedding else 'None'}")
+    """
+    Vektorsuche (Kosinus-Distanz). Im Index-Modus "halfvec"/"binary" werden limit * VECTOR_RERANK_MULTIPLIER
+    Kandidaten über den kompakten Index gesucht und anschließend exakt auf den vollen Vektoren sortiert.
+    `index_mode` überschreibt VECTOR_INDEX_MODE (z.B. für Benchmarks).
+    """
     if not query_embedding or len(query_embedding) != EMBEDDING_DIM_FROM_ENV:
         print(f"ERROR_CRUD_RETRIEVAL: Ungültiges Query-Embedding. Erw: {EMBEDDING_DIM_FROM_ENV}, Erh: {len(query_embedding) if query_embedding else 'None'}.")
         return []
 
     distance_calculation = Chunk.embedding.cosine_distance(query_embedding)
+    is_filtered = bool(document_id_filter) or (filters is not None and not filters.is_empty())
+    mode = await resolve_vector_index_mode(db, index_mode)
+    candidate_limit = limit
     
     stmt = (
-        select(
-            Chunk.id.label("chunk_db_id"), 
-            Chunk.content.label("chunk_content"),
-            Chunk.page_number,
-            Chunk.char_count,
-            Document.id.label("document_db_id"),
-            Document.original_filename,
-            Document.title.label("document_title"),
-            Document.author.label("document_author"),
-            Document.publication_year,
-            distance_calculation.label("distance") 
-        )
+        select(*_chunk_result_columns(), distance_calculation.label("distance"))
         .join(Document, Chunk.document_id == Document.id)
     )
 
-    if document_id_filter:
-        stmt = stmt.filter(Chunk.document_id == document_id_filter)
+    if mode == "vector":
+        stmt = _apply_filters(stmt, filters, document_id_filter)
+    else:
+        # Kandidaten über den kompakten Index (Filter gelten schon hier), danach exakte Distanz nur für diese
+        candidate_limit = limit * max(1, VECTOR_RERANK_MULTIPLIER)
+        candidate_stmt = select(Chunk.id).join(Document, Chunk.document_id == Document.id)
+        candidate_stmt = _apply_filters(candidate_stmt, filters, document_id_filter)
+        candidate_ids = (
+            candidate_stmt.order_by(_approximate_distance(mode, query_embedding)).limit(candidate_limit)
+        ).scalar_subquery()
+        stmt = stmt.filter(Chunk.id.in_(candidate_ids))
     
     stmt = stmt.order_by(distance_calculation.asc()).limit(limit)
 
-    print(f"LOG_CRUD_RETRIEVAL: Führe Vektorsuche aus. SQL (ungefähr): {str(stmt)}") # Logge das SQL-Statement (ungefähr)
+    if log_enabled("DEBUG"):
+        # str(stmt) kompiliert das Statement - nur bei aktivem DEBUG-Level
+        log_debug("LOG_CRUD_RETRIEVAL", "Führe Vektorsuche aus (Index-Modus=%s). SQL (ungefähr): %s", mode, str(stmt))
     try:
-        result = await db.execute(stmt)
-        similar_chunks_rows = result.mappings().all()
-        
-        results_as_dicts = []
-        for i, row_mapping in enumerate(similar_chunks_rows):
-            row_dict = dict(row_mapping) # Konvertiere RowMapping zu einem echten Dictionary
-            print(f"  LOG_CRUD_RETRIEVAL_ROW_{i}: {row_dict}") # Logge jedes zurückgegebene Dictionary
-            results_as_dicts.append(row_dict)
-
-        print(f"LOG_CRUD_RETRIEVAL: {len(results_as_dicts)} ähnliche Chunks gefunden und als Dicts zurückgegeben.")
+        if is_filtered and tune_filtered_scan:
+            await _configure_filtered_hnsw_scan(db, min_ef_search=candidate_limit)
+        elif candidate_limit > HNSW_EF_SEARCH_DEFAULT:
+            # Ein HNSW-Scan liefert höchstens ef_search Treffer
+            await db.execute(text(f"SET LOCAL hnsw.ef_search = {min(candidate_limit, 1000)}"))
+        with span("vector_search"):
+            result = await db.execute(stmt)
+            results_as_dicts = [dict(row_mapping) for row_mapping in result.mappings().all()]
+        # relaxed_order kann leicht unsortierte Ergebnisse liefern
+        results_as_dicts.sort(key=lambda r: r["distance"] if r["distance"] is not None else float("inf"))
+
+        if log_enabled("DEBUG"):
+            for i, row_dict in enumerate(results_as_dicts):
+                log_debug("LOG_CRUD_RETRIEVAL_ROW", "%d: %s", i, row_dict)
+        log_debug("LOG_CRUD_RETRIEVAL", "%d ähnliche Chunks gefunden.", len(results_as_dicts))
         return results_as_dicts
     except Exception as e:
         print(f"ERROR_CRUD_RETRIEVAL: Fehler bei Vektorsuche: {e}")
         import traceback; traceback.print_exc()
-        return []
\ No newline at end of file
+        return []
+
+
+async def find_similar_chunks_in_version(
+    db: AsyncSession,
+    version_id: int,
+    query_embedding: List[float],
+    limit: int = 5,
+    filters: Optional[RetrievalFilters] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Exakte Vektorsuche über die Vektoren einer nicht aktiven Embedding-Version (chunk_embeddings, ohne Index).
+    Für Shadow-Reads während einer Modell-Migration - nicht für den normalen Anfragepfad gedacht.
+    """
+    distance_calculation = ChunkEmbedding.embedding.cosine_distance(query_embedding)
+    stmt = (
+        select(*_chunk_result_columns(), distance_calculation.label("distance"))
+        .select_from(ChunkEmbedding)
+        .join(Chunk, ChunkEmbedding.chunk_id == Chunk.id)
+        .join(Document, Chunk.document_id == Document.id)
+        .filter(ChunkEmbedding.version_id == version_id)
+    )
+    stmt = _apply_filters(stmt, filters).order_by(distance_calculation.asc()).limit(limit)
+    try:
+        result = await db.execute(stmt)
+        return [dict(row_mapping) for row_mapping in result.mappings().all()]
+    except Exception as e:
+        print(f"ERROR_CRUD_RETRIEVAL: Fehler bei Vektorsuche in Embedding-Version {version_id}: {e}")
+        return []
+
+
+async def find_lexical_chunks(
+    db: AsyncSession,
+    query_text: str,
+    limit: int = 5,
+    document_id_filter: Optional[uuid.UUID] = None,
+    filters: Optional[RetrievalFilters] = None,
+) -> List[Dict[str, Any]]:
+    """Volltextsuche über `chunks.content_tsv` (GIN-Index), sortiert nach ts_rank_cd."""
+    tsquery_text = build_or_tsquery_text(query_text)
+    if not tsquery_text:
+        return []
+    ts_query = func.to_tsquery(literal(FULLTEXT_SEARCH_CONFIG).cast(REGCONFIG), tsquery_text)
+    text_rank = func.ts_rank_cd(Chunk.content_tsv, ts_query)
+
+    stmt = (
+        select(*_chunk_result_columns(), text_rank.label("text_rank"))
+        .join(Document, Chunk.document_id == Document.id)
+        .filter(Chunk.content_tsv.op("@@")(ts_query))
+    )
+    stmt = _apply_filters(stmt, filters, document_id_filter)
+    stmt = stmt.order_by(text_rank.desc()).limit(limit)
+
+    try:
+        with span("lexical_search"):
+            result = await db.execute(stmt)
+            rows = [dict(row_mapping) for row_mapping in result.mappings().all()]
+        log_debug("LOG_CRUD_RETRIEVAL", "Volltextsuche '%s' ergab %d Chunks.", tsquery_text[:80], len(rows))
+        return rows
+    except Exception as e:
+        print(f"ERROR_CRUD_RETRIEVAL: Fehler bei Volltextsuche: {e}")
+        import traceback; traceback.print_exc()
+        return []
@@ -3,5 +3,6 @@ from .base_class import Base
 from .document_model import Document
 from .chunk_model import Chunk
 from .chat_model import ChatSession, ChatMessage
+from .embedding_version_model import EmbeddingVersion, ChunkEmbedding
 
-__all__ = ["Base", "Document", "Chunk", "ChatSession", "ChatMessage"]
\ No newline at end of file
+__all__ = ["Base", "Document", "Chunk", "ChatSession", "ChatMessage", "EmbeddingVersion", "ChunkEmbedding"]
\ No newline at end of file
@@ -10,6 +10,9 @@ class ChatSession(Base):
     __tablename__ = "chat_sessions"
     id = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Rollierende Zusammenfassung aller Nachrichten bis einschließlich `summarized_until` (wird im Hintergrund fortgeschrieben)
+    summary = Column(Text, nullable=True)
+    summarized_until = Column(DateTime(timezone=True), nullable=True)
     messages = relationship("ChatMessage", back_populates="session", cascade="all, delete-orphan", order_by="ChatMessage.created_at")
 
 class ChatMessage(Base):
@@ -18,5 +21,7 @@ class ChatMessage(Base):
     session_id = Column(PG_UUID(as_uuid=True), ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False, index=True)
     sender_type = Column(String, nullable=False) 
     content = Column(Text, nullable=False)
+    token_count = Column(Integer, nullable=True) # Tokens des Nachrichtentexts (geschätzt)
+    prompt_token_count = Column(Integer, nullable=True) # Nur AI-Nachrichten: Größe des gesendeten Prompts
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     session = relationship("ChatSession", back_populates="messages")
\ No newline at end of file
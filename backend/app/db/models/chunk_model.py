@@ -1,13 +1,45 @@
 # app/db/models/chunk_model.py
 import os
 import uuid
-from sqlalchemy import Column, Integer, Text, ForeignKey, Index
-from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy import Column, Integer, Text, ForeignKey, Index, Computed
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, TSVECTOR
 from pgvector.sqlalchemy import Vector
 from sqlalchemy.orm import relationship
 from .base_class import Base
 
 EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIMENSION", "768")) 
+# Textsuch-Konfiguration der tsvector-Spalte (Änderung erfordert Neuaufbau der Spalte)
+FULLTEXT_SEARCH_CONFIG = os.getenv("FULLTEXT_SEARCH_CONFIG", "english")
+# Vektor-Index: "vector" = HNSW auf den vollen float32-Vektoren (Standard),
+# "halfvec" = HNSW auf float16-Ausdruck (halbe Indexgröße), "binary" = HNSW auf binär quantisierten Vektoren (1 Bit/Dimension).
+# In den kompakten Modi werden Kandidaten über den kleinen Index gesucht und exakt auf den vollen Vektoren nachsortiert.
+VECTOR_INDEX_MODE = os.getenv("VECTOR_INDEX_MODE", "vector").lower()
+VECTOR_INDEX_MODES = ("vector", "halfvec", "binary")
+
+VECTOR_INDEX_NAMES = {
+    "vector": f"idx_chunk_embedding_hnsw_{EMBEDDING_DIM}",
+    "halfvec": f"idx_chunk_embedding_halfvec_hnsw_{EMBEDDING_DIM}",
+    "binary": f"idx_chunk_embedding_binary_hnsw_{EMBEDDING_DIM}",
+}
+
+def vector_index_ddl(mode: str, index_name: str = None) -> str:
+    """CREATE INDEX für den jeweiligen Modus (auch vom Benchmark genutzt, daher mit optionalem Namen)."""
+    index_name = index_name or VECTOR_INDEX_NAMES[mode]
+    if mode == "halfvec":
+        expression = f"(embedding::halfvec({EMBEDDING_DIM})) halfvec_cosine_ops"
+    elif mode == "binary":
+        expression = f"(binary_quantize(embedding)::bit({EMBEDDING_DIM})) bit_hamming_ops"
+    else:
+        expression = "embedding vector_cosine_ops"
+    return f"CREATE INDEX IF NOT EXISTS {index_name} ON chunks USING hnsw ({expression})"
+
+def vector_index_migration_statements(mode: str = VECTOR_INDEX_MODE):
+    """Legt den Index des aktiven Modus an und entfernt die der anderen Modi (idempotent)."""
+    if mode not in VECTOR_INDEX_MODES:
+        raise ValueError(f"Unbekannter VECTOR_INDEX_MODE: {mode} (erlaubt: {', '.join(VECTOR_INDEX_MODES)})")
+    statements = [vector_index_ddl(mode)]
+    statements += [f"DROP INDEX IF EXISTS {name}" for other, name in VECTOR_INDEX_NAMES.items() if other != mode]
+    return statements
 
 class Chunk(Base):
     __tablename__ = "chunks"
@@ -17,18 +49,18 @@ class Chunk(Base):
     content = Column(Text, nullable=False)
     page_number = Column(Integer, nullable=True)
     char_count = Column(Integer, nullable=True)
+    # Exakte Position im Marker-Markdown des Dokuments (Ende exklusiv); NULL bei Chunks von vor der Einführung
+    char_start = Column(Integer, nullable=True)
+    char_end = Column(Integer, nullable=True)
     embedding = Column(Vector(EMBEDDING_DIM), nullable=True)
+    # Von Postgres gepflegt, für die lexikalische Suche (GIN-Index)
+    content_tsv = Column(TSVECTOR, Computed(f"to_tsvector('{FULLTEXT_SEARCH_CONFIG}'::regconfig, content)", persisted=True))
     document = relationship("Document", back_populates="chunks")
 
     __table_args__ = (
-        Index(
-            f'idx_chunk_embedding_hnsw_{EMBEDDING_DIM}', 
-            embedding, 
-            postgresql_using='hnsw', 
-            postgresql_ops={'embedding': 'vector_cosine_ops'} 
-
-        ),
+        # Der Vektor-Index selbst hängt von VECTOR_INDEX_MODE ab und wird in create_db_tables angelegt
         Index('idx_chunk_document_page', 'document_id', 'page_number'), 
+        Index('idx_chunk_content_tsv', content_tsv, postgresql_using='gin'),
     )
 
     def __repr__(self):
@@ -15,8 +15,10 @@ class Document(Base):
     author = Column(Text, nullable=True)
     publication_year = Column(Integer, nullable=True)
     additional_metadata = Column(JSONB, nullable=True) 
+    content_sha256 = Column(String(64), index=True, nullable=True) # Fingerprint des PDF-Inhalts für Duplikaterkennung
 
-    chunks = relationship("Chunk", back_populates="document", cascade="all, delete-orphan")
+    # passive_deletes: Chunks löscht Postgres per ON DELETE CASCADE, das ORM lädt sie beim Löschen nicht erst
+    chunks = relationship("Chunk", back_populates="document", cascade="all, delete-orphan", passive_deletes=True)
 
     def __repr__(self):
         return f"<Document(id='{self.id}', original_filename='{self.original_filename}')>"
\ No newline at end of file
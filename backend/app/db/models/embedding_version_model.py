@@ -0,0 +1,84 @@
+# app/db/models/embedding_version_model.py
+from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, DateTime, Index
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.sql import func
+from pgvector.sqlalchemy import Vector
+from .base_class import Base
+
+# Status eines Embedding-Modells:
+#   active    seine Vektoren stehen in chunks.embedding (genau ein Eintrag)
+#   migrating Hintergrund-Job bettet die Chunks neu ein (Vektoren in chunk_embeddings)
+#   paused    Job angehalten, setzt beim nächsten Start der Migration fort
+#   ready     alle Chunks eingebettet, kann aktiviert werden
+#   retired   früher aktiv; Vektoren bleiben in chunk_embeddings (Rückweg per erneuter Migration + Aktivierung)
+#   failed    Job mit nicht einbettbaren Chunks beendet
+EMBEDDING_VERSION_STATES = ("active", "migrating", "paused", "ready", "retired", "failed")
+
+
+def make_embedding_version_key(provider: str, model_name: str, dimension: int) -> str:
+    return f"{provider}:{model_name}:{dimension}"
+
+
+class EmbeddingVersion(Base):
+    __tablename__ = "embedding_versions"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    version_key = Column(String, nullable=False, unique=True) # provider:model:dimension
+    provider = Column(String, nullable=False)
+    model_name = Column(String, nullable=False)
+    dimension = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, index=True)
+    total_chunks = Column(Integer, nullable=False, default=0)
+    embedded_chunks = Column(Integer, nullable=False, default=0)
+    failed_chunks = Column(Integer, nullable=False, default=0)
+    chunks_per_second = Column(Float, nullable=True) # Durchsatz des letzten Batches
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    activated_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<EmbeddingVersion(id={self.id}, key='{self.version_key}', status='{self.status}')>"
+
+
+class ChunkEmbedding(Base):
+    """
+    Vektoren nicht aktiver Modelle (Migrationsziel oder stillgelegt). Ohne feste Dimension, damit
+    Modelle mit anderer Dimension in derselben Tabelle liegen können; gesucht wird hier nur exakt (Shadow-Reads).
+    """
+    __tablename__ = "chunk_embeddings"
+
+    chunk_id = Column(PG_UUID(as_uuid=True), ForeignKey("chunks.id", ondelete="CASCADE"), primary_key=True)
+    version_id = Column(Integer, ForeignKey("embedding_versions.id", ondelete="CASCADE"), primary_key=True)
+    embedding = Column(Vector(), nullable=False)
+
+    __table_args__ = (
+        # Anti-Join "welche Chunks fehlen noch für Version X" und Löschen einer Version
+        Index('idx_chunk_embeddings_version_chunk', 'version_id', 'chunk_id'),
+    )
+
+
+def embedding_swap_statements(has_old_version: bool = True):
+    """
+    Tauscht die Vektoren in chunks.embedding gegen die der Version :new_version_id (Transaktion beim Aufrufer).
+    Die bisherigen Vektoren wandern unter :old_version_id nach chunk_embeddings - Rückweg ohne Neu-Einbetten.
+    """
+    statements = []
+    if has_old_version:
+        statements.append(
+            "INSERT INTO chunk_embeddings (chunk_id, version_id, embedding)"
+            " SELECT id, :old_version_id, embedding FROM chunks WHERE embedding IS NOT NULL"
+            " ON CONFLICT (chunk_id, version_id) DO UPDATE SET embedding = EXCLUDED.embedding"
+        )
+    statements += [
+        "UPDATE chunks SET embedding = ce.embedding FROM chunk_embeddings ce"
+        " WHERE ce.chunk_id = chunks.id AND ce.version_id = :new_version_id",
+        "DELETE FROM chunk_embeddings WHERE version_id = :new_version_id",
+    ]
+    if has_old_version:
+        statements.append("UPDATE embedding_versions SET status = 'retired', updated_at = now() WHERE id = :old_version_id")
+    statements.append(
+        "UPDATE embedding_versions SET status = 'active', activated_at = now(), updated_at = now(), last_error = NULL,"
+        " embedded_chunks = (SELECT count(*) FROM chunks WHERE embedding IS NOT NULL) WHERE id = :new_version_id"
+    )
+    return statements
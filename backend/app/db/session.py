@@ -1,10 +1,14 @@
 # app/db/session.py
 import os
+import time
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql import text 
 from dotenv import load_dotenv
 from app.db.models import Base 
+from app.db.models.chunk_model import EMBEDDING_DIM, FULLTEXT_SEARCH_CONFIG, VECTOR_INDEX_MODE, vector_index_migration_statements
+from app.db.models.embedding_version_model import embedding_swap_statements
+from app.core.observability import get_metrics_registry
 
 
 load_dotenv()
@@ -15,13 +19,26 @@ print(f"DEBUG_DB_SESSION: Geladene DATABASE_URL: {SQLALCHEMY_DATABASE_URL}")
 if not SQLALCHEMY_DATABASE_URL:
     raise ValueError("DATABASE_URL ist nicht in der .env Datei gesetzt!")
 
+# Verbindungs-Pool (Standardwerte wie SQLAlchemy); Auslastung unter /metrics (db_pool_*)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
 async_engine = create_async_engine(
     SQLALCHEMY_DATABASE_URL, 
     echo=False, # True für SQL-Logging, wenn es gebraucht wird
     pool_pre_ping=True,
     pool_recycle=1800, 
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
 )
 
+_metrics = get_metrics_registry()
+_metrics.gauge("db_pool_capacity", "Maximal gleichzeitig nutzbare DB-Verbindungen (pool_size + max_overflow)", lambda: DB_POOL_SIZE + DB_MAX_OVERFLOW)
+_metrics.gauge("db_pool_checked_out", "Aktuell ausgeliehene DB-Verbindungen", lambda: async_engine.pool.checkedout())
+_metrics.gauge("db_pool_idle", "Offene, freie DB-Verbindungen im Pool", lambda: async_engine.pool.checkedin())
+
 AsyncSessionLocal = sessionmaker(
     bind=async_engine, 
     class_=AsyncSession, 
@@ -30,6 +47,20 @@ AsyncSessionLocal = sessionmaker(
     autoflush=False
 )
 
+# Nachträglich hinzugefügte Spalten/Indizes für Datenbanken, die vor der jeweiligen Änderung erstellt wurden
+SCHEMA_UPGRADE_STATEMENTS = [
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_sha256 VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_documents_content_sha256 ON documents (content_sha256)",
+    f"ALTER TABLE chunks ADD COLUMN IF NOT EXISTS content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('{FULLTEXT_SEARCH_CONFIG}'::regconfig, content)) STORED",
+    "CREATE INDEX IF NOT EXISTS idx_chunk_content_tsv ON chunks USING gin (content_tsv)",
+    "ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summary TEXT",
+    "ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summarized_until TIMESTAMP WITH TIME ZONE",
+    "ALTER TABLE chat_messages ADD COLUMN IF NOT EXISTS token_count INTEGER",
+    "ALTER TABLE chat_messages ADD COLUMN IF NOT EXISTS prompt_token_count INTEGER",
+    "ALTER TABLE chunks ADD COLUMN IF NOT EXISTS char_start INTEGER",
+    "ALTER TABLE chunks ADD COLUMN IF NOT EXISTS char_end INTEGER",
+]
+
 async def get_async_db() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
@@ -44,4 +75,65 @@ async def create_db_tables():
             print(f"HINWEIS_DB: pgvector (existiert evtl. schon): {e}")
             
         await conn.run_sync(Base.metadata.create_all)
-        print("INFO_DB: Tabellenerstellung (Base.metadata.create_all) abgeschlossen.")
\ No newline at end of file
+        print("INFO_DB: Tabellenerstellung (Base.metadata.create_all) abgeschlossen.")
+
+        # create_all ergänzt keine Spalten in bestehenden Tabellen -> nachträgliche Spalten idempotent anlegen
+        for statement in SCHEMA_UPGRADE_STATEMENTS:
+            await conn.execute(text(statement))
+        print("INFO_DB: Schema-Ergänzungen geprüft/angewendet.")
+
+        await _switch_embedding_dimension_if_ready(conn)
+        await _apply_vector_index_mode(conn)
+
+async def _switch_embedding_dimension_if_ready(conn) -> None:
+    """
+    Dimensionswechsel des Embedding-Modells: Der Spaltentyp vector(n) hängt an EMBEDDING_DIMENSION und lässt sich nur
+    beim Start ändern. Ist eine fertig migrierte Version ("ready") mit der neuen Dimension vorhanden, wird die Spalte
+    umgestellt und mit deren Vektoren befüllt; der Vektor-Index wird danach von _apply_vector_index_mode neu aufgebaut.
+    """
+    column_dim = (await conn.execute(text(
+        "SELECT atttypmod FROM pg_attribute WHERE attrelid = 'chunks'::regclass AND attname = 'embedding'"
+    ))).scalar()
+    if not column_dim or column_dim <= 0 or column_dim == EMBEDDING_DIM:
+        return
+    target = (await conn.execute(text(
+        "SELECT id, version_key FROM embedding_versions WHERE status = 'ready' AND dimension = :dim ORDER BY updated_at DESC LIMIT 1"
+    ), {"dim": EMBEDDING_DIM})).first()
+    if target is None:
+        print(f"ERROR_DB: chunks.embedding hat Dimension {column_dim}, EMBEDDING_DIMENSION ist {EMBEDDING_DIM}, aber es gibt keine "
+              f"fertig migrierte Embedding-Version mit Dimension {EMBEDDING_DIM}. Vektorsuche liefert so keine Treffer - "
+              f"EMBEDDING_DIMENSION zurücksetzen und per POST /embeddings/migrations migrieren.")
+        return
+    switch_start = time.time()
+    old_version_id = (await conn.execute(text("SELECT id FROM embedding_versions WHERE status = 'active'"))).scalar()
+    params = {"old_version_id": old_version_id, "new_version_id": target.id}
+    statements = embedding_swap_statements(has_old_version=old_version_id is not None)
+    # Alte Vektoren sichern, bevor die Spalte geleert wird; danach Tausch wie beim Umschalten zur Laufzeit
+    if old_version_id is not None:
+        await conn.execute(text(statements.pop(0)), params)
+    index_names = (await conn.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = 'chunks' AND indexname LIKE 'idx\\_chunk\\_embedding\\_%'"
+    ))).scalars().all()
+    for index_name in index_names:
+        await conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+    await conn.execute(text(f"ALTER TABLE chunks ALTER COLUMN embedding TYPE vector({EMBEDDING_DIM}) USING NULL"))
+    for statement in statements:
+        await conn.execute(text(statement), params)
+    print(f"INFO_DB: Embedding-Spalte von Dimension {column_dim} auf {EMBEDDING_DIM} umgestellt, aktive Version: {target.version_key}. Dauer: {time.time() - switch_start:.2f}s")
+
+async def _apply_vector_index_mode(conn) -> None:
+    """
+    Stellt den Vektor-Index für VECTOR_INDEX_MODE her. Beim ersten Start nach einem Moduswechsel wird der neue
+    HNSW-Index über alle vorhandenen Chunks aufgebaut - bei großen Bibliotheken kann das einige Minuten dauern.
+    halfvec/binary_quantize gibt es erst ab pgvector 0.7.
+    """
+    mode = VECTOR_INDEX_MODE
+    if mode != "vector":
+        version_str = (await conn.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'"))).scalar() or "0"
+        if tuple(int(p) for p in version_str.split(".")[:2] if p.isdigit()) < (0, 7):
+            print(f"WARN_DB: VECTOR_INDEX_MODE={mode} benötigt pgvector >= 0.7 (installiert: {version_str}). Verwende 'vector'.")
+            mode = "vector"
+    index_start = time.time()
+    for statement in vector_index_migration_statements(mode):
+        await conn.execute(text(statement))
+    print(f"INFO_DB: Vektor-Index für Modus '{mode}' geprüft/angelegt. Dauer: {time.time() - index_start:.2f}s")
\ No newline at end of file
@@ -1,19 +1,142 @@
 # app/dependencies.py
-from functools import lru_cache
-from marker.models import create_model_dict
-from marker.config.parser import ConfigParser
-from typing import Dict, Any
+import os
+import asyncio
+import tempfile
+import threading
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Dict, Any, List, AsyncIterator, Optional
 
-# Diese Funktion ist ZWINGEND NOTWENDIG für die Performance mit Marker. @lru_cache sorgt dafür, dass create_model_dict() nur einmal ausgeführt wird.
-@lru_cache(maxsize=1)
+from app.core.config import TEMP_DIR
+
+# Marker (torch-Modelle) wird erst beim ersten Converter importiert - der API-Start bleibt schnell, Chat/Retrieval
+# kommen ohne Marker aus (siehe benchmarks/bench_import_time.py)
+if TYPE_CHECKING:
+    from marker.converters.pdf import PdfConverter
+
+MARKER_CONVERTER_POOL_SIZE = int(os.getenv("MARKER_CONVERTER_POOL_SIZE", "1"))
+MARKER_WARMUP_ON_STARTUP = os.getenv("MARKER_WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# Prozessweite Singletons (Marker-Modelle, Converter-Pool, Service). Die Getter laufen über asyncio.to_thread
+# parallel (Warm-up, erste Requests, Ingestion) - das Lock sorgt dafür, dass die Modelle (mehrere GB) nur einmal
+# geladen werden. RLock, weil die Getter einander aufrufen.
+_marker_resources: Optional[Dict[str, Any]] = None
+_converter_pool: Optional["MarkerConverterPool"] = None
+_pdf_processing_service = None
+_marker_init_lock = threading.RLock()
+
+# Diese Funktion ist ZWINGEND NOTWENDIG für die Performance mit Marker: create_model_dict() darf nur einmal laufen.
 def get_marker_resources() -> Dict[str, Any]:
-    """Lädt Marker-Modelle (nur einmal dank Cache)."""
-    print("LOG: Initialisiere Marker Modelle & Config (sollte nur einmal passieren)...")
-    artifact_dict = create_model_dict()
-    # Konfiguration für Marker hier anpassen
-    config_data = {"format_lines": True, "parallel_factor": 1}
-    config_parser = ConfigParser(config_data)
-    return {
-        "artifact_dict": artifact_dict,
-        "config": config_parser.generate_config_dict()
-    }
\ No newline at end of file
+    """Lädt Marker-Modelle (nur einmal pro Prozess)."""
+    global _marker_resources
+    if _marker_resources is None:
+        with _marker_init_lock:
+            if _marker_resources is None:
+                from marker.models import create_model_dict
+                from marker.config.parser import ConfigParser
+                print("LOG: Initialisiere Marker Modelle & Config (sollte nur einmal passieren)...")
+                artifact_dict = create_model_dict()
+                # Konfiguration für Marker hier anpassen
+                config_data = {"format_lines": True, "parallel_factor": 1}
+                config_parser = ConfigParser(config_data)
+                _marker_resources = {
+                    "artifact_dict": artifact_dict,
+                    "config": config_parser.generate_config_dict()
+                }
+    return _marker_resources
+
+
+def create_pdf_converter(artifact_dict: Dict[str, Any], config: Dict[str, Any]) -> "PdfConverter":
+    from marker.config.parser import ConfigParser
+    from marker.converters.pdf import PdfConverter
+    # Stellt sicher, dass Marker für Markdown-Output konfiguriert ist.
+    effective_config = config.copy()
+    effective_config["output_format"] = "markdown"
+    parser = ConfigParser(effective_config)
+    return PdfConverter(
+        artifact_dict=artifact_dict,
+        config=parser.generate_config_dict(),
+        renderer=parser.get_renderer(),
+    )
+
+
+class MarkerConverterPool:
+    """
+    N vorab erstellte PdfConverter, die alle dasselbe (gecachte) artifact_dict nutzen.
+    Ein Request leiht sich per `checkout()` einen Converter und gibt ihn danach zurück.
+    """
+
+    def __init__(self, artifact_dict: Dict[str, Any], config: Dict[str, Any], size: int):
+        self._converters: List["PdfConverter"] = [create_pdf_converter(artifact_dict, config) for _ in range(max(1, size))]
+        self._idle: List["PdfConverter"] = list(self._converters)
+        self._available: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        print(f"LOG_INIT: MarkerConverterPool mit {len(self._converters)} Converter(n) erstellt. Renderer: {type(self._converters[0].renderer)}")
+
+    @property
+    def size(self) -> int:
+        return len(self._converters)
+
+    @asynccontextmanager
+    async def checkout(self) -> AsyncIterator["PdfConverter"]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Semaphor an den Loop binden, auf dem der Pool benutzt wird (API bzw. langlebiger Loop des Worker-Prozesses)
+            self._loop = loop
+            self._available = asyncio.Semaphore(len(self._idle))
+        async with self._available:
+            converter = self._idle.pop()
+            try:
+                yield converter
+            finally:
+                self._idle.append(converter)
+
+
+def get_converter_pool() -> MarkerConverterPool:
+    global _converter_pool
+    if _converter_pool is None:
+        with _marker_init_lock:
+            if _converter_pool is None:
+                marker_res = get_marker_resources()
+                _converter_pool = MarkerConverterPool(marker_res["artifact_dict"], marker_res["config"], MARKER_CONVERTER_POOL_SIZE)
+    return _converter_pool
+
+
+def get_pdf_processing_service():
+    """Prozessweite PdfProcessingService-Instanz (zustandslos bis auf den Converter-Pool)."""
+    global _pdf_processing_service
+    if _pdf_processing_service is None:
+        with _marker_init_lock:
+            if _pdf_processing_service is None:
+                from app.services.pdf_processing_service import PdfProcessingService
+                _pdf_processing_service = PdfProcessingService(converter_pool=get_converter_pool())
+    return _pdf_processing_service
+
+
+def _write_warmup_pdf() -> str:
+    import fitz
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=TEMP_DIR, prefix="marker_warmup_")
+    os.close(fd)
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), "PaperPilot warm-up\nE = mc^2", fontsize=12)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+async def warm_up_marker_converters() -> None:
+    """
+    Lädt die Marker-Modelle, erstellt den Converter-Pool und schickt eine winzige PDF durch Marker,
+    damit die erste echte Anfrage keine verzögerte Modell-Initialisierung bezahlt.
+    """
+    pool = await asyncio.to_thread(get_converter_pool)
+    warmup_pdf_path = await asyncio.to_thread(_write_warmup_pdf)
+    try:
+        async with pool.checkout() as converter:
+            await asyncio.to_thread(converter, warmup_pdf_path)
+        print(f"INFO_MARKER: Warm-up abgeschlossen ({pool.size} Converter im Pool).")
+    except Exception as e:
+        print(f"WARN_MARKER: Warm-up fehlgeschlagen (erste Anfrage wird langsamer sein): {e}")
+    finally:
+        if os.path.exists(warmup_pdf_path):
+            os.remove(warmup_pdf_path)
@@ -0,0 +1,62 @@
+# app/ingestion_worker.py
+"""
+Eigenständiger Ingestion-Worker für INGESTION_WORKER_MODE="external": die API reiht PDFs nur in die Job-Tabelle
+ein, dieser Dienst verarbeitet sie (Marker, Chunking, Embeddings, DB). So starten Chat-/Retrieval-Instanzen ohne
+Marker/torch und lassen sich unabhängig von der Ingestion-Kapazität skalieren.
+
+Der Worker braucht denselben INGESTION_JOBS_DB_PATH und dasselbe TEMP_DIR (Spool-Dateien) wie die API, z.B. über
+ein geteiltes Volume. Pro Job-Datenbank genau einen Worker-Dienst betreiben; mehr Durchsatz über --workers.
+
+Aufruf (aus backend/):
+    python -m app.ingestion_worker --mode process --workers 2
+"""
+import signal
+import asyncio
+import argparse
+
+from app.db.session import create_db_tables
+from app.services.ingestion_jobs import (
+    IngestionJobManager, IngestionJobStore, INGESTION_MAX_WORKERS, INGESTION_POLL_INTERVAL_SECONDS,
+)
+from app.services.marker_sharding import get_marker_shard_pool
+from app.services.image_store import shutdown_image_executor
+from app.core.http_client import close_http_clients
+from app.dependencies import MARKER_WARMUP_ON_STARTUP, warm_up_marker_converters
+
+
+async def run_worker(mode: str, workers: int, poll_interval: float) -> None:
+    await create_db_tables()
+    manager = IngestionJobManager(IngestionJobStore(), mode=mode, max_workers=workers)
+    # Setzt beim letzten Beenden unterbrochene Jobs wieder auf 'queued'
+    await manager.start()
+    if mode == "inline" and MARKER_WARMUP_ON_STARTUP:
+        # Im Modus "process" wärmen die Worker-Prozesse selbst auf (_init_worker_process)
+        await warm_up_marker_converters()
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass # Windows: Strg+C beendet über KeyboardInterrupt
+    print(f"INFO_INGESTION_WORKER: Warte auf Jobs (Modus={mode}, Worker={workers}, Poll-Intervall={poll_interval}s).")
+    try:
+        await manager.run_worker_loop(stop_event, poll_interval)
+    finally:
+        await manager.shutdown()
+        if get_marker_shard_pool():
+            get_marker_shard_pool().shutdown()
+        shutdown_image_executor()
+        await close_http_clients()
+        print("INFO_INGESTION_WORKER: Worker beendet.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["process", "inline"], default="process",
+                        help="process: Jobs in Worker-Prozessen (Absturz-isoliert), inline: im Worker-Prozess selbst")
+    parser.add_argument("--workers", type=int, default=INGESTION_MAX_WORKERS, help="Gleichzeitig verarbeitete Jobs")
+    parser.add_argument("--poll-interval", type=float, default=INGESTION_POLL_INTERVAL_SECONDS)
+    args = parser.parse_args()
+    asyncio.run(run_worker(args.mode, args.workers, args.poll_interval))
@@ -1,9 +1,10 @@
 # app/schemas/chat_schemas.py
 from pydantic import BaseModel
-from typing import List, Optional 
+from typing import List, Optional, Dict
 
 # Importiere SourceDetail, da ChatResponse es verwendet
 from .generation_schemas import SourceDetail 
+from .processing_schemas import RetrievalFilters
 
 class ChatRequest(BaseModel):
     """Request-Body für den Chat-Endpunkt."""
@@ -11,9 +12,12 @@ class ChatRequest(BaseModel):
     message: str
     num_sources: Optional[int] = 3
     use_rag: Optional[bool] = True
+    filters: Optional[RetrievalFilters] = None # Suche auf Dokumente/Jahre/Autor einschränken
 
 class ChatResponse(BaseModel):
     """Response-Body für den Chat-Endpunkt."""
     session_id: str
     ai_message: str
-    retrieved_sources: List[SourceDetail] 
\ No newline at end of file
+    retrieved_sources: List[SourceDetail] 
+    # Geschätzte Tokens dieses Turns: summary_tokens, history_tokens, sources_tokens, prompt_tokens, completion_tokens
+    token_usage: Optional[Dict[str, int]] = None
\ No newline at end of file
@@ -18,4 +18,13 @@ class DocumentDisplay(DocumentBase):
     # chunk_count: int # Beispiel
 
     class Config:
-        orm_mode = True # Erlaube Pydantic, von ORM-Objekten zu lesen
\ No newline at end of file
+        orm_mode = True # Erlaube Pydantic, von ORM-Objekten zu lesen
+
+class DocumentBulkDeleteRequest(BaseModel):
+    document_ids: List[uuid.UUID] = Field(..., min_items=1, max_items=1000, description="IDs der zu löschenden Dokumente.")
+
+class DocumentBulkDeleteResponse(BaseModel):
+    """Ergebnis einer Sammel-Löschung; Bildordner werden im Hintergrund entfernt."""
+    deleted: List[DocumentDisplay]
+    not_found: List[uuid.UUID]
+    deleted_chunks: int
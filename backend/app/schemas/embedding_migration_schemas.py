@@ -0,0 +1,34 @@
+# app/schemas/embedding_migration_schemas.py
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Optional, Literal
+
+EmbeddingVersionState = Literal["active", "migrating", "paused", "ready", "retired", "failed"]
+
+class EmbeddingMigrationRequest(BaseModel):
+    """Zielmodell einer Neu-Einbettung. Ohne model_name wird das Modell aus der .env des Providers verwendet."""
+    provider: Literal["google", "ollama"]
+    model_name: Optional[str] = None
+    dimension: int = Field(..., ge=1, le=16000)
+
+class EmbeddingVersionStatus(BaseModel):
+    """Stand einer Embedding-Version inkl. Fortschritt des Migrations-Jobs und der Shadow-Reads."""
+    id: int
+    version_key: str
+    provider: str
+    model_name: str
+    dimension: int
+    status: EmbeddingVersionState
+    running: bool
+    total_chunks: int
+    embedded_chunks: int
+    failed_chunks: int
+    progress: float
+    chunks_per_second: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    last_error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    activated_at: Optional[datetime] = None
+    shadow_reads: int = 0
+    shadow_mean_overlap: Optional[float] = None
@@ -1,12 +1,14 @@
 # app/schemas/generation_schemas.py
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
+from .processing_schemas import RetrievalFilters
 
 class GenerateTextQuery(BaseModel):
     """Request-Body für den Textgenerierungs-Endpunkt."""
     editor_context_html: str = Field(..., description="Der gesamte HTML-Inhalt des Editors als Kontext.")
     user_prompt: Optional[str] = Field(None, description="Die spezifische Anweisung oder Frage des Nutzers (optional).")
     num_sources: Optional[int] = Field(default=2, ge=1, le=10, description="Anzahl der zu berücksichtigenden Quellen.")
+    filters: Optional[RetrievalFilters] = Field(None, description="Quellen auf Dokumentauswahl, Jahresbereich oder Autor einschränken.")
 
 class SourceDetail(BaseModel):
     """Detaillierte Informationen zu einer Quelle, die für die Generierung/Retrieval verwendet wurde."""
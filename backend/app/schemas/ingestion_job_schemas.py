@@ -0,0 +1,26 @@
+# app/schemas/ingestion_job_schemas.py
+from pydantic import BaseModel
+from typing import Dict, Any, Optional, Literal
+
+IngestionJobState = Literal["queued", "running", "succeeded", "failed"]
+
+class IngestionJobCreated(BaseModel):
+    """Antwort beim Einreihen einer PDF in die Ingestion-Queue."""
+    job_id: str
+    status: IngestionJobState
+    original_filename: str
+    status_url: str
+    events_url: str
+
+class IngestionJobStatus(BaseModel):
+    """Aktueller Stand eines Ingestion-Jobs inkl. Dauer pro Verarbeitungsstufe (Sekunden)."""
+    job_id: str
+    status: IngestionJobState
+    original_filename: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    current_stage: Optional[str] = None
+    stage_timings: Dict[str, float] = {}
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
@@ -13,6 +13,7 @@ class ArxivSearchRequest(BaseModel):
 
 class ArxivPaperResult(BaseModel):
     arxiv_id: str
+    arxiv_version: Optional[str] = None # z.B. "v2"; Teil des Schlüssels im Zusammenfassungs-Cache
     title: str
     authors: List[str]
     published_date: str
@@ -45,9 +46,11 @@ class BatchImportFromUrlRequest(BaseModel):
 class BatchImportResultItem(BaseModel):
     original_filename: str
     arxiv_id: Optional[str] = None
-    status: Literal["success", "error"]
+    # "queued": heruntergeladen und als Ingestion-Job eingereiht (Fortschritt über job_id)
+    status: Literal["queued", "success", "error"]
     message: str
     processed_document_id: Optional[str] = None # Von PdfProcessingResult.metadata
+    job_id: Optional[str] = None
     # document_db_id: Optional[uuid.UUID] = None # Falls du die DB ID auch zurückgeben willst
 
 # NEU: Response-Schema für Batch-Import
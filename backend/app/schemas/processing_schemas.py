@@ -1,4 +1,5 @@
 # app/schemas/processing_schemas.py
+import uuid
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
 
@@ -7,12 +8,16 @@ class ImageInfo(BaseModel):
     filename: str
     content_type: Optional[str] = None
     file_path: Optional[str] = None
+    sha256: Optional[str] = None # Inhaltsadresse im Bild-Store
+    thumbnail_path: Optional[str] = None
 
 
 class TextChunk(BaseModel):
     content: str
     page_number: Optional[int] = None 
     char_count: Optional[int] = None
+    char_start: Optional[int] = None # Position im Markdown des Dokuments
+    char_end: Optional[int] = None
 
 
 class PdfProcessingResult(BaseModel):
@@ -22,6 +27,17 @@ class PdfProcessingResult(BaseModel):
     debug_message: Optional[str] = None
     
     
+# Einschränkung der Suche auf eine Dokumentauswahl bzw. Metadaten
+class RetrievalFilters(BaseModel):
+    document_ids: Optional[List[uuid.UUID]] = None
+    year_from: Optional[int] = None
+    year_to: Optional[int] = None
+    author: Optional[str] = None # Teilstring, Groß-/Kleinschreibung egal
+
+    def is_empty(self) -> bool:
+        return not (self.document_ids or self.year_from is not None or self.year_to is not None or (self.author and self.author.strip()))
+
+
 # Pydantic Modell für die Antwort des Retrieval-Endpunkts
 class RetrievedChunk(BaseModel):
     chunk_content: str
@@ -31,3 +47,4 @@ class RetrievedChunk(BaseModel):
     original_filename: Optional[str] = None
     distance: Optional[float] = None 
     publication_year: Optional[int] = None
+    score: Optional[float] = None # RRF-Score (hybrid) bzw. ts_rank_cd (lexical)
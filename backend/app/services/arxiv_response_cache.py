@@ -0,0 +1,110 @@
+# app/services/arxiv_response_cache.py
+import os
+import re
+import json
+import sqlite3
+import threading
+import hashlib
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import CACHE_DIR
+
+ARXIV_RESPONSE_CACHE_ENABLED = os.getenv("ARXIV_RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+ARXIV_RESPONSE_CACHE_PATH = os.getenv("ARXIV_RESPONSE_CACHE_PATH", os.path.join(CACHE_DIR, "arxiv_responses.sqlite3"))
+ARXIV_RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("ARXIV_RESPONSE_CACHE_TTL_SECONDS", "86400"))
+
+
+def normalize_arxiv_query(query: str) -> str:
+    # Nur Leerraum vereinheitlichen - Groß-/Kleinschreibung ist für AND/OR/ANDNOT relevant
+    return re.sub(r"\s+", " ", query).strip()
+
+
+def make_response_cache_key(query: str, start: int, max_results: int, sort_by: str, sort_order: str) -> str:
+    raw_key = f"{normalize_arxiv_query(query)}|{start}|{max_results}|{sort_by}|{sort_order}"
+    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+
+class ArxivResponseCache:
+    """
+    Persistenter Cache (SQLite) der arXiv-Suchergebnisse mit TTL.
+    Gespeichert werden die bereits geparsten Einträge als JSON (kleiner als der Atom-Feed, kein erneutes Parsen).
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "writes": 0}
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS arxiv_responses ("
+            " cache_key TEXT PRIMARY KEY, query TEXT NOT NULL, entries TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        print(f"LOG_ARXIV_RESPONSE_CACHE: arXiv-Antwort-Cache geöffnet: {db_path}")
+
+    def get(self, cache_key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT entries, fetched_at FROM arxiv_responses WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            if time.time() - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM arxiv_responses WHERE cache_key = ?", (cache_key,))
+                self._conn.commit()
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+        return json.loads(row[0])
+
+    def put(self, cache_key: str, query: str, entries: List[Dict[str, Any]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO arxiv_responses (cache_key, query, entries, fetched_at) VALUES (?, ?, ?, ?)",
+                (cache_key, normalize_arxiv_query(query), json.dumps(entries, ensure_ascii=False), now),
+            )
+            # Abgelaufene Einträge bei Gelegenheit mit entfernen
+            self._conn.execute("DELETE FROM arxiv_responses WHERE fetched_at < ?", (now - self.ttl_seconds,))
+            self._conn.commit()
+            self._stats["writes"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            entries = self._conn.execute("SELECT COUNT(*) FROM arxiv_responses").fetchone()[0]
+            return {
+                **self._stats,
+                "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": entries,
+                "ttl_seconds": self.ttl_seconds,
+                "db_path": self.db_path,
+            }
+
+
+_arxiv_response_cache: Optional[ArxivResponseCache] = None
+_arxiv_response_cache_unavailable = False
+_arxiv_response_cache_lock = threading.Lock()
+
+def get_arxiv_response_cache() -> Optional[ArxivResponseCache]:
+    """Prozessweiter Cache (lazy). None, wenn per ARXIV_RESPONSE_CACHE_ENABLED deaktiviert oder nicht zu öffnen."""
+    global _arxiv_response_cache, _arxiv_response_cache_unavailable
+    if not ARXIV_RESPONSE_CACHE_ENABLED or _arxiv_response_cache_unavailable:
+        return None
+    if _arxiv_response_cache is None:
+        with _arxiv_response_cache_lock:
+            if _arxiv_response_cache is None:
+                try:
+                    _arxiv_response_cache = ArxivResponseCache(ARXIV_RESPONSE_CACHE_PATH, ARXIV_RESPONSE_CACHE_TTL_SECONDS)
+                except Exception as e:
+                    print(f"ERROR_ARXIV_RESPONSE_CACHE: Cache konnte nicht geöffnet werden ({ARXIV_RESPONSE_CACHE_PATH}): {e}")
+                    _arxiv_response_cache_unavailable = True
+                    return None
+    return _arxiv_response_cache
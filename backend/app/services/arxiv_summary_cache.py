@@ -0,0 +1,97 @@
+# app/services/arxiv_summary_cache.py
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Any
+
+from app.core.config import CACHE_DIR
+
+ARXIV_SUMMARY_CACHE_ENABLED = os.getenv("ARXIV_SUMMARY_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+ARXIV_SUMMARY_CACHE_PATH = os.getenv("ARXIV_SUMMARY_CACHE_PATH", os.path.join(CACHE_DIR, "arxiv_summaries.sqlite3"))
+
+
+def make_summary_cache_key(arxiv_id: str, arxiv_version: Optional[str]) -> str:
+    """Eine neue arXiv-Version kann einen geänderten Abstract haben -> eigener Eintrag pro Version."""
+    return f"{arxiv_id}|{arxiv_version or 'v?'}"
+
+
+class ArxivSummaryCache:
+    """
+    Persistenter Cache (SQLite) der LLM-Kurzfassungen von arXiv-Abstracts, Schlüssel: arXiv-ID + Version.
+    Einträge laufen nicht ab - der Abstract einer Version ändert sich nicht.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0}
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS arxiv_summaries ("
+            " cache_key TEXT PRIMARY KEY, summary TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        print(f"LOG_ARXIV_SUMMARY_CACHE: Zusammenfassungs-Cache geöffnet: {db_path}")
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, str] = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT cache_key, summary FROM arxiv_summaries WHERE cache_key IN ({placeholders})", part
+                ).fetchall()
+                found.update(rows)
+            self._stats["hits"] += len(found)
+            self._stats["misses"] += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, str]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO arxiv_summaries (cache_key, summary, created_at) VALUES (?, ?, ?)",
+                [(key, summary, now) for key, summary in items.items()],
+            )
+            self._conn.commit()
+            self._stats["writes"] += len(items)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            entries = self._conn.execute("SELECT COUNT(*) FROM arxiv_summaries").fetchone()[0]
+            return {
+                **self._stats,
+                "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": entries,
+                "db_path": self.db_path,
+            }
+
+
+_arxiv_summary_cache: Optional[ArxivSummaryCache] = None
+_arxiv_summary_cache_unavailable = False
+_arxiv_summary_cache_lock = threading.Lock()
+
+def get_arxiv_summary_cache() -> Optional[ArxivSummaryCache]:
+    """Prozessweiter Cache (lazy). None, wenn per ARXIV_SUMMARY_CACHE_ENABLED deaktiviert oder nicht zu öffnen."""
+    global _arxiv_summary_cache, _arxiv_summary_cache_unavailable
+    if not ARXIV_SUMMARY_CACHE_ENABLED or _arxiv_summary_cache_unavailable:
+        return None
+    if _arxiv_summary_cache is None:
+        with _arxiv_summary_cache_lock:
+            if _arxiv_summary_cache is None:
+                try:
+                    _arxiv_summary_cache = ArxivSummaryCache(ARXIV_SUMMARY_CACHE_PATH)
+                except Exception as e:
+                    print(f"ERROR_ARXIV_SUMMARY_CACHE: Cache konnte nicht geöffnet werden ({ARXIV_SUMMARY_CACHE_PATH}): {e}")
+                    _arxiv_summary_cache_unavailable = True
+                    return None
+    return _arxiv_summary_cache
@@ -0,0 +1,201 @@
+# app/services/chat_context.py
+import os
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Set, Tuple, Union
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+
+from app.db.crud import crud_chat
+from app.db.models import ChatMessage
+from app.db.session import AsyncSessionLocal
+from .llm_service import generate_text_with_llm
+
+# Token-Budgets pro Chat-Turn (Schätzwerte, siehe count_tokens)
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))
+CHAT_SOURCES_TOKEN_BUDGET = int(os.getenv("CHAT_SOURCES_TOKEN_BUDGET", "2500"))
+CHAT_SUMMARY_MAX_WORDS = int(os.getenv("CHAT_SUMMARY_MAX_WORDS", "200"))
+# Wie viele noch nicht zusammengefasste Nachrichten pro Turn höchstens geladen werden
+CHAT_HISTORY_FETCH_LIMIT = int(os.getenv("CHAT_HISTORY_FETCH_LIMIT", "40"))
+# Ein Quellen-Chunk wird nur gekürzt aufgenommen, wenn vom Budget noch mindestens so viele Tokens übrig sind
+CHAT_MIN_TRIMMED_CHUNK_TOKENS = 100
+
+CHAT_SYSTEM_PROMPT = "Du bist PaperPilot... Zitiere mit [ID:CHUNK_ID]."
+
+ROLLING_SUMMARY_PROMPT_TEMPLATE = """
+Du führst eine fortlaufende Zusammenfassung eines Chats zwischen einem Nutzer und dem Assistenten PaperPilot.
+Ergänze die bisherige Zusammenfassung um die neuen Nachrichten. Behalte Fakten, Entscheidungen, offene Fragen
+und genannte Quellen-IDs ([ID:...]) bei. Höchstens {max_words} Wörter. Gib NUR die neue Zusammenfassung zurück.
+
+Bisherige Zusammenfassung:
+{previous_summary}
+
+Neue Nachrichten:
+{new_messages}
+
+Neue Zusammenfassung:
+""".strip()
+
+LlmMessage = Union[SystemMessage, HumanMessage, AIMessage]
+
+_tiktoken_encoding = None
+_tiktoken_checked = False
+
+def count_tokens(text: Optional[str]) -> int:
+    """
+    Zählt Tokens mit tiktoken (optional installiert, cl100k als Näherung), sonst Heuristik ~4 Zeichen pro Token.
+    Exakte Zählung des jeweiligen Providers bräuchte einen API-Aufruf pro Turn - für Budgets reicht die Näherung.
+    """
+    global _tiktoken_encoding, _tiktoken_checked
+    if not text:
+        return 0
+    if not _tiktoken_checked:
+        _tiktoken_checked = True
+        try:
+            import tiktoken  # noqa: F401  (optional)
+            _tiktoken_encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _tiktoken_encoding = None
+    if _tiktoken_encoding is not None:
+        return len(_tiktoken_encoding.encode(text, disallowed_special=()))
+    return max(1, (len(text) + 3) // 4)
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Kürzt `text` auf ungefähr `max_tokens` Tokens, bevorzugt an einer Wortgrenze."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    approx_chars = max(0, int(len(text) * max_tokens / max(1, count_tokens(text))))
+    trimmed = text[:approx_chars]
+    last_space = trimmed.rfind(" ")
+    if last_space > approx_chars * 0.8:
+        trimmed = trimmed[:last_space]
+    return trimmed.rstrip() + " …"
+
+
+class ChatContextBuilder:
+    """
+    Baut den Prompt eines Chat-Turns innerhalb fester Token-Budgets:
+    System-Prompt + rollierende Sitzungs-Zusammenfassung + so viele jüngste Nachrichten wie ins Historien-Budget passen
+    + Quellen-Chunks bis zum Quellen-Budget (der letzte ggf. gekürzt) + aktuelle Frage.
+    Ältere Nachrichten, die nicht mehr ins Budget passen, werden im Hintergrund in die Zusammenfassung übernommen.
+    """
+
+    def __init__(self, history_budget: int = CHAT_HISTORY_TOKEN_BUDGET, sources_budget: int = CHAT_SOURCES_TOKEN_BUDGET):
+        self.history_budget = history_budget
+        self.sources_budget = sources_budget
+
+    def select_history(self, messages: List[ChatMessage]) -> Tuple[List[ChatMessage], List[ChatMessage]]:
+        """Teilt die (chronologischen) Nachrichten in (passt ins Budget, muss zusammengefasst werden)."""
+        used_tokens = 0
+        split_index = len(messages)
+        for i in range(len(messages) - 1, -1, -1):
+            message_tokens = messages[i].token_count or count_tokens(messages[i].content)
+            if used_tokens + message_tokens > self.history_budget:
+                break
+            used_tokens += message_tokens
+            split_index = i
+        return messages[split_index:], messages[:split_index]
+
+    def select_sources(self, retrieved_chunks: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], str]]:
+        """Nimmt Chunks in Ranking-Reihenfolge auf, bis das Quellen-Budget erschöpft ist; liefert (Chunk, Text)."""
+        selected: List[Tuple[Dict[str, Any], str]] = []
+        remaining = self.sources_budget
+        for chunk_data in retrieved_chunks:
+            content = chunk_data.get("chunk_content", "") or ""
+            content_tokens = count_tokens(content)
+            if content_tokens <= remaining:
+                selected.append((chunk_data, content))
+                remaining -= content_tokens
+            elif remaining >= CHAT_MIN_TRIMMED_CHUNK_TOKENS:
+                selected.append((chunk_data, trim_to_tokens(content, remaining)))
+                remaining = 0
+            if remaining < CHAT_MIN_TRIMMED_CHUNK_TOKENS:
+                break
+        return selected
+
+    def build(
+        self, summary: Optional[str], history: List[ChatMessage], user_message_content: str,
+        selected_sources: List[Tuple[Dict[str, Any], str]]
+    ) -> Tuple[List[LlmMessage], Dict[str, int]]:
+        system_prompt = CHAT_SYSTEM_PROMPT
+        if summary:
+            system_prompt += f"\n\nZusammenfassung des bisherigen Gesprächs:\n{summary}"
+        llm_messages: List[LlmMessage] = [SystemMessage(content=system_prompt)]
+        llm_messages.extend(
+            HumanMessage(content=m.content) if m.sender_type == "user" else AIMessage(content=m.content) for m in history
+        )
+
+        context_for_llm = ""
+        for chunk_data, content in selected_sources:
+            chunk_id = str(chunk_data.get('chunk_db_id', 'retrieved_chunk'))
+            context_for_llm += f"--- Quelle [ID:{chunk_id}] (Seite {chunk_data.get('page_number', 'N/A')}) ---\nInhalt: {content}\n---\n\n"
+        current_user_message_for_llm = user_message_content
+        if context_for_llm:
+            current_user_message_for_llm = f"Basierend auf Infos:\n{context_for_llm}\nMeine Frage: {user_message_content}"
+        llm_messages.append(HumanMessage(content=current_user_message_for_llm))
+
+        token_usage = {
+            "summary_tokens": count_tokens(summary),
+            "history_tokens": sum(m.token_count or count_tokens(m.content) for m in history),
+            "sources_tokens": sum(count_tokens(content) for _, content in selected_sources),
+            "prompt_tokens": sum(count_tokens(m.content) for m in llm_messages),
+        }
+        return llm_messages, token_usage
+
+
+# Laufende Zusammenfassungs-Tasks (Referenz halten, damit sie nicht vom GC eingesammelt werden)
+_summary_tasks: Set[asyncio.Task] = set()
+_sessions_being_summarized: Set[uuid.UUID] = set()
+
+def schedule_summary_update(session_id: uuid.UUID, summarize_until: datetime) -> None:
+    """
+    Startet die Aktualisierung der rollierenden Zusammenfassung im Hintergrund (max. eine gleichzeitig pro Session).
+    Zusammengefasst werden alle Nachrichten nach `summarized_until` bis einschließlich `summarize_until`.
+    """
+    if session_id in _sessions_being_summarized:
+        return
+    _sessions_being_summarized.add(session_id)
+    task = asyncio.create_task(_update_rolling_summary(session_id, summarize_until))
+    _summary_tasks.add(task)
+    task.add_done_callback(_summary_tasks.discard)
+
+
+async def _update_rolling_summary(session_id: uuid.UUID, summarize_until: datetime) -> None:
+    start_time = time.time()
+    try:
+        # Lesen und Schreiben in je einer kurzen Transaktion - während des LLM-Aufrufs ist keine DB-Verbindung belegt
+        async with AsyncSessionLocal() as db:
+            chat_session = await crud_chat.get_chat_session(db, session_id)
+            if not chat_session:
+                return
+            previous_summary, previous_summarized_until = chat_session.summary, chat_session.summarized_until
+            messages = await crud_chat.get_unsummarized_messages(db, session_id, previous_summarized_until, summarize_until)
+        if not messages:
+            return
+        new_messages_text = "\n".join(
+            f"{'Nutzer' if m.sender_type == 'user' else 'Assistent'}: {m.content}" for m in messages
+        )
+        summary = await generate_text_with_llm(ROLLING_SUMMARY_PROMPT_TEMPLATE, {
+            "max_words": CHAT_SUMMARY_MAX_WORDS,
+            "previous_summary": previous_summary or "(noch keine)",
+            "new_messages": new_messages_text,
+        })
+        if not summary or summary.startswith("Fehler"):
+            print(f"WARN_CHAT_CONTEXT: Zusammenfassung für Session {session_id} fehlgeschlagen: {summary}")
+            return
+        async with AsyncSessionLocal() as db:
+            updated = await crud_chat.update_session_summary(
+                db, session_id, summary.strip(),
+                summarized_until=messages[-1].created_at, previous_summarized_until=previous_summarized_until,
+            )
+            await db.commit()
+        if not updated:
+            print(f"WARN_CHAT_CONTEXT: Zusammenfassung für Session {session_id} verworfen - zwischenzeitlich anderweitig aktualisiert.")
+            return
+        print(f"LOG_CHAT_CONTEXT: Zusammenfassung für Session {session_id} um {len(messages)} Nachrichten ergänzt. Dauer: {time.time() - start_time:.2f}s")
+    except Exception as e:
+        print(f"ERROR_CHAT_CONTEXT: Fehler beim Aktualisieren der Zusammenfassung für Session {session_id}: {e}")
+    finally:
+        _sessions_being_summarized.discard(session_id)
@@ -1,84 +1,175 @@
 # app/services/chat_service.py
-import os, uuid, time # time hinzugefügt
-from typing import List, Dict, Any, Optional
+import os, uuid, time
+import asyncio
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 
-from .retrieval_service import RetrievalService
-from .llm_service import generate_text_with_llm, get_llm_chat_model
+from .retrieval_service import RetrievalService, chunk_to_source_detail
+from .llm_service import get_llm_chat_model
+from .embedding_service import aembed_query
+from .chat_context import (
+    ChatContextBuilder, LlmMessage, count_tokens, schedule_summary_update, CHAT_HISTORY_FETCH_LIMIT
+)
 from app.db.crud import crud_chat
+from app.db.session import AsyncSessionLocal
+from app.schemas.processing_schemas import RetrievalFilters
+from app.core.observability import span, observe_stage, log_debug
 
 class ChatService:
     def __init__(self):
         self.retrieval_service = RetrievalService()
         self.llm_provider = os.getenv("LLM_PROVIDER", "google").lower()
         self.chat_model = get_llm_chat_model(self.llm_provider)
+        self.context_builder = ChatContextBuilder()
         print(f"LOG_CHAT_SERVICE_INIT: ChatService initialisiert mit LLM Provider: {self.llm_provider}")
 
+    async def _prepare_chat_turn(
+        self, db: AsyncSession, session_id: uuid.UUID, user_message_content: str,
+        num_retrieved_chunks: int, use_rag: bool, retrieval_filters: Optional[RetrievalFilters]
+    ) -> Tuple[List[LlmMessage], List[Dict[str, Any]], Dict[str, int]]:
+        """
+        Lesephase eines Turns: Session-Upsert und Historie (danach sofort Commit), dann Retrieval in einer eigenen
+        kurzen Lesetransaktion - weder auf das Query-Embedding noch auf den (mehrsekündigen) LLM-Aufruf wird mit
+        offener Transaktion gewartet. Das Query-Embedding läuft parallel zu den Session-/Historien-Abfragen.
+        Geschrieben wird erst nach der Generierung (siehe _store_chat_turn).
+        """
+        embedding_task: Optional[asyncio.Task] = None
+        if use_rag and self.retrieval_service.uses_query_embedding():
+            embedding_task = asyncio.create_task(aembed_query(user_message_content))
+        try:
+            with span("chat_history_load"):
+                # DB Op 1: Session-Upsert (liefert gleich den Stand der Zusammenfassung)
+                session_row = await crud_chat.upsert_chat_session(db, session_id)
+
+                # DB Op 2: get_chat_history - nur Nachrichten, die noch nicht in der Zusammenfassung stecken
+                chat_history_db_messages = await crud_chat.get_chat_history(
+                    db, session_id, limit=CHAT_HISTORY_FETCH_LIMIT, after=session_row.summarized_until
+                )
+                history_for_llm, messages_to_summarize = self.context_builder.select_history(chat_history_db_messages)
+                # Session-Upsert festschreiben, bevor auf Embedding/Retrieval gewartet wird
+                with span("db_commit"):
+                    await db.commit()
+            log_debug("LOG_CHAT_TIMING", "Session + Historie geladen. Nachrichten: %d, im Prompt: %d", len(chat_history_db_messages), len(history_for_llm))
+
+            selected_sources: List[Tuple[Dict[str, Any], str]] = []
+            if use_rag:
+                query_embedding = await embedding_task if embedding_task else None
+                retrieved_chunks_data = await self.retrieval_service.find_relevant_chunks(
+                    db=db, query_text=user_message_content, limit=num_retrieved_chunks,
+                    filters=retrieval_filters, query_embedding=query_embedding
+                )
+                log_debug("LOG_CHAT_TIMING", "RAG: %d Chunks gefunden.", len(retrieved_chunks_data))
+                selected_sources = self.context_builder.select_sources(retrieved_chunks_data)
+            else: log_debug("LOG_CHAT_SERVICE", "RAG deaktiviert.")
+        finally:
+            if embedding_task and not embedding_task.done():
+                embedding_task.cancel()
+
+        # Lesetransaktion des Retrievals beenden und Verbindung vor dem LLM-Aufruf zurück in den Pool geben
+        with span("db_commit"):
+            await db.commit()
+        if messages_to_summarize:
+            schedule_summary_update(session_id, messages_to_summarize[-1].created_at)
+
+        sources_for_api_response = [
+            chunk_to_source_detail(chunk_data, i, preview_chars=150) for i, (chunk_data, _) in enumerate(selected_sources)
+        ]
+        llm_messages, token_usage = self.context_builder.build(
+            session_row.summary, history_for_llm, user_message_content, selected_sources
+        )
+        log_debug("LOG_CHAT_CONTEXT", "Prompt-Tokens (geschätzt): %s", token_usage)
+        return llm_messages, sources_for_api_response, token_usage
+
+    async def _store_chat_turn(
+        self, db: AsyncSession, session_id: uuid.UUID, user_message_content: str, ai_response_content: str,
+        user_created_at: datetime, token_usage: Dict[str, int]
+    ) -> None:
+        """Schreibphase: Nutzer- und AI-Nachricht in einer kurzen Transaktion (ein INSERT + Commit)."""
+        token_usage["completion_tokens"] = count_tokens(ai_response_content)
+        with span("chat_turn_store"):
+            await crud_chat.add_chat_turn(
+                db, session_id, user_message_content, ai_response_content, user_created_at=user_created_at,
+                user_token_count=count_tokens(user_message_content), ai_token_count=token_usage["completion_tokens"],
+                prompt_token_count=token_usage.get("prompt_tokens")
+            )
+            with span("db_commit"):
+                await db.commit()
+        log_debug("LOG_CHAT_TIMING", "Nutzer- und AI-Nachricht gespeichert.")
+
     async def process_chat_message(
         self, db: AsyncSession, session_id: uuid.UUID, user_message_content: str,
-        num_retrieved_chunks: int = 3, use_rag: bool = True
+        num_retrieved_chunks: int = 3, use_rag: bool = True,
+        retrieval_filters: Optional[RetrievalFilters] = None
     ) -> Dict[str, Any]:
-        service_method_start_time = time.time()
-        print(f"LOG_CHAT_TIMING: [{time.strftime('%H:%M:%S')}] process_chat_message gestartet für Session {session_id} (use_rag={use_rag}).")
-
-        # DB Op 1: get_or_create_session
-        db_op1_start = time.time()
-        chat_session_db_obj = await crud_chat.get_or_create_chat_session(db, session_id)
-        print(f"LOG_CHAT_TIMING: [{time.strftime('%H:%M:%S')}] get_or_create_chat_session beendet. Dauer: {time.time() - db_op1_start:.2f}s")
-        if not chat_session_db_obj: # Fehlerbehandlung
-            return {"ai_message": "Fehler: Session nicht initialisiert", "retrieved_sources_for_context": []}
-        
-        # DB Op 2: add_chat_message (user)
-        db_op2_start = time.time()
-        await crud_chat.add_chat_message(db, chat_session_db_obj.id, "user", user_message_content)
-        print(f"LOG_CHAT_TIMING: [{time.strftime('%H:%M:%S')}] User-Nachricht gespeichert. Dauer: {time.time() - db_op2_start:.2f}s")
-        
-        # DB Op 3: get_chat_history
-        db_op3_start = time.time()
-        chat_history_db_messages = await crud_chat.get_chat_history(db, chat_session_db_obj.id, limit=10) 
-        print(f"LOG_CHAT_TIMING: [{time.strftime('%H:%M:%S')}] Chat-Historie geladen. Dauer: {time.time() - db_op3_start:.2f}s. Nachrichten: {len(chat_history_db_messages)}")
-        history_for_llm_prompt = [HumanMessage(content=m.content) if m.sender_type=="user" else AIMessage(content=m.content) for m in chat_history_db_messages]
-        
-        context_for_llm = "Kein spezifischer Dokumenten-Kontext angefordert oder gefunden."
-        sources_for_api_response: List[Dict[str, Any]] = []
-
-        if use_rag:
-            retrieval_start_time = time.time()
-            print(f"LOG_CHAT_TIMING: [{time.strftime('%H:%M:%S')}] RAG: Starte RetrievalService.find_relevant_chunks...")
-            retrieved_chunks_data = await self.retrieval_service.find_relevant_chunks(db=db, query_text=user_message_content, limit=num_retrieved_chunks)
-            print(f"LOG_CHAT_TIMING: [{time.strftime('%H:%M:%S')}] RAG: RetrievalService beendet. Dauer: {time.time() - retrieval_start_time:.2f}s. Chunks: {len(retrieved_chunks_data)}")
-            if retrieved_chunks_data:
-                context_for_llm = "" 
-                for i, chunk_data in enumerate(retrieved_chunks_data): # Aufbereitung Kontext
-                    chunk_id = str(chunk_data.get('chunk_db_id', f'retrieved_chunk_{i}'))
-                    context_for_llm += f"--- Quelle [ID:{chunk_id}] (Seite {chunk_data.get('page_number', 'N/A')}) ---\nInhalt: {chunk_data.get('chunk_content', '')}\n---\n\n"
-                    sources_for_api_response.append({k: chunk_data.get(k) for k in ["chunk_id", "filename", "title", "author", "year", "page", "distance"]} | {"content_preview": chunk_data.get('chunk_content', '')[:150] + "..."})
-        else: print("LOG_CHAT_SERVICE: RAG deaktiviert.")
-
-        system_prompt_str = ("Du bist PaperPilot... Zitiere mit [ID:CHUNK_ID].")
-        llm_messages: List[SystemMessage | HumanMessage | AIMessage] = [SystemMessage(content=system_prompt_str)]
-        llm_messages.extend(history_for_llm_prompt)
-        current_user_message_for_llm = user_message_content
-        if use_rag and sources_for_api_response: 
-            current_user_message_for_llm = (f"Basierend auf Infos:\n{context_for_llm}\nMeine Frage: {user_message_content}")
-        llm_messages.append(HumanMessage(content=current_user_message_for_llm))
-        
+        service_method_start_time = time.perf_counter()
+        user_created_at = datetime.now(timezone.utc)
+        log_debug("LOG_CHAT_TIMING", "process_chat_message gestartet für Session %s (use_rag=%s).", session_id, use_rag)
+
+        llm_messages, sources_for_api_response, token_usage = await self._prepare_chat_turn(
+            db, session_id, user_message_content, num_retrieved_chunks, use_rag, retrieval_filters
+        )
+
         ai_response_content = "Fehler: LLM nicht verfügbar."
         if self.chat_model:
             try:
-                llm_call_start_time = time.time()
-                print(f"LOG_CHAT_TIMING: [{time.strftime('%H:%M:%S')}] Sende an LLM. Nachrichten: {len(llm_messages)}")
-                ai_response = await self.chat_model.ainvoke(llm_messages)
+                with span("llm_call"):
+                    ai_response = await self.chat_model.ainvoke(llm_messages)
                 ai_response_content = ai_response.content
-                print(f"LOG_CHAT_TIMING: [{time.strftime('%H:%M:%S')}] LLM-Antwort erhalten. Dauer: {time.time() - llm_call_start_time:.2f}s. (Auszug): {ai_response_content[:70]}...")
+                log_debug("LOG_CHAT_TIMING", "LLM-Antwort erhalten (%d Nachrichten im Prompt, %d Zeichen).", len(llm_messages), len(ai_response_content))
             except Exception as e_llm: print(f"ERROR_CHAT_SERVICE: LLM Fehler: {e_llm}"); ai_response_content = "LLM Fehler."
-        
-        # DB Op 4: add_chat_message (ai) und Commit
-        db_op4_start = time.time()
-        await crud_chat.add_chat_message(db, chat_session_db_obj.id, "ai", ai_response_content)
-        await db.commit()
-        print(f"LOG_CHAT_TIMING: [{time.strftime('%H:%M:%S')}] AI-Nachricht gespeichert & commited. Dauer: {time.time() - db_op4_start:.2f}s.")
-        
-        print(f"LOG_CHAT_TIMING: [{time.strftime('%H:%M:%S')}] process_chat_message beendet. Gesamtdauer: {time.time() - service_method_start_time:.2f}s")
-        return {"ai_message": ai_response_content, "retrieved_sources_for_context": sources_for_api_response}
\ No newline at end of file
+
+        await self._store_chat_turn(db, session_id, user_message_content, ai_response_content, user_created_at, token_usage)
+
+        observe_stage("chat_turn", time.perf_counter() - service_method_start_time)
+        return {"ai_message": ai_response_content, "retrieved_sources_for_context": sources_for_api_response, "token_usage": token_usage}
+
+    async def stream_chat_message(
+        self, session_id: uuid.UUID, user_message_content: str,
+        num_retrieved_chunks: int = 3, use_rag: bool = True,
+        retrieval_filters: Optional[RetrievalFilters] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Streaming-Variante: liefert (event, daten)-Paare - zuerst "sources", dann "token" pro Textstück
+        und zum Schluss "done". Beide Nachrichten werden gespeichert, sobald der Stream vollständig ist.
+        Nutzt eigene, kurzlebige DB-Sessions (Lese- und Schreibphase), da die Antwort erst nach Ende des
+        Endpunkts gestreamt wird - während des Streams ist keine Verbindung belegt.
+        """
+        service_method_start_time = time.perf_counter()
+        user_created_at = datetime.now(timezone.utc)
+        log_debug("LOG_CHAT_TIMING", "stream_chat_message gestartet für Session %s (use_rag=%s).", session_id, use_rag)
+        async with AsyncSessionLocal() as db:
+            llm_messages, sources_for_api_response, token_usage = await self._prepare_chat_turn(
+                db, session_id, user_message_content, num_retrieved_chunks, use_rag, retrieval_filters
+            )
+        yield "sources", {"session_id": str(session_id), "sources": sources_for_api_response}
+
+        response_parts: List[str] = []
+        if self.chat_model:
+            try:
+                llm_call_start_time = time.perf_counter()
+                first_token_logged = False
+                async for message_chunk in self.chat_model.astream(llm_messages):
+                    token = message_chunk.content if isinstance(message_chunk.content, str) else ""
+                    if not token:
+                        continue
+                    if not first_token_logged:
+                        observe_stage("llm_first_token", time.perf_counter() - llm_call_start_time)
+                        first_token_logged = True
+                    response_parts.append(token)
+                    yield "token", {"text": token}
+                observe_stage("llm_stream", time.perf_counter() - llm_call_start_time)
+            except Exception as e_llm:
+                observe_stage("llm_stream", time.perf_counter() - llm_call_start_time, outcome="error")
+                print(f"ERROR_CHAT_SERVICE: LLM Fehler (Stream): {e_llm}")
+                yield "error", {"detail": "LLM Fehler."}
+                if not response_parts: response_parts = ["LLM Fehler."]
+        else:
+            response_parts = ["Fehler: LLM nicht verfügbar."]
+            yield "token", {"text": response_parts[0]}
+
+        ai_response_content = "".join(response_parts)
+        async with AsyncSessionLocal() as db:
+            await self._store_chat_turn(db, session_id, user_message_content, ai_response_content, user_created_at, token_usage)
+        observe_stage("chat_turn_stream", time.perf_counter() - service_method_start_time)
+        yield "done", {"session_id": str(session_id), "ai_message": ai_response_content, "token_usage": token_usage}
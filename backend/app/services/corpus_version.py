@@ -0,0 +1,44 @@
+# app/services/corpus_version.py
+import os
+import time
+import threading
+from typing import Optional, Tuple
+
+from app.core.config import CACHE_DIR
+
+# Datei statt Variable: Ingestion läuft ggf. in Worker-Prozessen, der API-Prozess muss deren Änderungen sehen
+CORPUS_VERSION_PATH = os.getenv("CORPUS_VERSION_PATH", os.path.join(CACHE_DIR, "corpus_version"))
+
+_lock = threading.Lock()
+_cached_stat: Optional[Tuple[int, int]] = None
+_cached_version: str = "0"
+
+
+def get_corpus_version() -> str:
+    """
+    Aktuelle Korpus-Version (ändert sich bei jedem Import/Löschen von Dokumenten).
+    Kostet im Normalfall nur ein stat(): die Datei wird nur neu gelesen, wenn sie ersetzt wurde.
+    """
+    global _cached_stat, _cached_version
+    try:
+        st = os.stat(CORPUS_VERSION_PATH)
+    except FileNotFoundError:
+        return bump_corpus_version("initial")
+    stat_key = (st.st_ino, st.st_mtime_ns)
+    with _lock:
+        if stat_key != _cached_stat:
+            with open(CORPUS_VERSION_PATH, "r", encoding="utf-8") as f:
+                _cached_version = f.read().strip() or "0"
+            _cached_stat = stat_key
+        return _cached_version
+
+
+def bump_corpus_version(reason: str = "") -> str:
+    """Setzt eine neue, eindeutige Korpus-Version (atomar per rename, damit Leser nie eine halbe Datei sehen)."""
+    new_version = f"{time.time_ns()}-{os.getpid()}"
+    tmp_path = f"{CORPUS_VERSION_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(new_version)
+    os.replace(tmp_path, CORPUS_VERSION_PATH)
+    print(f"LOG_CORPUS_VERSION: Korpus-Version -> {new_version} ({reason or 'ohne Angabe'})")
+    return new_version
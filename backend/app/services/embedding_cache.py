@@ -0,0 +1,164 @@
+# app/services/embedding_cache.py
+import os
+import sqlite3
+import threading
+import hashlib
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Iterable, Optional, Any
+
+from app.core.config import CACHE_DIR
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(CACHE_DIR, "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "5000"))
+
+
+def make_cache_key(provider: str, model_name: str, task_type: str, text: str) -> str:
+    """Inhaltsadressierter Schlüssel: gleicher Text + gleiches Modell/task_type -> gleiches Embedding."""
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{provider}|{model_name}|{task_type}|{text_hash}"
+
+
+class EmbeddingCache:
+    """
+    Persistenter Embedding-Cache (SQLite) mit In-Process-LRU davor.
+    Vektoren werden als float32-Blob gespeichert (entspricht der Genauigkeit von pgvector).
+    Beim Überschreiten von `max_entries` werden die am längsten nicht genutzten Einträge entfernt.
+    """
+
+    def __init__(self, db_path: str, max_entries: int, memory_entries: int):
+        self.db_path = db_path
+        self.max_entries = max(1, max_entries)
+        self.memory_entries = max(0, memory_entries)
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_cache ("
+            " cache_key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_access ON embedding_cache(last_access)")
+        self._conn.commit()
+        self._disk_count = self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        print(f"LOG_EMBED_CACHE: Embedding-Cache geöffnet: {db_path} ({self._disk_count} Einträge)")
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        if not self.memory_entries:
+            return
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_entries:
+            self._lru.popitem(last=False)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            missing_in_memory: List[str] = []
+            for key in keys:
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    found[key] = vector
+                    self._stats["memory_hits"] += 1
+                else:
+                    missing_in_memory.append(key)
+
+            # SQLite begrenzt die Anzahl der Parameter pro Statement
+            for i in range(0, len(missing_in_memory), 500):
+                part = missing_in_memory[i:i + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT cache_key, vector FROM embedding_cache WHERE cache_key IN ({placeholders})", part
+                ).fetchall()
+                for cache_key, blob in rows:
+                    vector = array("f", blob).tolist()
+                    found[cache_key] = vector
+                    self._remember(cache_key, vector)
+                if rows:
+                    now = time.time()
+                    self._conn.executemany(
+                        "UPDATE embedding_cache SET last_access = ? WHERE cache_key = ?",
+                        [(now, cache_key) for cache_key, _ in rows],
+                    )
+                self._stats["disk_hits"] += len(rows)
+            if missing_in_memory:
+                self._conn.commit()
+            self._stats["misses"] += len(missing_in_memory) - sum(1 for k in missing_in_memory if k in found)
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO embedding_cache (cache_key, dim, vector, last_access) VALUES (?, ?, ?, ?)",
+                [(key, len(vector), array("f", vector).tobytes(), now) for key, vector in items.items()],
+            )
+            inserted = max(cursor.rowcount, 0)
+            self._disk_count += inserted
+            self._stats["writes"] += inserted
+            for key, vector in items.items():
+                self._remember(key, vector)
+            if self._disk_count > self.max_entries:
+                self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self) -> None:
+        # Auf 90% der Maximalgröße zurückschneiden, damit nicht bei jedem Insert evicted wird
+        to_remove = self._disk_count - int(self.max_entries * 0.9)
+        if to_remove <= 0:
+            return
+        cursor = self._conn.execute(
+            "DELETE FROM embedding_cache WHERE cache_key IN "
+            "(SELECT cache_key FROM embedding_cache ORDER BY last_access ASC LIMIT ?)",
+            (to_remove,),
+        )
+        removed = max(cursor.rowcount, 0)
+        self._disk_count -= removed
+        self._stats["evictions"] += removed
+        print(f"LOG_EMBED_CACHE: {removed} Einträge aus dem Embedding-Cache entfernt (LRU).")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["memory_hits"] + self._stats["disk_hits"] + self._stats["misses"]
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            return {
+                **self._stats,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._lru),
+                "disk_entries": self._disk_count,
+                "max_entries": self.max_entries,
+                "db_path": self.db_path,
+            }
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_unavailable = False
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Prozessweiter Cache (lazy). None, wenn per EMBEDDING_CACHE_ENABLED deaktiviert oder nicht zu öffnen."""
+    global _embedding_cache, _embedding_cache_unavailable
+    if not EMBEDDING_CACHE_ENABLED or _embedding_cache_unavailable:
+        return None
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                try:
+                    _embedding_cache = EmbeddingCache(
+                        EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_CACHE_MEMORY_ENTRIES
+                    )
+                except Exception as e:
+                    print(f"ERROR_EMBED_CACHE: Embedding-Cache konnte nicht geöffnet werden ({EMBEDDING_CACHE_PATH}): {e}")
+                    _embedding_cache_unavailable = True
+                    return None
+    return _embedding_cache
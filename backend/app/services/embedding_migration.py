@@ -0,0 +1,387 @@
+# app/services/embedding_migration.py
+import os
+import time
+import uuid
+import random
+import asyncio
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.db.crud import crud_embedding_version, crud_retrieval
+from app.db.models import EmbeddingVersion
+from app.db.session import AsyncSessionLocal
+from app.schemas.processing_schemas import RetrievalFilters
+from .corpus_version import bump_corpus_version
+from .embedding_service import aembed_documents, aembed_query, EMBEDDING_DIM
+from .embedding_versions import (
+    EmbeddingSpec, default_model_name, embedding_spec_from_env, get_active_embedding_spec, set_active_embedding_spec,
+    ACTIVE_EMBEDDING_MODEL_PATH,
+)
+
+EMBEDDING_MIGRATION_BATCH_SIZE = int(os.getenv("EMBEDDING_MIGRATION_BATCH_SIZE", "64"))
+# Drosselung, damit die Migration das Provider-Kontingent nicht für Uploads/Chat aufbraucht (0 = ungebremst)
+EMBEDDING_MIGRATION_MAX_CHUNKS_PER_SECOND = float(os.getenv("EMBEDDING_MIGRATION_MAX_CHUNKS_PER_SECOND", "20"))
+# Beim Umschalten werden höchstens so viele seit Job-Ende importierte Chunks direkt nachgezogen
+EMBEDDING_MIGRATION_MAX_INLINE_CATCHUP = int(os.getenv("EMBEDDING_MIGRATION_MAX_INLINE_CATCHUP", "500"))
+# Davon unter der Umschalt-Sperre (blockiert Ingestion-Commits) höchstens so viele; mehr -> Aktivierung erneut versuchen
+EMBEDDING_MIGRATION_MAX_LOCKED_CATCHUP = int(os.getenv("EMBEDDING_MIGRATION_MAX_LOCKED_CATCHUP", "32"))
+# Anteil der Vektor-Suchen, die während einer Migration zusätzlich gegen das Zielmodell laufen (0 = aus)
+EMBEDDING_MIGRATION_SHADOW_READ_RATE = float(os.getenv("EMBEDDING_MIGRATION_SHADOW_READ_RATE", "0.0"))
+SHADOW_READ_MAX_PENDING = 2
+
+
+def spec_of(version: EmbeddingVersion) -> EmbeddingSpec:
+    return EmbeddingSpec(version.provider, version.model_name, version.dimension)
+
+
+class EmbeddingMigrationManager:
+    """
+    Neu-Einbetten aller Chunks mit einem anderen Embedding-Modell ohne Ausfall der Suche:
+    1. Hintergrund-Job bettet in Batches (gedrosselt, fortsetzbar) nach chunk_embeddings ein,
+       die Suche läuft derweil unverändert auf chunks.embedding (altes Modell).
+    2. Optional Shadow-Reads: ein Teil der Suchanfragen läuft zusätzlich gegen das Zielmodell,
+       die Überlappung der Treffer zeigt vor dem Umschalten, wie stark sich die Ergebnisse ändern.
+    3. Aktivieren tauscht die Vektoren in einer Transaktion und schaltet das Query-Modell aller Prozesse um.
+    Ein Dimensionswechsel braucht zusätzlich EMBEDDING_DIMENSION + Neustart (Spaltentyp), siehe create_db_tables.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._switch_lock = asyncio.Lock()
+        self._shadow_target: Optional[Tuple[int, EmbeddingSpec]] = None
+        self._shadow_tasks: Set[asyncio.Task] = set()
+        self._shadow_stats: Dict[int, Dict[str, float]] = {}
+
+    async def start(self) -> None:
+        """App-Start: aktive Version sicherstellen, Zeiger-Datei abgleichen, unterbrochene Migrationen fortsetzen."""
+        env_spec = embedding_spec_from_env()
+        async with AsyncSessionLocal() as db:
+            active = await crud_embedding_version.get_active_version(db)
+            if active is None:
+                # Erster Start: die vorhandenen Vektoren stammen vom Modell aus der .env
+                active = await crud_embedding_version.get_version_by_key(db, *env_spec)
+                if active is None:
+                    active = await crud_embedding_version.create_version(db, *env_spec, status="active")
+                await crud_embedding_version.update_version(
+                    db, active.id, status="active",
+                    total_chunks=await crud_embedding_version.count_chunks(db),
+                    embedded_chunks=await crud_embedding_version.count_chunks(db, with_embedding=True),
+                )
+                await db.commit()
+                print(f"INFO_EMBEDDING_MIGRATION: Embedding-Version {env_spec.version_key} als aktiv registriert.")
+            active_spec = spec_of(active)
+            resumable = await crud_embedding_version.list_versions(db, ["migrating"])
+            shadow_candidates = await crud_embedding_version.list_versions(db, ["migrating", "paused", "ready"])
+
+        if active_spec.dimension != EMBEDDING_DIM:
+            print(f"ERROR_EMBEDDING_MIGRATION: Aktives Modell {active_spec.version_key} hat Dimension {active_spec.dimension}, "
+                  f"EMBEDDING_DIMENSION ist {EMBEDDING_DIM}. Für einen Dimensionswechsel zuerst per Migration neu einbetten.")
+        elif env_spec != active_spec:
+            print(f"WARN_EMBEDDING_MIGRATION: .env-Modell {env_spec.version_key} ist nicht aktiv, es bleibt bei {active_spec.version_key}. "
+                  f"Wechsel per POST /embeddings/migrations und anschließendem Aktivieren.")
+
+        previous_spec = get_active_embedding_spec()
+        if previous_spec != active_spec or not os.path.exists(ACTIVE_EMBEDDING_MODEL_PATH):
+            set_active_embedding_spec(active_spec)
+            if previous_spec != active_spec:
+                bump_corpus_version(f"Embedding-Modell {active_spec.version_key} aktiv")
+        if shadow_candidates:
+            self._shadow_target = (shadow_candidates[-1].id, spec_of(shadow_candidates[-1]))
+        for version in resumable:
+            self._launch(version.id, spec_of(version))
+        print(f"INFO_EMBEDDING_MIGRATION: Aktives Embedding-Modell: {active_spec.version_key}. Fortgesetzte Migrationen: {len(resumable)}.")
+
+    async def shutdown(self) -> None:
+        # Status bleibt "migrating" -> der Job wird beim nächsten Start fortgesetzt
+        for task in list(self._tasks.values()) + list(self._shadow_tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), *self._shadow_tasks, return_exceptions=True)
+
+    async def start_migration(self, provider: str, model_name: Optional[str], dimension: int) -> Dict[str, Any]:
+        """Legt die Zielversion an (oder setzt eine pausierte/abgebrochene fort) und startet den Hintergrund-Job."""
+        spec = EmbeddingSpec(provider, model_name or default_model_name(provider), dimension)
+        async with AsyncSessionLocal() as db:
+            version = await crud_embedding_version.get_version_by_key(db, *spec)
+            if version is not None and version.status == "active":
+                raise ValueError(f"Embedding-Modell {spec.version_key} ist bereits aktiv.")
+            if version is None:
+                version = await crud_embedding_version.create_version(db, *spec, status="migrating")
+            elif not self._is_running(version.id):
+                await crud_embedding_version.update_version(db, version.id, status="migrating", last_error=None, failed_chunks=0)
+            await db.commit()
+            version_id = version.id
+        if not self._is_running(version_id):
+            self._launch(version_id, spec)
+        self._shadow_target = (version_id, spec)
+        return await self.get_status(version_id)
+
+    async def pause(self, version_id: int) -> Optional[Dict[str, Any]]:
+        task = self._tasks.get(version_id)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        async with AsyncSessionLocal() as db:
+            version = await crud_embedding_version.get_version(db, version_id)
+            if version is None:
+                return None
+            if version.status == "migrating":
+                await crud_embedding_version.update_version(db, version_id, status="paused")
+                await db.commit()
+        return await self.get_status(version_id)
+
+    async def activate(self, version_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Schaltet atomar auf die Version um. Nachzügler-Chunks werden vorher ohne Sperre eingebettet; in der
+        Umschalt-Transaktion (Sperre auf der aktiven Version, wartet laufende Ingestion-Schreibvorgänge ab) nur noch
+        ein kleiner Rest, dann Vektoren tauschen und Status setzen.
+        """
+        async with self._switch_lock:
+            switch_start = time.time()
+            async with AsyncSessionLocal() as db:
+                target = await crud_embedding_version.get_version(db, version_id)
+                if target is None:
+                    return None
+                self._check_activatable(target)
+                target_spec = spec_of(target)
+                missing = await crud_embedding_version.get_chunks_missing_embedding(
+                    db, version_id, limit=EMBEDDING_MIGRATION_MAX_INLINE_CATCHUP + 1
+                )
+            if len(missing) > EMBEDDING_MIGRATION_MAX_INLINE_CATCHUP:
+                raise ValueError(f"Seit Ende der Migration sind zu viele Chunks hinzugekommen. Migration für {target.version_key} erneut starten.")
+            # Provider-Aufrufe (gedrosselt, ggf. Sekunden bis Minuten) ohne offene Transaktion und ohne Sperre:
+            # jeder Ingestion-Commit liest die aktive Version mit FOR SHARE und würde sonst so lange warten
+            caught_up = await self._embed_missing_chunks(version_id, target_spec, missing)
+
+            async with AsyncSessionLocal() as db:
+                target = await crud_embedding_version.get_version(db, version_id, for_update=True)
+                if target is None:
+                    return None
+                self._check_activatable(target)
+                active = await crud_embedding_version.get_active_version(db, lock="update")
+                # Unter der Sperre nur noch prüfen, was seit dem Nachziehen hinzugekommen ist
+                remainder = await crud_embedding_version.get_chunks_missing_embedding(
+                    db, version_id, limit=EMBEDDING_MIGRATION_MAX_LOCKED_CATCHUP + 1
+                )
+                if len(remainder) > EMBEDDING_MIGRATION_MAX_LOCKED_CATCHUP:
+                    raise ValueError(f"Während des Umschaltens kommen laufend neue Chunks hinzu. Aktivierung von {target.version_key} später erneut versuchen.")
+                if remainder:
+                    await self._embed_missing_chunks(version_id, target_spec, remainder, db=db)
+                await crud_embedding_version.swap_active_embeddings(db, active.id if active else None, version_id)
+                await db.commit()
+
+            set_active_embedding_spec(target_spec)
+            bump_corpus_version(f"Embedding-Modell {target_spec.version_key} aktiviert") # Retrieval-Caches enthalten Ergebnisse des alten Modells
+            if self._shadow_target and self._shadow_target[0] == version_id:
+                self._shadow_target = None
+            print(f"INFO_EMBEDDING_MIGRATION: Umgeschaltet auf {target_spec.version_key} ({caught_up + len(remainder)} Nachzügler, davon {len(remainder)} unter Sperre). Dauer: {time.time() - switch_start:.2f}s")
+        return await self.get_status(version_id)
+
+    @staticmethod
+    def _check_activatable(target: EmbeddingVersion) -> None:
+        if target.status != "ready":
+            raise ValueError(f"Version {target.version_key} hat Status '{target.status}', aktivierbar ist nur 'ready'.")
+        if target.dimension != EMBEDDING_DIM:
+            raise ValueError(
+                f"Version {target.version_key} hat Dimension {target.dimension}, die Spalte chunks.embedding {EMBEDDING_DIM}. "
+                f"EMBEDDING_DIMENSION={target.dimension} setzen und neu starten - der Wechsel erfolgt dann beim Start."
+            )
+
+    async def _embed_missing_chunks(
+        self, version_id: int, spec: EmbeddingSpec, missing: List[Tuple[uuid.UUID, str]], db=None
+    ) -> int:
+        """Bettet Nachzügler ein und speichert sie - in db (ohne Commit) oder in einer eigenen kurzen Transaktion."""
+        if not missing:
+            return 0
+        embeddings = await aembed_documents([content for _, content in missing], spec=spec)
+        if any(e is None for e in embeddings):
+            raise ValueError("Nachzügler-Chunks konnten nicht eingebettet werden. Später erneut versuchen.")
+        rows = [(chunk_id, e) for (chunk_id, _), e in zip(missing, embeddings)]
+        if db is not None:
+            await crud_embedding_version.store_chunk_embeddings(db, version_id, rows)
+        else:
+            async with AsyncSessionLocal() as write_db:
+                await crud_embedding_version.store_chunk_embeddings(write_db, version_id, rows)
+                await write_db.commit()
+        return len(missing)
+
+    async def delete(self, version_id: int) -> Optional[bool]:
+        """Löscht eine nicht aktive Version samt Vektoren. None = nicht gefunden."""
+        if self._is_running(version_id):
+            raise ValueError("Migration läuft noch, zuerst pausieren.")
+        async with AsyncSessionLocal() as db:
+            version = await crud_embedding_version.get_version(db, version_id)
+            if version is None:
+                return None
+            if version.status == "active":
+                raise ValueError("Die aktive Version kann nicht gelöscht werden.")
+            await crud_embedding_version.delete_version(db, version_id)
+            await db.commit()
+        self._shadow_stats.pop(version_id, None)
+        if self._shadow_target and self._shadow_target[0] == version_id:
+            self._shadow_target = None
+        return True
+
+    # --- Fortschritt ---
+
+    async def get_status(self, version_id: int) -> Optional[Dict[str, Any]]:
+        async with AsyncSessionLocal() as db:
+            version = await crud_embedding_version.get_version(db, version_id)
+        return self._status_dict(version) if version else None
+
+    async def list_statuses(self) -> List[Dict[str, Any]]:
+        async with AsyncSessionLocal() as db:
+            versions = await crud_embedding_version.list_versions(db)
+        return [self._status_dict(v) for v in versions]
+
+    def _status_dict(self, version: EmbeddingVersion) -> Dict[str, Any]:
+        remaining = max(0, (version.total_chunks or 0) - (version.embedded_chunks or 0) - (version.failed_chunks or 0))
+        running = self._is_running(version.id)
+        shadow = self._shadow_stats.get(version.id)
+        return {
+            "id": version.id,
+            "version_key": version.version_key,
+            "provider": version.provider,
+            "model_name": version.model_name,
+            "dimension": version.dimension,
+            "status": version.status,
+            "running": running,
+            "total_chunks": version.total_chunks or 0,
+            "embedded_chunks": version.embedded_chunks or 0,
+            "failed_chunks": version.failed_chunks or 0,
+            "progress": round(min(1.0, (version.embedded_chunks or 0) / version.total_chunks), 4) if version.total_chunks else 0.0,
+            "chunks_per_second": version.chunks_per_second,
+            "eta_seconds": round(remaining / version.chunks_per_second, 1) if running and version.chunks_per_second else None,
+            "last_error": version.last_error,
+            "created_at": version.created_at,
+            "updated_at": version.updated_at,
+            "activated_at": version.activated_at,
+            "shadow_reads": int(shadow["reads"]) if shadow else 0,
+            "shadow_mean_overlap": round(shadow["overlap_sum"] / shadow["reads"], 4) if shadow and shadow["reads"] else None,
+        }
+
+    # --- Hintergrund-Job ---
+
+    def _is_running(self, version_id: int) -> bool:
+        task = self._tasks.get(version_id)
+        return task is not None and not task.done()
+
+    def _launch(self, version_id: int, spec: EmbeddingSpec) -> None:
+        task = asyncio.create_task(self._run_migration(version_id, spec))
+        self._tasks[version_id] = task
+        task.add_done_callback(lambda t: self._tasks.pop(version_id, None) if self._tasks.get(version_id) is t else None)
+
+    async def _run_migration(self, version_id: int, spec: EmbeddingSpec) -> None:
+        start_time = time.time()
+        failed_ids: Set[uuid.UUID] = set()
+        try:
+            print(f"INFO_EMBEDDING_MIGRATION: Migration nach {spec.version_key} gestartet (Batch={EMBEDDING_MIGRATION_BATCH_SIZE}, max. {EMBEDDING_MIGRATION_MAX_CHUNKS_PER_SECOND} Chunks/s).")
+            # Durchläufe, bis keiner mehr etwas einbettet: der zweite erfasst Chunks, die während des ersten importiert wurden
+            while True:
+                async with AsyncSessionLocal() as db:
+                    await crud_embedding_version.update_version(
+                        db, version_id,
+                        total_chunks=await crud_embedding_version.count_chunks(db),
+                        embedded_chunks=await crud_embedding_version.count_version_embeddings(db, version_id),
+                    )
+                    await db.commit()
+                if await self._run_pass(version_id, spec, failed_ids) == 0:
+                    break
+
+            async with AsyncSessionLocal() as db:
+                await crud_embedding_version.update_version(
+                    db, version_id,
+                    status="failed" if failed_ids else "ready",
+                    total_chunks=await crud_embedding_version.count_chunks(db),
+                    embedded_chunks=await crud_embedding_version.count_version_embeddings(db, version_id),
+                    failed_chunks=len(failed_ids),
+                    last_error=f"{len(failed_ids)} Chunks konnten nicht eingebettet werden." if failed_ids else None,
+                )
+                await db.commit()
+            print(f"INFO_EMBEDDING_MIGRATION: Migration nach {spec.version_key} beendet. Fehlgeschlagen: {len(failed_ids)}, Dauer: {time.time() - start_time:.1f}s")
+        except asyncio.CancelledError:
+            print(f"INFO_EMBEDDING_MIGRATION: Migration nach {spec.version_key} unterbrochen (wird fortgesetzt, wo sie stand).")
+            raise
+        except Exception as e:
+            print(f"ERROR_EMBEDDING_MIGRATION: Migration nach {spec.version_key} fehlgeschlagen: {e}")
+            import traceback; traceback.print_exc()
+            async with AsyncSessionLocal() as db:
+                await crud_embedding_version.update_version(db, version_id, status="failed", last_error=str(e))
+                await db.commit()
+
+    async def _run_pass(self, version_id: int, spec: EmbeddingSpec, failed_ids: Set[uuid.UUID]) -> int:
+        """Ein Durchlauf über alle fehlenden Chunks (Keyset-Pagination nach ID). Gibt die Zahl neu gespeicherter Vektoren zurück."""
+        cursor: Optional[uuid.UUID] = None
+        stored_in_pass = 0
+        while True:
+            batch_start = time.monotonic()
+            async with AsyncSessionLocal() as db:
+                rows = await crud_embedding_version.get_chunks_missing_embedding(
+                    db, version_id, after_id=cursor, limit=EMBEDDING_MIGRATION_BATCH_SIZE
+                )
+            if not rows:
+                return stored_in_pass
+            cursor = rows[-1][0]
+            rows = [row for row in rows if row[0] not in failed_ids]
+            if not rows:
+                continue
+
+            embeddings = await aembed_documents([content for _, content in rows], spec=spec)
+            embedded_rows = [(chunk_id, e) for (chunk_id, _), e in zip(rows, embeddings) if e is not None]
+            failed_ids.update(chunk_id for (chunk_id, _), e in zip(rows, embeddings) if e is None)
+            if EMBEDDING_MIGRATION_MAX_CHUNKS_PER_SECOND > 0:
+                min_batch_seconds = len(rows) / EMBEDDING_MIGRATION_MAX_CHUNKS_PER_SECOND
+                await asyncio.sleep(max(0.0, min_batch_seconds - (time.monotonic() - batch_start)))
+            chunks_per_second = len(rows) / max(time.monotonic() - batch_start, 1e-6)
+
+            async with AsyncSessionLocal() as db:
+                stored = await crud_embedding_version.store_chunk_embeddings(db, version_id, embedded_rows)
+                await crud_embedding_version.update_version(
+                    db, version_id,
+                    embedded_chunks=EmbeddingVersion.embedded_chunks + stored,
+                    failed_chunks=len(failed_ids),
+                    chunks_per_second=round(chunks_per_second, 2),
+                )
+                await db.commit()
+            stored_in_pass += stored
+
+    # --- Shadow-Reads ---
+
+    def maybe_schedule_shadow_read(
+        self, query_text: str, limit: int, filters: Optional[RetrievalFilters], active_results: List[Dict[str, Any]]
+    ) -> None:
+        """Wiederholt eine Vektor-Suche stichprobenartig im Hintergrund gegen das Zielmodell der laufenden Migration."""
+        if EMBEDDING_MIGRATION_SHADOW_READ_RATE <= 0 or self._shadow_target is None or not active_results:
+            return
+        if len(self._shadow_tasks) >= SHADOW_READ_MAX_PENDING or random.random() >= EMBEDDING_MIGRATION_SHADOW_READ_RATE:
+            return
+        version_id, spec = self._shadow_target
+        active_ids = [row["chunk_db_id"] for row in active_results]
+        task = asyncio.create_task(self._shadow_read(version_id, spec, query_text, limit, filters, active_ids))
+        self._shadow_tasks.add(task)
+        task.add_done_callback(self._shadow_tasks.discard)
+
+    async def _shadow_read(
+        self, version_id: int, spec: EmbeddingSpec, query_text: str, limit: int,
+        filters: Optional[RetrievalFilters], active_ids: List[uuid.UUID]
+    ) -> None:
+        try:
+            query_embedding = await aembed_query(query_text, spec=spec)
+            if not query_embedding:
+                return
+            async with AsyncSessionLocal() as db:
+                shadow_rows = await crud_retrieval.find_similar_chunks_in_version(db, version_id, query_embedding, limit, filters)
+            overlap = len(set(active_ids) & {row["chunk_db_id"] for row in shadow_rows}) / len(active_ids)
+            stats = self._shadow_stats.setdefault(version_id, {"reads": 0, "overlap_sum": 0.0})
+            stats["reads"] += 1
+            stats["overlap_sum"] += overlap
+            print(f"LOG_EMBEDDING_MIGRATION: Shadow-Read ({spec.version_key}): Überlappung {overlap:.2f} bei k={len(active_ids)}.")
+        except Exception as e:
+            print(f"WARN_EMBEDDING_MIGRATION: Shadow-Read fehlgeschlagen: {e}")
+
+
+_embedding_migration_manager: Optional[EmbeddingMigrationManager] = None
+
+def get_embedding_migration_manager() -> EmbeddingMigrationManager:
+    global _embedding_migration_manager
+    if _embedding_migration_manager is None:
+        _embedding_migration_manager = EmbeddingMigrationManager()
+    return _embedding_migration_manager
@@ -1,88 +1,258 @@
 # app/services/embedding_service.py
 import os
-from typing import List, Optional, Literal
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.embeddings import OllamaEmbeddings # Für Ollama
+import asyncio
+import random
+import time
+import weakref
+from typing import List, Optional, Literal, Dict, Tuple
 from dotenv import load_dotenv
+from .embedding_cache import get_embedding_cache, make_cache_key
+from .embedding_versions import EmbeddingSpec, get_active_embedding_spec, default_model_name
+from app.core.observability import span, log, log_debug
 
 load_dotenv()
 
-EMBEDDING_SERVICE_PROVIDER = os.getenv("EMBEDDING_SERVICE_PROVIDER", "google").lower() # "google" or "ollama"
+# Vorgaben aus der .env; welches Modell tatsächlich aktiv ist, bestimmt embedding_versions (Modell-Migration)
+EMBEDDING_SERVICE_PROVIDER = os.getenv("EMBEDDING_SERVICE_PROVIDER", "google").lower() # "google", "ollama" oder "fake" (Benchmarks)
 EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIMENSION", "768"))
 
-_google_embedding_model = None
-_ollama_embedding_model = None
+# Batching/Nebenläufigkeit für die asynchrone Embedding-Pipeline
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_MAX_CONCURRENCY: Dict[str, int] = {
+    "google": int(os.getenv("EMBEDDING_MAX_CONCURRENCY_GOOGLE", "4")),
+    "ollama": int(os.getenv("EMBEDDING_MAX_CONCURRENCY_OLLAMA", "2")),
+    "fake": int(os.getenv("EMBEDDING_MAX_CONCURRENCY_FAKE", "8")),
+}
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "3"))
+EMBEDDING_RETRY_BASE_DELAY = float(os.getenv("EMBEDDING_RETRY_BASE_DELAY", "1.0")) # Sekunden, verdoppelt sich pro Versuch
+
+# Ein Modell-Objekt pro (Provider, Modellname) - während einer Migration sind zwei Modelle gleichzeitig in Gebrauch
+_embedding_models: Dict[Tuple[str, str], object] = {}
+
+# Ein Semaphor pro Provider, begrenzt parallele Batch-Requests prozessweit
+# Je Event-Loop eigene Semaphoren: asyncio-Primitive sind an den Loop gebunden, auf dem sie zuerst warten
+_provider_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+
+def get_embedding_model(provider: Optional[Literal["google", "ollama"]] = None, model_name: Optional[str] = None):
+    """Modell-Objekt für Provider/Modell; ohne Angabe das aktive Embedding-Modell."""
+    spec = _resolve_spec(provider)
+    provider, model_name = spec.provider, model_name or spec.model_name
+    model = _embedding_models.get((provider, model_name))
+    if model is not None:
+        return model
 
-def get_embedding_model(provider: Literal["google", "ollama"] = EMBEDDING_SERVICE_PROVIDER):
-    global _google_embedding_model, _ollama_embedding_model
-    
     if provider == "google":
-        if _google_embedding_model is None:
-            api_key = os.getenv("GOOGLE_API_KEY")
-            model_name = os.getenv("GOOGLE_EMBEDDING_MODEL_NAME", "models/text-embedding-004")
-            if not api_key:
-                print(f"WARN_EMBED: GOOGLE_API_KEY nicht gefunden für Provider 'google'. Modell '{model_name}' nicht initialisiert.")
-                return None
-            print(f"LOG_EMBED: Initialisiere GoogleEmbeddings: {model_name}")
-            try:
-                _google_embedding_model = GoogleGenerativeAIEmbeddings(
-                    model=model_name, google_api_key=api_key, task_type="retrieval_document"
-                )
-            except Exception as e:
-                print(f"ERROR_EMBED: Fehler Init GoogleEmbeddings: {e}"); return None
-        return _google_embedding_model
-    
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            print(f"WARN_EMBED: GOOGLE_API_KEY nicht gefunden für Provider 'google'. Modell '{model_name}' nicht initialisiert.")
+            return None
+        print(f"LOG_EMBED: Initialisiere GoogleEmbeddings: {model_name}")
+        try:
+            # Provider-SDKs erst bei Bedarf laden (kurzer Kaltstart, nur das aktive SDK im Speicher)
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+            model = GoogleGenerativeAIEmbeddings(
+                model=model_name, google_api_key=api_key, task_type="retrieval_document"
+            )
+        except Exception as e:
+            print(f"ERROR_EMBED: Fehler Init GoogleEmbeddings: {e}"); return None
+
     elif provider == "ollama":
-        if _ollama_embedding_model is None:
-            base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-            model_name = os.getenv("OLLAMA_EMBEDDING_MODEL_NAME", "nomic-embed-text")
-            print(f"LOG_EMBED: Initialisiere OllamaEmbeddings: {model_name} @ {base_url}")
-            try:
-                # Stelle sicher, dass Ollama läuft und das Modell `model_name` verfügbar ist (`ollama pull nomic-embed-text`)
-                _ollama_embedding_model = OllamaEmbeddings(model=model_name, base_url=base_url)
-            except Exception as e:
-                print(f"ERROR_EMBED: Fehler Init OllamaEmbeddings: {e}"); return None
-        return _ollama_embedding_model
+        base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+        print(f"LOG_EMBED: Initialisiere OllamaEmbeddings: {model_name} @ {base_url}")
+        try:
+            # Stelle sicher, dass Ollama läuft und das Modell `model_name` verfügbar ist (`ollama pull nomic-embed-text`)
+            from langchain_community.embeddings import OllamaEmbeddings
+            model = OllamaEmbeddings(model=model_name, base_url=base_url)
+        except Exception as e:
+            print(f"ERROR_EMBED: Fehler Init OllamaEmbeddings: {e}"); return None
+
+    elif provider == "fake":
+        # Deterministische Hashing-Embeddings für Last-Tests (siehe fake_providers, benchmarks/bench_load.py)
+        print(f"LOG_EMBED: Initialisiere FakeEmbeddings: {model_name} (Dimension {spec.dimension})")
+        from .fake_providers import FakeEmbeddings
+        model = FakeEmbeddings(dimension=spec.dimension)
     else:
         raise ValueError(f"Unbekannter Embedding-Provider: {provider}")
+    _embedding_models[(provider, model_name)] = model
+    return model
+
+
+def _resolve_spec(provider: Optional[str] = None) -> EmbeddingSpec:
+    """Aktives Modell bzw. für einen anderen Provider dessen .env-Vorgaben."""
+    active_spec = get_active_embedding_spec()
+    if provider is None or provider == active_spec.provider:
+        return active_spec
+    return EmbeddingSpec(provider, default_model_name(provider), EMBEDDING_DIM)
+
+
+def _resolve_from_cache(
+    texts: List[str], spec: EmbeddingSpec, task_type: str
+) -> Tuple[List[str], Dict[str, List[float]], Dict[str, str]]:
+    """
+    Liefert (Schlüssel pro Text, Cache-Treffer, noch einzubettende Texte je Schlüssel).
+    Doppelte Texte innerhalb eines Aufrufs werden nur einmal eingebettet.
+    """
+    keys = [make_cache_key(spec.provider, spec.model_name, task_type, t) for t in texts]
+    cache = get_embedding_cache()
+    cached = cache.get_many(list(dict.fromkeys(keys))) if cache else {}
+    missing: Dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in missing:
+            missing[key] = text
+    return keys, cached, missing
+
+
+def _store_in_cache(new_embeddings: Dict[str, Optional[List[float]]]) -> None:
+    cache = get_embedding_cache()
+    if cache:
+        cache.put_many({k: v for k, v in new_embeddings.items() if v is not None})
+
+
+def get_embedding_cache_stats() -> Dict[str, object]:
+    cache = get_embedding_cache()
+    return cache.stats() if cache else {"enabled": False}
+
+
+def _embed_batch_sync(model, texts: List[str], provider: str, task_type: str, dimension: int = EMBEDDING_DIM) -> List[List[float]]:
+    """Ein einzelner, blockierender Provider-Aufruf für einen Batch. Wirft bei Fehler oder falscher Dimension."""
+    if provider == "google":
+        # task_type pro Aufruf statt am geteilten Modell-Objekt setzen -> sicher bei parallelen Batches
+        if task_type == "retrieval_query" and len(texts) == 1:
+            embeddings = [model.embed_query(texts[0], task_type=task_type)]
+        else:
+            embeddings = model.embed_documents(texts, task_type=task_type)
+    else:
+        embeddings = model.embed_documents(texts)
+
+    if len(embeddings) != len(texts) or any(len(e) != dimension for e in embeddings):
+        received_dim = len(embeddings[0]) if embeddings and embeddings[0] else "N/A"
+        raise ValueError(f"Unerwartetes Format/Dimension. Erwartet: {dimension}, Erhalten: {received_dim}")
+    return embeddings
+
+
+def _split_into_batches(texts: List[str], batch_size: int) -> List[List[str]]:
+    batch_size = max(1, batch_size)
+    return [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
 
-def generate_embeddings(texts: List[str], 
-                        provider: Literal["google", "ollama"] = EMBEDDING_SERVICE_PROVIDER,
+def generate_embeddings(texts: List[str],
+                        provider: Optional[Literal["google", "ollama"]] = None,
                         task_type: str = "retrieval_document" # Für Google: "retrieval_query" für Suchanfragen
                         ) -> Optional[List[List[float]]]:
-    model = get_embedding_model(provider)
-    if not model:
-        print(f"WARN_EMBED: Embedding-Modell für Provider '{provider}' nicht verfügbar. Gebe Dummy-Embeddings zurück.")
-        return [[0.0] * EMBEDDING_DIM for _ in texts] 
+    """Synchrone Variante (z.B. für Skripte). Im Request-Pfad `aembed_documents`/`aembed_query` verwenden."""
     if not texts: return []
+    spec = _resolve_spec(provider)
+    provider = spec.provider
+    keys, cached, missing = _resolve_from_cache(texts, spec, task_type)
+    if not missing:
+        print(f"LOG_EMBED: Alle {len(texts)} Embeddings aus dem Cache.")
+        return [cached[k] for k in keys]
 
-    # Spezifische Anpassung für Google-Modelle und task_type
-    if provider == "google" and hasattr(model, 'task_type'):
-        # Temporäres Setzen des task_type, falls das Modell es unterstützt und es sich vom Default unterscheidet
-        original_task_type = model.task_type
-        if task_type != original_task_type:
-            model.task_type = task_type 
-            print(f"LOG_EMBED: Google task_type temporär auf '{task_type}' gesetzt.")
+    model = get_embedding_model(provider, spec.model_name)
+    if not model:
+        print(f"WARN_EMBED: Embedding-Modell für Provider '{provider}' nicht verfügbar. Gebe Dummy-Embeddings zurück.")
+        return [[0.0] * spec.dimension for _ in texts]
 
-    print(f"LOG_EMBED: Generiere Embeddings für {len(texts)} Texte mit Provider '{provider}'...")
+    print(f"LOG_EMBED: Generiere Embeddings für {len(missing)} Texte mit Provider '{provider}' ({len(texts) - len(missing)} aus Cache/Duplikaten)...")
     try:
-        if provider == "google" and task_type == "retrieval_query" and len(texts) == 1:
-            # GoogleGenerativeAIEmbeddings hat separate Methode für einzelne Querys
-            embeddings = [model.embed_query(texts[0])]
-        else:
-            embeddings = model.embed_documents(texts)
-        
-        if embeddings and isinstance(embeddings[0], list) and len(embeddings[0]) == EMBEDDING_DIM:
-             print(f"LOG_EMBED: Embeddings generiert. Anzahl: {len(embeddings)}, Dimension: {len(embeddings[0])}")
-        else:
-            print(f"ERROR_EMBED: Unerwartetes Format/Dimension. Erwartet: {EMBEDDING_DIM}, Erhalten: {len(embeddings[0]) if embeddings and embeddings[0] else 'N/A'}")
-            return [[0.0] * EMBEDDING_DIM for _ in texts]
-        return embeddings
+        missing_texts = list(missing.values())
+        embeddings: List[List[float]] = []
+        for batch in _split_into_batches(missing_texts, EMBEDDING_BATCH_SIZE):
+            embeddings.extend(_embed_batch_sync(model, batch, provider, task_type, spec.dimension))
+        new_embeddings = dict(zip(missing.keys(), embeddings))
+        _store_in_cache(new_embeddings)
+        print(f"LOG_EMBED: Embeddings generiert. Anzahl: {len(embeddings)}, Dimension: {len(embeddings[0])}")
+        return [cached.get(k) or new_embeddings[k] for k in keys]
     except Exception as e:
         print(f"ERROR_EMBED: Fehler bei Embedding-Generierung mit '{provider}': {e}")
         import traceback; traceback.print_exc()
-        return [[0.0] * EMBEDDING_DIM for _ in texts]
-    finally:
-        # Setze task_type zurück, falls geändert
-        if provider == "google" and hasattr(model, 'task_type') and task_type != original_task_type:
-            model.task_type = original_task_type
\ No newline at end of file
+        return [[0.0] * spec.dimension for _ in texts]
+
+
+def _get_provider_semaphore(provider: str) -> asyncio.Semaphore:
+    loop_semaphores = _provider_semaphores.setdefault(asyncio.get_running_loop(), {})
+    semaphore = loop_semaphores.get(provider)
+    if semaphore is None:
+        semaphore = loop_semaphores[provider] = asyncio.Semaphore(max(1, EMBEDDING_MAX_CONCURRENCY.get(provider, 1)))
+    return semaphore
+
+
+def _is_event_loop_error(error: BaseException) -> bool:
+    """asyncio-Fehler für Objekte eines anderen bzw. geschlossenen Event-Loops (nicht jede RuntimeError)."""
+    message = str(error)
+    return type(error) is RuntimeError and ("attached to a different loop" in message or "Event loop is closed" in message)
+
+
+async def _aembed_batch_with_retry(
+    model, batch: List[str], batch_index: int, provider: str, task_type: str, dimension: int = EMBEDDING_DIM
+) -> List[Optional[List[float]]]:
+    """Bettet einen Batch im Thread-Pool ein (Event-Loop bleibt frei), mit Retry und exponentiellem Backoff."""
+    semaphore = _get_provider_semaphore(provider)
+    for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+        try:
+            async with semaphore:
+                return await asyncio.to_thread(_embed_batch_sync, model, batch, provider, task_type, dimension)
+        except Exception as e:
+            if _is_event_loop_error(e):
+                # An einen anderen/geschlossenen Event-Loop gebundene Objekte heilt kein Retry - Job scheitern lassen statt NULL-Vektoren
+                raise
+            if attempt >= EMBEDDING_MAX_RETRIES:
+                print(f"ERROR_EMBED: Batch {batch_index} ({len(batch)} Texte) endgültig fehlgeschlagen nach {attempt + 1} Versuchen: {e}")
+                return [None] * len(batch)
+            delay = EMBEDDING_RETRY_BASE_DELAY * (2 ** attempt) * (1 + random.random() * 0.25)
+            print(f"WARN_EMBED: Batch {batch_index} fehlgeschlagen (Versuch {attempt + 1}): {e}. Neuer Versuch in {delay:.1f}s.")
+            await asyncio.sleep(delay)
+    return [None] * len(batch)
+
+
+async def aembed_documents(texts: List[str],
+                           provider: Optional[Literal["google", "ollama"]] = None,
+                           task_type: str = "retrieval_document",
+                           batch_size: Optional[int] = None,
+                           spec: Optional[EmbeddingSpec] = None
+                           ) -> List[Optional[List[float]]]:
+    """
+    Asynchrone Embedding-Pipeline: prüft zuerst den Embedding-Cache, teilt die restlichen Texte in
+    Batches auf und bettet sie mit begrenzter Nebenläufigkeit pro Provider ein. Die Reihenfolge der
+    Ergebnisse entspricht `texts`; Einträge endgültig fehlgeschlagener Batches sind None
+    (werden in der DB als NULL gespeichert). Ohne `spec` wird das aktive Embedding-Modell verwendet.
+    """
+    if not texts: return []
+    spec = spec or _resolve_spec(provider)
+    provider = spec.provider
+    keys, cached, missing = await asyncio.to_thread(_resolve_from_cache, texts, spec, task_type)
+    if not missing:
+        log_debug("LOG_EMBED", "Alle %d Embeddings aus dem Cache.", len(texts))
+        return [cached[k] for k in keys]
+
+    model = get_embedding_model(provider, spec.model_name)
+    if not model:
+        print(f"WARN_EMBED: Embedding-Modell für Provider '{provider}' nicht verfügbar.")
+        return [cached.get(k) for k in keys]
+
+    batches = _split_into_batches(list(missing.values()), batch_size or EMBEDDING_BATCH_SIZE)
+    start_time = time.time()
+    log_debug("LOG_EMBED", "Generiere Embeddings (async) für %d Texte in %d Batches mit Provider '%s' (%d aus Cache/Duplikaten)...",
+              len(missing), len(batches), provider, len(texts) - len(missing))
+    with span("embed_query" if task_type == "retrieval_query" else "embed_documents"):
+        batch_results = await asyncio.gather(
+            *(_aembed_batch_with_retry(model, batch, i, provider, task_type, spec.dimension) for i, batch in enumerate(batches))
+        )
+    new_embeddings = dict(zip(missing.keys(), (e for batch_result in batch_results for e in batch_result)))
+    await asyncio.to_thread(_store_in_cache, new_embeddings)
+
+    embeddings = [cached.get(k) or new_embeddings.get(k) for k in keys]
+    failed = sum(1 for e in embeddings if e is None)
+    log("WARN" if failed else "DEBUG", "WARN_EMBED" if failed else "LOG_EMBED", "Embeddings (async) generiert. Anzahl: %d, Fehlgeschlagen: %d, Dauer: %.2fs", len(embeddings), failed, time.time() - start_time)
+    return embeddings
+
+
+async def aembed_query(query_text: str,
+                       provider: Optional[Literal["google", "ollama"]] = None,
+                       spec: Optional[EmbeddingSpec] = None
+                       ) -> Optional[List[float]]:
+    """Bettet eine einzelne Suchanfrage ein (Google: task_type 'retrieval_query')."""
+    spec = spec or _resolve_spec(provider)
+    task_type = "retrieval_query" if spec.provider == "google" else "retrieval_document"
+    embeddings = await aembed_documents([query_text], task_type=task_type, spec=spec)
+    return embeddings[0] if embeddings else None
@@ -0,0 +1,71 @@
+# app/services/embedding_versions.py
+import os
+import json
+import threading
+from typing import NamedTuple, Optional, Tuple
+
+from app.core.config import CACHE_DIR
+from app.db.models.embedding_version_model import make_embedding_version_key
+
+# Zeiger auf das aktive Embedding-Modell. Maßgeblich ist die Tabelle embedding_versions; die Datei verteilt den
+# Stand nur an alle Prozesse (API-Worker, Ingestion-Worker), ohne dass jedes Query-Embedding die DB fragen muss.
+ACTIVE_EMBEDDING_MODEL_PATH = os.getenv("ACTIVE_EMBEDDING_MODEL_PATH", os.path.join(CACHE_DIR, "active_embedding_model.json"))
+
+
+class EmbeddingSpec(NamedTuple):
+    provider: str
+    model_name: str
+    dimension: int
+
+    @property
+    def version_key(self) -> str:
+        return make_embedding_version_key(self.provider, self.model_name, self.dimension)
+
+
+def default_model_name(provider: str) -> str:
+    if provider == "google":
+        return os.getenv("GOOGLE_EMBEDDING_MODEL_NAME", "models/text-embedding-004")
+    if provider == "fake":
+        return "fake-hash-embedding"
+    return os.getenv("OLLAMA_EMBEDDING_MODEL_NAME", "nomic-embed-text")
+
+
+def embedding_spec_from_env() -> EmbeddingSpec:
+    """Das per .env konfigurierte Modell - beim ersten Start das aktive, danach nur noch Vorgabe."""
+    provider = os.getenv("EMBEDDING_SERVICE_PROVIDER", "google").lower()
+    return EmbeddingSpec(provider, default_model_name(provider), int(os.getenv("EMBEDDING_DIMENSION", "768")))
+
+
+_lock = threading.Lock()
+_cached_stat: Optional[Tuple[int, int]] = None
+_cached_spec: Optional[EmbeddingSpec] = None
+
+
+def get_active_embedding_spec() -> EmbeddingSpec:
+    """Aktives Modell (stat()-gecacht wie die Korpus-Version); ohne Zeiger-Datei das Modell aus der .env."""
+    global _cached_stat, _cached_spec
+    try:
+        st = os.stat(ACTIVE_EMBEDDING_MODEL_PATH)
+    except FileNotFoundError:
+        return embedding_spec_from_env()
+    stat_key = (st.st_ino, st.st_mtime_ns)
+    with _lock:
+        if stat_key != _cached_stat:
+            try:
+                with open(ACTIVE_EMBEDDING_MODEL_PATH, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                _cached_spec = EmbeddingSpec(data["provider"], data["model_name"], int(data["dimension"]))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"WARN_EMBEDDING_VERSIONS: Zeiger-Datei {ACTIVE_EMBEDDING_MODEL_PATH} unlesbar ({e}). Verwende .env-Modell.")
+                _cached_spec = embedding_spec_from_env()
+            _cached_stat = stat_key
+        return _cached_spec
+
+
+def set_active_embedding_spec(spec: EmbeddingSpec) -> None:
+    """Schreibt den Zeiger atomar (rename); andere Prozesse sehen die Änderung beim nächsten stat()."""
+    tmp_path = f"{ACTIVE_EMBEDDING_MODEL_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(spec._asdict(), f)
+    os.replace(tmp_path, ACTIVE_EMBEDDING_MODEL_PATH)
+    print(f"LOG_EMBEDDING_VERSIONS: Aktives Embedding-Modell -> {spec.version_key}")
@@ -0,0 +1,161 @@
+# app/services/fake_providers.py
+import os
+import re
+import time
+import random
+import asyncio
+import hashlib
+import functools
+import threading
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Deterministische lokale Provider ("fake") für Last-Tests und Benchmarks ohne Gemini/Ollama:
+# EMBEDDING_SERVICE_PROVIDER=fake bzw. LLM_PROVIDER=fake. Latenz und Fehlerquote sind einstellbar,
+# damit sich das Verhalten der Pipeline unter langsamen oder wackligen Providern nachstellen lässt.
+FAKE_EMBEDDING_LATENCY_MS = float(os.getenv("FAKE_EMBEDDING_LATENCY_MS", "0"))       # pro Provider-Aufruf (Batch)
+FAKE_EMBEDDING_FAILURE_RATE = float(os.getenv("FAKE_EMBEDDING_FAILURE_RATE", "0"))   # Anteil fehlschlagender Aufrufe
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))                   # bis zum ersten Token
+FAKE_LLM_TOKEN_DELAY_MS = float(os.getenv("FAKE_LLM_TOKEN_DELAY_MS", "0"))           # je weiteres Token beim Streaming
+FAKE_LLM_FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+FAKE_LLM_RESPONSE_WORDS = int(os.getenv("FAKE_LLM_RESPONSE_WORDS", "60"))
+FAKE_PROVIDER_SEED = int(os.getenv("FAKE_PROVIDER_SEED", "42"))
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+_RESPONSE_WORDS = (
+    "die Quelle beschreibt das Verfahren im Detail und zeigt dass der Ansatz in mehreren Studien "
+    "konsistente Ergebnisse liefert wobei Einschränkungen bei kleinen Stichproben bestehen"
+).split()
+
+
+class FakeProviderError(Exception):
+    """Simulierter Provider-Fehler (FAKE_*_FAILURE_RATE); wie echte Provider-Fehler mit Retry behandelt."""
+
+
+class _FailureInjector:
+    """Gemeinsamer Zufallsgenerator (fester Seed) für die simulierten Fehler; thread-sicher für to_thread-Aufrufe."""
+
+    def __init__(self, failure_rate: float, seed: int):
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def maybe_fail(self, what: str) -> None:
+        if self.failure_rate <= 0:
+            return
+        with self._lock:
+            failed = self._rng.random() < self.failure_rate
+        if failed:
+            raise FakeProviderError(f"Simulierter Fehler des Fake-Providers ({what})")
+
+
+@functools.lru_cache(maxsize=None)
+def _get_failure_injector(failure_rate: float, seed: int) -> _FailureInjector:
+    return _FailureInjector(failure_rate, seed)
+
+
+def _stable_hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Hashing-Embeddings: jedes Wort landet per Hash mit Vorzeichen in einer Dimension, der Vektor wird L2-normiert.
+    Gleicher Text -> gleicher Vektor; Texte mit gemeinsamen Wörtern liegen nah beieinander, sodass die
+    Vektorsuche sinnvolle Treffer liefert. Blockiert wie die echten Provider (Aufruf erfolgt im Thread-Pool).
+    """
+
+    def __init__(self, dimension: int, latency_ms: float = FAKE_EMBEDDING_LATENCY_MS,
+                 failure_rate: float = FAKE_EMBEDDING_FAILURE_RATE, seed: int = FAKE_PROVIDER_SEED):
+        self.dimension = dimension
+        self.latency_ms = latency_ms
+        self._failures = _FailureInjector(failure_rate, seed)
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        tokens = _TOKEN_PATTERN.findall(text.lower()) or [text]
+        for token in tokens:
+            h = _stable_hash(token)
+            vector[h % self.dimension] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = sum(v * v for v in vector) ** 0.5
+        if norm == 0.0:
+            # Hebt sich alles auf: auf eine feste Dimension ausweichen, damit der Kosinus definiert bleibt
+            vector[_stable_hash(text) % self.dimension] = 1.0
+            return vector
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000)
+        self._failures.maybe_fail("embed_documents")
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat-Modell mit deterministischer Antwort (abhängig vom Prompt), nutzbar in Chains (prompt | model | parser)
+    sowie per ainvoke/astream wie ChatGoogleGenerativeAI. Wartet FAKE_LLM_LATENCY_MS bis zum ersten Token und
+    FAKE_LLM_TOKEN_DELAY_MS je weiterem Token.
+    """
+
+    latency_ms: float = FAKE_LLM_LATENCY_MS
+    token_delay_ms: float = FAKE_LLM_TOKEN_DELAY_MS
+    failure_rate: float = FAKE_LLM_FAILURE_RATE
+    response_words: int = FAKE_LLM_RESPONSE_WORDS
+    seed: int = FAKE_PROVIDER_SEED
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    @property
+    def _failures(self) -> _FailureInjector:
+        # Pydantic-Modell: der Zufallsgenerator lebt außerhalb der Felder, geteilt je (Fehlerquote, Seed)
+        return _get_failure_injector(self.failure_rate, self.seed)
+
+    def _response_tokens(self, messages: List[BaseMessage]) -> List[str]:
+        prompt = "\n".join(str(m.content) for m in messages)
+        rng = random.Random(_stable_hash(prompt))
+        words = [rng.choice(_RESPONSE_WORDS) for _ in range(max(1, self.response_words))]
+        words[0] = words[0].capitalize()
+        return [w if i == 0 else " " + w for i, w in enumerate(words)] + ["."]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep((self.latency_ms + self.token_delay_ms * self.response_words) / 1000)
+        self._failures.maybe_fail("generate")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(self._response_tokens(messages))))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep((self.latency_ms + self.token_delay_ms * self.response_words) / 1000)
+        self._failures.maybe_fail("generate")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(self._response_tokens(messages))))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency_ms / 1000)
+        self._failures.maybe_fail("stream")
+        for i, token in enumerate(self._response_tokens(messages)):
+            if i and self.token_delay_ms > 0:
+                time.sleep(self.token_delay_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency_ms / 1000)
+        self._failures.maybe_fail("stream")
+        for i, token in enumerate(self._response_tokens(messages)):
+            if i and self.token_delay_ms > 0:
+                await asyncio.sleep(self.token_delay_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
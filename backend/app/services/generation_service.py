@@ -1,10 +1,13 @@
 # app/services/generation_service.py
 import os
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .retrieval_service import RetrievalService 
-from .llm_service import generate_text_with_llm 
+from .retrieval_service import RetrievalService, chunk_to_source_detail
+from .llm_service import generate_text_with_llm, stream_text_with_llm
+from app.db.session import AsyncSessionLocal
+from app.schemas.processing_schemas import RetrievalFilters
 # TextChunk Pydantic Schema wird hier nicht direkt benötigt, da wir Dictionaries verarbeiten und zurückgeben
 
 class GenerationService:
@@ -13,18 +16,15 @@ class GenerationService:
         self.llm_provider = os.getenv("LLM_PROVIDER", "google").lower()
         print(f"LOG_GEN_SERVICE_INIT: GenerationService initialisiert mit LLM Provider: {self.llm_provider}")
 
-    async def generate_text_with_context( # NEUE Methode und Parameter
+    async def _build_generation_prompt(
             self,
             db: AsyncSession,
             editor_context_html: str,
-            user_prompt: Optional[str], # Kann None sein
-            num_retrieved_chunks: Optional[int] = 3
-        ) -> Dict[str, Any]:
-            """
-            Generiert Text basierend auf dem gesamten Editor-Kontext und einer optionalen Nutzeranweisung.
-            Findet relevante Quellen basierend auf dem Nutzer-Prompt oder dem Kontext.
-            """
-            print(f"LOG_GEN_SERVICE: Starte generate_text_with_context.")
+            user_prompt: Optional[str],
+            num_retrieved_chunks: Optional[int],
+            retrieval_filters: Optional[RetrievalFilters]
+        ) -> Tuple[str, Dict[str, Any], List[Dict[str, Any]]]:
+            """Sucht die Quellen und baut Prompt-Template, Prompt-Daten und Quellenliste für das LLM auf."""
             print(f"  User Prompt: '{str(user_prompt)[:70]}...'")
             print(f"  Editor Context HTML (erste 100 Zeichen): '{editor_context_html[:100]}...'")
             query_for_retrieval = user_prompt
@@ -34,7 +34,8 @@ class GenerationService:
             retrieved_chunks_data = await self.retrieval_service.find_relevant_chunks(
                 db=db,
                 query_text=query_for_retrieval, # Nutze die bestimmte Query
-                limit=num_retrieved_chunks if num_retrieved_chunks is not None else 3
+                limit=num_retrieved_chunks if num_retrieved_chunks is not None else 3,
+                filters=retrieval_filters
             )
 
             sources_for_api_response = []
@@ -54,15 +55,7 @@ class GenerationService:
                     context_for_llm_sources += f"Inhalt des Chunks:\n{chunk_data.get('chunk_content', '')}\n"
                     context_for_llm_sources += f"--- Ende Quelle [ID:{chunk_id}] ---\n\n"
 
-                    sources_for_api_response.append({
-                        "chunk_id": chunk_id,
-                        # ... (restliche Felder für API-Antwort bleiben gleich)
-                        "filename": chunk_data.get('original_filename'), "title": chunk_data.get('document_title'),
-                        "author": chunk_data.get('document_author'), "year": chunk_data.get('publication_year'),
-                        "page": chunk_data.get('page_number'),
-                        "content_preview": chunk_data.get('chunk_content', '')[:200] + "...",
-                        "distance": chunk_data.get('distance')
-                    })
+                    sources_for_api_response.append(chunk_to_source_detail(chunk_data, i))
 
             # Erstelle den finalen Prompt für das LLM
             # Dieser beinhaltet jetzt den Editor-Kontext, die Quellen und den User-Prompt.
@@ -109,6 +102,24 @@ class GenerationService:
                 "source_context": context_for_llm_sources.strip() if context_for_llm_sources else "Keine spezifischen Quellen für diese Anfrage gefunden/verwendet.",
                 "user_instruction": user_prompt if user_prompt and user_prompt.strip() else "Führe den vorhandenen Dokumentkontext thematisch passend fort oder ergänze ihn."
             }
+            return prompt_template, prompt_data, sources_for_api_response
+
+    async def generate_text_with_context( # NEUE Methode und Parameter
+            self,
+            db: AsyncSession,
+            editor_context_html: str,
+            user_prompt: Optional[str], # Kann None sein
+            num_retrieved_chunks: Optional[int] = 3,
+            retrieval_filters: Optional[RetrievalFilters] = None
+        ) -> Dict[str, Any]:
+            """
+            Generiert Text basierend auf dem gesamten Editor-Kontext und einer optionalen Nutzeranweisung.
+            Findet relevante Quellen basierend auf dem Nutzer-Prompt oder dem Kontext.
+            """
+            print(f"LOG_GEN_SERVICE: Starte generate_text_with_context.")
+            prompt_template, prompt_data, sources_for_api_response = await self._build_generation_prompt(
+                db, editor_context_html, user_prompt, num_retrieved_chunks, retrieval_filters
+            )
 
             print(f"LOG_GEN_SERVICE: Rufe LLM zur Textgenerierung auf. Provider: {self.llm_provider}")
             generated_text_from_llm = await generate_text_with_llm(
@@ -121,6 +132,36 @@ class GenerationService:
                 generated_text_from_llm = "Fehler: Das Sprachmodell konnte keine Antwort generieren."
                 print(f"ERROR_GEN_SERVICE: LLM hat None zurückgegeben.")
 
-            return {"generated_text": generated_text_from_llm, "sources": sources_for_api_response}    
-            
-        
\ No newline at end of file
+            return {"generated_text": generated_text_from_llm, "sources": sources_for_api_response}
+
+    async def stream_text_with_context(
+            self,
+            editor_context_html: str,
+            user_prompt: Optional[str],
+            num_retrieved_chunks: Optional[int] = 3,
+            retrieval_filters: Optional[RetrievalFilters] = None
+        ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+            """
+            Streaming-Variante von `generate_text_with_context`: liefert (event, daten)-Paare - zuerst "sources",
+            dann "token" pro Textstück, zum Schluss "done" mit dem vollständigen Text - oder "error" (dann kein "done").
+            Die DB-Session wird nur für die Quellensuche gehalten und vor dem LLM-Aufruf freigegeben.
+            """
+            print("LOG_GEN_SERVICE: Starte stream_text_with_context.")
+            stream_start_time = time.time()
+            async with AsyncSessionLocal() as db:
+                prompt_template, prompt_data, sources_for_api_response = await self._build_generation_prompt(
+                    db, editor_context_html, user_prompt, num_retrieved_chunks, retrieval_filters
+                )
+            yield "sources", {"sources": sources_for_api_response}
+
+            generated_parts: List[str] = []
+            try:
+                async for token in stream_text_with_llm(prompt_template, prompt_data, provider=self.llm_provider):
+                    generated_parts.append(token)
+                    yield "token", {"text": token}
+            except Exception as e:
+                print(f"ERROR_GEN_SERVICE: Fehler im LLM-Stream: {e}")
+                yield "error", {"detail": f"Fehler bei der Textgenerierung: {str(e)}"}
+                return
+            print(f"LOG_GEN_SERVICE: stream_text_with_context beendet. Dauer: {time.time() - stream_start_time:.2f}s")
+            yield "done", {"generated_text": "".join(generated_parts), "sources": sources_for_api_response}
@@ -0,0 +1,366 @@
+# app/services/image_store.py
+import os
+import io
+import base64
+import shutil
+import hashlib
+import time
+import uuid
+import asyncio
+import mimetypes
+import multiprocessing
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from app.core.config import EXTRACTED_IMAGES_DIR
+
+# Inhaltsadressierter Bildspeicher: jedes Bild liegt einmal unter seinem SHA-256 im Store und wird per Hardlink in
+# die Dokumentordner (extracted_images/<processed_document_id>/) eingehängt. Der Store muss dafür auf demselben
+# Dateisystem liegen wie EXTRACTED_IMAGES_DIR, sonst wird kopiert.
+IMAGE_STORE_DIR = os.getenv("IMAGE_STORE_DIR", os.path.join(EXTRACTED_IMAGES_DIR, "_store"))
+# "original" = Bytes wie von Marker geliefert, "webp" = Umwandlung nach WebP (nur wenn kleiner als das Original)
+IMAGE_OUTPUT_FORMAT = os.getenv("IMAGE_OUTPUT_FORMAT", "original").lower()
+IMAGE_WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+IMAGE_THUMBNAIL_SIZE = int(os.getenv("IMAGE_THUMBNAIL_SIZE", "0")) # längste Kante in px für den Editor, 0 = keine Thumbnails
+IMAGE_PROCESSING_WORKERS = int(os.getenv("IMAGE_PROCESSING_WORKERS", "4"))
+# true: Dekodieren/Kodieren in eigenen Prozessen statt Threads (lohnt sich bei WebP/Thumbnails für viele Bilder)
+IMAGE_PROCESSING_USE_PROCESSES = os.getenv("IMAGE_PROCESSING_USE_PROCESSES", "false").lower() in ("1", "true", "yes")
+# Beim Löschen von Dokumenten Store-Objekte entfernen, auf die danach kein Dokumentordner mehr verlinkt
+IMAGE_STORE_PRUNE_ON_DELETE = os.getenv("IMAGE_STORE_PRUNE_ON_DELETE", "true").lower() in ("1", "true", "yes")
+
+THUMBNAIL_DIR_NAME = "thumbnails"
+os.makedirs(IMAGE_STORE_DIR, exist_ok=True)
+
+
+class StoredImage(NamedTuple):
+    filename: str # Name aus Marker, so im Markdown referenziert
+    file_path: str # relativ zu EXTRACTED_IMAGES_DIR
+    content_type: Optional[str]
+    sha256: str
+    source_bytes: int
+    stored_bytes: int # neu in den Store geschrieben (0 bei Duplikaten)
+    thumbnail_path: Optional[str] = None
+    thumbnail_bytes: int = 0
+
+
+def image_to_bytes(img_data_value: Any, filename: str) -> Optional[bytes]:
+    """Bilddaten aus Marker (bytes, Base64-String oder PIL-Bild) als Datei-Bytes im Format der Dateiendung."""
+    if isinstance(img_data_value, bytes):
+        return img_data_value
+    if isinstance(img_data_value, str):
+        data = img_data_value.split(",", 1)[1] if "," in img_data_value else img_data_value
+        pad = len(data) % 4
+        data += "=" * (4 - pad) if pad else ""
+        return base64.b64decode(data)
+    # PIL erst hier laden: das Modul wird auch von der API (Fingerprint, Löschen) importiert, die keine Bilder dekodiert
+    from PIL import Image
+    if isinstance(img_data_value, Image.Image):
+        buffer = io.BytesIO()
+        ext = os.path.splitext(filename)[1].lstrip(".").upper()
+        img_format = {"JPG": "JPEG"}.get(ext, ext) or img_data_value.format or "PNG"
+        img_data_value.save(buffer, format=img_format)
+        return buffer.getvalue()
+    return None
+
+
+def _object_path(object_name: str) -> str:
+    # Zwei Zeichen Präfix als Unterordner, damit der Store-Ordner nicht zu groß wird
+    return os.path.join(IMAGE_STORE_DIR, object_name[:2], object_name)
+
+
+def _put_object(object_name: str, data: bytes) -> bool:
+    """Legt das Objekt an, falls es fehlt. True, wenn es neu geschrieben wurde."""
+    object_path = _object_path(object_name)
+    if os.path.exists(object_path):
+        return False
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    tmp_path = f"{object_path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    try:
+        # link() statt replace(): schlägt fehl, wenn ein anderer Worker dasselbe Objekt gerade angelegt hat,
+        # und ersetzt so nie eine Datei, auf die schon Dokumentordner verlinkt sind
+        os.link(tmp_path, object_path)
+        return True
+    except FileExistsError:
+        return False
+    except OSError:
+        os.replace(tmp_path, object_path) # Dateisystem ohne Hardlinks
+        return True
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _link_object(object_path: str, target_path: str) -> None:
+    if os.path.exists(target_path) and os.path.samefile(object_path, target_path):
+        return
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    tmp_path = f"{target_path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        os.link(object_path, tmp_path)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(object_path, tmp_path) # anderes Dateisystem o.ä.
+    os.replace(tmp_path, target_path)
+
+
+def _link_into(object_name: str, target_path: str, object_data: Callable[[], bytes]) -> None:
+    """
+    Verlinkt das Objekt in den Dokumentordner. Ein paralleles remove_document_folders kann ein Objekt mit nur einem
+    Link zwischen Anlegen/Prüfen und Verlinken entfernen - dann wird es aus object_data() neu geschrieben.
+    """
+    for attempt in range(3):
+        try:
+            _link_object(_object_path(object_name), target_path)
+            return
+        except FileNotFoundError:
+            if attempt == 2:
+                raise
+            print(f"WARN_IMAGE_STORE: Objekt {object_name} wurde während des Speicherns entfernt, wird neu geschrieben.")
+            _put_object(object_name, object_data())
+
+
+def _encode_webp(source: bytes, quality: int) -> bytes:
+    from PIL import Image
+    with Image.open(io.BytesIO(source)) as img:
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+        buffer = io.BytesIO()
+        img.save(buffer, format="WEBP", quality=quality, method=4)
+        return buffer.getvalue()
+
+
+def _encode_thumbnail(source: bytes, size: int, quality: int) -> bytes:
+    from PIL import Image
+    with Image.open(io.BytesIO(source)) as img:
+        img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+        img.thumbnail((size, size))
+        buffer = io.BytesIO()
+        img.save(buffer, format="WEBP", quality=quality, method=4)
+        return buffer.getvalue()
+
+
+def store_image(
+    img_data_value: Any, original_filename: str, doc_folder: str,
+    output_format: str = IMAGE_OUTPUT_FORMAT, webp_quality: int = IMAGE_WEBP_QUALITY, thumbnail_size: int = IMAGE_THUMBNAIL_SIZE,
+) -> Optional[StoredImage]:
+    """
+    Dekodiert, (optional) transkodiert und speichert ein Bild und verlinkt es in den Dokumentordner.
+    Blockierend (PIL + Dateisystem) - läuft im Thread-/Prozess-Pool, siehe store_document_images.
+    """
+    from PIL import Image, UnidentifiedImageError
+    basename = os.path.basename(original_filename)
+    stem, ext = os.path.splitext(basename)
+    source = image_to_bytes(img_data_value, basename)
+    if source is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(source)) as img:
+            img.verify()
+    except (UnidentifiedImageError, OSError) as e:
+        print(f"  ERROR_SAVE_IMG: Bild '{basename}' nicht lesbar: {e}")
+        return None
+    digest = hashlib.sha256(source).hexdigest()
+
+    object_name, link_name, stored_bytes = f"{digest}{ext.lower()}", basename, 0
+    if output_format == "webp" and ext.lower() != ".webp":
+        webp_name = f"{digest}.q{webp_quality}.webp"
+        if os.path.exists(_object_path(webp_name)):
+            object_name, link_name = webp_name, f"{stem}.webp"
+        else:
+            webp_bytes = _encode_webp(source, webp_quality)
+            if len(webp_bytes) < len(source):
+                object_name, link_name = webp_name, f"{stem}.webp"
+                stored_bytes = len(webp_bytes) if _put_object(webp_name, webp_bytes) else 0
+    if object_name == f"{digest}{ext.lower()}":
+        stored_bytes = len(source) if _put_object(object_name, source) else 0
+
+    doc_dir = os.path.join(EXTRACTED_IMAGES_DIR, doc_folder)
+    _link_into(
+        object_name, os.path.join(doc_dir, link_name),
+        (lambda: _encode_webp(source, webp_quality)) if object_name.endswith(".webp") and ext.lower() != ".webp" else (lambda: source),
+    )
+
+    thumbnail_path, thumbnail_bytes = None, 0
+    if thumbnail_size > 0:
+        thumb_name = f"{digest}.thumb{thumbnail_size}.webp"
+        if not os.path.exists(_object_path(thumb_name)):
+            thumb_data = _encode_thumbnail(source, thumbnail_size, webp_quality)
+            thumbnail_bytes = len(thumb_data) if _put_object(thumb_name, thumb_data) else 0
+        _link_into(
+            thumb_name, os.path.join(doc_dir, THUMBNAIL_DIR_NAME, f"{stem}.webp"),
+            lambda: _encode_thumbnail(source, thumbnail_size, webp_quality),
+        )
+        thumbnail_path = os.path.join(doc_folder, THUMBNAIL_DIR_NAME, f"{stem}.webp")
+
+    return StoredImage(
+        filename=basename,
+        file_path=os.path.join(doc_folder, link_name),
+        content_type=mimetypes.guess_type(link_name)[0] or ("image/webp" if link_name.endswith(".webp") else None),
+        sha256=digest,
+        source_bytes=len(source),
+        stored_bytes=stored_bytes,
+        thumbnail_path=thumbnail_path,
+        thumbnail_bytes=thumbnail_bytes,
+    )
+
+
+_executor: Optional[Executor] = None
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        workers = max(1, IMAGE_PROCESSING_WORKERS)
+        if IMAGE_PROCESSING_USE_PROCESSES:
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-store")
+        print(f"INFO_IMAGE_STORE: {'Prozess' if IMAGE_PROCESSING_USE_PROCESSES else 'Thread'}-Pool mit {workers} Workern gestartet (Format={IMAGE_OUTPUT_FORMAT}, Thumbnails={IMAGE_THUMBNAIL_SIZE or 'aus'}).")
+    return _executor
+
+
+def shutdown_image_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def store_document_images(img_dict: Dict[str, Any], doc_folder: str) -> Tuple[List[StoredImage], Dict[str, int]]:
+    """
+    Speichert alle Bilder eines Dokuments parallel im Pool (der Event-Loop wartet nur). Gibt die gespeicherten
+    Bilder und eine Bilanz zurück; bytes_saved = Originalgröße minus tatsächlich neu geschriebene Bytes
+    (Duplikate im Store + kleinere WebP-Dateien), Thumbnails sind separat ausgewiesen.
+    """
+    if not img_dict:
+        return [], {}
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    names = list(img_dict.keys())
+    results = await asyncio.gather(
+        *(loop.run_in_executor(executor, store_image, img_dict[name], name, doc_folder) for name in names),
+        return_exceptions=True,
+    )
+    stored: List[StoredImage] = []
+    for name, result in zip(names, results):
+        if isinstance(result, BaseException):
+            print(f"  ERROR_SAVE_IMG: Bild '{os.path.basename(name)}': {result}")
+        elif result is not None:
+            stored.append(result)
+    source_bytes = sum(img.source_bytes for img in stored)
+    written_bytes = sum(img.stored_bytes for img in stored)
+    stats = {
+        "images": len(stored),
+        "failed": len(names) - len(stored),
+        "deduplicated": sum(1 for img in stored if img.stored_bytes == 0),
+        "source_bytes": source_bytes,
+        "stored_bytes": written_bytes,
+        "bytes_saved": source_bytes - written_bytes,
+        "thumbnail_bytes": sum(img.thumbnail_bytes for img in stored),
+    }
+    print(f"LOG_IMAGE_STORE: {stats['images']} Bilder für '{doc_folder}' gespeichert, {stats['deduplicated']} schon im Store. "
+          f"{source_bytes / 1e6:.2f} MB -> {written_bytes / 1e6:.2f} MB neu geschrieben ({stats['bytes_saved'] / 1e6:.2f} MB gespart).")
+    return stored, stats
+
+
+def remove_document_folders(doc_folders: Iterable[str], prune_objects: bool = IMAGE_STORE_PRUNE_ON_DELETE) -> Dict[str, int]:
+    """
+    Entfernt extracted_images/<ordner> gelöschter Dokumente (blockierend, im Thread aufrufen). Mit `prune_objects`
+    werden anschließend die Store-Objekte gelöscht, die nur von diesen Ordnern verlinkt waren (nlink fällt auf 1);
+    Objekte, die weitere Dokumente nutzen, bleiben. Ohne Hardlinks (Kopien) gibt es nichts zu bereinigen.
+    """
+    base_dir = os.path.realpath(EXTRACTED_IMAGES_DIR)
+    store_dir = os.path.realpath(IMAGE_STORE_DIR)
+    linked_inodes: Set[Tuple[int, int]] = set()
+    folders_removed, files_removed = 0, 0
+    for doc_folder in doc_folders:
+        if not doc_folder:
+            continue
+        folder_path = os.path.realpath(os.path.join(base_dir, doc_folder))
+        # Nur direkte Unterordner von extracted_images, niemals der Store selbst
+        if os.path.dirname(folder_path) != base_dir or folder_path == store_dir:
+            print(f"WARN_IMAGE_STORE: Ordner '{doc_folder}' liegt nicht direkt unter {base_dir}, wird nicht gelöscht.")
+            continue
+        if not os.path.isdir(folder_path):
+            continue
+        for dir_path, _, file_names in os.walk(folder_path):
+            for file_name in file_names:
+                try:
+                    st = os.stat(os.path.join(dir_path, file_name))
+                except OSError:
+                    continue
+                files_removed += 1
+                if st.st_nlink > 1:
+                    linked_inodes.add((st.st_dev, st.st_ino))
+        shutil.rmtree(folder_path, ignore_errors=True)
+        folders_removed += 1
+
+    objects_pruned, bytes_pruned = 0, 0
+    if prune_objects and linked_inodes:
+        for dir_path, _, file_names in os.walk(store_dir):
+            for file_name in file_names:
+                object_path = os.path.join(dir_path, file_name)
+                try:
+                    st = os.stat(object_path)
+                    # nlink > 1: inzwischen (wieder) von einem Dokument verlinkt, z.B. gleiches Bild in neuer PDF
+                    if (st.st_dev, st.st_ino) in linked_inodes and st.st_nlink <= 1:
+                        os.remove(object_path)
+                        objects_pruned += 1
+                        bytes_pruned += st.st_size
+                except OSError:
+                    continue
+    return {"folders_removed": folders_removed, "files_removed": files_removed, "objects_pruned": objects_pruned, "bytes_pruned": bytes_pruned}
+
+
+# Laufende Lösch-Tasks (Referenz halten, damit sie nicht vom GC eingesammelt werden)
+_removal_tasks: Set[asyncio.Task] = set()
+
+def schedule_document_folder_removal(doc_folders: List[str]) -> None:
+    """Entfernt die Bildordner gelöschter Dokumente im Hintergrund; die Lösch-Anfrage wartet nicht auf das Dateisystem."""
+    doc_folders = [f for f in doc_folders if f]
+    if not doc_folders:
+        return
+    task = asyncio.create_task(_remove_document_folders_in_background(doc_folders))
+    _removal_tasks.add(task)
+    task.add_done_callback(_removal_tasks.discard)
+
+
+async def _remove_document_folders_in_background(doc_folders: List[str]) -> None:
+    start_time = time.time()
+    try:
+        stats = await asyncio.to_thread(remove_document_folders, doc_folders)
+    except Exception as e:
+        print(f"ERROR_IMAGE_STORE: Bildordner von {len(doc_folders)} gelöschten Dokumenten nicht entfernt: {e}")
+        return
+    print(f"LOG_IMAGE_STORE: {stats['folders_removed']} Bildordner ({stats['files_removed']} Dateien) entfernt, "
+          f"{stats['objects_pruned']} nicht mehr verlinkte Store-Objekte gelöscht ({stats['bytes_pruned'] / 1e6:.2f} MB). "
+          f"Dauer: {time.time() - start_time:.2f}s")
+
+
+def get_image_store_stats() -> Dict[str, Any]:
+    """
+    Belegung des Stores (blockierend, im Thread aufrufen). Jede zusätzliche Verlinkung eines Objekts ist eine Kopie,
+    die ohne Store angefallen wäre; Objekte ohne Verlinkung (nlink == 1) gehören zu keinem Dokument mehr.
+    """
+    objects, stored_bytes, linked_bytes, unreferenced = 0, 0, 0, 0
+    for dir_path, _, file_names in os.walk(IMAGE_STORE_DIR):
+        for file_name in file_names:
+            if file_name.endswith(".tmp"):
+                continue
+            st = os.stat(os.path.join(dir_path, file_name))
+            objects += 1
+            stored_bytes += st.st_size
+            linked_bytes += st.st_size * max(st.st_nlink - 1, 0)
+            if st.st_nlink <= 1:
+                unreferenced += 1
+    return {
+        "objects": objects,
+        "stored_bytes": stored_bytes,
+        "linked_bytes": linked_bytes,
+        "bytes_saved_by_dedup": max(linked_bytes - stored_bytes, 0),
+        "unreferenced_objects": unreferenced,
+        "output_format": IMAGE_OUTPUT_FORMAT,
+        "thumbnail_size": IMAGE_THUMBNAIL_SIZE,
+    }
@@ -0,0 +1,149 @@
+# app/services/index_maintenance.py
+import os
+import time
+import asyncio
+from typing import Any, Dict, List, Optional
+from sqlalchemy.sql import text
+
+from app.db.session import async_engine
+from app.core.observability import span
+
+# Wartung des HNSW-Index nach größeren Löschungen: gelöschte Chunks bleiben als tote Tupel im Index, bis VACUUM den
+# Graphen repariert. Nach dem Löschen wird (entprellt) geprüft, wie hoch der Anteil toter Tupel in chunks ist;
+# ab INDEX_MAINTENANCE_VACUUM_RATIO folgt VACUUM (ANALYZE), ab INDEX_MAINTENANCE_REINDEX_RATIO vorher ein
+# REINDEX CONCURRENTLY des Vektor-Index (schneller als VACUUM über einen stark ausgedünnten HNSW-Graphen).
+INDEX_MAINTENANCE_ENABLED = os.getenv("INDEX_MAINTENANCE_ENABLED", "true").lower() in ("1", "true", "yes")
+INDEX_MAINTENANCE_DELAY_SECONDS = float(os.getenv("INDEX_MAINTENANCE_DELAY_SECONDS", "30")) # sammelt weitere Löschungen
+INDEX_MAINTENANCE_MIN_DEAD_TUPLES = int(os.getenv("INDEX_MAINTENANCE_MIN_DEAD_TUPLES", "1000"))
+INDEX_MAINTENANCE_VACUUM_RATIO = float(os.getenv("INDEX_MAINTENANCE_VACUUM_RATIO", "0.1"))
+INDEX_MAINTENANCE_REINDEX_RATIO = float(os.getenv("INDEX_MAINTENANCE_REINDEX_RATIO", "0.3"))
+
+# Advisory-Lock: bei mehreren API-Workern wartet immer nur einer den Index
+_ADVISORY_LOCK_KEY = 724_100_024
+MAINTENANCE_ACTIONS = ("vacuum", "reindex")
+
+
+def recommend_maintenance(live_tuples: int, dead_tuples: int) -> Optional[str]:
+    """'reindex', 'vacuum' oder None anhand des Anteils toter Tupel in chunks."""
+    if dead_tuples < INDEX_MAINTENANCE_MIN_DEAD_TUPLES:
+        return None
+    dead_ratio = dead_tuples / max(live_tuples + dead_tuples, 1)
+    if dead_ratio >= INDEX_MAINTENANCE_REINDEX_RATIO:
+        return "reindex"
+    if dead_ratio >= INDEX_MAINTENANCE_VACUUM_RATIO:
+        return "vacuum"
+    return None
+
+
+class IndexMaintenanceManager:
+    def __init__(self):
+        self._pending_task: Optional[asyncio.Task] = None
+        self._run_lock = asyncio.Lock()
+        self._deleted_chunks_since_run = 0
+        self._last_run: Optional[Dict[str, Any]] = None
+
+    def note_deleted_chunks(self, count: int) -> None:
+        """Nach dem Commit einer Löschung aufrufen; plant eine Prüfung nach INDEX_MAINTENANCE_DELAY_SECONDS ein."""
+        if count <= 0:
+            return
+        self._deleted_chunks_since_run += count
+        if INDEX_MAINTENANCE_ENABLED and (self._pending_task is None or self._pending_task.done()):
+            self._pending_task = asyncio.create_task(self._check_after_delay())
+
+    async def _check_after_delay(self) -> None:
+        await asyncio.sleep(INDEX_MAINTENANCE_DELAY_SECONDS)
+        try:
+            table_stats = await self._table_stats()
+            action = recommend_maintenance(table_stats["live_tuples"], table_stats["dead_tuples"])
+            if action is None:
+                print(f"LOG_INDEX_MAINTENANCE: Keine Wartung nötig ({table_stats['dead_tuples']} tote von "
+                      f"{table_stats['live_tuples'] + table_stats['dead_tuples']} Tupeln in chunks).")
+                return
+            await self.run(action)
+        except Exception as e:
+            print(f"WARN_INDEX_MAINTENANCE: Geplante Index-Wartung fehlgeschlagen: {e}")
+
+    async def _table_stats(self) -> Dict[str, Any]:
+        async with async_engine.connect() as conn:
+            row = (await conn.execute(text(
+                "SELECT n_live_tup, n_dead_tup, last_vacuum, last_autovacuum FROM pg_stat_user_tables WHERE relname = 'chunks'"
+            ))).first()
+            index_rows = (await conn.execute(text(
+                "SELECT indexname, pg_relation_size(format('%I', indexname)::regclass) AS size_bytes FROM pg_indexes "
+                "WHERE tablename = 'chunks' AND indexname LIKE 'idx\\_chunk\\_embedding\\_%'"
+            ))).all()
+        return {
+            "live_tuples": int(row.n_live_tup) if row else 0,
+            "dead_tuples": int(row.n_dead_tup) if row else 0,
+            "last_vacuum": (row.last_vacuum or row.last_autovacuum) if row else None,
+            "vector_indexes": {r.indexname: int(r.size_bytes) for r in index_rows},
+        }
+
+    async def run(self, action: str) -> Dict[str, Any]:
+        """
+        Führt die Wartung sofort aus: "vacuum" = VACUUM (ANALYZE) chunks, "reindex" = REINDEX INDEX CONCURRENTLY
+        der Vektor-Indizes und danach VACUUM. Beides blockiert weder Suche noch Ingestion, braucht aber eine eigene
+        Verbindung außerhalb einer Transaktion (AUTOCOMMIT).
+        """
+        if action not in MAINTENANCE_ACTIONS:
+            raise ValueError(f"Unbekannte Wartung: {action} (erlaubt: {', '.join(MAINTENANCE_ACTIONS)})")
+        async with self._run_lock:
+            start_time = time.time()
+            async with async_engine.connect() as conn:
+                conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                if not (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})).scalar():
+                    print("LOG_INDEX_MAINTENANCE: Wartung läuft bereits in einem anderen Prozess, übersprungen.")
+                    return {"action": action, "skipped": True}
+                try:
+                    reindexed: List[str] = []
+                    with span(f"index_{action}"):
+                        if action == "reindex":
+                            index_names = (await conn.execute(text(
+                                "SELECT indexname FROM pg_indexes WHERE tablename = 'chunks' AND indexname LIKE 'idx\\_chunk\\_embedding\\_%'"
+                            ))).scalars().all()
+                            for index_name in index_names:
+                                await conn.execute(text(f"REINDEX INDEX CONCURRENTLY {index_name}"))
+                                reindexed.append(index_name)
+                        await conn.execute(text("VACUUM (ANALYZE) chunks"))
+                finally:
+                    await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+            self._last_run = {
+                "action": action,
+                "reindexed": reindexed,
+                "deleted_chunks_before": self._deleted_chunks_since_run,
+                "finished_at": time.time(),
+                "seconds": round(time.time() - start_time, 2),
+            }
+            self._deleted_chunks_since_run = 0
+            print(f"LOG_INDEX_MAINTENANCE: {action} abgeschlossen in {self._last_run['seconds']:.2f}s (neu aufgebaut: {reindexed or '-'}).")
+            return self._last_run
+
+    async def get_stats(self) -> Dict[str, Any]:
+        table_stats = await self._table_stats()
+        live, dead = table_stats["live_tuples"], table_stats["dead_tuples"]
+        return {
+            **table_stats,
+            "dead_ratio": round(dead / max(live + dead, 1), 4),
+            "recommendation": recommend_maintenance(live, dead),
+            "deleted_chunks_since_last_run": self._deleted_chunks_since_run,
+            "check_pending": bool(self._pending_task and not self._pending_task.done()),
+            "last_run": self._last_run,
+            "enabled": INDEX_MAINTENANCE_ENABLED,
+        }
+
+    async def shutdown(self) -> None:
+        if self._pending_task and not self._pending_task.done():
+            self._pending_task.cancel()
+            try:
+                await self._pending_task
+            except asyncio.CancelledError:
+                pass
+
+
+_index_maintenance_manager: Optional[IndexMaintenanceManager] = None
+
+def get_index_maintenance_manager() -> IndexMaintenanceManager:
+    global _index_maintenance_manager
+    if _index_maintenance_manager is None:
+        _index_maintenance_manager = IndexMaintenanceManager()
+    return _index_maintenance_manager
@@ -0,0 +1,367 @@
+# app/services/ingestion_jobs.py
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, List
+
+from app.core.config import TEMP_DIR, CACHE_DIR
+from app.core.observability import observe_stage
+
+# "process": Marker läuft in einem eigenen Prozess-Pool (Standard, CPU/torch-lastig)
+# "inline": Jobs laufen als asyncio-Tasks im API-Prozess (z.B. für Tests ohne Worker-Prozesse)
+# "external": die API reiht Jobs nur ein; verarbeitet werden sie vom separaten Dienst `python -m app.ingestion_worker`
+# (gleicher INGESTION_JOBS_DB_PATH und TEMP_DIR, z.B. geteiltes Volume). Die API lädt dann weder Marker noch torch.
+INGESTION_WORKER_MODE = os.getenv("INGESTION_WORKER_MODE", "process").lower()
+INGESTION_MAX_WORKERS = int(os.getenv("INGESTION_MAX_WORKERS", "1"))
+INGESTION_POLL_INTERVAL_SECONDS = float(os.getenv("INGESTION_POLL_INTERVAL_SECONDS", "1.0")) # nur externer Worker
+INGESTION_JOBS_DB_PATH = os.getenv("INGESTION_JOBS_DB_PATH", os.path.join(CACHE_DIR, "ingestion_jobs.sqlite3"))
+INGESTION_SPOOL_DIR = os.path.join(TEMP_DIR, "ingestion_jobs")
+os.makedirs(INGESTION_SPOOL_DIR, exist_ok=True)
+
+
+class IngestionJobStore:
+    """
+    SQLite-basierte Job-Tabelle. Jede Operation öffnet eine eigene Verbindung, damit
+    API-Prozess und Worker-Prozesse gleichzeitig lesen/schreiben können.
+    """
+
+    def __init__(self, db_path: str = INGESTION_JOBS_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ingestion_jobs ("
+                " id TEXT PRIMARY KEY, status TEXT NOT NULL, original_filename TEXT NOT NULL,"
+                " pdf_path TEXT NOT NULL, created_at REAL NOT NULL, started_at REAL, finished_at REAL,"
+                " current_stage TEXT, stage_timings TEXT NOT NULL DEFAULT '{}', result TEXT, error TEXT,"
+                " rechunk_existing INTEGER NOT NULL DEFAULT 0, processing_options TEXT)"
+            )
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(ingestion_jobs)")}
+            if "rechunk_existing" not in columns:
+                conn.execute("ALTER TABLE ingestion_jobs ADD COLUMN rechunk_existing INTEGER NOT NULL DEFAULT 0")
+            if "processing_options" not in columns:
+                conn.execute("ALTER TABLE ingestion_jobs ADD COLUMN processing_options TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_status ON ingestion_jobs(status)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create_job(
+        self, original_filename: str, pdf_path: str, job_id: Optional[str] = None, rechunk_existing: bool = False,
+        processing_options: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """processing_options: zusätzliche Argumente für process_pdf_data_and_store (z.B. Metadaten beim URL-Import)."""
+        job_id = job_id or uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO ingestion_jobs (id, status, original_filename, pdf_path, created_at, rechunk_existing, processing_options)"
+                " VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, original_filename, pdf_path, time.time(), int(rechunk_existing),
+                 json.dumps(processing_options) if processing_options else None),
+            )
+        return job_id
+
+    def mark_started(self, job_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE ingestion_jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def claim_job(self, job_id: str) -> bool:
+        """Setzt einen wartenden Job atomar auf 'running'; False, wenn ihn schon ein anderer Worker übernommen hat."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE ingestion_jobs SET status = 'running', started_at = ? WHERE id = ? AND status = 'queued'", (time.time(), job_id)
+            )
+        return cursor.rowcount == 1
+
+    def record_stage(self, job_id: str, stage: str, duration: Optional[float]) -> None:
+        """duration=None markiert den Beginn einer Stufe, sonst wird die Dauer aufsummiert."""
+        with self._connect() as conn:
+            if duration is None:
+                conn.execute("UPDATE ingestion_jobs SET current_stage = ? WHERE id = ?", (stage, job_id))
+                return
+            row = conn.execute("SELECT stage_timings FROM ingestion_jobs WHERE id = ?", (job_id,)).fetchone()
+            timings = json.loads(row["stage_timings"]) if row else {}
+            timings[stage] = round(timings.get(stage, 0.0) + duration, 3)
+            conn.execute("UPDATE ingestion_jobs SET stage_timings = ? WHERE id = ?", (json.dumps(timings), job_id))
+
+    def mark_finished(self, job_id: str, result: Dict[str, Any]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE ingestion_jobs SET status = 'succeeded', finished_at = ?, current_stage = NULL, result = ? WHERE id = ?",
+                (time.time(), json.dumps(result, default=str), job_id),
+            )
+
+    def mark_failed(self, job_id: str, error: str, result: Optional[Dict[str, Any]] = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE ingestion_jobs SET status = 'failed', finished_at = ?, error = ?, result = ? WHERE id = ?",
+                (time.time(), error, json.dumps(result, default=str) if result else None, job_id),
+            )
+
+    def requeue_unfinished(self) -> List[str]:
+        """Setzt nach einem Neustart hängengebliebene Jobs zurück auf 'queued' und gibt alle offenen IDs zurück."""
+        with self._connect() as conn:
+            conn.execute("UPDATE ingestion_jobs SET status = 'queued', started_at = NULL, current_stage = NULL WHERE status = 'running'")
+            rows = conn.execute("SELECT id FROM ingestion_jobs WHERE status = 'queued' ORDER BY created_at").fetchall()
+        return [row["id"] for row in rows]
+
+    def queued_job_ids(self) -> List[str]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id FROM ingestion_jobs WHERE status = 'queued' ORDER BY created_at").fetchall()
+        return [row["id"] for row in rows]
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM ingestion_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "original_filename": row["original_filename"],
+            "pdf_path": row["pdf_path"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "current_stage": row["current_stage"],
+            "stage_timings": json.loads(row["stage_timings"] or "{}"),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "rechunk_existing": bool(row["rechunk_existing"]),
+            "processing_options": json.loads(row["processing_options"]) if row["processing_options"] else {},
+        }
+
+
+# --- Worker-Seite (läuft im Worker-Prozess bzw. im API-Prozess im Modus "inline") ---
+
+def _get_worker_service():
+    """Ein PdfProcessingService pro Prozess; Marker-Modelle und Converter werden nur einmal erstellt."""
+    from app.dependencies import get_pdf_processing_service
+    return get_pdf_processing_service()
+
+
+# Ein Event-Loop pro Worker-Prozess für alle Jobs: Semaphoren, HTTP-Clients und DB-Pool des Prozesses sind an
+# den Loop gebunden, auf dem sie zuerst benutzt wurden (asyncio.run pro Job würde sie beim nächsten Job brechen)
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _get_worker_loop() -> asyncio.AbstractEventLoop:
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+    return _worker_loop
+
+
+def _init_worker_process() -> None:
+    """Initializer der Worker-Prozesse: lädt Marker vorab, statt den ersten Job damit zu belasten."""
+    from app.dependencies import MARKER_WARMUP_ON_STARTUP, warm_up_marker_converters
+    if MARKER_WARMUP_ON_STARTUP:
+        _get_worker_loop().run_until_complete(warm_up_marker_converters())
+
+
+def _worker_ready() -> bool:
+    return True
+
+
+def _read_spool_file(pdf_path: str) -> bytes:
+    with open(pdf_path, "rb") as f:
+        return f.read()
+
+
+async def _process_job(store: IngestionJobStore, job: Dict[str, Any]) -> None:
+    from app.db.session import AsyncSessionLocal
+
+    job_id = job["job_id"]
+    # SQLite- und Spool-Zugriffe im Thread-Pool: im Modus "inline" läuft das hier auf dem Event-Loop der API
+    if not await asyncio.to_thread(store.claim_job, job_id):
+        return
+    try:
+        pdf_bytes = await asyncio.to_thread(_read_spool_file, job["pdf_path"])
+        service = _get_worker_service()
+        async with AsyncSessionLocal() as db:
+            processing_result = await service.process_pdf_data_and_store(
+                db=db,
+                pdf_bytes=pdf_bytes,
+                original_doc_filename=job["original_filename"],
+                stage_callback=lambda stage, duration: store.record_stage(job_id, stage, duration),
+                rechunk_existing=job.get("rechunk_existing", False),
+                **job.get("processing_options", {}),
+            )
+        result_summary = {
+            "original_filename": job["original_filename"],
+            "processed_document_id": processing_result.metadata.get("processed_document_id"),
+            "num_chunks": len(processing_result.text_chunks),
+            "images": [img.dict() for img in processing_result.images],
+            "debug_message": processing_result.debug_message,
+            "deduplicated": processing_result.metadata.get("deduplicated", False),
+        }
+        processing_error = processing_result.metadata.get("error_processing_pdf")
+        if processing_error:
+            await asyncio.to_thread(store.mark_failed, job_id, processing_error, result_summary)
+        else:
+            await asyncio.to_thread(store.mark_finished, job_id, result_summary)
+        print(f"LOG_INGESTION_JOB: Job {job_id} ({job['original_filename']}) abgeschlossen. Fehler: {processing_error}")
+    except Exception as e:
+        print(f"ERROR_INGESTION_JOB: Job {job_id} fehlgeschlagen: {e}")
+        import traceback; traceback.print_exc()
+        await asyncio.to_thread(store.mark_failed, job_id, str(e))
+    finally:
+        if os.path.exists(job["pdf_path"]):
+            try: os.remove(job["pdf_path"])
+            except OSError as e_rm: print(f"WARN_INGESTION_JOB: Konnte Spool-Datei nicht löschen: {job['pdf_path']}, Fehler: {e_rm}")
+
+
+def run_ingestion_job_in_worker(job_id: str, store_path: str) -> None:
+    """Einstiegspunkt im Worker-Prozess: alle Jobs laufen auf dem langlebigen Loop des Prozesses (_get_worker_loop)."""
+    store = IngestionJobStore(store_path)
+    job = store.get_job(job_id)
+    if job is None or job["status"] != "queued":
+        return
+    _get_worker_loop().run_until_complete(_process_job(store, job))
+
+
+# --- API-Seite ---
+
+class IngestionJobManager:
+    def __init__(self, store: IngestionJobStore, mode: str = INGESTION_WORKER_MODE, max_workers: int = INGESTION_MAX_WORKERS):
+        self.store = store
+        self.mode = mode
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inline_semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: set = set()
+        self._active_job_ids: set = set() # verteilte, noch nicht beendete Jobs (externer Worker pollt sonst doppelt)
+
+    async def start(self) -> None:
+        if self.mode == "external":
+            # Nur einreihen: Verarbeitung (und Wiederaufnahme offener Jobs) übernimmt app.ingestion_worker
+            print("INFO_INGESTION: Job-Manager gestartet (Modus=external, Verarbeitung durch app.ingestion_worker).")
+            return
+        if self.mode == "process":
+            # "spawn": Worker erben keine Event-Loop-/DB-Verbindungen des API-Prozesses
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker_process,
+            )
+            # Worker sofort starten (und damit aufwärmen), nicht erst beim ersten Job
+            for _ in range(self.max_workers):
+                self._executor.submit(_worker_ready)
+        else:
+            self._inline_semaphore = asyncio.Semaphore(self.max_workers)
+        pending_job_ids = await asyncio.to_thread(self.store.requeue_unfinished)
+        for job_id in pending_job_ids:
+            self._dispatch(job_id)
+        print(f"INFO_INGESTION: Job-Manager gestartet (Modus={self.mode}, Worker={self.max_workers}, offene Jobs={len(pending_job_ids)}).")
+
+    async def shutdown(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        print("INFO_INGESTION: Job-Manager beendet.")
+
+    # Die öffentlichen Methoden laufen auf dem Event-Loop der API: Spool-Datei und SQLite (inkl. Commit/fsync)
+    # daher im Thread-Pool, nur das Verteilen (_dispatch) auf dem Loop selbst
+
+    async def enqueue(
+        self, pdf_bytes: bytes, original_filename: str, rechunk_existing: bool = False,
+        processing_options: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        job_id = uuid.uuid4().hex
+        await asyncio.to_thread(self._spool_and_create_job, job_id, pdf_bytes, original_filename, rechunk_existing, processing_options)
+        if self.mode != "external":
+            self._dispatch(job_id)
+        print(f"LOG_INGESTION: Job {job_id} für '{original_filename}' eingereiht.")
+        return job_id
+
+    def _spool_and_create_job(
+        self, job_id: str, pdf_bytes: bytes, original_filename: str, rechunk_existing: bool,
+        processing_options: Optional[Dict[str, Any]],
+    ) -> None:
+        pdf_path = os.path.join(INGESTION_SPOOL_DIR, f"{job_id}.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(pdf_bytes)
+        self.store.create_job(
+            original_filename, pdf_path, job_id=job_id, rechunk_existing=rechunk_existing, processing_options=processing_options,
+        )
+
+    async def record_completed(self, original_filename: str, result: Dict[str, Any]) -> str:
+        """Legt einen sofort abgeschlossenen Job an (z.B. Duplikat), ohne die Worker-Queue zu belegen."""
+        return await asyncio.to_thread(self._create_completed_job, original_filename, result)
+
+    def _create_completed_job(self, original_filename: str, result: Dict[str, Any]) -> str:
+        job_id = self.store.create_job(original_filename, pdf_path="")
+        self.store.mark_started(job_id)
+        self.store.mark_finished(job_id, result)
+        return job_id
+
+    def _dispatch(self, job_id: str) -> None:
+        if self.mode == "process":
+            if self._executor is None:
+                raise RuntimeError("Ingestion-Job-Manager wurde nicht gestartet.")
+            task = asyncio.create_task(self._run_in_process(job_id))
+        else:
+            task = asyncio.create_task(self._run_inline(job_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self._active_job_ids.add(job_id)
+        task.add_done_callback(lambda _task: self._active_job_ids.discard(job_id))
+
+    async def _run_in_process(self, job_id: str) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, run_ingestion_job_in_worker, job_id, self.store.db_path)
+            # Metriken des Worker-Prozesses landen nicht in /metrics dieses Prozesses - Stufen-Dauern aus dem Job übernehmen
+            job = await self.get_job(job_id)
+            if job:
+                outcome = "ok" if job["status"] == "succeeded" else "error"
+                for stage, duration in job["stage_timings"].items():
+                    observe_stage(f"ingest_{stage}", duration, outcome)
+        except Exception as e:
+            # z.B. BrokenProcessPool, wenn ein Worker abstürzt (OOM in Marker/torch)
+            print(f"ERROR_INGESTION: Worker-Prozess für Job {job_id} fehlgeschlagen: {e}")
+            job = await self.get_job(job_id)
+            if job and job["status"] in ("queued", "running"):
+                await asyncio.to_thread(self.store.mark_failed, job_id, f"Worker-Prozess abgebrochen: {e}")
+
+    async def _run_inline(self, job_id: str) -> None:
+        async with self._inline_semaphore:
+            job = await self.get_job(job_id)
+            if job and job["status"] == "queued":
+                await _process_job(self.store, job)
+
+    async def run_worker_loop(self, stop_event: asyncio.Event, poll_interval: float = INGESTION_POLL_INTERVAL_SECONDS) -> None:
+        """
+        Hauptschleife des externen Workers: holt neu eingereihte Jobs aus der Job-Tabelle und verteilt sie auf die
+        eigenen Worker (Modus process/inline), bis stop_event gesetzt ist. start() muss vorher gelaufen sein.
+        """
+        while not stop_event.is_set():
+            for job_id in await asyncio.to_thread(self.store.queued_job_ids):
+                if job_id not in self._active_job_ids:
+                    self._dispatch(job_id)
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.store.get_job, job_id)
+
+
+_ingestion_job_manager: Optional[IngestionJobManager] = None
+
+def get_ingestion_job_manager() -> IngestionJobManager:
+    global _ingestion_job_manager
+    if _ingestion_job_manager is None:
+        _ingestion_job_manager = IngestionJobManager(IngestionJobStore())
+    return _ingestion_job_manager
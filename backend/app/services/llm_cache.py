@@ -0,0 +1,131 @@
+# app/services/llm_cache.py
+import os
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+
+
+def make_llm_cache_key(provider: str, model_name: str, temperature: Any, rendered_prompt: str) -> str:
+    """Gleicher (fertig gerenderter) Prompt + gleiches Modell/Temperatur -> gleicher Cache-Eintrag."""
+    prompt_hash = hashlib.sha256(rendered_prompt.encode("utf-8")).hexdigest()
+    return f"{provider}|{model_name}|{temperature}|{prompt_hash}"
+
+
+class LLMResponseCache:
+    """
+    In-Process-Cache für LLM-Antworten mit TTL und LRU-Verdrängung.
+    Zusätzlich "Single-Flight": gleichzeitige Anfragen mit demselben Schlüssel warten auf denselben
+    Upstream-Aufruf, statt ihn mehrfach auszulösen. Fehler werden nicht gecacht.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        # Schlüssel -> (Ablaufzeit, Antwort, Dauer des ursprünglichen LLM-Aufrufs)
+        self._entries: "OrderedDict[str, Tuple[float, str, float]]" = OrderedDict()
+        self._inflight: Dict[str, "asyncio.Future[Tuple[str, float]]"] = {}
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expired": 0, "errors": 0}
+        self._saved_seconds = 0.0
+
+    def _get_fresh(self, key: str) -> Optional[Tuple[str, float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, upstream_seconds = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self._stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return value, upstream_seconds
+
+    def _store(self, key: str, value: str, upstream_seconds: float) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value, upstream_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        """
+        Liefert die gecachte Antwort oder führt `compute` aus. Läuft für `key` bereits ein Aufruf,
+        wird auf dessen Ergebnis gewartet (auch dessen Exception wird weitergereicht). Wird der
+        laufende Aufruf abgebrochen (z.B. SSE-Client getrennt), übernimmt ein Wartender die Berechnung.
+        """
+        while True:
+            cached = self._get_fresh(key)
+            if cached is not None:
+                self._stats["hits"] += 1
+                self._saved_seconds += cached[1]
+                return cached[0]
+
+            inflight = self._inflight.get(key)
+            if inflight is None or inflight.done() or inflight.get_loop() is not asyncio.get_running_loop():
+                break
+            outcome = await asyncio.shield(inflight)
+            if outcome is None:
+                # Leader wurde abgebrochen - nicht an die Wartenden weitergeben, der erste wird neuer Leader
+                continue
+            value, upstream_seconds = outcome
+            self._stats["coalesced"] += 1
+            self._saved_seconds += upstream_seconds
+            return value
+
+        self._stats["misses"] += 1
+        # Ergebnis für Wartende: (Antwort, Dauer) oder None, wenn dieser Aufruf abgebrochen wurde
+        future: "asyncio.Future[Optional[Tuple[str, float]]]" = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        start_time = time.perf_counter()
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.set_result(None)
+            raise
+        except Exception as e:
+            self._stats["errors"] += 1
+            future.set_exception(e)
+            future.exception()  # als abgerufen markieren, falls niemand wartet
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        upstream_seconds = time.perf_counter() - start_time
+        self._store(key, value, upstream_seconds)
+        future.set_result((value, upstream_seconds))
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"] + self._stats["coalesced"]
+        served_without_call = self._stats["hits"] + self._stats["coalesced"]
+        return {
+            "enabled": True,
+            **self._stats,
+            "hit_ratio": round(served_without_call / lookups, 4) if lookups else 0.0,
+            "saved_latency_seconds": round(self._saved_seconds, 3),
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+_llm_response_cache: Optional[LLMResponseCache] = None
+
+def get_llm_response_cache() -> Optional[LLMResponseCache]:
+    """Prozessweiter Cache (lazy). None, wenn per LLM_CACHE_ENABLED deaktiviert."""
+    global _llm_response_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _llm_response_cache is None:
+        _llm_response_cache = LLMResponseCache(LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES)
+        print(f"LOG_LLM_CACHE: LLM-Antwort-Cache aktiv (TTL {LLM_CACHE_TTL_SECONDS:.0f}s, max. {LLM_CACHE_MAX_ENTRIES} Einträge).")
+    return _llm_response_cache
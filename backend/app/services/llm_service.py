@@ -1,23 +1,28 @@
 # app/services/llm_service.py
 import os
-from typing import List, Dict, Any, Optional
-from langchain_google_genai import ChatGoogleGenerativeAI
+import re
+import json
+from typing import List, Dict, Any, Optional, AsyncIterator
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
 import time
 
+from .llm_cache import get_llm_response_cache, make_llm_cache_key
+from app.core.observability import observe_stage, log_debug
+
 load_dotenv()
 
-LLM_PROVIDER = os.getenv("LLM_PROVIDER", "google").lower() # "google" oder später "ollama"
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "google").lower() # "google", "fake" (Benchmarks) oder später "ollama"
 # Die Dimension hier ist nicht direkt für den LLM-Call relevant, aber gut zu wissen
 EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIMENSION", "768"))
 
 _google_chat_model = None
+_fake_chat_model = None
 # _ollama_chat_model = None # Für später
 
 def get_llm_chat_model(provider: str = LLM_PROVIDER):
-    global _google_chat_model #, _ollama_chat_model
+    global _google_chat_model, _fake_chat_model #, _ollama_chat_model
     
     if provider == "google":
         if _google_chat_model is None:
@@ -32,6 +37,8 @@ def get_llm_chat_model(provider: str = LLM_PROVIDER):
             try:
                 # convert_system_message_to_human=True kann bei manchen Gemini-Versionen helfen,
                 # wenn System-Prompts nicht direkt unterstützt werden oder anders behandelt werden.
+                # SDK erst bei der ersten Nutzung laden (kurzer Kaltstart der API)
+                from langchain_google_genai import ChatGoogleGenerativeAI
                 _google_chat_model = ChatGoogleGenerativeAI(
                     model=model_name,
                     google_api_key=api_key,
@@ -42,6 +49,13 @@ def get_llm_chat_model(provider: str = LLM_PROVIDER):
             except Exception as e:
                 print(f"ERROR_LLM: Fehler Init Google Chat-Modell: {e}"); return None
         return _google_chat_model
+    elif provider == "fake":
+        # Deterministische Antworten mit einstellbarer Latenz/Fehlerquote für Last-Tests (siehe fake_providers)
+        if _fake_chat_model is None:
+            print("LOG_LLM: Initialisiere Fake-Chat-Modell (LLM_PROVIDER=fake).")
+            from .fake_providers import FakeChatModel
+            _fake_chat_model = FakeChatModel()
+        return _fake_chat_model
     # elif provider == "ollama":
         # ... (Implementierung für Ollama Chat später)
     else:
@@ -60,33 +74,72 @@ async def generate_text_with_llm(
         print(f"WARN_LLM: Chat-Modell für Provider '{provider}' nicht verfügbar.")
         return "Fehler: Sprachmodell nicht verfügbar."
 
-    print(f"LOG_LLM: Generiere Text mit Provider '{provider}'. Prompt-Template (Auszug): {prompt_template_str[:100]}...")
-    print(f"LOG_LLM_TIMING: [{time.strftime('%H:%M:%S')}] Generiere Text mit Provider '{provider}'.")
+    log_debug("LOG_LLM", "Generiere Text mit Provider '%s'. Prompt-Template (Auszug): %s...", provider, prompt_template_str[:100])
+    invoke_start_time = time.perf_counter()
     try:
         prompt = ChatPromptTemplate.from_template(prompt_template_str)
         output_parser = StrOutputParser()
         
         # Erstelle die Kette: Prompt -> LLM -> Output Parser
         chain = prompt | chat_model | output_parser
-        
-        # Führe die Kette mit den Kontextdaten aus
-        # Langchain's invoke ist jetzt asynchron für async llms
-        generated_text = await chain.ainvoke(context_data)
-        
-        print(f"LOG_LLM: Text erfolgreich generiert (Auszug): {generated_text[:100]}...")
-        invoke_start_time = time.time()
-        generated_text = await chain.ainvoke(context_data)
-        invoke_duration = time.time() - invoke_start_time
-        print(f"LOG_LLM_TIMING: [{time.strftime('%H:%M:%S')}] LLM-Aufruf (chain.ainvoke) beendet. Dauer: {invoke_duration:.2f}s.")
+
+        async def invoke_chain() -> str:
+            # Langchain's invoke ist jetzt asynchron für async llms
+            return await chain.ainvoke(context_data)
+
+        cache = get_llm_response_cache()
+        if cache is None:
+            generated_text = await invoke_chain()
+        else:
+            # Schlüssel über den fertig gerenderten Prompt, nicht über Template + Daten getrennt
+            rendered_prompt = prompt.format(**context_data)
+            cache_key = make_llm_cache_key(
+                provider, getattr(chat_model, "model", ""), getattr(chat_model, "temperature", None), rendered_prompt
+            )
+            generated_text = await cache.get_or_compute(cache_key, invoke_chain)
+
+        observe_stage("llm_generate", time.perf_counter() - invoke_start_time)
+        log_debug("LOG_LLM", "Text erfolgreich generiert (Auszug): %s...", generated_text[:100])
         return generated_text
     except Exception as e:
-        print(f"ERROR_LLM: Fehler bei der Textgenerierung mit '{provider}': {e}")
-        invoke_duration_error = time.time() - invoke_start_time if 'invoke_start_time' in locals() else -1
-        print(f"ERROR_LLM_TIMING: LLM Fehler nach {invoke_duration_error:.2f}s: {e}")
+        observe_stage("llm_generate", time.perf_counter() - invoke_start_time, outcome="error")
+        print(f"ERROR_LLM: Fehler bei der Textgenerierung mit '{provider}' nach {time.perf_counter() - invoke_start_time:.2f}s: {e}")
         import traceback; traceback.print_exc()
         return f"Fehler bei der Textgenerierung: {str(e)}"
 
 
+def get_llm_cache_stats() -> Dict[str, Any]:
+    cache = get_llm_response_cache()
+    return cache.stats() if cache else {"enabled": False}
+
+
+async def stream_text_with_llm(
+    prompt_template_str: str,
+    context_data: Dict[str, Any],
+    provider: str = LLM_PROVIDER
+) -> AsyncIterator[str]:
+    """
+    Wie `generate_text_with_llm`, liefert den Text aber stückweise (chain.astream), sobald das Modell ihn erzeugt.
+    Fehler des Modells werden an den Aufrufer weitergereicht.
+    """
+    chat_model = get_llm_chat_model(provider)
+    if not chat_model:
+        print(f"WARN_LLM: Chat-Modell für Provider '{provider}' nicht verfügbar.")
+        yield "Fehler: Sprachmodell nicht verfügbar."
+        return
+
+    prompt = ChatPromptTemplate.from_template(prompt_template_str)
+    chain = prompt | chat_model | StrOutputParser()
+    stream_start_time = time.perf_counter()
+    first_token_time: Optional[float] = None
+    async for token in chain.astream(context_data):
+        if first_token_time is None:
+            first_token_time = time.perf_counter() - stream_start_time
+            observe_stage("llm_first_token", first_token_time)
+        yield token
+    observe_stage("llm_stream", time.perf_counter() - stream_start_time)
+
+
 # --- Funktion für arXiv Suche ---
 ARXIV_QUERY_PROMPT_TEMPLATE = """
 Basierend auf dem folgenden Kontext und der Nutzeranfrage, formuliere EINE prägnante Suchanfrage für die wissenschaftliche Datenbank arXiv.
@@ -112,6 +165,19 @@ Abstract:
 Zusammenfassung (1-2 Sätze):
 """.strip()
 
+# Mehrere Abstracts in einem Aufruf; doppelte geschweifte Klammern, da ChatPromptTemplate {..} als Variable liest
+ARXIV_ABSTRACT_BATCH_SUMMARY_PROMPT_TEMPLATE = """
+Fasse jeden der folgenden wissenschaftlichen Abstracts in 1-2 prägnanten Sätzen für eine schnelle Übersicht zusammen.
+Betone jeweils das Hauptergebnis, die Hauptmethode oder die Kernfrage des Papers.
+Antworte AUSSCHLIESSLICH mit einem JSON-Array, ein Objekt pro Abstract in derselben Reihenfolge, ohne weiteren Text:
+[{{"index": 0, "summary": "..."}}, {{"index": 1, "summary": "..."}}]
+
+Abstracts:
+{abstracts}
+
+JSON-Array:
+""".strip()
+
 async def generate_arxiv_search_query(context_text: Optional[str], user_prompt: Optional[str]) -> str:
     context_data = {
         "context_text": context_text or "Kein spezifischer Kontext vorhanden.",
@@ -143,4 +209,57 @@ async def summarize_arxiv_abstract(abstract: str) -> str:
     cleaned_summary = summary.replace("Zusammenfassung (1-2 Sätze):", "").strip()
     if not cleaned_summary:
         return "Zusammenfassung konnte nicht generiert werden."
-    return cleaned_summary
\ No newline at end of file
+    return cleaned_summary
+
+
+def parse_batch_summaries(raw_response: Optional[str], expected_count: int) -> List[Optional[str]]:
+    """
+    Liest die JSON-Antwort der Batch-Zusammenfassung. Liefert pro Abstract die Zusammenfassung oder None,
+    wenn der Eintrag fehlt/unbrauchbar ist (der Aufrufer fasst diese einzeln zusammen).
+    """
+    summaries: List[Optional[str]] = [None] * expected_count
+    if not raw_response or raw_response.startswith("Fehler"):
+        return summaries
+    # Modelle umschließen JSON gern mit ```json ... ``` oder Begleittext -> äußerstes Array herausschneiden
+    match = re.search(r"\[.*\]", raw_response, re.DOTALL)
+    if not match:
+        return summaries
+    try:
+        items = json.loads(match.group(0))
+    except json.JSONDecodeError as e:
+        print(f"WARN_LLM_ARXIV: Batch-Zusammenfassung ist kein gültiges JSON: {e}")
+        return summaries
+    if not isinstance(items, list):
+        return summaries
+
+    for position, item in enumerate(items):
+        if isinstance(item, dict):
+            index, summary = item.get("index", position), item.get("summary")
+        else:
+            index, summary = position, item
+        if isinstance(index, int) and 0 <= index < expected_count and isinstance(summary, str) and summary.strip():
+            summaries[index] = summary.strip()
+    return summaries
+
+
+class BatchSummaryUnavailableError(Exception):
+    """Der Batch-Aufruf selbst ist fehlgeschlagen (Rate-Limit, Timeout, Modell nicht verfügbar) - keine Antwort erhalten."""
+
+
+async def summarize_arxiv_abstracts_batch(abstracts: List[str]) -> List[Optional[str]]:
+    """
+    Fasst mehrere Abstracts mit EINEM LLM-Aufruf zusammen (JSON-Array). None = Eintrag nicht lesbar.
+    BatchSummaryUnavailableError, wenn der Aufruf selbst fehlschlägt.
+    """
+    if not abstracts:
+        return []
+    numbered_abstracts = "\n\n".join(f"[{i}] {abstract}" for i, abstract in enumerate(abstracts))
+    raw_response = await generate_text_with_llm(ARXIV_ABSTRACT_BATCH_SUMMARY_PROMPT_TEMPLATE, {"abstracts": numbered_abstracts})
+    # generate_text_with_llm meldet Fehler als Text ("Fehler: ..." bzw. "Fehler bei der Textgenerierung: ...")
+    if raw_response and raw_response.startswith("Fehler"):
+        raise BatchSummaryUnavailableError(raw_response)
+    summaries = parse_batch_summaries(raw_response, len(abstracts))
+    missing = sum(1 for s in summaries if s is None)
+    if missing:
+        print(f"WARN_LLM_ARXIV: Batch-Zusammenfassung: {missing} von {len(abstracts)} Einträgen nicht lesbar.")
+    return summaries
@@ -0,0 +1,206 @@
+# app/services/markdown_chunker.py
+import re
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# Seitenmarker im Marker-Markdown (Seiten 0-basiert): <span id="page-N-..."></span> und Bildnamen mit _page_N_
+PAGE_MARKER_PATTERN = re.compile(
+    r'(<span id="page-(\d+)-[^"]*"></span>)|(!\[.*?\]\([^_]*_page_(\d+)_.*?\))',
+    re.IGNORECASE,
+)
+PAGE_SPAN_PATTERN = re.compile(r'<span id="page-\d+-[^"]*"></span>', re.IGNORECASE)
+CHUNK_SEPARATORS = ["\n\n\n", "\n\n", "\n", ". ", "! ", "? ", "; ", ", ", "\u200b", " ", ""]
+
+# Der Puffer wird erst gesplittet, wenn er dieses Vielfache der Chunk-Größe erreicht. Chunks, die in das letzte
+# Chunk-Größen-Fenster reichen, bleiben im Puffer, weil sie sich mit dem nächsten Segment noch ändern können.
+_BUFFER_FACTOR = 4
+# Marker bzw. TOC-Titel, die über eine Segmentgrenze reichen, werden beim nächsten Segment noch gefunden
+_MARKER_LOOKBACK_CHARS = 512
+
+
+def iter_markdown_pages(markdown_text: str) -> Iterator[str]:
+    """Zerlegt das Marker-Markdown an den page-N-Spans in Seiten-Segmente (zusammengesetzt wieder der Originaltext)."""
+    start = 0
+    for match in PAGE_SPAN_PATTERN.finditer(markdown_text):
+        if match.start() > start:
+            yield markdown_text[start:match.start()]
+            start = match.start()
+    if start < len(markdown_text):
+        yield markdown_text[start:]
+
+
+class PageIndex:
+    """Sortierte Marker-Positionen (global im Markdown) mit 0-basierter Seite; Seitenzuordnung per Binärsuche."""
+
+    def __init__(self):
+        self.offsets: List[int] = []
+        self.pages: List[int] = []
+        self._last_pos = -1
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def add(self, pos: int, page_0_idx: int) -> None:
+        # Deduplizierung wie beim bisherigen globalen Chunking: aufeinanderfolgende Marker derselben Seite zählen
+        # einmal, bei gleicher Position gewinnt die kleinere Seite. Marker vor der letzten Position werden ignoriert.
+        if pos > self._last_pos:
+            if not self.pages or page_0_idx != self.pages[-1]:
+                self.offsets.append(pos)
+                self.pages.append(page_0_idx)
+            self._last_pos = pos
+        elif pos == self._last_pos and self.pages and page_0_idx < self.pages[-1]:
+            self.offsets[-1] = pos
+            self.pages[-1] = page_0_idx
+
+    def page_at(self, pos: int) -> int:
+        """1-basierte Seite des letzten Markers bis `pos`; vor dem ersten Marker dessen Seite, ohne Marker Seite 1."""
+        if not self.offsets:
+            return 1
+        i = bisect_right(self.offsets, pos) - 1
+        return self.pages[max(i, 0)] + 1
+
+
+def _toc_title_patterns(toc: Optional[List[Dict[str, Any]]]) -> List[Tuple[re.Pattern, int]]:
+    patterns = []
+    for item in toc if isinstance(toc, list) else []:
+        if not (isinstance(item, dict) and "title" in item and "page_id" in item):
+            continue
+        try:
+            title = str(item["title"]).strip()
+            page_id = int(item["page_id"])
+        except (TypeError, ValueError):
+            continue
+        if title:
+            patterns.append((re.compile(re.escape(title), re.IGNORECASE), page_id))
+    return patterns
+
+
+class StreamingMarkdownChunker:
+    """
+    Inkrementelles Chunking: Markdown-Segmente (z.B. Seiten) werden per feed() angehängt, fertige Chunks sofort
+    geliefert. Im Speicher bleibt nur der noch nicht ausgegebene Rest; jeder Chunk trägt seine exakte Position
+    (char_start/char_end, global im zusammengesetzten Markdown) und die per Binärsuche zugeordnete Seite.
+    """
+
+    def __init__(self, toc: Optional[List[Dict[str, Any]]] = None, max_chunk_chars: int = 1500, chunk_overlap_ratio: float = 0.1):
+        self.max_chunk_chars = max_chunk_chars
+        self.chunk_overlap = int(max_chunk_chars * chunk_overlap_ratio)
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=max_chunk_chars,
+            chunk_overlap=self.chunk_overlap,
+            length_function=len,
+            separators=CHUNK_SEPARATORS,
+            keep_separator=True,
+        )
+        self.page_index = PageIndex()
+        self.chunk_count = 0
+        self.total_chars = 0
+        self._open_toc_titles = _toc_title_patterns(toc) # TOC-Titel zählen nur beim ersten Vorkommen
+        self._lookback = max([_MARKER_LOOKBACK_CHARS] + [len(p.pattern) for p, _ in self._open_toc_titles])
+        self._flush_at = max_chunk_chars * _BUFFER_FACTOR
+        self._buffer = ""
+        self._buffer_base = 0 # globale Position von _buffer[0]
+
+    def feed(self, segment: str) -> Iterator[Dict[str, Any]]:
+        if not segment:
+            return
+        scanned_until = self._buffer_base + len(self._buffer)
+        self._buffer += segment
+        self.total_chars += len(segment)
+        self._scan_markers(scanned_until)
+        if len(self._buffer) >= self._flush_at:
+            yield from self._emit(final=False)
+
+    def finish(self) -> Iterator[Dict[str, Any]]:
+        yield from self._emit(final=True)
+        if not self.chunk_count and self._buffer.strip():
+            # Fallback wie bisher: der Splitter hat nichts geliefert, der Text ist aber nicht leer
+            content = self._buffer.strip()
+            start = self._buffer_base + self._buffer.index(content)
+            self.chunk_count += 1
+            yield self._chunk_dict(content, start, page_number=1)
+        print(f"LOG_STREAM_CHUNK: Chunking abgeschlossen. {self.chunk_count} Chunks, {len(self.page_index)} Seiten-Indikatoren, Textlänge: {self.total_chars}")
+
+    def _scan_markers(self, scanned_until: int) -> None:
+        # Nur das neue Segment plus ein kurzes Stück davor durchsuchen; bereits gefundene Marker werden übersprungen
+        window_start = max(scanned_until - self._lookback, self._buffer_base)
+        window = self._buffer[window_start - self._buffer_base:]
+        found: List[Tuple[int, int]] = []
+        for match in PAGE_MARKER_PATTERN.finditer(window):
+            if window_start + match.end() <= scanned_until:
+                continue
+            found.append((window_start + match.start(), int(match.group(2) or match.group(4))))
+        still_open = []
+        for title_pattern, page_id in self._open_toc_titles:
+            match = title_pattern.search(window)
+            if match:
+                found.append((window_start + match.start(), page_id))
+            else:
+                still_open.append((title_pattern, page_id))
+        self._open_toc_titles = still_open
+        for pos, page_0_idx in sorted(found):
+            self.page_index.add(pos, page_0_idx)
+
+    def _locate_chunks(self, raw_chunks: List[str]) -> List[Tuple[int, str]]:
+        """Startposition jedes Chunks im Puffer: Suche ab dem frühestmöglichen Start (Ende des Vorgängers minus Overlap)."""
+        located: List[Tuple[int, str]] = []
+        index, previous_len = 0, 0
+        for chunk_text in raw_chunks:
+            search_from = max(0, index + previous_len - self.chunk_overlap) if located else 0
+            found_at = self._buffer.find(chunk_text, search_from)
+            if found_at < 0:
+                found_at = self._buffer.find(chunk_text, index)
+            if found_at < 0:
+                found_at = index
+            index, previous_len = found_at, len(chunk_text)
+            located.append((found_at, chunk_text))
+        return located
+
+    def _emit(self, final: bool) -> Iterator[Dict[str, Any]]:
+        if not self._buffer:
+            return
+        located = self._locate_chunks(self.text_splitter.split_text(self._buffer))
+        if final:
+            ready, keep_from = located, len(self._buffer)
+        else:
+            safe_end = len(self._buffer) - self.max_chunk_chars
+            ready_count = 0
+            while ready_count < len(located) - 1 and located[ready_count][0] + len(located[ready_count][1]) <= safe_end:
+                ready_count += 1
+            if not ready_count:
+                return
+            ready, keep_from = located[:ready_count], located[ready_count][0]
+        for start, chunk_text in ready:
+            content = chunk_text.strip()
+            if not content:
+                continue
+            global_start = self._buffer_base + start + (len(chunk_text) - len(chunk_text.lstrip()))
+            self.chunk_count += 1
+            yield self._chunk_dict(content, global_start, self.page_index.page_at(global_start))
+        if self.chunk_count or not final:
+            self._buffer = self._buffer[keep_from:]
+            self._buffer_base += keep_from
+
+    def _chunk_dict(self, content: str, char_start: int, page_number: int) -> Dict[str, Any]:
+        return {
+            "content": content,
+            "page_number": page_number,
+            "char_count": len(content),
+            "char_start": char_start,
+            "char_end": char_start + len(content),
+        }
+
+
+def iter_markdown_chunks(
+    markdown_segments: Iterable[str],
+    toc: Optional[List[Dict[str, Any]]] = None,
+    max_chunk_chars: int = 1500,
+    chunk_overlap_ratio: float = 0.1,
+) -> Iterator[Dict[str, Any]]:
+    """Generator über die Chunks einer Folge von Markdown-Segmenten (siehe StreamingMarkdownChunker)."""
+    chunker = StreamingMarkdownChunker(toc, max_chunk_chars, chunk_overlap_ratio)
+    for segment in markdown_segments:
+        yield from chunker.feed(segment)
+    yield from chunker.finish()
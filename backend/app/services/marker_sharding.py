@@ -0,0 +1,137 @@
+# app/services/marker_sharding.py
+import os
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+# Seitenweise Parallelisierung von Marker für große PDFs: die PDF wird in Seitenfenster geteilt, die Fenster
+# laufen in einem eigenen Prozess-Pool (Modelle einmal pro Worker geladen) und werden danach wieder zusammengesetzt.
+# 0 = aus. Jeder Worker lädt die Marker-Modelle selbst (mehrere GB RAM/VRAM pro Worker).
+MARKER_SHARD_WORKERS = int(os.getenv("MARKER_SHARD_WORKERS", "0"))
+MARKER_SHARD_PAGES = int(os.getenv("MARKER_SHARD_PAGES", "20")) # Seiten pro Fenster
+MARKER_SHARD_MIN_PAGES = int(os.getenv("MARKER_SHARD_MIN_PAGES", "40")) # kleinere PDFs laufen wie bisher am Stück
+
+MarkerOutput = Tuple[str, Dict[str, Any], Dict[str, Any]] # (Markdown, Metadaten, Bilder) wie text_from_rendered
+
+
+def plan_page_windows(page_count: int, window_size: int) -> List[Tuple[int, int]]:
+    """Seitenfenster als (erste, letzte) 0-basierte Seite, beide inklusive."""
+    window_size = max(1, window_size)
+    return [(start, min(start + window_size, page_count) - 1) for start in range(0, page_count, window_size)]
+
+
+def merge_marker_outputs(parts: List[MarkerOutput]) -> MarkerOutput:
+    """
+    Setzt die Ergebnisse der Seitenfenster in Seitenreihenfolge zusammen. Marker behält bei page_range die
+    Original-Seitennummern (page-N-Spans, _page_N_-Bildnamen, page_id im TOC), daher funktioniert die
+    Seitenzuordnung im Chunker (markdown_chunker) unverändert.
+    """
+    markdown_parts: List[str] = []
+    merged_meta: Dict[str, Any] = {}
+    merged_images: Dict[str, Any] = {}
+    for markdown, meta, images in parts:
+        if markdown and markdown.strip():
+            markdown_parts.append(markdown.strip("\n"))
+        for key, value in (meta or {}).items():
+            if isinstance(value, list):
+                # z.B. table_of_contents, page_stats
+                merged_meta.setdefault(key, []).extend(value)
+            else:
+                merged_meta.setdefault(key, value)
+        merged_images.update(images or {})
+    return "\n\n".join(markdown_parts), merged_meta, merged_images
+
+
+# --- Worker-Seite ---
+
+def _init_shard_worker(torch_threads: int) -> None:
+    """Lädt die Marker-Modelle einmal pro Worker und teilt die CPU-Threads zwischen den Workern auf."""
+    try:
+        import torch
+        torch.set_num_threads(max(1, torch_threads))
+    except ImportError:
+        pass
+    from app.dependencies import get_marker_resources
+    get_marker_resources()
+
+
+def _convert_page_window(pdf_path: str, first_page: int, last_page: int) -> MarkerOutput:
+    from marker.output import text_from_rendered
+    from app.dependencies import get_marker_resources, create_pdf_converter
+
+    marker_res = get_marker_resources()
+    config = dict(marker_res["config"], page_range=f"{first_page}-{last_page}")
+    converter = create_pdf_converter(marker_res["artifact_dict"], config)
+    window_start = time.perf_counter()
+    rendered_obj = converter(pdf_path)
+    if not rendered_obj:
+        raise ValueError(f"Marker gab für Seiten {first_page}-{last_page} kein Objekt zurück.")
+    markdown, meta, images = text_from_rendered(rendered_obj)
+    print(f"LOG_MARKER_SHARD: Seiten {first_page}-{last_page} in {time.perf_counter() - window_start:.1f}s konvertiert (PID {os.getpid()}).")
+    return markdown, meta if isinstance(meta, dict) else {}, images or {}
+
+
+def _worker_ready() -> bool:
+    return True
+
+
+# --- API-/Ingestion-Seite ---
+
+class MarkerShardPool:
+    def __init__(self, workers: int, window_size: int, min_pages: int):
+        self.workers = max(1, workers)
+        self.window_size = max(1, window_size)
+        self.min_pages = min_pages
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def should_shard(self, page_count: Optional[int]) -> bool:
+        return bool(page_count) and page_count >= max(self.min_pages, 2) and page_count > self.window_size
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            torch_threads = max(1, (os.cpu_count() or 1) // self.workers)
+            # "spawn": Worker erben keine Event-Loop-/DB-Verbindungen und keinen (nicht fork-sicheren) torch-Zustand
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_shard_worker,
+                initargs=(torch_threads,),
+            )
+            print(f"INFO_MARKER_SHARD: Prozess-Pool mit {self.workers} Workern gestartet (torch-Threads je Worker: {torch_threads}).")
+        return self._executor
+
+    async def warm_up(self) -> None:
+        """Startet alle Worker (und damit das Laden der Modelle), bevor die erste große PDF kommt."""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(*(loop.run_in_executor(executor, _worker_ready) for _ in range(self.workers)))
+
+    async def convert(self, pdf_path: str, page_count: int) -> MarkerOutput:
+        windows = plan_page_windows(page_count, self.window_size)
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        convert_start = time.perf_counter()
+        parts = await asyncio.gather(
+            *(loop.run_in_executor(executor, _convert_page_window, pdf_path, first, last) for first, last in windows)
+        )
+        print(f"LOG_MARKER_SHARD: {page_count} Seiten in {len(windows)} Fenstern mit {self.workers} Workern konvertiert. Dauer: {time.perf_counter() - convert_start:.1f}s")
+        return merge_marker_outputs(list(parts))
+
+    def shutdown(self) -> None:
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_marker_shard_pool: Optional[MarkerShardPool] = None
+
+def get_marker_shard_pool() -> Optional[MarkerShardPool]:
+    """Prozessweiter Pool (lazy). None, wenn MARKER_SHARD_WORKERS = 0 (Sharding aus)."""
+    global _marker_shard_pool
+    if MARKER_SHARD_WORKERS <= 0:
+        return None
+    if _marker_shard_pool is None:
+        _marker_shard_pool = MarkerShardPool(MARKER_SHARD_WORKERS, MARKER_SHARD_PAGES, MARKER_SHARD_MIN_PAGES)
+    return _marker_shard_pool
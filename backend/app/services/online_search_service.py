@@ -1,4 +1,7 @@
 # app/services/online_search_service.py
+import os
+import re
+import time
 import httpx
 import xml.etree.ElementTree as ET
 from typing import List, Dict, Any, Optional
@@ -6,9 +9,30 @@ import asyncio # Für parallele Zusammenfassungen
 
 from app.schemas.online_search_schemas import ArxivSearchRequest, ArxivPaperResult
 # Importiere die neuen, spezifischen LLM-Funktionen
-from app.services.llm_service import generate_arxiv_search_query, summarize_arxiv_abstract
+from app.services.llm_service import generate_arxiv_search_query, summarize_arxiv_abstract, summarize_arxiv_abstracts_batch
+from app.services.arxiv_summary_cache import get_arxiv_summary_cache, make_summary_cache_key
+from app.services.arxiv_response_cache import get_arxiv_response_cache, make_response_cache_key
+from app.core.http_client import get_http_client
 
 ARXIV_API_URL = "http://export.arxiv.org/api/query"
+ARXIV_NAMESPACES = {'atom': 'http://www.w3.org/2005/Atom', 'arxiv': 'http://arxiv.org/schemas/atom'}
+ARXIV_HTTP_MAX_CONNECTIONS = int(os.getenv("ARXIV_HTTP_MAX_CONNECTIONS", "4"))
+
+# "batch": mehrere Abstracts pro LLM-Aufruf (JSON-Antwort), "single": ein Aufruf pro Abstract
+ARXIV_SUMMARY_MODE = os.getenv("ARXIV_SUMMARY_MODE", "batch").lower()
+ARXIV_SUMMARY_BATCH_SIZE = int(os.getenv("ARXIV_SUMMARY_BATCH_SIZE", "10"))
+# Maximal gleichzeitige LLM-Aufrufe für Zusammenfassungen (prozessweit, schützt vor Rate-Limits des Providers)
+ARXIV_SUMMARY_MAX_CONCURRENCY = int(os.getenv("ARXIV_SUMMARY_MAX_CONCURRENCY", "2"))
+
+SUMMARY_FAILED_TEXT = "Zusammenfassung konnte nicht generiert werden oder LLM gab Fehler zurück."
+
+_summary_semaphore: Optional[asyncio.Semaphore] = None
+
+def _get_summary_semaphore() -> asyncio.Semaphore:
+    global _summary_semaphore
+    if _summary_semaphore is None:
+        _summary_semaphore = asyncio.Semaphore(max(1, ARXIV_SUMMARY_MAX_CONCURRENCY))
+    return _summary_semaphore
 
 def parse_arxiv_entry(entry: ET.Element, ns: Dict[str, str]) -> Optional[Dict[str, Any]]:
     try:
@@ -17,6 +41,8 @@ def parse_arxiv_entry(entry: ET.Element, ns: Dict[str, str]) -> Optional[Dict[st
         arxiv_id_parts = arxiv_id_full.split('/abs/')
         if len(arxiv_id_parts) < 2: return None
         arxiv_id = arxiv_id_parts[1].split('v')[0]
+        version_match = re.search(r"v(\d+)$", arxiv_id_parts[1])
+        arxiv_version = f"v{version_match.group(1)}" if version_match else None
 
         title = entry.findtext('atom:title', 'N/A', namespaces=ns).strip().replace('\n', ' ').replace('  ', ' ')
         authors_elements = entry.findall('atom:author', namespaces=ns)
@@ -30,7 +56,7 @@ def parse_arxiv_entry(entry: ET.Element, ns: Dict[str, str]) -> Optional[Dict[st
         primary_category = primary_category_el.get('term') if primary_category_el is not None else None
 
         return {
-            "arxiv_id": arxiv_id, "title": title, "authors": authors,
+            "arxiv_id": arxiv_id, "arxiv_version": arxiv_version, "title": title, "authors": authors,
             "published_date": published_date.split("T")[0],
             "updated_date": updated_date.split("T")[0],
             "full_abstract": full_abstract, "pdf_url": pdf_url,
@@ -41,66 +67,192 @@ def parse_arxiv_entry(entry: ET.Element, ns: Dict[str, str]) -> Optional[Dict[st
         return None
 
 
-async def search_arxiv_service(request_data: ArxivSearchRequest) -> List[ArxivPaperResult]:
-    results_with_summaries: List[ArxivPaperResult] = []
-    
-    arxiv_query = await generate_arxiv_search_query(request_data.context_text, request_data.user_prompt)
-    print(f"LOG_ARXIV_SERVICE: Generierte arXiv-Suchanfrage: {arxiv_query}")
+def _get_arxiv_client() -> httpx.AsyncClient:
+    # Geteilter Client mit Keep-Alive; arXiv bittet ohnehin um wenige gleichzeitige Verbindungen
+    return get_http_client(
+        "arxiv",
+        timeout=30.0, # Erhöhter Timeout
+        limits=httpx.Limits(max_connections=ARXIV_HTTP_MAX_CONNECTIONS, max_keepalive_connections=ARXIV_HTTP_MAX_CONNECTIONS),
+    )
+
+
+async def _stream_parse_arxiv_feed(response: httpx.Response) -> List[Dict[str, Any]]:
+    """
+    Parst den Atom-Feed inkrementell, während er ankommt (XMLPullParser). Jeder <entry> wird nach dem
+    Auslesen aus dem Baum entfernt - weder der komplette Feed noch der komplette Elementbaum liegen im Speicher.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    entry_tag = f"{{{ARXIV_NAMESPACES['atom']}}}entry"
+    feed_root: Optional[ET.Element] = None
+    entries: List[Dict[str, Any]] = []
+
+    def drain_events() -> None:
+        nonlocal feed_root
+        for event, elem in parser.read_events():
+            if event == "start":
+                if feed_root is None:
+                    feed_root = elem
+            elif elem.tag == entry_tag:
+                parsed_entry = parse_arxiv_entry(elem, ARXIV_NAMESPACES)
+                if parsed_entry:
+                    entries.append(parsed_entry)
+                if feed_root is not None:
+                    try:
+                        feed_root.remove(elem) # <entry> ist direktes Kind von <feed>
+                    except ValueError:
+                        elem.clear()
+
+    async for data in response.aiter_bytes():
+        parser.feed(data)
+        drain_events()
+    parser.close()
+    drain_events()
+    return entries
+
+
+async def fetch_arxiv_entries(
+    arxiv_query: str, start: int = 0, max_results: int = 10,
+    sort_by: str = "relevance", sort_order: str = "descending"
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Fragt die arXiv-API ab (bzw. den Antwort-Cache, Schlüssel: normalisierte Query + Paging + Sortierung).
+    Gibt None bei HTTP-/Netzwerk-/Parse-Fehlern zurück.
+    """
+    cache = get_arxiv_response_cache()
+    cache_key = make_response_cache_key(arxiv_query, start, max_results, sort_by, sort_order)
+    if cache:
+        # SQLite-Zugriffe (inkl. Commit/fsync beim Schreiben) im Thread-Pool, nicht im Event-Loop
+        cached_entries = await asyncio.to_thread(cache.get, cache_key)
+        if cached_entries is not None:
+            print(f"LOG_ARXIV_SERVICE: {len(cached_entries)} arXiv-Einträge aus dem Cache für Query '{arxiv_query}'.")
+            return cached_entries
 
     params = {
-        "search_query": arxiv_query, "start": 0, "max_results": request_data.num_results,
-        "sortBy": "relevance", "sortOrder": "descending"
+        "search_query": arxiv_query, "start": start, "max_results": max_results,
+        "sortBy": sort_by, "sortOrder": sort_order
     }
-
-    async with httpx.AsyncClient(timeout=30.0) as client: # Erhöhter Timeout
-        try:
-            response = await client.get(ARXIV_API_URL, params=params)
-            response.raise_for_status()
-        except httpx.HTTPStatusError as e:
-            print(f"ERROR_ARXIV_SERVICE: HTTP Fehler bei arXiv API: {e.response.status_code} - {e.response.text}")
-            return []
-        except httpx.RequestError as e:
-            print(f"ERROR_ARXIV_SERVICE: Netzwerkfehler bei arXiv API: {e}")
-            return []
-
-    ns = {'atom': 'http://www.w3.org/2005/Atom', 'arxiv': 'http://arxiv.org/schemas/atom'}
-    parsed_papers_temp: List[Dict[str, Any]] = []
+    fetch_start_time = time.time()
     try:
-        root = ET.fromstring(response.content)
-        for entry in root.findall('atom:entry', ns):
-            parsed_entry = parse_arxiv_entry(entry, ns)
-            if parsed_entry:
-                parsed_papers_temp.append(parsed_entry)
+        async with _get_arxiv_client().stream("GET", ARXIV_API_URL, params=params) as response:
+            if response.is_error:
+                await response.aread()
+            response.raise_for_status()
+            entries = await _stream_parse_arxiv_feed(response)
+    except httpx.HTTPStatusError as e:
+        print(f"ERROR_ARXIV_SERVICE: HTTP Fehler bei arXiv API: {e.response.status_code} - {e.response.text}")
+        return None
+    except httpx.RequestError as e:
+        print(f"ERROR_ARXIV_SERVICE: Netzwerkfehler bei arXiv API: {e}")
+        return None
     except ET.ParseError as e:
         print(f"ERROR_ARXIV_SERVICE: Fehler beim Parsen der arXiv XML: {e}")
+        return None
+    print(f"LOG_ARXIV_SERVICE: {len(entries)} arXiv-Einträge geladen und geparst. Dauer: {time.time() - fetch_start_time:.2f}s")
+
+    if cache:
+        await asyncio.to_thread(cache.put, cache_key, arxiv_query, entries)
+    return entries
+
+
+def get_arxiv_cache_stats() -> Dict[str, Any]:
+    response_cache = get_arxiv_response_cache()
+    summary_cache = get_arxiv_summary_cache()
+    return {
+        "responses": response_cache.stats() if response_cache else {"enabled": False},
+        "summaries": summary_cache.stats() if summary_cache else {"enabled": False},
+    }
+
+
+async def search_arxiv_service(request_data: ArxivSearchRequest) -> List[ArxivPaperResult]:
+    results_with_summaries: List[ArxivPaperResult] = []
+    
+    arxiv_query = await generate_arxiv_search_query(request_data.context_text, request_data.user_prompt)
+    print(f"LOG_ARXIV_SERVICE: Generierte arXiv-Suchanfrage: {arxiv_query}")
+
+    parsed_papers_temp = await fetch_arxiv_entries(arxiv_query, start=0, max_results=request_data.num_results)
+    if parsed_papers_temp is None:
         return []
 
     if not parsed_papers_temp:
         print(f"LOG_ARXIV_SERVICE: Keine Paper von arXiv für Query '{arxiv_query}' gefunden.")
         return []
 
-    # Parallele LLM-Zusammenfassungen der Abstracts
-    summary_tasks = []
-    for paper_data in parsed_papers_temp:
-        summary_tasks.append(summarize_arxiv_abstract(paper_data["full_abstract"]))
-    
-    print(f"LOG_ARXIV_SERVICE: Starte {len(summary_tasks)} LLM-Zusammenfassungen parallel...")
-    llm_summaries = await asyncio.gather(*summary_tasks, return_exceptions=True) # return_exceptions ist wichtig!
-    print(f"LOG_ARXIV_SERVICE: LLM-Zusammenfassungen abgeschlossen.")
-
-    for i, paper_data in enumerate(parsed_papers_temp):
-        summary_result = llm_summaries[i]
-        if isinstance(summary_result, Exception):
-            print(f"ERROR_ARXIV_SERVICE: Fehler bei LLM-Zusammenfassung für {paper_data.get('arxiv_id', 'Unbekannt')}: {summary_result}")
-            abstract_summary_llm = "Zusammenfassung konnte nicht generiert werden (Fehler)."
-        elif not summary_result or "Fehler:" in summary_result: # Prüfe auch auf "Fehler:" von unserem LLM Service
-             abstract_summary_llm = "Zusammenfassung konnte nicht generiert werden oder LLM gab Fehler zurück."
-        else:
-            abstract_summary_llm = summary_result
-        
+    llm_summaries = await summarize_papers(parsed_papers_temp)
+
+    for paper_data, abstract_summary_llm in zip(parsed_papers_temp, llm_summaries):
         results_with_summaries.append(ArxivPaperResult(
             **paper_data,
             abstract_summary_llm=abstract_summary_llm
         ))
             
-    return results_with_summaries
\ No newline at end of file
+    return results_with_summaries
+
+
+def _is_valid_summary(summary: Any) -> bool:
+    return isinstance(summary, str) and bool(summary.strip()) and "Fehler:" not in summary \
+        and not summary.startswith("Zusammenfassung konnte nicht generiert werden")
+
+
+async def _summarize_single(abstract: str) -> Optional[str]:
+    async with _get_summary_semaphore():
+        try:
+            summary = await summarize_arxiv_abstract(abstract)
+        except Exception as e:
+            print(f"ERROR_ARXIV_SERVICE: Fehler bei LLM-Zusammenfassung: {e}")
+            return None
+    return summary if _is_valid_summary(summary) else None
+
+
+async def _summarize_batch(abstracts: List[str]) -> List[Optional[str]]:
+    """
+    Ein Batch-Aufruf; nicht lesbare Einträge einer erhaltenen Antwort werden einzeln nachgeholt. Ist der Aufruf selbst
+    fehlgeschlagen (z.B. Rate-Limit), gibt es keine Einzelaufrufe - sie träfen denselben, bereits drosselnden Provider.
+    """
+    async with _get_summary_semaphore():
+        try:
+            summaries = await summarize_arxiv_abstracts_batch(abstracts)
+        except Exception as e:
+            print(f"ERROR_ARXIV_SERVICE: Fehler bei Batch-Zusammenfassung, kein Einzel-Fallback: {e}")
+            return [None] * len(abstracts)
+    summaries = [s if _is_valid_summary(s) else None for s in summaries]
+
+    fallback_indices = [i for i, s in enumerate(summaries) if s is None]
+    if fallback_indices:
+        print(f"LOG_ARXIV_SERVICE: Fallback auf Einzel-Zusammenfassung für {len(fallback_indices)} von {len(abstracts)} Abstracts.")
+        fallback_results = await asyncio.gather(*(_summarize_single(abstracts[i]) for i in fallback_indices))
+        for i, summary in zip(fallback_indices, fallback_results):
+            summaries[i] = summary
+    return summaries
+
+
+async def summarize_papers(papers: List[Dict[str, Any]]) -> List[str]:
+    """
+    Liefert pro Paper eine Kurzfassung des Abstracts. Bereits bekannte (arXiv-ID + Version) kommen aus dem
+    persistenten Cache, der Rest wird je nach ARXIV_SUMMARY_MODE gebündelt oder einzeln - und begrenzt parallel - erzeugt.
+    """
+    cache = get_arxiv_summary_cache()
+    keys = [make_summary_cache_key(p["arxiv_id"], p.get("arxiv_version")) for p in papers]
+    cached = await asyncio.to_thread(cache.get_many, keys) if cache else {}
+    summaries: List[Optional[str]] = [cached.get(key) for key in keys]
+
+    missing_indices = [i for i, s in enumerate(summaries) if s is None]
+    print(f"LOG_ARXIV_SERVICE: {len(papers) - len(missing_indices)} Zusammenfassungen aus dem Cache, {len(missing_indices)} werden erzeugt (Modus={ARXIV_SUMMARY_MODE}).")
+    if missing_indices:
+        missing_abstracts = [papers[i]["full_abstract"] for i in missing_indices]
+        if ARXIV_SUMMARY_MODE == "batch":
+            batch_size = max(1, ARXIV_SUMMARY_BATCH_SIZE)
+            batches = [missing_abstracts[i:i + batch_size] for i in range(0, len(missing_abstracts), batch_size)]
+            new_summaries = [s for batch in await asyncio.gather(*(_summarize_batch(b) for b in batches)) for s in batch]
+        else:
+            new_summaries = list(await asyncio.gather(*(_summarize_single(a) for a in missing_abstracts)))
+        print(f"LOG_ARXIV_SERVICE: LLM-Zusammenfassungen abgeschlossen.")
+
+        to_cache: Dict[str, str] = {}
+        for i, summary in zip(missing_indices, new_summaries):
+            summaries[i] = summary
+            if summary is not None:
+                to_cache[keys[i]] = summary
+        if cache:
+            await asyncio.to_thread(cache.put_many, to_cache)
+
+    return [s if s is not None else SUMMARY_FAILED_TEXT for s in summaries]
@@ -0,0 +1,102 @@
+# app/services/pdf_artifact_cache.py
+import os
+import json
+import shutil
+import hashlib
+import uuid
+from typing import Dict, Any, Optional, Tuple
+
+from app.core.config import CACHE_DIR
+from .image_store import image_to_bytes
+
+PDF_ARTIFACT_CACHE_ENABLED = os.getenv("PDF_ARTIFACT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PDF_ARTIFACT_CACHE_DIR = os.getenv("PDF_ARTIFACT_CACHE_DIR", os.path.join(CACHE_DIR, "pdf_artifacts"))
+
+_MARKDOWN_FILE = "document.md"
+_META_FILE = "marker_meta.json"
+_IMAGES_DIR = "images"
+
+# (Markdown, Marker-Metadaten inkl. table_of_contents, Bilder als Dateiname -> Bytes) wie bei text_from_rendered
+PdfArtifacts = Tuple[str, Dict[str, Any], Dict[str, bytes]]
+
+
+def compute_pdf_fingerprint(pdf_bytes: bytes) -> str:
+    """SHA-256 über den PDF-Inhalt; identische Uploads haben unabhängig vom Dateinamen denselben Fingerprint."""
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+class PdfArtifactCache:
+    """
+    Dateibasierter Cache der Marker-Ergebnisse pro PDF-Fingerprint:
+    <root>/<sha256>/document.md, marker_meta.json und images/<dateiname>.
+    Einträge werden in ein temporäres Verzeichnis geschrieben und per rename veröffentlicht,
+    damit parallele Worker-Prozesse nie einen halb geschriebenen Eintrag lesen.
+    """
+
+    def __init__(self, root_dir: str = PDF_ARTIFACT_CACHE_DIR):
+        self.root_dir = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _entry_dir(self, fingerprint: str) -> str:
+        return os.path.join(self.root_dir, fingerprint)
+
+    def has(self, fingerprint: str) -> bool:
+        return os.path.isfile(os.path.join(self._entry_dir(fingerprint), _MARKDOWN_FILE))
+
+    def get(self, fingerprint: str) -> Optional[PdfArtifacts]:
+        entry_dir = self._entry_dir(fingerprint)
+        if not self.has(fingerprint):
+            return None
+        try:
+            with open(os.path.join(entry_dir, _MARKDOWN_FILE), "r", encoding="utf-8") as f:
+                md_text = f.read()
+            with open(os.path.join(entry_dir, _META_FILE), "r", encoding="utf-8") as f:
+                marker_meta = json.load(f)
+            images: Dict[str, bytes] = {}
+            images_dir = os.path.join(entry_dir, _IMAGES_DIR)
+            if os.path.isdir(images_dir):
+                for img_name in sorted(os.listdir(images_dir)):
+                    with open(os.path.join(images_dir, img_name), "rb") as f:
+                        images[img_name] = f.read()
+            return md_text, marker_meta, images
+        except (OSError, ValueError) as e:
+            print(f"WARN_ARTIFACT_CACHE: Eintrag {fingerprint[:12]} unlesbar, wird ignoriert: {e}")
+            return None
+
+    def put(self, fingerprint: str, md_text: str, marker_meta: Any, img_dict: Optional[Dict[str, Any]]) -> None:
+        if self.has(fingerprint):
+            return
+        tmp_dir = os.path.join(self.root_dir, f".tmp_{fingerprint}_{uuid.uuid4().hex[:6]}")
+        try:
+            os.makedirs(os.path.join(tmp_dir, _IMAGES_DIR))
+            with open(os.path.join(tmp_dir, _MARKDOWN_FILE), "w", encoding="utf-8") as f:
+                f.write(md_text)
+            with open(os.path.join(tmp_dir, _META_FILE), "w", encoding="utf-8") as f:
+                json.dump(marker_meta if isinstance(marker_meta, dict) else {}, f, default=str)
+            for img_name, img_value in (img_dict or {}).items():
+                img_basename = os.path.basename(img_name)
+                img_bytes = image_to_bytes(img_value, img_basename)
+                if img_bytes is None:
+                    continue
+                with open(os.path.join(tmp_dir, _IMAGES_DIR, img_basename), "wb") as f:
+                    f.write(img_bytes)
+            os.rename(tmp_dir, self._entry_dir(fingerprint))
+            print(f"LOG_ARTIFACT_CACHE: Marker-Ergebnis für {fingerprint[:12]} gespeichert ({len(img_dict or {})} Bilder).")
+        except OSError as e:
+            # z.B. ein anderer Worker hat denselben Eintrag gerade veröffentlicht
+            print(f"WARN_ARTIFACT_CACHE: Konnte Eintrag {fingerprint[:12]} nicht speichern: {e}")
+        finally:
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+_pdf_artifact_cache: Optional[PdfArtifactCache] = None
+
+def get_pdf_artifact_cache() -> Optional[PdfArtifactCache]:
+    """Gibt den prozessweiten Artefakt-Cache zurück (None, wenn deaktiviert)."""
+    global _pdf_artifact_cache
+    if not PDF_ARTIFACT_CACHE_ENABLED:
+        return None
+    if _pdf_artifact_cache is None:
+        _pdf_artifact_cache = PdfArtifactCache()
+    return _pdf_artifact_cache
@@ -1,30 +1,34 @@
 import os
-import io
-import base64
 import tempfile
 import uuid
 import re
-from typing import Dict, Any, Optional, List
-from PIL import Image, UnidentifiedImageError
+import time
+import asyncio
+import mimetypes
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Callable
 import fitz
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import text  # Für die Test-DB-Abfrage
 
-from marker.converters.pdf import PdfConverter
-from marker.config.parser import ConfigParser
 from marker.output import text_from_rendered
 from app.core.config import TEMP_DIR, EXTRACTED_IMAGES_DIR
+from app.dependencies import MarkerConverterPool
 from app.schemas.processing_schemas import PdfProcessingResult, ImageInfo, TextChunk
 
 # Importiere CRUD-Funktionen (Repository-Pattern)
-from app.db.crud import crud_document, crud_chunk
-from .embedding_service import generate_embeddings
+from app.db.crud import crud_document, crud_chunk, crud_embedding_version
+from .embedding_service import aembed_documents, EMBEDDING_BATCH_SIZE
+from .embedding_versions import EmbeddingSpec, get_active_embedding_spec
+from .pdf_artifact_cache import compute_pdf_fingerprint, get_pdf_artifact_cache
+from .image_store import store_document_images, THUMBNAIL_DIR_NAME
+from .corpus_version import bump_corpus_version
+from .marker_sharding import get_marker_shard_pool, plan_page_windows
+from .markdown_chunker import iter_markdown_chunks, iter_markdown_pages
+from app.core.observability import span, observe_stage
 from datetime import datetime
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from app.schemas.online_search_schemas import ImportFromUrlRequest, BatchImportResultItem
 from app.db.models.document_model import Document
-import httpx
 
 
 def chunk_globally_then_assign_pages(
@@ -33,191 +37,77 @@ def chunk_globally_then_assign_pages(
     max_chunk_chars: int = 1500,
     chunk_overlap_ratio: float = 0.1,
 ) -> List[Dict[str, Any]]:
-    # Diese Funktion teilt Markdown global und versucht, Seiten zuzuordnen.
-    print(
-        f"LOG_GLOBAL_CHUNK: Starte globales Chunking. Textlänge: {len(full_markdown_text)}"
-    )
-    final_chunks_output: List[Dict[str, Any]] = []
-    page_indicators = []
-    page_marker_pattern = re.compile(
-        r'(<span id="page-(\d+)-[^"]*"></span>)|(!\[.*?\]\([^_]*_page_(\d+)_.*?\))',
-        re.IGNORECASE,
-    )
-    for match in page_marker_pattern.finditer(full_markdown_text):
-        page_num_str = match.group(2) or match.group(4)
-        if page_num_str:
-            try:
-                page_indicators.append(
-                    {
-                        "pos": match.start(),
-                        "page_0_idx": int(page_num_str),
-                        "type": "tag",
-                    }
-                )
-            except ValueError:
-                pass
-    if toc and isinstance(toc, list):
-        for item in toc:
-            if isinstance(item, dict) and "title" in item and "page_id" in item:
-                title = item["title"].strip()
-                try:
-                    page_id = int(item["page_id"])
-                    for pattern_str in [
-                        re.escape(title),
-                        r"^#+\s*" + re.escape(title) + r"\s*$",
-                    ]:
-                        for m in re.finditer(
-                            pattern_str,
-                            full_markdown_text,
-                            re.MULTILINE | re.IGNORECASE,
-                        ):
-                            page_indicators.append(
-                                {"pos": m.start(), "page_0_idx": page_id, "type": "toc"}
-                            )
-                            break
-                        else:
-                            continue
-                            break
-                except:
-                    continue
-    page_indicators.sort(key=lambda x: x["pos"])
-    unique_page_indicators = []
-    if page_indicators:
-        last_pos = -1
-        last_page = -1
-        for ind in page_indicators:
-            if ind["pos"] > last_pos:
-                if ind["page_0_idx"] != last_page:
-                    unique_page_indicators.append(ind)
-                    last_page = ind["page_0_idx"]
-                last_pos = ind["pos"]
-            elif (
-                ind["pos"] == last_pos
-                and ind["page_0_idx"] < unique_page_indicators[-1]["page_0_idx"]
-            ):
-                unique_page_indicators[-1] = ind
-                last_page = ind["page_0_idx"]
-    print(
-        f"LOG_GLOBAL_CHUNK: {len(unique_page_indicators)} eindeutige Seiten-Indikatoren: {unique_page_indicators[:5]}"
-    )
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=max_chunk_chars,
-        chunk_overlap=int(max_chunk_chars * chunk_overlap_ratio),
-        length_function=len,
-        separators=[
-            "\n\n\n",
-            "\n\n",
-            "\n",
-            ". ",
-            "! ",
-            "? ",
-            "; ",
-            ", ",
-            "\u200b",
-            " ",
-            "",
-        ],
-        keep_separator=True,
-    )
-    raw_md_string_chunks = text_splitter.split_text(full_markdown_text)
-    current_char_offset_in_md = 0
-    for chunk_content_str in raw_md_string_chunks:
-        assigned_page_1_idx = 1
-        if unique_page_indicators:
-            assigned_page_1_idx = unique_page_indicators[0]["page_0_idx"] + 1
-            for marker in unique_page_indicators:
-                if marker["pos"] <= current_char_offset_in_md:
-                    assigned_page_1_idx = marker["page_0_idx"] + 1
-                else:
-                    break
-        stripped_content = chunk_content_str.strip()
-        if stripped_content:
-            final_chunks_output.append(
-                {
-                    "content": stripped_content,
-                    "page_number": assigned_page_1_idx,
-                    "char_count": len(stripped_content),
-                }
-            )
-        current_char_offset_in_md += len(chunk_content_str)
-    if not final_chunks_output and full_markdown_text.strip():
-        final_chunks_output.append(
-            {
-                "content": full_markdown_text.strip(),
-                "page_number": 1,
-                "char_count": len(full_markdown_text.strip()),
-            }
-        )
-    print(
-        f"LOG_GLOBAL_CHUNK: Globale Chunk-Seitenzuordnung abgeschlossen. {len(final_chunks_output)} Chunks."
-    )
-    return final_chunks_output
+    # Alle Chunks eines fertigen Markdown-Texts als Liste (die Pipeline nutzt den Generator direkt)
+    return list(iter_markdown_chunks(iter_markdown_pages(full_markdown_text), toc, max_chunk_chars, chunk_overlap_ratio))
+
+
+# Callback für Fortschrittsmeldungen: (stage, None) beim Start, (stage, dauer_in_s) am Ende einer Stufe
+StageCallback = Callable[[str, Optional[float]], None]
 
 
 class PdfProcessingService:
-    def __init__(self, artifact_dict: Dict[str, Any], config: Dict[str, Any]):
-        # Stellt sicher, dass Marker für Markdown-Output konfiguriert ist.
-        effective_config = config.copy()
-        effective_config["output_format"] = "markdown"
-        parser = ConfigParser(effective_config)
-        self.converter = PdfConverter(
-            artifact_dict=artifact_dict,
-            config=parser.generate_config_dict(),
-            renderer=parser.get_renderer(),
-        )
-        print(
-            f"LOG_INIT: PdfProcessingService initialisiert. Converter Config: {self.converter.config}, Renderer: {type(self.converter.renderer)}"
-        )
+    def __init__(self, converter_pool: "MarkerConverterPool"):
+        # Converter werden nicht mehr pro Request gebaut, sondern aus dem prozessweiten Pool ausgeliehen
+        self.converter_pool = converter_pool
+        print(f"LOG_INIT: PdfProcessingService initialisiert. Converter-Pool-Größe: {converter_pool.size}")
 
-    def _save_image_and_get_info(
-        self,
-        img_data_value: Any,
-        original_img_filename_from_marker: str,
-        doc_id_folder_name: str,
-    ) -> Optional[ImageInfo]:
-        # Speichert Bilddaten und gibt Metadaten zurück.
-        actual_img_basename = os.path.basename(original_img_filename_from_marker)
-        doc_specific_image_dir = os.path.join(EXTRACTED_IMAGES_DIR, doc_id_folder_name)
+    @contextmanager
+    def _timed_stage(self, stage: str, stage_timings: Dict[str, float], stage_callback: Optional[StageCallback]):
+        # Misst die Dauer einer Verarbeitungsstufe (marker, chunking, embedding, db, ...); auch als Metrik ingest_<stage>
+        if stage_callback: stage_callback(stage, None)
+        stage_start = time.perf_counter()
+        outcome = "ok"
         try:
-            os.makedirs(doc_specific_image_dir, exist_ok=True)
-        except OSError:
-            return None
-        image_save_path = os.path.join(doc_specific_image_dir, actual_img_basename)
-        pil_img = None
-        try:
-            if isinstance(img_data_value, Image.Image):
-                pil_img = img_data_value
-                img_data_value.save(image_save_path)
-            elif isinstance(img_data_value, bytes):
-                img = Image.open(io.BytesIO(img_data_value))
-                pil_img = img
-                img.save(image_save_path)
-            elif isinstance(img_data_value, str):
-                data = (
-                    img_data_value.split(",", 1)[1]
-                    if "," in img_data_value
-                    else img_data_value
-                )
-                pad = len(data) % 4
-                data += "=" * (4 - pad) if pad else ""
-                img = Image.open(io.BytesIO(base64.b64decode(data)))
-                pil_img = img
-                img.save(image_save_path)
-            else:
-                return None
-            ct = (
-                Image.MIME.get(pil_img.format.upper())
-                if pil_img and pil_img.format
-                else None
-            )
-            return ImageInfo(
-                filename=actual_img_basename,
-                content_type=ct,
-                file_path=os.path.join(doc_id_folder_name, actual_img_basename),
-            )
-        except Exception as e:
-            print(f"  ERROR_SAVE_IMG: Bild '{actual_img_basename}': {e}")
-        return None
+            yield
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            duration = time.perf_counter() - stage_start
+            stage_timings[stage] = round(stage_timings.get(stage, 0.0) + duration, 3)
+            observe_stage(f"ingest_{stage}", duration, outcome)
+            if stage_callback: stage_callback(stage, duration)
+
+    def _list_stored_images(self, doc_id_folder_name: str) -> List[ImageInfo]:
+        # Bereits gespeicherte Bilder eines Dokuments (für Duplikate, ohne sie neu zu schreiben)
+        doc_specific_image_dir = os.path.join(EXTRACTED_IMAGES_DIR, doc_id_folder_name)
+        if not os.path.isdir(doc_specific_image_dir):
+            return []
+        thumbnail_dir = os.path.join(doc_specific_image_dir, THUMBNAIL_DIR_NAME)
+        images = []
+        for img_name in sorted(os.listdir(doc_specific_image_dir)):
+            if not os.path.isfile(os.path.join(doc_specific_image_dir, img_name)):
+                continue # z.B. thumbnails/
+            thumbnail_name = f"{os.path.splitext(img_name)[0]}.webp"
+            images.append(ImageInfo(
+                filename=img_name,
+                content_type=mimetypes.guess_type(img_name)[0],
+                file_path=os.path.join(doc_id_folder_name, img_name),
+                thumbnail_path=os.path.join(doc_id_folder_name, THUMBNAIL_DIR_NAME, thumbnail_name)
+                if os.path.isfile(os.path.join(thumbnail_dir, thumbnail_name)) else None,
+            ))
+        return images
+
+    async def _existing_document_result(
+        self, db: AsyncSession, existing_document: Document, original_doc_filename: str, api_response_metadata: Dict[str, Any]
+    ) -> PdfProcessingResult:
+        """Antwort für ein bereits gespeichertes PDF mit identischem Inhalt: gespeicherte Chunks statt Marker/Embedding."""
+        db_chunks = await crud_chunk.get_chunks_by_document_id(db, existing_document.id)
+        api_response_metadata.update({
+            "processed_document_id": existing_document.processed_document_id,
+            "duplicate_of_document_id": str(existing_document.id),
+            "deduplicated": True,
+        })
+        print(f"LOG_PDF_SERVICE_DEDUP: '{original_doc_filename}' ist identisch mit Dokument {existing_document.id} ('{existing_document.original_filename}'). Verarbeitung übersprungen.")
+        return PdfProcessingResult(
+            text_chunks=[
+                TextChunk(content=c.content, page_number=c.page_number, char_count=c.char_count, char_start=c.char_start, char_end=c.char_end)
+                for c in db_chunks
+            ],
+            images=await asyncio.to_thread(self._list_stored_images, existing_document.processed_document_id),
+            metadata=api_response_metadata,
+            debug_message=f"'{original_doc_filename}' ist bereits als '{existing_document.original_filename}' gespeichert (identischer Inhalt). Verarbeitung übersprungen.",
+        )
 
     async def process_pdf_data_and_store(
         self, db: AsyncSession, pdf_bytes: bytes, original_doc_filename: str,
@@ -226,7 +116,10 @@ class PdfProcessingService:
         provided_author: Optional[str] = None, # Wird als String erwartet
         provided_year: Optional[int] = None,
         external_processed_id_candidate: Optional[str] = None,
-        additional_provided_metadata: Optional[Dict[str, Any]] = None
+        additional_provided_metadata: Optional[Dict[str, Any]] = None,
+        stage_callback: Optional[StageCallback] = None,
+        # True: ein bereits gespeichertes Duplikat wird aus dem gecachten Markdown neu gechunkt/eingebettet
+        rechunk_existing: bool = False
     ) -> PdfProcessingResult:
         # Doku-ID Logik
         if external_processed_id_candidate:
@@ -253,6 +146,7 @@ class PdfProcessingService:
 
         debug_msg: str = ""
         md_text_len = 0
+        stage_timings: Dict[str, float] = {}
         db_document_obj: Optional[Document] = None # Umbenannt von db_document zur Klarheit
 
         # Test-DB-Abfrage (optional, aber gut für Debugging)
@@ -264,42 +158,79 @@ class PdfProcessingService:
         #     print(f"ERROR_SERVICE_DB_TEST: Test-DB-Abfrage VOR Marker fehlgeschlagen: {e_db_test}")
 
         try:
+            # Duplikaterkennung über den Inhalt, bevor Marker läuft
+            with self._timed_stage("dedup", stage_timings, stage_callback):
+                content_sha256 = await asyncio.to_thread(compute_pdf_fingerprint, pdf_bytes)
+                api_response_metadata["content_sha256"] = content_sha256
+                existing_document = await crud_document.get_document_by_fingerprint(db, content_sha256)
+            if existing_document and not rechunk_existing:
+                duplicate_result = await self._existing_document_result(db, existing_document, original_doc_filename, api_response_metadata)
+                await db.commit() # nur gelesen
+                return duplicate_result
+            # Lese-Transaktion beenden: während Marker/Embedding (Minuten) hält der Job keine DB-Verbindung
+            await db.commit()
+            if existing_document:
+                doc_id_folder_name = existing_document.processed_document_id
+                api_response_metadata["processed_document_id"] = doc_id_folder_name
+                api_response_metadata["rechunked_document_id"] = str(existing_document.id)
+
             # Metadaten aus PDF (PyMuPDF) - als Fallback oder Ergänzung
-            pdf_title_fitz, pdf_author_fitz, pdf_year_fitz = None, None, None
-            try:
-                fitz_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-                fitz_meta = fitz_doc.metadata
-                fitz_doc.close()
-                if fitz_meta:
-                    pdf_title_fitz = fitz_meta.get("title")
-                    pdf_author_fitz = fitz_meta.get("author")
-                    creation_date_str = fitz_meta.get("creationDate")
-                    mod_date_str = fitz_meta.get("modDate")
-                    date_to_parse = creation_date_str or mod_date_str
-                    if date_to_parse and isinstance(date_to_parse, str) and date_to_parse.startswith("D:"):
-                        year_str_fitz = date_to_parse[2:6]
-                        try: pdf_year_fitz = int(year_str_fitz)
-                        except ValueError: pass
-                # Speichere Fitz-Metadaten in api_response_metadata zur Info
-                api_response_metadata.update({
-                    "title_from_pdf_meta_fitz": pdf_title_fitz,
-                    "author_from_pdf_meta_fitz": pdf_author_fitz,
-                    "year_from_pdf_meta_fitz": pdf_year_fitz,
-                })
-            except Exception as e_fitz:
-                print(f"WARN_PDF_SERVICE: PyMuPDF Metadaten-Extraktionsfehler für '{original_doc_filename}': {e_fitz}")
+            with self._timed_stage("metadata", stage_timings, stage_callback):
+                pdf_title_fitz, pdf_author_fitz, pdf_year_fitz = None, None, None
+                pdf_page_count: Optional[int] = None
+                try:
+                    fitz_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+                    fitz_meta = fitz_doc.metadata
+                    pdf_page_count = fitz_doc.page_count
+                    fitz_doc.close()
+                    if fitz_meta:
+                        pdf_title_fitz = fitz_meta.get("title")
+                        pdf_author_fitz = fitz_meta.get("author")
+                        creation_date_str = fitz_meta.get("creationDate")
+                        mod_date_str = fitz_meta.get("modDate")
+                        date_to_parse = creation_date_str or mod_date_str
+                        if date_to_parse and isinstance(date_to_parse, str) and date_to_parse.startswith("D:"):
+                            year_str_fitz = date_to_parse[2:6]
+                            try: pdf_year_fitz = int(year_str_fitz)
+                            except ValueError: pass
+                    # Speichere Fitz-Metadaten in api_response_metadata zur Info
+                    api_response_metadata.update({
+                        "title_from_pdf_meta_fitz": pdf_title_fitz,
+                        "author_from_pdf_meta_fitz": pdf_author_fitz,
+                        "year_from_pdf_meta_fitz": pdf_year_fitz,
+                    })
+                except Exception as e_fitz:
+                    print(f"WARN_PDF_SERVICE: PyMuPDF Metadaten-Extraktionsfehler für '{original_doc_filename}': {e_fitz}")
 
             # Entscheide, welche Metadaten für die DB verwendet werden: Priorität auf `provided_` Werten
             final_title = provided_title if provided_title is not None else pdf_title_fitz
             final_author_str = provided_author if provided_author is not None else pdf_author_fitz
             final_year = provided_year if provided_year is not None else pdf_year_fitz
 
-            # Marker-Verarbeitung
-            with open(temp_pdf_path, "wb") as f: f.write(pdf_bytes)
-            rendered_obj = self.converter(temp_pdf_path)
-            if not rendered_obj: raise ValueError("Marker gab kein Objekt zurück.")
-            md_text, marker_global_meta, img_dict = text_from_rendered(rendered_obj)
-            md_text_len = len(md_text)
+            # Marker-Verarbeitung (CPU/GPU-lastig, daher im Thread-Pool statt im Event-Loop);
+            # bei bekanntem Fingerprint stattdessen Markdown/TOC/Bilder aus dem Artefakt-Cache
+            artifact_cache = get_pdf_artifact_cache()
+            with self._timed_stage("marker", stage_timings, stage_callback):
+                cached_artifacts = await asyncio.to_thread(artifact_cache.get, content_sha256) if artifact_cache else None
+                if cached_artifacts:
+                    md_text, marker_global_meta, img_dict = cached_artifacts
+                    api_response_metadata["marker_artifacts_from_cache"] = True
+                    print(f"LOG_PDF_SERVICE: Marker übersprungen, Artefakte für '{original_doc_filename}' aus dem Cache ({content_sha256[:12]}).")
+                else:
+                    with open(temp_pdf_path, "wb") as f: f.write(pdf_bytes)
+                    shard_pool = get_marker_shard_pool()
+                    if shard_pool and shard_pool.should_shard(pdf_page_count):
+                        # Große PDFs: Seitenfenster parallel in eigenen Prozessen, danach zusammengesetzt
+                        md_text, marker_global_meta, img_dict = await shard_pool.convert(temp_pdf_path, pdf_page_count)
+                        api_response_metadata["marker_page_windows"] = len(plan_page_windows(pdf_page_count, shard_pool.window_size))
+                    else:
+                        async with self.converter_pool.checkout() as converter:
+                            rendered_obj = await asyncio.to_thread(converter, temp_pdf_path)
+                        if not rendered_obj: raise ValueError("Marker gab kein Objekt zurück.")
+                        md_text, marker_global_meta, img_dict = text_from_rendered(rendered_obj)
+                    if artifact_cache:
+                        await asyncio.to_thread(artifact_cache.put, content_sha256, md_text, marker_global_meta, img_dict)
+                md_text_len = len(md_text)
 
             if isinstance(marker_global_meta, dict): api_response_metadata.update(marker_global_meta)
             elif marker_global_meta is not None: api_response_metadata["marker_raw_meta"] = str(marker_global_meta)
@@ -324,44 +255,95 @@ class PdfProcessingService:
                      api_response_metadata["year_from_markdown_text"] = final_year
 
 
-            # DB-Dokument erstellen/abrufen
-            db_document_obj = await crud_document.get_document_by_processed_id(db, doc_id_folder_name)
-            if not db_document_obj:
-                print(f"LOG_PDF_SERVICE_DB: Erstelle neues Dokument für processed_id: {doc_id_folder_name}")
-                db_document_obj = await crud_document.create_document(
-                    db=db,
-                    original_filename=original_doc_filename,
-                    processed_document_id=doc_id_folder_name,
-                    title=final_title,
-                    author=final_author_str,
-                    publication_year=final_year,
-                    additional_metadata=api_response_metadata # Speichere alle gesammelten Metadaten
-                )
-            if not db_document_obj or not db_document_obj.id:
-                raise ValueError(f"DB Dokument konnte nicht erstellt/abgerufen werden für {doc_id_folder_name}.")
-            else:
-                print(f"LOG_PDF_SERVICE_DB: Dokument ID {db_document_obj.id} für {doc_id_folder_name} vorhanden/erstellt.")
-
-            # Chunking und Embedding
+            # Chunking und Embedding überlappen: der Chunker liefert seitenweise fertige Chunks, jeder volle Batch
+            # geht sofort an die Embedding-Pipeline, während die restlichen Seiten noch gechunkt werden
             toc_for_splitter = api_response_metadata.get("table_of_contents", [])
-            chunk_dictionaries = chunk_globally_then_assign_pages(md_text, toc_for_splitter)
-            pydantic_text_chunks_for_api = [TextChunk(**cd) for cd in chunk_dictionaries]
-
-            if pydantic_text_chunks_for_api:
+            embeddings = None
+            embedding_spec = get_active_embedding_spec()
+            embedding_tasks: List[asyncio.Task] = []
+            try:
+                with self._timed_stage("chunking", stage_timings, stage_callback):
+                    pending_contents: List[str] = []
+                    for chunk_dict in iter_markdown_chunks(iter_markdown_pages(md_text), toc_for_splitter):
+                        pydantic_text_chunks_for_api.append(TextChunk(**chunk_dict))
+                        pending_contents.append(chunk_dict["content"])
+                        if len(pending_contents) >= EMBEDDING_BATCH_SIZE:
+                            embedding_tasks.append(asyncio.create_task(aembed_documents(pending_contents, spec=embedding_spec)))
+                            pending_contents = []
+                            await asyncio.sleep(0) # Batch sofort starten lassen
+                    if pending_contents:
+                        embedding_tasks.append(asyncio.create_task(aembed_documents(pending_contents, spec=embedding_spec)))
                 chunk_contents = [c.content for c in pydantic_text_chunks_for_api]
-                embeddings = generate_embeddings(chunk_contents)
-                await crud_chunk.create_chunks(
-                    db, document_id=db_document_obj.id,
-                    chunks_data=pydantic_text_chunks_for_api, embeddings=embeddings
-                )
-            await db.commit() # Commit nach erfolgreicher Dokument- und Chunk-Erstellung
+                if embedding_tasks:
+                    with self._timed_stage("embedding", stage_timings, stage_callback):
+                        embeddings = [e for batch_embeddings in await asyncio.gather(*embedding_tasks) for e in batch_embeddings]
+            except BaseException:
+                for task in embedding_tasks:
+                    task.cancel()
+                raise
+            # Kurze Schreib-Transaktion: Lock auf den Fingerprint, erneute Duplikatprüfung, Dokument + Chunks, Commit
+            with self._timed_stage("db", stage_timings, stage_callback):
+                # Bis zum Commit gesperrt: ein parallel verarbeitetes Duplikat wartet hier und findet danach dieses
+                # Dokument, statt es ein zweites Mal zu speichern
+                await crud_document.lock_fingerprint(db, content_sha256)
+                if existing_document:
+                    # Neu-Chunking: Dokument bleibt bestehen, alte Chunks werden in derselben Transaktion ersetzt
+                    db_document_obj = await crud_document.get_document_by_id(db, existing_document.id)
+                    if db_document_obj:
+                        await crud_chunk.delete_chunks_by_document_id(db, db_document_obj.id)
+                else:
+                    concurrent_duplicate = await crud_document.get_document_by_fingerprint(db, content_sha256)
+                    if concurrent_duplicate:
+                        # Während Marker/Embedding wurde derselbe Inhalt von einem anderen Job gespeichert
+                        duplicate_result = await self._existing_document_result(db, concurrent_duplicate, original_doc_filename, api_response_metadata)
+                        await db.commit()
+                        return duplicate_result
+                    db_document_obj = await crud_document.get_document_by_processed_id(db, doc_id_folder_name)
+                if not db_document_obj:
+                    print(f"LOG_PDF_SERVICE_DB: Erstelle neues Dokument für processed_id: {doc_id_folder_name}")
+                    db_document_obj = await crud_document.create_document(
+                        db=db,
+                        original_filename=original_doc_filename,
+                        processed_document_id=doc_id_folder_name,
+                        title=final_title,
+                        author=final_author_str,
+                        publication_year=final_year,
+                        additional_metadata=api_response_metadata, # Speichere alle gesammelten Metadaten
+                        content_sha256=content_sha256
+                    )
+                if not db_document_obj or not db_document_obj.id:
+                    raise ValueError(f"DB Dokument konnte nicht erstellt/abgerufen werden für {doc_id_folder_name}.")
+                print(f"LOG_PDF_SERVICE_DB: Dokument ID {db_document_obj.id} für {doc_id_folder_name} vorhanden/erstellt.")
+                if pydantic_text_chunks_for_api:
+                    # Sperrt die aktive Embedding-Version bis zum Commit: ein gleichzeitiges Umschalten des Modells
+                    # wartet, und wurde während des Embeddings umgeschaltet, wird mit dem neuen Modell neu eingebettet
+                    active_version = await crud_embedding_version.get_active_version(db, lock="share")
+                    if active_version is not None and active_version.version_key != embedding_spec.version_key:
+                        print(f"WARN_PDF_SERVICE: Embedding-Modell wurde während der Verarbeitung auf {active_version.version_key} umgestellt. Bette neu ein.")
+                        embeddings = await aembed_documents(chunk_contents, spec=EmbeddingSpec(
+                            active_version.provider, active_version.model_name, active_version.dimension
+                        ))
+                    await crud_chunk.bulk_create_chunks(
+                        db, document_id=db_document_obj.id,
+                        chunks_data=pydantic_text_chunks_for_api, embeddings=embeddings
+                    )
+                with span("db_commit"):
+                    await db.commit() # Commit nach erfolgreicher Dokument- und Chunk-Erstellung
+                bump_corpus_version(f"Dokument {doc_id_folder_name} gespeichert") # invalidiert den Retrieval-Cache (alle Prozesse)
             print(f"LOG_PDF_SERVICE_DB: Dokument und Chunks für {doc_id_folder_name} commited.")
 
-            # Bildverarbeitung
+            # Bildverarbeitung im Thread-/Prozess-Pool, inhaltsadressiert gespeichert (Duplikate nur einmal auf der Platte)
             if img_dict:
-                for key, val in img_dict.items():
-                    img_info = self._save_image_and_get_info(val, key, doc_id_folder_name)
-                    if img_info: images_info_for_api.append(img_info)
+                with self._timed_stage("images", stage_timings, stage_callback):
+                    stored_images, image_stats = await store_document_images(img_dict, doc_id_folder_name)
+                    images_info_for_api = [
+                        ImageInfo(
+                            filename=img.filename, content_type=img.content_type, file_path=img.file_path,
+                            sha256=img.sha256, thumbnail_path=img.thumbnail_path,
+                        )
+                        for img in stored_images
+                    ]
+                    api_response_metadata["image_stats"] = image_stats
 
             debug_msg = f"'{original_doc_filename}' erfolgreich verarbeitet. MD-Länge={md_text_len}, Chunks={len(pydantic_text_chunks_for_api)}, Bilder={len(images_info_for_api)}."
         
@@ -375,6 +357,7 @@ class PdfProcessingService:
             if os.path.exists(temp_pdf_path):
                 try: os.remove(temp_pdf_path)
                 except OSError as e_rm: print(f"WARN_PDF_SERVICE: Konnte temp PDF nicht löschen: {temp_pdf_path}, Fehler: {e_rm}")
+            api_response_metadata["stage_timings"] = stage_timings
 
         return PdfProcessingResult(
             text_chunks=pydantic_text_chunks_for_api,
@@ -383,102 +366,3 @@ class PdfProcessingService:
             debug_message=debug_msg,
             # document_id=str(db_document_obj.id) if db_document_obj and db_document_obj.id else None # Optional: ID zurückgeben
         )
-
-    async def import_pdf_from_url_and_store(
-        self, db: AsyncSession, request_data: ImportFromUrlRequest
-    ) -> PdfProcessingResult:
-        print(f"LOG_PDF_SERVICE: Starte Import von URL: {request_data.pdf_url}")
-        
-        # HIER DIE ÄNDERUNG: follow_redirects=True
-        async with httpx.AsyncClient(timeout=60.0, follow_redirects=True) as client:
-            try:
-                response = await client.get(request_data.pdf_url)
-                response.raise_for_status() # Löst jetzt keinen Fehler mehr bei 3xx aus, wenn follow_redirects=True und erfolgreich
-                pdf_bytes = await response.aread()
-                print(f"LOG_PDF_SERVICE: PDF von {request_data.pdf_url} (ggf. nach Redirect) erfolgreich heruntergeladen ({len(pdf_bytes)} bytes).")
-                print(f"LOG_PDF_SERVICE: Finale URL nach Redirects (falls vorhanden): {response.url}") # Gibt die finale URL aus
-            except httpx.HTTPStatusError as e:
-                err_msg = f"Konnte PDF von URL nicht herunterladen (HTTP {e.response.status_code}): {request_data.pdf_url}"
-                print(f"ERROR_PDF_SERVICE: {err_msg} - Details: {e.response.text[:200]}")
-                raise ValueError(err_msg)
-            except httpx.RequestError as e:
-                err_msg = f"Netzwerkfehler beim PDF-Download von {request_data.pdf_url}: {str(e)}"
-                print(f"ERROR_PDF_SERVICE: {err_msg}")
-                raise ValueError(err_msg)
-            except httpx.TooManyRedirects as e: # Fange explizit ab, falls es eine Redirect-Schleife gibt
-                err_msg = f"Zu viele Redirects beim Versuch, PDF von {request_data.pdf_url} herunterzuladen: {str(e)}"
-                print(f"ERROR_PDF_SERVICE: {err_msg}")
-                raise ValueError(err_msg)
-
-        author_str: Optional[str] = None
-        if request_data.authors and isinstance(request_data.authors, list):
-            author_str = "; ".join(filter(None, request_data.authors)) # Filtert None-Werte und verbindet
-
-        processed_id_candidate = request_data.arxiv_id if request_data.arxiv_id else \
-                                 os.path.splitext(request_data.original_filename)[0]
-        
-        # Sammle alle Metadaten von arXiv, um sie im Document.additional_metadata zu speichern
-        author_str: Optional[str] = None
-        if request_data.authors and isinstance(request_data.authors, list):
-            author_str = "; ".join(filter(None, request_data.authors))
-
-        processed_id_candidate = request_data.arxiv_id if request_data.arxiv_id else \
-                                 os.path.splitext(request_data.original_filename)[0]
-        
-        arxiv_metadata_for_db = {
-            "source_type": "arxiv_import",
-            "arxiv_id": request_data.arxiv_id,
-            "pdf_url_source": str(response.url), # Speichere die finale URL
-        }
-        arxiv_metadata_for_db = {k: v for k, v in arxiv_metadata_for_db.items() if v is not None}
-
-        return await self.process_pdf_data_and_store(
-            db=db,
-            pdf_bytes=pdf_bytes,
-            original_doc_filename=request_data.original_filename,
-            provided_title=request_data.title,
-            provided_author=author_str,
-            provided_year=request_data.publication_year,
-            external_processed_id_candidate=processed_id_candidate,
-            additional_provided_metadata=arxiv_metadata_for_db
-        )
-        
-    async def batch_import_pdfs_from_urls(
-        self, db: AsyncSession, papers_to_import: List[ImportFromUrlRequest]
-    ) -> List[BatchImportResultItem]:
-        batch_results: List[BatchImportResultItem] = []
-
-        print(f"LOG_PDF_SERVICE_BATCH: Starte sequenziellen Import von {len(papers_to_import)} Papern.")
-        for paper_data in papers_to_import:
-            try:
-                print(f"LOG_PDF_SERVICE_BATCH: Verarbeite (sequenziell) {paper_data.original_filename} von URL {paper_data.pdf_url}...")
-                # Rufe die bestehende Methode für ein einzelnes Paper auf
-                processing_result = await self.import_pdf_from_url_and_store(
-                    db=db, # Die DB-Session wird hier für jeden Aufruf wiederverwendet
-                           # und `import_pdf_from_url_and_store` ruft `process_pdf_data_and_store` auf,
-                           # welches den Commit pro Dokument macht. Das ist bei sequenzieller Verarbeitung sicher.
-                    request_data=paper_data
-                )
-                batch_results.append(BatchImportResultItem(
-                    original_filename=paper_data.original_filename,
-                    arxiv_id=paper_data.arxiv_id,
-                    status="success",
-                    message=processing_result.debug_message or f"'{paper_data.original_filename}' erfolgreich importiert.",
-                    processed_document_id=processing_result.metadata.get("processed_document_id")
-                    # document_db_id=uuid.UUID(processing_result.metadata.get("document_db_id")) if processing_result.metadata.get("document_db_id") else None # Falls du die DB ID brauchst
-                ))
-                print(f"LOG_PDF_SERVICE_BATCH: {paper_data.original_filename} erfolgreich verarbeitet.")
-            except Exception as e:
-                error_message = str(e)
-                print(f"ERROR_PDF_SERVICE_BATCH: Fehler bei {paper_data.original_filename}: {error_message}")
-                import traceback
-                traceback.print_exc() # Für detailliertere Fehler im Server-Log
-                batch_results.append(BatchImportResultItem(
-                    original_filename=paper_data.original_filename,
-                    arxiv_id=paper_data.arxiv_id,
-                    status="error",
-                    message=error_message
-                ))
-        
-        print(f"LOG_PDF_SERVICE_BATCH: Sequenzieller Batch-Import abgeschlossen. {len(batch_results)} Ergebnisse.")
-        return batch_results
@@ -0,0 +1,112 @@
+# app/services/pdf_url_import.py
+import os
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import httpx
+
+from app.core.http_client import get_http_client, get_host_semaphore
+from app.schemas.online_search_schemas import ImportFromUrlRequest, BatchImportResultItem
+from .ingestion_jobs import IngestionJobManager
+
+# Import per URL: die API lädt die PDFs herunter und reiht sie als Ingestion-Jobs ein (mit den Metadaten aus der
+# Anfrage); Marker, Embedding und DB laufen in den Ingestion-Workern. Die API lädt dafür weder Marker noch torch.
+PDF_DOWNLOAD_CONCURRENCY = int(os.getenv("PDF_DOWNLOAD_CONCURRENCY", "8"))
+PDF_DOWNLOAD_MAX_PER_HOST = int(os.getenv("PDF_DOWNLOAD_MAX_PER_HOST", "4"))
+
+
+async def download_pdf(request_data: ImportFromUrlRequest) -> Tuple[bytes, str]:
+    """Lädt eine PDF über den geteilten HTTP-Client; begrenzt parallele Downloads pro Host. ValueError bei Fehlern."""
+    client = get_http_client(
+        "pdf_download",
+        timeout=60.0,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=PDF_DOWNLOAD_CONCURRENCY * 2, max_keepalive_connections=PDF_DOWNLOAD_CONCURRENCY),
+    )
+    async with get_host_semaphore(request_data.pdf_url, PDF_DOWNLOAD_MAX_PER_HOST):
+        try:
+            response = await client.get(request_data.pdf_url)
+            response.raise_for_status() # Löst jetzt keinen Fehler mehr bei 3xx aus, wenn follow_redirects=True und erfolgreich
+            pdf_bytes = response.content
+            print(f"LOG_PDF_URL_IMPORT: PDF von {request_data.pdf_url} (ggf. nach Redirect) erfolgreich heruntergeladen ({len(pdf_bytes)} bytes).")
+            print(f"LOG_PDF_URL_IMPORT: Finale URL nach Redirects (falls vorhanden): {response.url}") # Gibt die finale URL aus
+        except httpx.HTTPStatusError as e:
+            err_msg = f"Konnte PDF von URL nicht herunterladen (HTTP {e.response.status_code}): {request_data.pdf_url}"
+            print(f"ERROR_PDF_URL_IMPORT: {err_msg} - Details: {e.response.text[:200]}")
+            raise ValueError(err_msg)
+        except httpx.TooManyRedirects as e: # Fange explizit ab, falls es eine Redirect-Schleife gibt
+            err_msg = f"Zu viele Redirects beim Versuch, PDF von {request_data.pdf_url} herunterzuladen: {str(e)}"
+            print(f"ERROR_PDF_URL_IMPORT: {err_msg}")
+            raise ValueError(err_msg)
+        except httpx.RequestError as e:
+            err_msg = f"Netzwerkfehler beim PDF-Download von {request_data.pdf_url}: {str(e)}"
+            print(f"ERROR_PDF_URL_IMPORT: {err_msg}")
+            raise ValueError(err_msg)
+    return pdf_bytes, str(response.url)
+
+
+def processing_options_for_url_import(request_data: ImportFromUrlRequest, final_url: str) -> Dict[str, Any]:
+    """Zusätzliche Argumente für process_pdf_data_and_store (werden mit dem Job gespeichert, daher JSON-tauglich)."""
+    author_str: Optional[str] = None
+    if request_data.authors and isinstance(request_data.authors, list):
+        author_str = "; ".join(filter(None, request_data.authors)) # Filtert None-Werte und verbindet
+
+    processed_id_candidate = request_data.arxiv_id if request_data.arxiv_id else \
+                             os.path.splitext(request_data.original_filename)[0]
+
+    # Sammle alle Metadaten von arXiv, um sie im Document.additional_metadata zu speichern
+    arxiv_metadata_for_db = {
+        "source_type": "arxiv_import",
+        "arxiv_id": request_data.arxiv_id,
+        "pdf_url_source": final_url, # Speichere die finale URL
+    }
+    return {
+        "provided_title": request_data.title,
+        "provided_author": author_str,
+        "provided_year": request_data.publication_year,
+        "external_processed_id_candidate": processed_id_candidate,
+        "additional_provided_metadata": {k: v for k, v in arxiv_metadata_for_db.items() if v is not None},
+    }
+
+
+async def enqueue_pdf_from_url(manager: IngestionJobManager, request_data: ImportFromUrlRequest) -> str:
+    """Lädt die PDF herunter und reiht sie als Ingestion-Job ein; gibt die Job-ID zurück."""
+    pdf_bytes, final_url = await download_pdf(request_data)
+    return await manager.enqueue(
+        pdf_bytes, request_data.original_filename,
+        processing_options=processing_options_for_url_import(request_data, final_url),
+    )
+
+
+async def iter_enqueue_pdfs_from_urls(
+    manager: IngestionJobManager, papers_to_import: List[ImportFromUrlRequest]
+) -> AsyncIterator[Tuple[int, BatchImportResultItem]]:
+    """
+    Batch-Import: Downloads laufen parallel (PDF_DOWNLOAD_CONCURRENCY), jedes geladene Paper wird sofort als Job
+    eingereiht. Ergebnisse (Index in der Eingabeliste, Ergebnis mit Job-ID) in der Reihenfolge der Fertigstellung.
+    """
+    download_semaphore = asyncio.Semaphore(PDF_DOWNLOAD_CONCURRENCY)
+
+    async def enqueue_item(index: int, paper_data: ImportFromUrlRequest) -> Tuple[int, BatchImportResultItem]:
+        try:
+            async with download_semaphore:
+                job_id = await enqueue_pdf_from_url(manager, paper_data)
+            return index, BatchImportResultItem(
+                original_filename=paper_data.original_filename, arxiv_id=paper_data.arxiv_id, status="queued",
+                message=f"'{paper_data.original_filename}' heruntergeladen und zur Verarbeitung eingereiht.", job_id=job_id,
+            )
+        except Exception as e:
+            print(f"ERROR_PDF_URL_IMPORT: Fehler bei {paper_data.original_filename}: {e}")
+            return index, BatchImportResultItem(
+                original_filename=paper_data.original_filename, arxiv_id=paper_data.arxiv_id, status="error", message=str(e),
+            )
+
+    print(f"LOG_PDF_URL_IMPORT: Starte Import von {len(papers_to_import)} Papern (Downloads={PDF_DOWNLOAD_CONCURRENCY}).")
+    tasks = [asyncio.create_task(enqueue_item(i, paper)) for i, paper in enumerate(papers_to_import)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # Client hat die Verbindung getrennt o.ä. -> restliche Downloads abbrechen
+        for task in tasks:
+            if not task.done():
+                task.cancel()
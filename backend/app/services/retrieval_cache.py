@@ -0,0 +1,101 @@
+# app/services/retrieval_cache.py
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.schemas.processing_schemas import RetrievalFilters
+from .corpus_version import get_corpus_version
+
+RETRIEVAL_CACHE_ENABLED = os.getenv("RETRIEVAL_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "2000"))
+# Sicherheitsnetz für Änderungen, die die Korpus-Version nicht erhöhen (z.B. manuelle SQL-Änderungen)
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "3600"))
+
+
+def normalize_query(query_text: str) -> str:
+    return re.sub(r"\s+", " ", query_text).strip().casefold()
+
+
+def make_retrieval_cache_key(
+    query_text: str, limit: int, mode: str, embedding_provider: str,
+    filters: Optional[RetrievalFilters], corpus_version: str
+) -> str:
+    filters_key = json.dumps(filters.dict(exclude_none=True), sort_keys=True, default=str) if filters else ""
+    return "|".join([corpus_version, mode, embedding_provider, str(limit), filters_key, normalize_query(query_text)])
+
+
+class RetrievalResultCache:
+    """
+    In-Process-LRU für Suchergebnisse. Der Schlüssel enthält die Korpus-Version; ändert sie sich
+    (Import/Löschen), werden alle Einträge der alten Version verworfen ("stale evictions").
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stale_evictions": 0, "expired": 0, "lru_evictions": 0}
+
+    def current_version(self) -> str:
+        version = get_corpus_version()
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self._stats["stale_evictions"] += len(self._entries)
+                    print(f"LOG_RETRIEVAL_CACHE: Korpus-Version geändert, {len(self._entries)} Einträge verworfen.")
+                    self._entries.clear()
+                self._version = version
+        return version
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                self._stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            # Kopien herausgeben - Aufrufer ergänzen die Dicts teils (z.B. RRF)
+            return [dict(row) for row in entry[1]]
+
+    def put(self, key: str, results: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, [dict(row) for row in results])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["lru_evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "enabled": True,
+                **self._stats,
+                "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "corpus_version": self._version,
+            }
+
+
+_retrieval_cache: Optional[RetrievalResultCache] = None
+
+def get_retrieval_cache() -> Optional[RetrievalResultCache]:
+    """Prozessweiter Cache (lazy). None, wenn per RETRIEVAL_CACHE_ENABLED deaktiviert."""
+    global _retrieval_cache
+    if not RETRIEVAL_CACHE_ENABLED:
+        return None
+    if _retrieval_cache is None:
+        _retrieval_cache = RetrievalResultCache(RETRIEVAL_CACHE_MAX_ENTRIES, RETRIEVAL_CACHE_TTL_SECONDS)
+    return _retrieval_cache
@@ -1,37 +1,154 @@
 # app/services/retrieval_service.py
 import os
 import time # NEU
-from typing import List, Dict, Any, Optional
+import asyncio
+from typing import List, Dict, Any, Optional, Literal
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.crud import crud_retrieval # Importiere die Suchfunktion
-from .embedding_service import generate_embeddings # Importiere die Haupt-Embedding-Funktion
+from app.db.session import AsyncSessionLocal
+from app.schemas.processing_schemas import RetrievalFilters
+from app.core.observability import observe_stage, log_debug, log_enabled
+from .embedding_service import aembed_query # Asynchrones Query-Embedding (blockiert den Event-Loop nicht)
+from .retrieval_cache import get_retrieval_cache, make_retrieval_cache_key
+from .embedding_versions import get_active_embedding_spec
+from .embedding_migration import get_embedding_migration_manager
+
+RetrievalMode = Literal["vector", "lexical", "hybrid"]
+
+RETRIEVAL_DEFAULT_MODE: RetrievalMode = os.getenv("RETRIEVAL_DEFAULT_MODE", "vector").lower()
+# Hybrid: jede Teilsuche liefert limit * Faktor Kandidaten, die per Reciprocal Rank Fusion zusammengeführt werden
+HYBRID_CANDIDATE_MULTIPLIER = int(os.getenv("HYBRID_CANDIDATE_MULTIPLIER", "4"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: Dict[str, List[Dict[str, Any]]], limit: int, k: int = RRF_K
+) -> List[Dict[str, Any]]:
+    """
+    Reciprocal Rank Fusion: score(chunk) = Summe über alle Listen von 1 / (k + rang).
+    Rang-basiert, daher müssen Kosinus-Distanz und ts_rank nicht auf eine gemeinsame Skala gebracht werden.
+    """
+    fused: Dict[Any, Dict[str, Any]] = {}
+    for source_name, results in ranked_lists.items():
+        for rank, row in enumerate(results, start=1):
+            entry = fused.get(row["chunk_db_id"])
+            if entry is None:
+                entry = dict(row)
+                entry["rrf_score"] = 0.0
+                fused[row["chunk_db_id"]] = entry
+            else:
+                # Felder der anderen Teilsuche ergänzen (z.B. distance bei reinen Volltext-Treffern)
+                for key, value in row.items():
+                    if entry.get(key) is None: entry[key] = value
+            entry[f"{source_name}_rank"] = rank
+            entry["rrf_score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda e: e["rrf_score"], reverse=True)[:limit]
+
+
+def chunk_to_source_detail(chunk_data: Dict[str, Any], index: int = 0, preview_chars: int = 200) -> Dict[str, Any]:
+    """Wandelt ein Suchergebnis in das Quellen-Format der Chat-/Generierungs-Antworten (SourceDetail) um."""
+    return {
+        "chunk_id": str(chunk_data.get("chunk_db_id", f"retrieved_chunk_{index}")),
+        "filename": chunk_data.get("original_filename"), "title": chunk_data.get("document_title"),
+        "author": chunk_data.get("document_author"), "year": chunk_data.get("publication_year"),
+        "page": chunk_data.get("page_number"),
+        "content_preview": chunk_data.get("chunk_content", "")[:preview_chars] + "...",
+        "distance": chunk_data.get("distance"),
+    }
+
 
 class RetrievalService:
+     @staticmethod
+     def uses_query_embedding(mode: Optional[RetrievalMode] = None) -> bool:
+        """Ob der Modus ein Query-Embedding braucht (dann lohnt es sich, dieses früh parallel zu starten)."""
+        return (mode or RETRIEVAL_DEFAULT_MODE) != "lexical"
+
      async def find_relevant_chunks(
         self, db: AsyncSession, query_text: str, limit: int = 5,
-        embedding_provider: str = os.getenv("EMBEDDING_SERVICE_PROVIDER", "google").lower() 
+        embedding_provider: Optional[str] = None,
+        mode: Optional[RetrievalMode] = None,
+        filters: Optional[RetrievalFilters] = None,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
-        service_method_start_time = time.time()
-        print(f"LOG_RETRIEVAL_TIMING: [{time.strftime('%H:%M:%S')}] find_relevant_chunks gestartet für Query: '{query_text[:50]}...'")
-        
-        embedding_start_time = time.time()
-        query_embedding_list = generate_embeddings(
-            [query_text], provider=embedding_provider, 
-            task_type="retrieval_query" if embedding_provider == "google" else "retrieval_document"
-        )
-        print(f"LOG_RETRIEVAL_TIMING: [{time.strftime('%H:%M:%S')}] Query-Embedding generiert. Dauer: {time.time() - embedding_start_time:.2f}s")
-        
-        if not query_embedding_list or not query_embedding_list[0]:
+        """
+        `query_embedding` kann vorab (z.B. parallel zu anderen DB-Abfragen) berechnet übergeben werden.
+        Ohne `embedding_provider` wird das aktive Embedding-Modell verwendet (siehe embedding_versions).
+        """
+        mode = mode or RETRIEVAL_DEFAULT_MODE
+        if filters is not None and filters.is_empty():
+            filters = None
+        service_method_start_time = time.perf_counter()
+        if log_enabled("DEBUG"):
+            log_debug("LOG_RETRIEVAL_TIMING", "find_relevant_chunks gestartet (Modus=%s, Filter=%s) für Query: '%s...'",
+                      mode, filters.dict(exclude_none=True) if filters else None, query_text[:50])
+
+        # Treffer sparen Query-Embedding und Index-Scan; die Korpus-Version im Schlüssel invalidiert bei Import/Löschen
+        cache = get_retrieval_cache()
+        cache_key = None
+        if cache:
+            cache_key = make_retrieval_cache_key(
+                query_text, limit, mode, embedding_provider or get_active_embedding_spec().version_key, filters, cache.current_version()
+            )
+            cached_chunks = cache.get(cache_key)
+            if cached_chunks is not None:
+                observe_stage("retrieval_cached", time.perf_counter() - service_method_start_time)
+                return cached_chunks
+
+        if mode == "lexical":
+            similar_chunks = await crud_retrieval.find_lexical_chunks(db=db, query_text=query_text, limit=limit, filters=filters)
+        elif mode == "hybrid":
+            similar_chunks = await self._find_hybrid_chunks(db, query_text, limit, embedding_provider, filters, query_embedding)
+        else:
+            similar_chunks = await self._find_vector_chunks(db, query_text, limit, embedding_provider, filters, query_embedding)
+
+        if mode == "vector":
+            # Während einer Modell-Migration stichprobenartig auch gegen das Zielmodell suchen (Hintergrund)
+            get_embedding_migration_manager().maybe_schedule_shadow_read(query_text, limit, filters, similar_chunks)
+
+        # Leere Ergebnisse nicht cachen - die CRUD-Funktionen liefern auch bei DB-Fehlern []
+        if cache and similar_chunks:
+            cache.put(cache_key, similar_chunks)
+        observe_stage(f"retrieval_{mode}", time.perf_counter() - service_method_start_time)
+        return similar_chunks
+
+     async def _find_vector_chunks(
+        self, db: AsyncSession, query_text: str, limit: int, embedding_provider: Optional[str],
+        filters: Optional[RetrievalFilters] = None, query_embedding: Optional[List[float]] = None
+    ) -> List[Dict[str, Any]]:
+        if query_embedding is None:
+            query_embedding = await aembed_query(query_text, provider=embedding_provider)
+
+        if not query_embedding:
             print("ERROR_RETRIEVAL_SERVICE: Konnte kein Query-Embedding generieren.")
             return []
-        query_embedding = query_embedding_list[0]
-        
-        db_call_start_time = time.time()
-        print(f"LOG_RETRIEVAL_TIMING: [{time.strftime('%H:%M:%S')}] Rufe crud_retrieval.find_similar_chunks auf...")
-        similar_chunks = await crud_retrieval.find_similar_chunks(
-            db=db, query_embedding=query_embedding, limit=limit
+
+        return await crud_retrieval.find_similar_chunks(
+            db=db, query_embedding=query_embedding, limit=limit, filters=filters
+        )
+
+     async def _find_hybrid_chunks(
+        self, db: AsyncSession, query_text: str, limit: int, embedding_provider: Optional[str],
+        filters: Optional[RetrievalFilters] = None, query_embedding: Optional[List[float]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Vektor- und Volltextsuche laufen gleichzeitig (Volltext mit eigener Session, da eine AsyncSession
+        keine parallelen Abfragen erlaubt); die Volltextsuche überlappt dabei auch mit dem Query-Embedding.
+        """
+        candidate_limit = limit * max(1, HYBRID_CANDIDATE_MULTIPLIER)
+
+        async def lexical_search() -> List[Dict[str, Any]]:
+            async with AsyncSessionLocal() as lexical_db:
+                return await crud_retrieval.find_lexical_chunks(db=lexical_db, query_text=query_text, limit=candidate_limit, filters=filters)
+
+        vector_results, lexical_results = await asyncio.gather(
+            self._find_vector_chunks(db, query_text, candidate_limit, embedding_provider, filters, query_embedding),
+            lexical_search(),
         )
-        print(f"LOG_RETRIEVAL_TIMING: [{time.strftime('%H:%M:%S')}] crud_retrieval.find_similar_chunks beendet. Dauer: {time.time() - db_call_start_time:.2f}s. Chunks: {len(similar_chunks)}")
-        
-        print(f"LOG_RETRIEVAL_TIMING: [{time.strftime('%H:%M:%S')}] find_relevant_chunks beendet. Gesamtdauer: {time.time() - service_method_start_time:.2f}s")
-        return similar_chunks
\ No newline at end of file
+        fused = reciprocal_rank_fusion({"vector": vector_results, "lexical": lexical_results}, limit=limit)
+        log_debug("LOG_RETRIEVAL_SERVICE", "Hybrid-Suche: %d Vektor- + %d Volltext-Kandidaten -> %d Chunks.", len(vector_results), len(lexical_results), len(fused))
+        return fused
+
+
+def get_retrieval_cache_stats() -> Dict[str, Any]:
+    cache = get_retrieval_cache()
+    return cache.stats() if cache else {"enabled": False}
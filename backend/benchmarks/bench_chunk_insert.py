@@ -0,0 +1,86 @@
+# benchmarks/bench_chunk_insert.py
+"""
+Vergleicht die Schreibwege für Chunks (orm / insert / copy) bei Dokumenten mit 1k bzw. 10k Chunks.
+
+Benötigt eine laufende Postgres/pgvector-Datenbank (DATABASE_URL aus .env). Jeder Lauf legt ein
+Test-Dokument an, schreibt synthetische Chunks mit zufälligen Embeddings und rollt danach zurück,
+es bleiben also keine Daten in der Datenbank.
+
+Aufruf (aus backend/):
+    python -m benchmarks.bench_chunk_insert --sizes 1000 10000 --modes orm insert copy --repeat 3
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import statistics
+import tracemalloc
+from typing import List, Dict, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.session import AsyncSessionLocal, async_engine, create_db_tables  # noqa: E402
+from app.db.crud import crud_document, crud_chunk  # noqa: E402
+from app.schemas.processing_schemas import TextChunk  # noqa: E402
+
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIMENSION", "768"))
+
+
+def _synthetic_chunks(n: int) -> Tuple[List[TextChunk], List[List[float]]]:
+    rng = random.Random(42)
+    chunks = [
+        TextChunk(content=f"Synthetischer Chunk {i}. " + "Lorem ipsum dolor sit amet. " * 40, page_number=i // 10 + 1, char_count=1150)
+        for i in range(n)
+    ]
+    embeddings = [[rng.uniform(-1.0, 1.0) for _ in range(EMBEDDING_DIM)] for _ in range(n)]
+    return chunks, embeddings
+
+
+async def _run_once(mode: str, chunks: List[TextChunk], embeddings: List[List[float]], trace_memory: bool) -> Dict[str, float]:
+    async with AsyncSessionLocal() as db:
+        document = await crud_document.create_document(
+            db=db,
+            original_filename="benchmark.pdf",
+            processed_document_id=f"benchmark_{uuid.uuid4().hex[:8]}",
+        )
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        await crud_chunk.bulk_create_chunks(
+            db, document_id=document.id, chunks_data=chunks, embeddings=embeddings, mode=mode
+        )
+        await db.flush()
+        duration = time.perf_counter() - start
+        peak_mb = 0.0
+        if trace_memory:
+            peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+        await db.rollback()
+    return {"seconds": duration, "peak_mb": peak_mb}
+
+
+async def main(sizes: List[int], modes: List[str], repeat: int, trace_memory: bool) -> None:
+    await create_db_tables()
+    print(f"{'Chunks':>8} {'Modus':>7} {'Median s':>10} {'Min s':>8} {'Chunks/s':>10} {'Peak MB':>8}")
+    for size in sizes:
+        chunks, embeddings = _synthetic_chunks(size)
+        for mode in modes:
+            runs = [await _run_once(mode, chunks, embeddings, trace_memory) for _ in range(repeat)]
+            seconds = [r["seconds"] for r in runs]
+            median = statistics.median(seconds)
+            peak = max(r["peak_mb"] for r in runs)
+            print(f"{size:>8} {mode:>7} {median:>10.3f} {min(seconds):>8.3f} {size / median:>10.0f} {peak:>8.1f}")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--modes", nargs="+", default=["orm", "insert", "copy"], choices=["orm", "insert", "copy"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--trace-memory", action="store_true", help="Python-Speicherspitze per tracemalloc messen (verlangsamt alle Modi)")
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.modes, args.repeat, args.trace_memory))
@@ -0,0 +1,77 @@
+# benchmarks/bench_chunker.py
+"""
+Misst den Chunker (app/services/markdown_chunker.py) auf synthetischem Marker-Markdown in Buchlänge.
+
+Verglichen werden seitenweises Einspeisen (wie in der Pipeline) und das Einspeisen des gesamten Texts als ein
+Segment (entspricht dem früheren globalen Chunking). Ausgegeben werden Laufzeit, Zeit bis zum ersten Chunk,
+Spitzen-Speicher des Chunkers (tracemalloc) sowie Anzahl Chunks und zugeordneter Seiten. Zusätzlich wird geprüft,
+dass char_start/char_end jedes Chunks exakt auf seinen Inhalt im Markdown zeigen.
+
+Aufruf (aus backend/):
+    python -m benchmarks.bench_chunker --pages 100 500 2000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+from typing import Iterable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.markdown_chunker import iter_markdown_chunks, iter_markdown_pages  # noqa: E402
+
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore".split()
+
+
+def build_markdown(pages: int, seed: int = 42) -> str:
+    rng = random.Random(seed)
+    parts: List[str] = []
+    for page in range(pages):
+        parts.append(f'<span id="page-{page}-0"></span>\n\n')
+        if page % 25 == 0:
+            parts.append(f"# Kapitel {page // 25 + 1}\n\n")
+        for _ in range(rng.randint(4, 10)):
+            sentences = (" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 20))).capitalize() + "." for _ in range(rng.randint(2, 8)))
+            parts.append(" ".join(sentences) + "\n\n")
+        if page % 7 == 0:
+            parts.append(f"![](_page_{page}_Figure_1.jpeg)\n\n")
+    return "".join(parts)
+
+
+def run(md_text: str, segments: Iterable[str], toc: list) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    first_chunk_seconds = None
+    chunks = []
+    for chunk in iter_markdown_chunks(segments, toc):
+        if first_chunk_seconds is None:
+            first_chunk_seconds = time.perf_counter() - start
+        chunks.append(chunk)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    offsets_ok = all(md_text[c["char_start"]:c["char_end"]] == c["content"] for c in chunks)
+    return {
+        "seconds": seconds, "first": first_chunk_seconds or 0.0, "peak_mb": peak / 1e6,
+        "chunks": len(chunks), "pages": len({c["page_number"] for c in chunks}), "offsets_ok": offsets_ok,
+    }
+
+
+def main(page_counts: List[int]) -> None:
+    print(f"{'Seiten':>7} {'MD-Zeich':>10} {'Weg':<10} {'Zeit s':>8} {'1. Chunk s':>10} {'Peak MB':>8} {'Chunks':>7} {'Seiten':>7} {'Offsets':>8}")
+    for pages in page_counts:
+        md_text = build_markdown(pages)
+        toc = [{"title": f"Kapitel {i + 1}", "page_id": i * 25} for i in range((pages + 24) // 25)]
+        for label, segments in (("seitenw.", iter_markdown_pages(md_text)), ("am Stück", [md_text])):
+            r = run(md_text, segments, toc)
+            print(f"{pages:>7} {len(md_text):>10} {label:<10} {r['seconds']:>8.2f} {r['first']:>10.3f} {r['peak_mb']:>8.1f} "
+                  f"{r['chunks']:>7} {r['pages']:>7} {'ok' if r['offsets_ok'] else 'FEHLER':>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 500, 2000])
+    args = parser.parse_args()
+    main(args.pages)
@@ -0,0 +1,116 @@
+# benchmarks/bench_document_delete.py
+"""
+Vergleicht das Löschen von Dokumenten über das ORM (Dokument samt Chunks laden, db.delete je Objekt - der frühere
+Weg ohne passive_deletes) mit crud_document.delete_documents (ein DELETE, Chunks per ON DELETE CASCADE).
+
+Benötigt eine laufende Postgres/pgvector-Datenbank (DATABASE_URL aus .env). Es werden Test-Dokumente mit
+synthetischen Chunks angelegt; jeder Löschlauf wird zurückgerollt, sodass alle Modi dieselben Daten löschen.
+Am Ende werden die Test-Dokumente endgültig entfernt.
+
+Aufruf (aus backend/):
+    python -m benchmarks.bench_document_delete --documents 1 10 --chunks 5000 --repeat 3
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import statistics
+import tracemalloc
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.future import select  # noqa: E402
+from sqlalchemy.orm import selectinload  # noqa: E402
+
+from app.db.session import AsyncSessionLocal, async_engine, create_db_tables  # noqa: E402
+from app.db.models import Document  # noqa: E402
+from app.db.crud import crud_document, crud_chunk  # noqa: E402
+from app.schemas.processing_schemas import TextChunk  # noqa: E402
+
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIMENSION", "768"))
+
+
+async def _create_documents(count: int, chunks_per_document: int) -> List[uuid.UUID]:
+    rng = random.Random(42)
+    chunks = [
+        TextChunk(content=f"Synthetischer Chunk {i}. " + "Lorem ipsum dolor sit amet. " * 40, page_number=i // 10 + 1, char_count=1150)
+        for i in range(chunks_per_document)
+    ]
+    embeddings = [[rng.uniform(-1.0, 1.0) for _ in range(EMBEDDING_DIM)] for _ in range(chunks_per_document)]
+    document_ids = []
+    async with AsyncSessionLocal() as db:
+        for _ in range(count):
+            document = await crud_document.create_document(
+                db=db, original_filename="benchmark_delete.pdf", processed_document_id=f"benchmark_delete_{uuid.uuid4().hex[:8]}"
+            )
+            await crud_chunk.bulk_create_chunks(db, document_id=document.id, chunks_data=chunks, embeddings=embeddings)
+            document_ids.append(document.id)
+        await db.commit()
+    return document_ids
+
+
+async def _delete_orm(db, document_ids: List[uuid.UUID]) -> None:
+    # Entspricht dem bisherigen Verhalten: ohne passive_deletes lädt SQLAlchemy alle Chunks und löscht sie einzeln
+    result = await db.execute(select(Document).options(selectinload(Document.chunks)).where(Document.id.in_(document_ids)))
+    for document in result.scalars().all():
+        for chunk in document.chunks:
+            await db.delete(chunk)
+        await db.delete(document)
+    await db.flush()
+
+
+async def _delete_statement(db, document_ids: List[uuid.UUID]) -> None:
+    await crud_document.delete_documents(db, document_ids)
+
+
+MODES = {"orm": _delete_orm, "statement": _delete_statement}
+
+
+async def _run_once(mode: str, document_ids: List[uuid.UUID], trace_memory: bool) -> Dict[str, float]:
+    async with AsyncSessionLocal() as db:
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        await MODES[mode](db, document_ids)
+        duration = time.perf_counter() - start
+        peak_mb = 0.0
+        if trace_memory:
+            peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+        await db.rollback()
+    return {"seconds": duration, "peak_mb": peak_mb}
+
+
+async def main(document_counts: List[int], chunks_per_document: int, modes: List[str], repeat: int, trace_memory: bool) -> None:
+    await create_db_tables()
+    print(f"{'Dokumente':>9} {'Chunks':>8} {'Modus':>10} {'Median s':>10} {'Min s':>8} {'Chunks/s':>10} {'Peak MB':>8}")
+    for count in document_counts:
+        document_ids = await _create_documents(count, chunks_per_document)
+        try:
+            for mode in modes:
+                runs = [await _run_once(mode, document_ids, trace_memory) for _ in range(repeat)]
+                seconds = [r["seconds"] for r in runs]
+                median = statistics.median(seconds)
+                total_chunks = count * chunks_per_document
+                print(f"{count:>9} {total_chunks:>8} {mode:>10} {median:>10.3f} {min(seconds):>8.3f} {total_chunks / median:>10.0f} "
+                      f"{max(r['peak_mb'] for r in runs):>8.1f}")
+        finally:
+            async with AsyncSessionLocal() as db:
+                await crud_document.delete_documents(db, document_ids)
+                await db.commit()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--chunks", type=int, default=5000, help="Chunks pro Dokument")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--trace-memory", action="store_true", help="Python-Speicherspitze per tracemalloc messen (verlangsamt alle Modi)")
+    args = parser.parse_args()
+    asyncio.run(main(args.documents, args.chunks, args.modes, args.repeat, args.trace_memory))
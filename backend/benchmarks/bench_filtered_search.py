@@ -0,0 +1,114 @@
+# benchmarks/bench_filtered_search.py
+"""
+Misst Latenz und Recall@k der gefilterten Vektorsuche im Vergleich zur ungefilterten Suche.
+
+Als Anfragen dienen zufällige, bereits gespeicherte Chunk-Embeddings (kein Embedding-Provider nötig).
+Die Ground Truth ist eine exakte Suche ohne HNSW-Index (enable_indexscan = off) mit demselben Filter.
+
+Strategien:
+  unfiltered        HNSW ohne Filter (Referenz-Latenz)
+  filtered_default  HNSW + Filter mit pgvector-Standardeinstellungen (ef_search=40, kein iterativer Scan)
+  filtered_tuned    HNSW + Filter mit HNSW_EF_SEARCH_FILTERED / HNSW_ITERATIVE_SCAN (Standard im Service)
+
+Aufruf (aus backend/, benötigt eine befüllte Datenbank):
+    python -m benchmarks.bench_filtered_search --queries 50 --k 5
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import statistics
+from typing import List, Dict, Any, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text, func  # noqa: E402
+from sqlalchemy.future import select  # noqa: E402
+
+from app.db.session import AsyncSessionLocal, async_engine  # noqa: E402
+from app.db.models import Chunk, Document  # noqa: E402
+from app.db.crud import crud_retrieval  # noqa: E402
+from app.schemas.processing_schemas import RetrievalFilters  # noqa: E402
+
+
+async def _sample_query_embeddings(n: int) -> List[List[float]]:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Chunk.embedding).filter(Chunk.embedding.isnot(None)).order_by(func.random()).limit(n)
+        )
+        return [[float(x) for x in row[0]] for row in result.all()]
+
+
+async def _build_filter_scenarios(rng: random.Random) -> Dict[str, RetrievalFilters]:
+    async with AsyncSessionLocal() as db:
+        documents = (await db.execute(select(Document.id, Document.publication_year, Document.author))).all()
+    if not documents:
+        raise SystemExit("Keine Dokumente in der Datenbank.")
+    scenarios: Dict[str, RetrievalFilters] = {
+        "single_document": RetrievalFilters(document_ids=[rng.choice(documents).id]),
+        "document_set": RetrievalFilters(document_ids=[d.id for d in rng.sample(documents, min(5, len(documents)))]),
+    }
+    years = sorted(d.publication_year for d in documents if d.publication_year)
+    if years:
+        median_year = years[len(years) // 2]
+        scenarios["year_range"] = RetrievalFilters(year_from=median_year - 1, year_to=median_year + 1)
+    authors = [d.author for d in documents if d.author]
+    if authors:
+        author_token = max(rng.choice(authors).replace(";", " ").split(), key=len)
+        scenarios["author"] = RetrievalFilters(author=author_token)
+    return scenarios
+
+
+async def _search(query_embedding: List[float], k: int, filters: Optional[RetrievalFilters], tuned: bool, exact: bool = False):
+    async with AsyncSessionLocal() as db:
+        if exact:
+            await db.execute(text("SET LOCAL enable_indexscan = off"))
+        start = time.perf_counter()
+        rows = await crud_retrieval.find_similar_chunks(
+            db=db, query_embedding=query_embedding, limit=k, filters=filters, tune_filtered_scan=tuned and not exact
+        )
+        duration = time.perf_counter() - start
+        await db.rollback()
+    return rows, duration
+
+
+def _recall(approx: List[Dict[str, Any]], exact: List[Dict[str, Any]]) -> float:
+    if not exact:
+        return 1.0
+    exact_ids = {r["chunk_db_id"] for r in exact}
+    return len(exact_ids & {r["chunk_db_id"] for r in approx}) / len(exact_ids)
+
+
+async def main(num_queries: int, k: int, seed: int) -> None:
+    rng = random.Random(seed)
+    query_embeddings = await _sample_query_embeddings(num_queries)
+    scenarios = await _build_filter_scenarios(rng)
+    strategies = [("unfiltered", False, False), ("filtered_default", True, False), ("filtered_tuned", True, True)]
+
+    print(f"{len(query_embeddings)} Anfragen, k={k}")
+    print(f"{'Szenario':<16} {'Strategie':<17} {'p50 ms':>8} {'p95 ms':>8} {'Recall':>7} {'Treffer':>8}")
+    for scenario_name, filters in scenarios.items():
+        for strategy_name, use_filter, tuned in strategies:
+            latencies, recalls, counts = [], [], []
+            for query_embedding in query_embeddings:
+                active_filters = filters if use_filter else None
+                exact_rows, _ = await _search(query_embedding, k, active_filters, tuned=False, exact=True)
+                rows, duration = await _search(query_embedding, k, active_filters, tuned=tuned)
+                latencies.append(duration * 1000)
+                recalls.append(_recall(rows, exact_rows))
+                counts.append(len(rows))
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(f"{scenario_name:<16} {strategy_name:<17} {statistics.median(latencies):>8.1f} {p95:>8.1f} {statistics.mean(recalls):>7.3f} {statistics.mean(counts):>8.1f}")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(main(args.queries, args.k, args.seed))
@@ -0,0 +1,100 @@
+# benchmarks/bench_import_time.py
+"""
+Misst die Kaltstart-Importzeit der API (und einzelner Module) in jeweils frischen Python-Prozessen und listet,
+welche schweren Pakete (Marker, torch, PIL, fitz, Provider-SDKs) dabei schon geladen werden. Chat-/Retrieval-
+Instanzen sollen ohne Marker/torch starten; die PDF-Verarbeitung lädt sie erst bei Bedarf (bzw. nur im
+Ingestion-Worker, INGESTION_WORKER_MODE="external").
+
+Keine Datenbank nötig - es wird nur importiert, der Lifespan (DB, Warm-up) läuft nicht.
+
+Aufruf (aus backend/):
+    python -m benchmarks.bench_import_time --repeat 5 --importtime 15
+    python -m benchmarks.bench_import_time --modules main --check --max-seconds 1.0
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = ["main", "app.api.routes", "app.services.chat_service", "app.services.pdf_processing_service"]
+# Module, die in der API erst bei Bedarf geladen werden sollen (main darf keines davon importieren)
+HEAVY_MODULES = [
+    "marker", "torch", "transformers", "PIL", "fitz",
+    "langchain_google_genai", "langchain_community", "langchain_text_splitters",
+]
+
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"seconds": seconds, "heavy": heavy, "modules": len(sys.modules)}}))
+"""
+
+
+def _measure_once(module: str) -> Dict:
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        return {"error": (result.stderr.strip().splitlines() or ["unbekannter Fehler"])[-1]}
+    # Module dürfen beim Import Logs ausgeben; das Messergebnis ist die letzte Zeile
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _importtime_top(module: str, top: int) -> List[Tuple[int, str]]:
+    """Größte kumulierte Importzeiten (µs) aus `python -X importtime`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:   self_us |   cumulative_us | paket" (Einrückung des Namens = Verschachtelung)
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append((int(cumulative_us), name.strip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+def main(modules: List[str], repeat: int, importtime_top: int, check: bool, max_seconds: float) -> int:
+    print(f"{'Modul':<42} {'Median s':>9} {'Min s':>7} {'Module':>7}  Schwere Pakete geladen")
+    failures = []
+    for module in modules:
+        runs = [_measure_once(module) for _ in range(repeat)]
+        errors = [r["error"] for r in runs if "error" in r]
+        if errors:
+            print(f"{module:<42} Import fehlgeschlagen: {errors[0]}")
+            failures.append(module)
+            continue
+        seconds = [r["seconds"] for r in runs]
+        heavy = runs[-1]["heavy"]
+        median = statistics.median(seconds)
+        print(f"{module:<42} {median:>9.3f} {min(seconds):>7.3f} {runs[-1]['modules']:>7}  {', '.join(heavy) or '-'}")
+        if check and module == "main" and (heavy or median > max_seconds):
+            failures.append(module)
+        if importtime_top:
+            for cumulative_us, name in _importtime_top(module, importtime_top):
+                print(f"    {cumulative_us / 1e6:>8.3f}s  {name}")
+    if check and failures:
+        print(f"FEHLER: Kaltstart-Ziel verfehlt bzw. Import fehlgeschlagen: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="die N teuersten Importe je Modul (-X importtime)")
+    parser.add_argument("--check", action="store_true", help="Exit-Code 1, wenn main schwere Pakete lädt oder zu langsam ist")
+    parser.add_argument("--max-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+    sys.exit(main(args.modules, args.repeat, args.importtime, args.check, args.max_seconds))
@@ -0,0 +1,434 @@
+# benchmarks/bench_load.py
+"""
+Last-Test des Backends Ende-zu-Ende mit den lokalen Fake-Providern (app/services/fake_providers.py).
+
+seed: legt einen synthetischen Korpus (N Dokumente mit je M Chunks, Fake-Embeddings) in Postgres/pgvector an.
+      Die Dokumente tragen das Präfix "loadtest_" in processed_document_id, --reset entfernt vorherige Läufe.
+run:  treibt /retrieval/find-similar, /chat/, /generation/generate-from-query(/stream) und
+      /pdf-processor/extract-and-store nebenläufig (geschlossene Schleife mit --concurrency Clients) und
+      gibt je Endpunkt Anfragen, Fehler, RPS und p50/p95/p99 aus. Die Auslastung des DB-Pools wird während
+      des Laufs über /metrics (db_pool_*) abgetastet, die Zeit je Verarbeitungsstufe aus rag_stage_duration_seconds.
+
+Ohne --base-url läuft die App im selben Prozess (httpx ASGITransport inkl. Lifespan); dann werden
+EMBEDDING_SERVICE_PROVIDER und LLM_PROVIDER auf "fake" gesetzt, sofern nicht anders vorgegeben. Gegen einen
+laufenden Server (--base-url) muss dieser selbst mit den Fake-Providern gestartet sein. Latenz und Fehlerquote
+der Provider: FAKE_EMBEDDING_LATENCY_MS, FAKE_LLM_LATENCY_MS, FAKE_LLM_TOKEN_DELAY_MS, FAKE_*_FAILURE_RATE.
+Die Fake-Embeddings müssen das aktive Embedding-Modell sein (frische Datenbank oder eigene
+ACTIVE_EMBEDDING_MODEL_PATH), sonst bricht seed ab.
+
+Aufruf (aus backend/):
+    python -m benchmarks.bench_load seed --documents 200 --chunks 50 --reset
+    python -m benchmarks.bench_load run --concurrency 32 --duration 60 --mix retrieval=60,chat=15,generation=10,generation_stream=5,ingest=10
+    python -m benchmarks.bench_load run --base-url http://localhost:8000 --concurrency 64 --duration 120
+"""
+import os
+import re
+import sys
+import math
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from collections import Counter as CounterDict
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+# Die App-Module werden erst nach dem Setzen der Provider importiert (lesen ihre Konfiguration beim Import)
+
+TOPIC_WORDS = (
+    "retrieval embedding vektor suche transformer aufmerksamkeit sprache modell korpus dokument "
+    "klimawandel emission energie speicher netz solar wind batterie wasserstoff effizienz "
+    "protein zelle genom mutation enzym stoffwechsel immunantwort impfstoff therapie klinik "
+    "algorithmus komplexität graph optimierung heuristik parallelität cache latenz durchsatz index "
+    "lernen bewertung curriculum motivation didaktik studie stichprobe regression varianz signifikanz"
+).split()
+FILLER_WORDS = "die der das und in mit für von auf bei zur im ist wird werden zeigt ergebnis ansatz methode daten".split()
+AUTHORS = [f"Autor{i:02d}, Vorname" for i in range(20)]
+DOCUMENT_PREFIX = "loadtest_"
+SCENARIOS = ("retrieval", "chat", "generation", "generation_stream", "ingest")
+
+METRIC_LINE_PATTERN = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{([^}]*)\})? ([0-9.eE+-]+|NaN|\+Inf)$')
+LABEL_PATTERN = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+# --- Synthetische Daten ---
+
+def _sentence(rng: random.Random, topic: List[str]) -> str:
+    words = [rng.choice(topic) if rng.random() < 0.4 else rng.choice(FILLER_WORDS) for _ in range(rng.randint(8, 18))]
+    return " ".join(words).capitalize() + "."
+
+
+def build_document_chunks(rng: random.Random, chunks: int) -> List[str]:
+    """Ein Dokument behandelt wenige Themenwörter, damit Vektor- und Volltextsuche unterscheidbare Treffer liefern."""
+    topic = rng.sample(TOPIC_WORDS, 6)
+    return [" ".join(_sentence(rng, topic) for _ in range(rng.randint(6, 14))) for _ in range(chunks)]
+
+
+def build_queries(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.sample(TOPIC_WORDS, rng.randint(2, 5))) for _ in range(max(1, count))]
+
+
+def build_pdf(seed: int, pages: int) -> bytes:
+    """Kleine, inhaltlich eindeutige PDF (sonst greift die SHA-256-Duplikaterkennung statt der Ingestion)."""
+    import fitz
+    rng = random.Random(seed)
+    topic = rng.sample(TOPIC_WORDS, 6)
+    doc = fitz.open()
+    try:
+        for page_no in range(pages):
+            page = doc.new_page()
+            text = f"Last-Test {seed} Seite {page_no + 1}\n\n" + "\n".join(_sentence(rng, topic) for _ in range(25))
+            page.insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=10)
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+
+# --- seed ---
+
+async def seed(documents: int, chunks_per_document: int, reset: bool, seed_value: int) -> None:
+    from sqlalchemy import delete
+    from app.db.session import AsyncSessionLocal, async_engine, create_db_tables
+    from app.db.models.document_model import Document
+    from app.db.crud import crud_document, crud_chunk
+    from app.schemas.processing_schemas import TextChunk
+    from app.services.embedding_migration import get_embedding_migration_manager
+    from app.services.embedding_versions import get_active_embedding_spec
+    from app.services.fake_providers import FakeEmbeddings
+    from app.services.corpus_version import bump_corpus_version
+
+    await create_db_tables()
+    migration_manager = get_embedding_migration_manager()
+    await migration_manager.start()
+    await migration_manager.shutdown()
+    spec = get_active_embedding_spec()
+    if spec.provider != "fake":
+        await async_engine.dispose()
+        raise SystemExit(f"Aktives Embedding-Modell ist {spec.version_key}, nicht 'fake'. Frische Datenbank (oder eigene "
+                         f"ACTIVE_EMBEDDING_MODEL_PATH) mit EMBEDDING_SERVICE_PROVIDER=fake verwenden.")
+
+    if reset:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(delete(Document).where(Document.processed_document_id.like(f"{DOCUMENT_PREFIX}%")))
+            await db.commit()
+        print(f"{result.rowcount} Last-Test-Dokumente entfernt (Chunks per ON DELETE CASCADE).")
+
+    # Ohne Latenz/Fehler: der Korpus soll schnell und vollständig entstehen
+    embeddings_model = FakeEmbeddings(dimension=spec.dimension, latency_ms=0, failure_rate=0)
+    rng = random.Random(seed_value)
+    run_id = uuid.uuid4().hex[:8]
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        for i in range(documents):
+            texts = build_document_chunks(rng, chunks_per_document)
+            document = await crud_document.create_document(
+                db=db,
+                original_filename=f"loadtest_{i:06d}.pdf",
+                processed_document_id=f"{DOCUMENT_PREFIX}{run_id}_{i:06d}",
+                title=f"Synthetisches Dokument {i}",
+                author=rng.choice(AUTHORS),
+                publication_year=rng.randint(1995, 2025),
+                additional_metadata={"synthetic": True},
+            )
+            chunks = [
+                TextChunk(content=text, page_number=j // 3 + 1, char_count=len(text))
+                for j, text in enumerate(texts)
+            ]
+            await crud_chunk.bulk_create_chunks(
+                db, document_id=document.id, chunks_data=chunks, embeddings=await asyncio.to_thread(embeddings_model.embed_documents, texts)
+            )
+            await db.commit()
+            if (i + 1) % 50 == 0:
+                print(f"  {i + 1}/{documents} Dokumente geschrieben")
+    seconds = time.perf_counter() - start
+    bump_corpus_version("Last-Test-Korpus angelegt")
+    total_chunks = documents * chunks_per_document
+    print(f"{documents} Dokumente / {total_chunks} Chunks in {seconds:.1f}s ({total_chunks / max(seconds, 1e-9):.0f} Chunks/s), Modell {spec.version_key}")
+    await async_engine.dispose()
+
+
+# --- run ---
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, CounterDict] = {}
+        self.recording = False
+
+    def record(self, scenario: str, seconds: float, error: Optional[str]) -> None:
+        if not self.recording:
+            return
+        self.latencies.setdefault(scenario, []).append(seconds)
+        if error:
+            self.errors.setdefault(scenario, CounterDict())[error] += 1
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-Rank-Verfahren
+    index = min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class LoadScenarios:
+    """Eine Anfrage je Szenario; Rückgabe None bei Erfolg, sonst eine kurze Fehlerbeschreibung (Status/Exception)."""
+
+    def __init__(self, client: httpx.AsyncClient, queries: List[str], args: argparse.Namespace):
+        self.client = client
+        self.queries = queries
+        self.args = args
+        self.ingest_job_ids: List[str] = []
+        self._pdf_counter = 0
+
+    @staticmethod
+    def _status_error(response: httpx.Response) -> Optional[str]:
+        return None if response.status_code < 400 else f"HTTP {response.status_code}"
+
+    async def retrieval(self, rng: random.Random, state: dict) -> Optional[str]:
+        params = {"query": rng.choice(self.queries), "limit": 5, "mode": rng.choice(self.args.retrieval_modes)}
+        if rng.random() < self.args.filter_ratio:
+            params["year_from"] = rng.randint(1995, 2020)
+        return self._status_error(await self.client.get("/retrieval/find-similar", params=params))
+
+    async def chat(self, rng: random.Random, state: dict) -> Optional[str]:
+        # Pro Client eine Sitzung über --chat-turns Nachrichten, damit auch das Laden des Verlaufs belastet wird
+        if state.get("chat_turns", 0) >= self.args.chat_turns:
+            state.pop("chat_session_id", None)
+            state["chat_turns"] = 0
+        body = {"message": rng.choice(self.queries) + "?", "session_id": state.get("chat_session_id"), "num_sources": 3, "use_rag": True}
+        response = await self.client.post("/chat/", json=body)
+        if response.status_code < 400:
+            state["chat_session_id"] = response.json().get("session_id")
+            state["chat_turns"] = state.get("chat_turns", 0) + 1
+        return self._status_error(response)
+
+    def _generation_body(self, rng: random.Random) -> dict:
+        return {
+            "editor_context_html": f"<h1>Entwurf</h1><p>{rng.choice(self.queries)}</p>",
+            "user_prompt": f"Ergänze einen Absatz zu {rng.choice(self.queries)}",
+            "num_sources": 3,
+        }
+
+    async def generation(self, rng: random.Random, state: dict) -> Optional[str]:
+        return self._status_error(await self.client.post("/generation/generate-from-query", json=self._generation_body(rng)))
+
+    async def generation_stream(self, rng: random.Random, state: dict) -> Optional[str]:
+        async with self.client.stream("POST", "/generation/generate-from-query/stream", json=self._generation_body(rng)) as response:
+            body = b"".join([chunk async for chunk in response.aiter_bytes()])
+        if response.status_code >= 400:
+            return f"HTTP {response.status_code}"
+        return "SSE error" if b"event: error" in body else None
+
+    async def ingest(self, rng: random.Random, state: dict) -> Optional[str]:
+        self._pdf_counter += 1
+        pdf_bytes = await asyncio.to_thread(build_pdf, rng.randint(0, 2**31) + self._pdf_counter, self.args.ingest_pages)
+        response = await self.client.post(
+            "/pdf-processor/extract-and-store",
+            params={"background": "true"},
+            files={"uploaded_file": (f"loadtest_{self._pdf_counter}.pdf", pdf_bytes, "application/pdf")},
+        )
+        if response.status_code < 400:
+            job_id = response.json().get("job_id")
+            if job_id:
+                self.ingest_job_ids.append(job_id)
+        return self._status_error(response)
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip():
+            weights[name.strip()] = float(weight or 1)
+    return {k: v for k, v in weights.items() if v > 0}
+
+
+def parse_metrics(text: str) -> Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]:
+    values = {}
+    for line in text.splitlines():
+        match = METRIC_LINE_PATTERN.match(line)
+        if match:
+            labels = tuple(sorted(LABEL_PATTERN.findall(match.group(2) or "")))
+            values[(match.group(1), labels)] = float(match.group(3))
+    return values
+
+
+async def sample_pool(client: httpx.AsyncClient, interval: float, samples: List[Tuple[float, float]], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            metrics = parse_metrics((await client.get("/metrics")).text)
+            samples.append((metrics.get(("db_pool_checked_out", ()), 0.0), metrics.get(("db_pool_capacity", ()), 0.0)))
+        except httpx.HTTPError:
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def worker(scenarios: LoadScenarios, weights: Dict[str, float], recorder: Recorder, deadline: float, seed_value: int) -> None:
+    rng = random.Random(seed_value)
+    names, cumulative = list(weights), list(weights.values())
+    state: dict = {}
+    while time.perf_counter() < deadline:
+        scenario = rng.choices(names, weights=cumulative)[0]
+        start = time.perf_counter()
+        try:
+            error = await getattr(scenarios, scenario)(rng, state)
+        except (httpx.HTTPError, ValueError) as e:
+            error = type(e).__name__
+        recorder.record(scenario, time.perf_counter() - start, error)
+
+
+async def wait_for_ingest_jobs(client: httpx.AsyncClient, job_ids: List[str], timeout: float) -> List[float]:
+    """Wartet auf die eingereihten Ingestion-Jobs und gibt deren Dauer (Einreihen bis Ende) zurück."""
+    pending, durations, failed = set(job_ids), [], 0
+    deadline = time.perf_counter() + timeout
+    while pending and time.perf_counter() < deadline:
+        for job_id in list(pending):
+            job = (await client.get(f"/pdf-processor/jobs/{job_id}")).json()
+            if job.get("status") in ("succeeded", "failed"):
+                pending.discard(job_id)
+                failed += job["status"] == "failed"
+                durations.append((job.get("finished_at") or time.time()) - job["created_at"])
+        if pending:
+            await asyncio.sleep(1.0)
+    print(f"\nIngestion-Jobs: {len(durations)} fertig ({failed} fehlgeschlagen), {len(pending)} nach {timeout:.0f}s noch offen")
+    return sorted(durations)
+
+
+def print_report(recorder: Recorder, seconds: float) -> None:
+    print(f"\n{'Szenario':<18} {'Anfr.':>7} {'Fehler':>7} {'RPS':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    all_latencies: List[float] = []
+    for scenario in sorted(recorder.latencies):
+        latencies = sorted(recorder.latencies[scenario])
+        all_latencies += latencies
+        errors = sum(recorder.errors.get(scenario, {}).values())
+        print(f"{scenario:<18} {len(latencies):>7} {errors:>7} {len(latencies) / seconds:>8.1f} {percentile(latencies, 50) * 1000:>9.1f} "
+              f"{percentile(latencies, 95) * 1000:>9.1f} {percentile(latencies, 99) * 1000:>9.1f} {latencies[-1] * 1000:>9.1f}")
+    all_latencies.sort()
+    total_errors = sum(sum(c.values()) for c in recorder.errors.values())
+    print(f"{'gesamt':<18} {len(all_latencies):>7} {total_errors:>7} {len(all_latencies) / seconds:>8.1f} {percentile(all_latencies, 50) * 1000:>9.1f} "
+          f"{percentile(all_latencies, 95) * 1000:>9.1f} {percentile(all_latencies, 99) * 1000:>9.1f} {(all_latencies[-1] if all_latencies else 0) * 1000:>9.1f}")
+    for scenario, errors in sorted(recorder.errors.items()):
+        print(f"  Fehler {scenario}: " + ", ".join(f"{kind} x{count}" for kind, count in errors.most_common()))
+
+
+def print_pool_report(samples: List[Tuple[float, float]]) -> None:
+    if not samples:
+        print("\nDB-Pool: keine Messwerte (/metrics nicht erreichbar)")
+        return
+    capacity = max(c for _, c in samples) or 1.0
+    checked_out = [s for s, _ in samples]
+    saturated = sum(1 for s in checked_out if s >= capacity)
+    print(f"\nDB-Pool (Kapazität {capacity:.0f}, {len(samples)} Messungen): ausgeliehen Mittel {sum(checked_out) / len(samples):.1f}, "
+          f"max {max(checked_out):.0f}, Auslastung Mittel {sum(checked_out) / len(samples) / capacity:.0%}, voll in {saturated / len(samples):.0%} der Messungen")
+
+
+def print_stage_report(before: Dict, after: Dict) -> None:
+    rows = []
+    for (name, labels), total in after.items():
+        if name != "rag_stage_duration_seconds_sum":
+            continue
+        count_key = ("rag_stage_duration_seconds_count", labels)
+        count = after.get(count_key, 0.0) - before.get(count_key, 0.0)
+        if count > 0:
+            label_map = dict(labels)
+            rows.append((label_map.get("stage", ""), label_map.get("outcome", ""), count, (total - before.get((name, labels), 0.0)) / count))
+    if rows:
+        print(f"\n{'Stufe (Server)':<28} {'Ergebnis':<9} {'Anzahl':>8} {'Mittel ms':>10}")
+        for stage, outcome, count, mean in sorted(rows, key=lambda r: -r[2] * r[3]):
+            print(f"{stage:<28} {outcome:<9} {count:>8.0f} {mean * 1000:>10.1f}")
+
+
+async def run_load(args: argparse.Namespace, client: httpx.AsyncClient) -> None:
+    weights = parse_mix(args.mix)
+    unknown = [name for name in weights if name not in SCENARIOS]
+    if unknown or not weights:
+        raise SystemExit(f"Unbekannte Szenarien in --mix: {unknown or args.mix}")
+    scenarios = LoadScenarios(client, build_queries(args.query_pool, args.seed), args)
+    recorder = Recorder()
+    before = parse_metrics((await client.get("/metrics")).text)
+    samples: List[Tuple[float, float]] = []
+    stop_sampling = asyncio.Event()
+
+    print(f"Last-Test: {args.concurrency} Clients, {args.warmup:.0f}s Aufwärmen + {args.duration:.0f}s Messung, Mix {weights}")
+    start = time.perf_counter()
+    deadline = start + args.warmup + args.duration
+    sampler = asyncio.create_task(sample_pool(client, args.sample_interval, samples, stop_sampling))
+    workers = [asyncio.create_task(worker(scenarios, weights, recorder, deadline, args.seed + i)) for i in range(args.concurrency)]
+    await asyncio.sleep(args.warmup)
+    recorder.recording = True
+    samples.clear()
+    measure_start = time.perf_counter()
+    await asyncio.gather(*workers)
+    # Laufende Anfragen beim Deadline-Ende verlängern die Messung; RPS bezieht sich auf die tatsächliche Dauer
+    measured_seconds = time.perf_counter() - measure_start
+    stop_sampling.set()
+    await sampler
+
+    print_report(recorder, measured_seconds)
+    print_pool_report(samples)
+    print_stage_report(before, parse_metrics((await client.get("/metrics")).text))
+    if args.wait_ingest and scenarios.ingest_job_ids:
+        durations = await wait_for_ingest_jobs(client, scenarios.ingest_job_ids, args.ingest_timeout)
+        if durations:
+            print(f"Job-Dauer: p50 {percentile(durations, 50):.1f}s, p95 {percentile(durations, 95):.1f}s, max {durations[-1]:.1f}s")
+
+
+async def run(args: argparse.Namespace) -> None:
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency + 2, max_keepalive_connections=args.concurrency + 2)
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout, limits=limits) as client:
+            await run_load(args, client)
+        return
+
+    from main import app
+    # ASGITransport startet keinen Lifespan und puffert Streaming-Antworten vollständig (SSE-Zeiten = Gesamtzeit)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=timeout) as client:
+            await run_load(args, client)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=42, help="Seed für Korpus, Anfragen und Szenario-Auswahl")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="Synthetischen Korpus anlegen")
+    seed_parser.add_argument("--documents", type=int, default=200)
+    seed_parser.add_argument("--chunks", type=int, default=50, help="Chunks pro Dokument")
+    seed_parser.add_argument("--reset", action="store_true", help="Vorher alle loadtest_-Dokumente löschen")
+
+    run_parser = commands.add_parser("run", help="Last erzeugen und auswerten")
+    run_parser.add_argument("--base-url", default=None, help="Laufender Server; ohne Angabe wird die App im Prozess gestartet")
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--duration", type=float, default=30.0, help="Messdauer in Sekunden")
+    run_parser.add_argument("--warmup", type=float, default=5.0, help="Aufwärmphase in Sekunden (nicht gewertet)")
+    run_parser.add_argument("--mix", default="retrieval=60,chat=15,generation=10,generation_stream=5,ingest=10",
+                            help=f"Gewichte je Szenario: {', '.join(SCENARIOS)}")
+    run_parser.add_argument("--retrieval-modes", nargs="+", default=["vector"], choices=["vector", "lexical", "hybrid"])
+    run_parser.add_argument("--filter-ratio", type=float, default=0.2, help="Anteil der Suchen mit Jahresfilter")
+    run_parser.add_argument("--query-pool", type=int, default=1000, help="Anzahl verschiedener Anfragen (kleiner = mehr Cache-Treffer)")
+    run_parser.add_argument("--chat-turns", type=int, default=5, help="Nachrichten pro Chat-Sitzung")
+    run_parser.add_argument("--ingest-pages", type=int, default=3, help="Seiten pro hochgeladener Test-PDF")
+    run_parser.add_argument("--wait-ingest", action="store_true", help="Nach der Messung auf die Ingestion-Jobs warten")
+    run_parser.add_argument("--ingest-timeout", type=float, default=600.0)
+    run_parser.add_argument("--sample-interval", type=float, default=0.25, help="Abtastintervall des DB-Pools in Sekunden")
+    run_parser.add_argument("--timeout", type=float, default=120.0, help="HTTP-Timeout je Anfrage in Sekunden")
+    args = parser.parse_args()
+
+    if args.command == "seed" or not args.base_url:
+        os.environ.setdefault("EMBEDDING_SERVICE_PROVIDER", "fake")
+        os.environ.setdefault("LLM_PROVIDER", "fake")
+    if args.command == "seed":
+        asyncio.run(seed(args.documents, args.chunks, args.reset, args.seed))
+    else:
+        asyncio.run(run(args))
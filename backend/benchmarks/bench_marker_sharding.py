@@ -0,0 +1,82 @@
+# benchmarks/bench_marker_sharding.py
+"""
+Vergleicht Marker am Stück (ein Converter, wie bisher) mit der seitenweisen Parallelisierung (MARKER_SHARD_*).
+
+Für jede PDF werden Laufzeit, Markdown-Länge, gefundene Seiten-Marker und das Ergebnis von
+chunk_globally_then_assign_pages (Chunks, zugeordnete Seiten) beider Wege ausgegeben. Das Laden der Modelle
+in den Shard-Workern wird vorab erledigt und separat ausgewiesen, damit nur die Konvertierung verglichen wird.
+
+Aufruf (aus backend/, Standard: alle PDFs in raw_pdf_testbase/):
+    python -m benchmarks.bench_marker_sharding --workers 4 --window 20
+    python -m benchmarks.bench_marker_sharding --pdfs ../raw_pdf_testbase/science.pdf --workers 2 --window 10
+"""
+import os
+import re
+import sys
+import glob
+import time
+import asyncio
+import argparse
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+from marker.output import text_from_rendered  # noqa: E402
+
+from app.dependencies import get_marker_resources, create_pdf_converter  # noqa: E402
+from app.services.marker_sharding import MarkerShardPool  # noqa: E402
+from app.services.pdf_processing_service import chunk_globally_then_assign_pages  # noqa: E402
+
+DEFAULT_PDF_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "raw_pdf_testbase")
+PAGE_SPAN_PATTERN = re.compile(r'<span id="page-(\d+)-')
+
+
+def _summarize(md_text: str, meta: dict) -> str:
+    pages_with_marker = len(set(PAGE_SPAN_PATTERN.findall(md_text)))
+    chunks = chunk_globally_then_assign_pages(md_text, meta.get("table_of_contents", []))
+    assigned_pages = len({c["page_number"] for c in chunks})
+    return f"{len(md_text):>9} {pages_with_marker:>7} {len(chunks):>7} {assigned_pages:>7}"
+
+
+async def main(pdf_paths: List[str], workers: int, window: int) -> None:
+    load_start = time.perf_counter()
+    marker_res = get_marker_resources()
+    converter = create_pdf_converter(marker_res["artifact_dict"], marker_res["config"])
+    print(f"Modelle (API-Prozess) geladen in {time.perf_counter() - load_start:.1f}s")
+
+    shard_pool = MarkerShardPool(workers, window, min_pages=0)
+    warmup_start = time.perf_counter()
+    await shard_pool.warm_up()
+    print(f"{workers} Shard-Worker gestartet (Modelle geladen) in {time.perf_counter() - warmup_start:.1f}s, Fenster: {window} Seiten\n")
+
+    print(f"{'PDF':<36} {'Seiten':>6} {'Weg':<9} {'Zeit s':>8} {'Speedup':>7} {'MD-Zeich':>9} {'Marker':>7} {'Chunks':>7} {'Seiten':>7}")
+    try:
+        for pdf_path in pdf_paths:
+            with fitz.open(pdf_path) as doc:
+                page_count = doc.page_count
+            name = os.path.basename(pdf_path)[:36]
+
+            start = time.perf_counter()
+            md_text, meta, _ = text_from_rendered(converter(pdf_path))
+            sequential_seconds = time.perf_counter() - start
+            print(f"{name:<36} {page_count:>6} {'am Stück':<9} {sequential_seconds:>8.1f} {1.0:>7.2f} {_summarize(md_text, meta)}")
+
+            start = time.perf_counter()
+            md_text, meta, _ = await shard_pool.convert(pdf_path, page_count)
+            sharded_seconds = time.perf_counter() - start
+            print(f"{'':<36} {'':>6} {'sharded':<9} {sharded_seconds:>8.1f} {sequential_seconds / sharded_seconds:>7.2f} {_summarize(md_text, meta)}")
+    finally:
+        shard_pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdfs", nargs="*", default=None, help="PDF-Dateien (Standard: raw_pdf_testbase/*.pdf)")
+    parser.add_argument("--workers", type=int, default=max(2, min(4, (os.cpu_count() or 2) // 2)))
+    parser.add_argument("--window", type=int, default=20, help="Seiten pro Fenster")
+    args = parser.parse_args()
+    pdfs = args.pdfs or sorted(glob.glob(os.path.join(DEFAULT_PDF_DIR, "*.pdf")))
+    if not pdfs:
+        raise SystemExit(f"Keine PDFs gefunden (Standardverzeichnis: {DEFAULT_PDF_DIR}).")
+    asyncio.run(main(pdfs, args.workers, args.window))
@@ -0,0 +1,121 @@
+# benchmarks/bench_vector_index.py
+"""
+Vergleicht die HNSW-Index-Modi (VECTOR_INDEX_MODE): Bauzeit, Indexgröße, Recall@k und Latenz.
+
+  vector   volle Präzision (vector_cosine_ops), Referenz
+  halfvec  16-Bit-Floats (halfvec_cosine_ops), ca. halbe Indexgröße, exakte Nachsortierung
+  binary   binary_quantize + Hamming (bit_hamming_ops), ca. 1/32 der Größe, exakte Nachsortierung
+
+Für jeden Modus wird ein eigener Benchmark-Index angelegt und am Ende wieder gelöscht.
+Als Anfragen dienen zufällige, bereits gespeicherte Chunk-Embeddings (kein Embedding-Provider nötig);
+die Ground Truth ist eine exakte Suche ohne Index (enable_indexscan = off). Benötigt pgvector >= 0.7.
+
+Aufruf (aus backend/, benötigt eine befüllte Datenbank):
+    python -m benchmarks.bench_vector_index --queries 50 --k 5 --multiplier 4
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from typing import List, Dict, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text, func  # noqa: E402
+from sqlalchemy.future import select  # noqa: E402
+
+from app.db.session import AsyncSessionLocal, async_engine  # noqa: E402
+from app.db.models import Chunk  # noqa: E402
+from app.db.models.chunk_model import VECTOR_INDEX_MODES, vector_index_ddl  # noqa: E402
+from app.db.crud import crud_retrieval  # noqa: E402
+
+
+def _bench_index_name(mode: str) -> str:
+    return f"bench_chunk_embedding_{mode}_hnsw"
+
+
+async def _sample_query_embeddings(n: int) -> List[List[float]]:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Chunk.embedding).filter(Chunk.embedding.isnot(None)).order_by(func.random()).limit(n)
+        )
+        return [[float(x) for x in row[0]] for row in result.all()]
+
+
+async def _build_index(mode: str) -> Dict[str, float]:
+    index_name = _bench_index_name(mode)
+    async with async_engine.begin() as conn:
+        await conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+        start = time.perf_counter()
+        await conn.execute(text(vector_index_ddl(mode, index_name)))
+        build_seconds = time.perf_counter() - start
+        size_bytes = (await conn.execute(text(f"SELECT pg_relation_size('{index_name}')"))).scalar() or 0
+    return {"build_seconds": build_seconds, "size_mb": size_bytes / (1024 * 1024)}
+
+
+async def _drop_indexes() -> None:
+    async with async_engine.begin() as conn:
+        for mode in VECTOR_INDEX_MODES:
+            await conn.execute(text(f"DROP INDEX IF EXISTS {_bench_index_name(mode)}"))
+
+
+async def _search(query_embedding: List[float], k: int, mode: str, exact: bool = False):
+    async with AsyncSessionLocal() as db:
+        if exact:
+            await db.execute(text("SET LOCAL enable_indexscan = off"))
+        start = time.perf_counter()
+        rows = await crud_retrieval.find_similar_chunks(
+            db=db, query_embedding=query_embedding, limit=k, tune_filtered_scan=False, index_mode=mode
+        )
+        duration = time.perf_counter() - start
+        await db.rollback()
+    return rows, duration
+
+
+def _recall(approx: List[Dict[str, Any]], exact: List[Dict[str, Any]]) -> float:
+    if not exact:
+        return 1.0
+    exact_ids = {r["chunk_db_id"] for r in exact}
+    return len(exact_ids & {r["chunk_db_id"] for r in approx}) / len(exact_ids)
+
+
+async def main(num_queries: int, k: int, multiplier: int) -> None:
+    crud_retrieval.VECTOR_RERANK_MULTIPLIER = multiplier
+    query_embeddings = await _sample_query_embeddings(num_queries)
+    if not query_embeddings:
+        raise SystemExit("Keine Chunks mit Embedding in der Datenbank.")
+
+    exact_results = []
+    for query_embedding in query_embeddings:
+        rows, _ = await _search(query_embedding, k, "vector", exact=True)
+        exact_results.append(rows)
+
+    print(f"{len(query_embeddings)} Anfragen, k={k}, Nachsortierung aus {k * multiplier} Kandidaten")
+    print(f"{'Modus':<8} {'Bau s':>7} {'Größe MB':>9} {'p50 ms':>8} {'p95 ms':>8} {'Recall':>7}")
+    try:
+        for mode in VECTOR_INDEX_MODES:
+            index_stats = await _build_index(mode)
+            latencies, recalls = [], []
+            for query_embedding, exact_rows in zip(query_embeddings, exact_results):
+                rows, duration = await _search(query_embedding, k, mode)
+                latencies.append(duration * 1000)
+                recalls.append(_recall(rows, exact_rows))
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(f"{mode:<8} {index_stats['build_seconds']:>7.1f} {index_stats['size_mb']:>9.1f} {statistics.median(latencies):>8.1f} {p95:>8.1f} {statistics.mean(recalls):>7.3f}")
+            # Nur ein Benchmark-Index gleichzeitig, damit der Planer nicht auf einen anderen ausweicht
+            await _drop_indexes()
+    finally:
+        await _drop_indexes()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--multiplier", type=int, default=4, help="VECTOR_RERANK_MULTIPLIER für halfvec/binary")
+    args = parser.parse_args()
+    asyncio.run(main(args.queries, args.k, args.multiplier))
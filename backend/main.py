@@ -4,13 +4,38 @@ from fastapi.middleware.cors import CORSMiddleware # HINZUGEFÜGT
 from contextlib import asynccontextmanager
 from app.api.routes import api_router 
 from app.db.session import create_db_tables
+from app.services.ingestion_jobs import get_ingestion_job_manager, INGESTION_WORKER_MODE
+from app.services.embedding_migration import get_embedding_migration_manager
+from app.services.marker_sharding import get_marker_shard_pool
+from app.services.image_store import shutdown_image_executor
+from app.services.index_maintenance import get_index_maintenance_manager
+from app.core.http_client import close_http_clients
+from app.core.observability import RequestContextMiddleware
+from app.dependencies import MARKER_WARMUP_ON_STARTUP, warm_up_marker_converters
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("INFO_MAIN: Application startup... Calling create_db_tables().")
     await create_db_tables() 
     print("INFO_MAIN: Database tables checked/created.")
+    # Aktives Embedding-Modell festlegen, bevor Ingestion-Worker starten (sie lesen es aus der Zeiger-Datei)
+    embedding_migration_manager = get_embedding_migration_manager()
+    await embedding_migration_manager.start()
+    ingestion_job_manager = get_ingestion_job_manager()
+    await ingestion_job_manager.start()
+    if MARKER_WARMUP_ON_STARTUP and INGESTION_WORKER_MODE == "inline":
+        # Converter-Pool erstellen und eine Mini-PDF durch Marker schicken, bevor die erste Anfrage kommt
+        await warm_up_marker_converters()
+    # Nur bei "inline" läuft Marker im API-Prozess; bei "process" wärmen die Worker-Prozesse selbst auf, bei "external"
+    # verarbeitet app.ingestion_worker die Jobs. Die API lädt Marker dann erst, wenn /extract-and-store synchron genutzt wird.
     yield
+    await ingestion_job_manager.shutdown()
+    await embedding_migration_manager.shutdown()
+    await get_index_maintenance_manager().shutdown()
+    if get_marker_shard_pool():
+        get_marker_shard_pool().shutdown()
+    shutdown_image_executor()
+    await close_http_clients()
     print("INFO_MAIN: Application shutdown.")
     
 app = FastAPI(
@@ -33,7 +58,10 @@ app.add_middleware(
     allow_credentials=True, 
     allow_methods=["*"],    # Erlaube OPTIONS, POST, GET etc.
     allow_headers=["*"],    
+    expose_headers=["X-Request-ID"],
 )
+# Request-ID und Latenz je Route (siehe /metrics)
+app.add_middleware(RequestContextMiddleware)
 
 @app.get("/", tags=["Root"])
 async def root_welcome():
@@ -3,7 +3,7 @@
 import { useState, useEffect, useRef } from "react";
 import Link from "next/link";
 import { useRouter } from "next/navigation";
-import { sendMessageToLLM } from "../../services/llmService"; // Passe Pfad ggf. an
+import { streamMessageToLLM } from "../../services/llmService"; // Passe Pfad ggf. an
 import ReactMarkdown from 'react-markdown';
 import { Send, Loader2, MessageSquare } from 'lucide-react';
 
@@ -55,16 +55,21 @@ export default function ChatInterface({ asSidebar = false }: ChatInterfaceProps)
     if (textareaRef.current) textareaRef.current.style.height = 'auto';
     setIsLoading(true);
 
+    // Antwort wird per SSE gestreamt: leere Assistenten-Nachricht anlegen und Tokens direkt anhängen
+    const assistantId = `assistant-${Date.now()}`;
+    const updateAssistantMessage = (update: (content: string) => string) =>
+      setMessages(prev => prev.map(m => m.id === assistantId ? { ...m, content: update(m.content) } : m));
+    setMessages(prev => [...prev, { id: assistantId, content: "", sender: 'assistant' }]);
+
     try {
       const useRagForThisMessage = true;
-      const aiResponseText = await sendMessageToLLM(
-          userInput,
-          documentConfig,
-          useRagForThisMessage,
-          3
-      );
-      const newAssistantMessage: Message = { id: `assistant-${Date.now()}`, content: aiResponseText, sender: 'assistant' };
-      setMessages(prev => [...prev, newAssistantMessage]);
+      const response = await streamMessageToLLM(userInput, {
+        onToken: (text) => updateAssistantMessage(content => content + text),
+        onError: (detail) => updateAssistantMessage(content => `${content}\n\nFehler: ${detail}`),
+      }, useRagForThisMessage, 3);
+      if (!response.ai_message) {
+        updateAssistantMessage(content => content || "Keine Textantwort vom Assistenten.");
+      }
     } catch (error) {
       console.error("Fehler in ChatInterface:", error);
       const errorResponseMessage: Message = {
@@ -72,7 +77,7 @@ export default function ChatInterface({ asSidebar = false }: ChatInterfaceProps)
         content: "Kommunikationsfehler mit dem Assistenten.",
         sender: 'assistant'
       };
-      setMessages(prev => [...prev, errorResponseMessage]);
+      setMessages(prev => [...prev.filter(m => !(m.id === assistantId && !m.content)), errorResponseMessage]);
     } finally {
       setIsLoading(false);
     }
@@ -93,7 +98,7 @@ export default function ChatInterface({ asSidebar = false }: ChatInterfaceProps)
 
         {/* Nachrichtenbereich - KEIN extra Padding unten mehr */}
         <div className="flex-grow overflow-y-auto p-4 space-y-4">
-          {messages.map((message) => (
+          {messages.filter(m => m.content).map((message) => (
             <div key={message.id} className={`flex w-full ${message.sender === 'user' ? 'justify-end' : 'justify-start'}`}>
               <div
                 className={`inline-block rounded-xl px-3.5 py-2 max-w-[85%] text-sm shadow-sm
@@ -115,7 +120,7 @@ export default function ChatInterface({ asSidebar = false }: ChatInterfaceProps)
             </div>
           ))}
           <div ref={messagesEndRef} />
-          {isLoading && !messages.find(m => m.sender === 'assistant' && m.content.includes('denkt nach')) && (
+          {isLoading && messages[messages.length - 1]?.content === "" && (
             <div className="flex justify-center items-center py-2">
               <Loader2 size={16} className="text-gray-400 animate-spin mr-2" />
               <p className="text-xs text-gray-500">Assistent denkt nach...</p>
@@ -8,7 +8,7 @@ import EditorBubbleMenu from './EditorBubbleMenu'
 import EditorToolbar from './EditorToolbar'
 import Citation from './extensions/CitationNode'
 import EditorContextMenu from './EditorContextMenu';
-import { generateTextFromQuery } from "@/services/llmService";
+import { streamTextFromQuery } from "@/services/llmService";
 import Heading from '@tiptap/extension-heading';
 
 import {
@@ -356,9 +356,26 @@ const Tiptap: React.FC<TiptapProps> = ({ onOutlineUpdate, initialOutline }) => {
     const NUM_SOURCES = 3;
     const editorHTML = editor.getHTML();
     const effectivePrompt = userPromptFromContextMenu?.trim() || "Schreibe einen passenden wissenschaftlichen Textabschnitt basierend auf dem aktuellen Kontext...";
+    // Tokens werden sofort als Rohtext an der Cursor-Position eingefügt; am Ende wird dieser Bereich
+    // durch den fertigen Text mit Citation-Nodes ersetzt. Währenddessen ist der Editor schreibgeschützt.
+    const streamStart = editor.state.selection.from;
+    let streamEnd = streamStart;
+    let streamError: string | null = null;
+    editor.setEditable(false);
     try {
-      const response = await generateTextFromQuery(editorHTML, effectivePrompt, NUM_SOURCES);
-      if (response.generated_text) {
+      const response = await streamTextFromQuery(editorHTML, effectivePrompt, {
+        onToken: (text) => {
+          const sizeBefore = editor.state.doc.content.size;
+          editor.chain().insertContentAt(streamEnd, { type: 'text', text }).run();
+          streamEnd += editor.state.doc.content.size - sizeBefore;
+        },
+        onError: (detail) => { streamError = detail; },
+      }, NUM_SOURCES);
+      const streamedRange = { from: streamStart, to: streamEnd };
+      if (streamError) {
+        editor.chain().deleteRange(streamedRange).run();
+        alert(`Fehler bei Textgenerierung (Kontextmenü): ${streamError}`);
+      } else if (response.generated_text) {
         const sourceMap = new Map(response.sources.map(s => [s.chunk_id, s]));
         const contentToInsert: Array<any> = [];
         const citationRegex = /\[ID:([a-f0-9-]+(?:-[a-f0-9]+)*)\]/gi;
@@ -377,11 +394,20 @@ const Tiptap: React.FC<TiptapProps> = ({ onOutlineUpdate, initialOutline }) => {
         if (textAfter) contentToInsert.push({ type: 'text', text: textAfter });
 
         if (contentToInsert.length > 0) {
-          editor.chain().focus().insertContent(contentToInsert).run();
+          editor.chain().focus().deleteRange(streamedRange).insertContentAt(streamStart, contentToInsert).run();
         }
-      } else { alert("Kein Text von der KI generiert (Kontextmenü)."); }
-    } catch (e: any) { alert(`Fehler bei Textgenerierung (Kontextmenü): ${e?.message || 'Unbekannt'}`); }
-    finally { setIsGeneratingTextFromContext(false); }
+      } else {
+        editor.chain().deleteRange(streamedRange).run();
+        alert("Kein Text von der KI generiert (Kontextmenü).");
+      }
+    } catch (e: any) {
+      editor.chain().deleteRange({ from: streamStart, to: streamEnd }).run();
+      alert(`Fehler bei Textgenerierung (Kontextmenü): ${e?.message || 'Unbekannt'}`);
+    }
+    finally {
+      editor.setEditable(true);
+      setIsGeneratingTextFromContext(false);
+    }
   };
 
   const handleContextMenuRewriteText = (prompt?: string) => {
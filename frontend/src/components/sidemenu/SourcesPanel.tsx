@@ -29,6 +29,8 @@ const SourcesPanel: React.FC<SourcesPanelProps> = (props) => {
   const [actionNotification, setActionNotification] = useState<NotificationState>({ type: null, message: null });
   const [showAddSourceOptions, setShowAddSourceOptions] = useState(false);
   const [showOnlineSearchModal, setShowOnlineSearchModal] = useState(false);
+  // Bricht das Warten auf laufende Upload-Jobs ab, wenn das Panel geschlossen wird
+  const uploadAbortRef = useRef<AbortController | null>(null);
 
   // Beispiel: Breite des SideMenu (IconBar 64px + Panel 288px = 352px)
   // Dieser Wert muss der tatsächlichen Breite des geöffneten SideMenu-Panels entsprechen.
@@ -54,6 +56,10 @@ const SourcesPanel: React.FC<SourcesPanelProps> = (props) => {
     fetchSourcesData();
   }, [fetchSourcesData]);
 
+  useEffect(() => {
+    return () => uploadAbortRef.current?.abort();
+  }, []);
+
   useEffect(() => {
     if (actionNotification.message) {
       const timer = setTimeout(() => {
@@ -102,7 +108,8 @@ const SourcesPanel: React.FC<SourcesPanelProps> = (props) => {
         setIsLoading(true);
         setActionNotification({ type: null, message: null });
         try {
-            const result = await uploadAndStorePdf(file);
+            uploadAbortRef.current = new AbortController();
+            const result = await uploadAndStorePdf(file, undefined, { signal: uploadAbortRef.current.signal });
             await fetchSourcesData(false);
             setActionNotification({ type: 'success', message: `Datei "${result.original_filename}" erfolgreich hochgeladen!` });
         } catch (err) {
@@ -27,7 +27,39 @@ export interface PdfProcessingResultFE {
 }
 
 
+// Entspricht IngestionJobCreated / IngestionJobStatus aus app/schemas/ingestion_job_schemas.py
+export interface IngestionJobCreatedFE {
+    job_id: string;
+    status: "queued" | "running" | "succeeded" | "failed";
+    original_filename: string;
+    status_url: string;
+    events_url: string;
+}
+
+export interface IngestionJobStatusFE {
+    job_id: string;
+    status: "queued" | "running" | "succeeded" | "failed";
+    original_filename: string;
+    current_stage?: string | null;
+    stage_timings: Record<string, number>;
+    result?: {
+        processed_document_id?: string | null;
+        num_chunks?: number;
+        debug_message?: string | null;
+    } | null;
+    error?: string | null;
+}
+
+
 const API_BASE_URL = "http://127.0.0.1:8000/pdf-processor"; // Basis-URL für Dokumenten-Endpunkte
+const JOB_POLL_INTERVAL_MS = 1500;
+// Obergrenze fürs Warten auf einen Job (z.B. kein Ingestion-Worker aktiv oder Job hängt in "running")
+const JOB_WAIT_TIMEOUT_MS = 30 * 60 * 1000;
+
+export interface WaitForJobOptions {
+    timeoutMs?: number;
+    signal?: AbortSignal;
+}
 
 /**
  * Ruft eine Liste aller verarbeiteten Dokumente vom Backend ab.
@@ -67,22 +99,78 @@ export async function deleteDocument(documentId: string): Promise<DocumentDispla
     }
 }
 
+function sleep(ms: number, signal?: AbortSignal): Promise<void> {
+    return new Promise((resolve, reject) => {
+        if (signal?.aborted) {
+            reject(new Error("Warten auf die Verarbeitung abgebrochen."));
+            return;
+        }
+        const onAbort = () => {
+            clearTimeout(timer);
+            reject(new Error("Warten auf die Verarbeitung abgebrochen."));
+        };
+        const timer = setTimeout(() => {
+            signal?.removeEventListener("abort", onAbort);
+            resolve();
+        }, ms);
+        signal?.addEventListener("abort", onAbort, { once: true });
+    });
+}
+
 /**
- * Lädt eine PDF-Datei hoch, verarbeitet sie und speichert sie.
+ * Fragt den Status eines Ingestion-Jobs ab, bis er abgeschlossen ist.
+ * @param jobId Die ID des Jobs aus der Upload-Antwort.
+ * @param onProgress Optionaler Callback mit dem jeweils aktuellen Status (z.B. für eine Fortschrittsanzeige).
+ * @param options Optional: Zeitlimit (Standard JOB_WAIT_TIMEOUT_MS) und AbortSignal zum Abbrechen.
+ */
+export async function waitForIngestionJob(
+    jobId: string,
+    onProgress?: (status: IngestionJobStatusFE) => void,
+    options: WaitForJobOptions = {}
+): Promise<IngestionJobStatusFE> {
+    const { timeoutMs = JOB_WAIT_TIMEOUT_MS, signal } = options;
+    const deadline = Date.now() + timeoutMs;
+    while (true) {
+        const response = await axios.get<IngestionJobStatusFE>(`${API_BASE_URL}/jobs/${jobId}`, { signal });
+        const job = response.data;
+        onProgress?.(job);
+        if (job.status === "succeeded") {
+            return job;
+        }
+        if (job.status === "failed") {
+            throw new Error(job.error || `Verarbeitung von "${job.original_filename}" fehlgeschlagen.`);
+        }
+        if (Date.now() >= deadline) {
+            const minutes = Math.round(timeoutMs / 60000);
+            throw new Error(job.status === "queued"
+                ? `"${job.original_filename}" wartet seit ${minutes} Minuten auf Verarbeitung. Läuft ein Ingestion-Worker?`
+                : `Verarbeitung von "${job.original_filename}" nach ${minutes} Minuten nicht abgeschlossen (Stufe: ${job.current_stage || "unbekannt"}).`);
+        }
+        await sleep(JOB_POLL_INTERVAL_MS, signal);
+    }
+}
+
+/**
+ * Lädt eine PDF-Datei hoch und wartet, bis der Verarbeitungs-Job im Backend abgeschlossen ist.
  * @param file Die hochzuladende PDF-Datei.
- * @returns Das Ergebnis der Verarbeitung und Speicherung.
+ * @param onProgress Optionaler Callback für den Job-Fortschritt.
+ * @returns Der abgeschlossene Ingestion-Job.
  */
-export async function uploadAndStorePdf(file: File): Promise<PdfProcessingResultFE> {
+export async function uploadAndStorePdf(
+    file: File,
+    onProgress?: (status: IngestionJobStatusFE) => void,
+    options: WaitForJobOptions = {}
+): Promise<IngestionJobStatusFE> {
     const formData = new FormData();
     formData.append("uploaded_file", file); // Der Name "uploaded_file" muss mit dem Backend übereinstimmen
 
     try {
-        const response = await axios.post<PdfProcessingResultFE>(`${API_BASE_URL}/extract-and-store`, formData, {
+        const response = await axios.post<IngestionJobCreatedFE>(`${API_BASE_URL}/extract-and-store`, formData, {
             headers: {
                 // 'Content-Type': 'multipart/form-data' wird von Axios automatisch gesetzt, wenn FormData verwendet wird.
             },
         });
-        return response.data;
+        return await waitForIngestionJob(response.data.job_id, onProgress, options);
     } catch (error) {
         console.error("Fehler beim Hochladen und Speichern der PDF:", error);
         if (axios.isAxiosError(error) && error.response) {
@@ -94,6 +182,9 @@ export async function uploadAndStorePdf(file: File): Promise<PdfProcessingResult
             }
             throw new Error(String(detail) || "Fehler beim Hochladen der PDF vom Server.");
         }
+        if (error instanceof Error) {
+            throw error;
+        }
         throw new Error("Netzwerkfehler oder unbekannter Fehler beim Hochladen der PDF.");
     }
 }
@@ -174,9 +265,11 @@ interface BatchImportFromUrlPayloadFE { // Entspricht BatchImportFromUrlRequest
 export interface BatchImportResultItemFE { // Entspricht BatchImportResultItem aus Backend
     original_filename: string;
     arxiv_id?: string | null;
-    status: "success" | "error";
+    // "queued": heruntergeladen und als Ingestion-Job eingereiht (job_id)
+    status: "queued" | "success" | "error";
     message: string;
     processed_document_id?: string | null;
+    job_id?: string | null;
 }
 
 export interface BatchImportFromUrlResponseFE { // Entspricht BatchImportFromUrlResponse aus Backend
@@ -192,7 +285,26 @@ export async function batchImportPdfsFromUrls(
             `http://127.0.0.1:8000/pdf-processor/batch-import-from-urls`,
             payload
         );
-        return response.data;
+        // Das Backend reiht die PDFs nur ein - auf die Verarbeitung der eingereihten Jobs warten.
+        // Die Jobs laufen ggf. nacheinander, daher wächst das Zeitlimit mit der Anzahl.
+        const queuedCount = response.data.results.filter(item => item.status === "queued").length;
+        const results = await Promise.all(response.data.results.map(async (item): Promise<BatchImportResultItemFE> => {
+            if (item.status !== "queued" || !item.job_id) {
+                return item;
+            }
+            try {
+                const job = await waitForIngestionJob(item.job_id, undefined, { timeoutMs: JOB_WAIT_TIMEOUT_MS * Math.max(1, queuedCount) });
+                return {
+                    ...item,
+                    status: "success",
+                    message: job.result?.debug_message || `'${item.original_filename}' erfolgreich importiert.`,
+                    processed_document_id: job.result?.processed_document_id ?? null,
+                };
+            } catch (jobError) {
+                return { ...item, status: "error", message: jobError instanceof Error ? jobError.message : String(jobError) };
+            }
+        }));
+        return { results };
     } catch (error) {
         console.error("Fehler beim Batch-Import von URLs:", error);
         if (axios.isAxiosError(error) && error.response) {
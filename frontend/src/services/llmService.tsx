@@ -280,4 +280,94 @@ export async function generateTextFromQuery(
       : "Netzwerkfehler oder unbekannter Serverfehler";
     throw new Error(`Fehler bei der Textgenerierung: ${errorDetails}`);
   }
-}
\ No newline at end of file
+}
+
+// --- NEU: Streaming-Varianten (Server-Sent-Events) ---
+// axios kann die Antwort im Browser nicht stückweise lesen, daher fetch + ReadableStream.
+export interface StreamCallbacks {
+  onSources?: (sources: SourceDetailFE[]) => void;
+  onToken?: (text: string) => void;
+  onError?: (detail: string) => void;
+}
+
+async function readSseStream(
+  url: string,
+  payload: unknown,
+  handleEvent: (event: string, data: any) => void
+): Promise<void> {
+  const response = await fetch(url, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
+    body: JSON.stringify(payload),
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Serverfehler beim Streaming (Status: ${response.status})`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    // Events sind durch eine Leerzeile getrennt
+    let separatorIndex: number;
+    while ((separatorIndex = buffer.indexOf("\n\n")) !== -1) {
+      const rawEvent = buffer.slice(0, separatorIndex);
+      buffer = buffer.slice(separatorIndex + 2);
+      let eventName = "message";
+      const dataLines: string[] = [];
+      for (const line of rawEvent.split("\n")) {
+        if (line.startsWith("event:")) eventName = line.slice(6).trim();
+        else if (line.startsWith("data:")) dataLines.push(line.slice(5).trimStart());
+      }
+      if (dataLines.length > 0) handleEvent(eventName, JSON.parse(dataLines.join("\n")));
+    }
+  }
+}
+
+export async function streamTextFromQuery(
+  editorContextHtml: string,
+  userPrompt: string | null | undefined,
+  callbacks: StreamCallbacks,
+  numSources: number = 2
+): Promise<GeneratedTextResponseFE> {
+  const payload: GenerateTextPayload = {
+    editor_context_html: editorContextHtml,
+    user_prompt: userPrompt,
+    num_sources: numSources,
+  };
+  let result: GeneratedTextResponseFE = { generated_text: "", sources: [] };
+  await readSseStream("http://127.0.0.1:8000/generation/generate-from-query/stream", payload, (event, data) => {
+    if (event === "sources") { result.sources = data.sources; callbacks.onSources?.(data.sources); }
+    else if (event === "token") { result.generated_text += data.text; callbacks.onToken?.(data.text); }
+    else if (event === "error") callbacks.onError?.(data.detail);
+    else if (event === "done") result = { generated_text: data.generated_text, sources: data.sources ?? result.sources };
+  });
+  return result;
+}
+
+export async function streamMessageToLLM(
+  userInput: string,
+  callbacks: StreamCallbacks,
+  useRagFlag: boolean = false,
+  numSourcesValue: number = 3
+): Promise<ChatResponseFE> {
+  const payload: ChatRequestPayload = { message: userInput, num_sources: numSourcesValue, use_rag: useRagFlag };
+  if (currentChatSessionId) payload.session_id = currentChatSessionId;
+
+  const result: ChatResponseFE = { session_id: currentChatSessionId ?? "", ai_message: "", retrieved_sources: [] };
+  await readSseStream("http://127.0.0.1:8000/chat/stream", payload, (event, data) => {
+    if (event === "sources") {
+      result.session_id = data.session_id;
+      currentChatSessionId = data.session_id;
+      result.retrieved_sources = data.sources;
+      callbacks.onSources?.(data.sources);
+    }
+    else if (event === "token") { result.ai_message += data.text; callbacks.onToken?.(data.text); }
+    else if (event === "error") callbacks.onError?.(data.detail);
+    else if (event === "done") result.ai_message = data.ai_message;
+  });
+  return result;
+}